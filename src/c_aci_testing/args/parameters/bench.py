@@ -0,0 +1,40 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+
+
+def parse_bench_args(parser):
+    parser.add_argument(
+        "--iterations",
+        help="Number of times to run the target, each with a fresh deployment name",
+        type=int,
+        default=os.getenv("BENCH_ITERATIONS", "5"),
+    )
+    parser.add_argument(
+        "--concurrency",
+        help="Number of iterations to run at the same time, vn2 targets only support 1",
+        type=int,
+        default=os.getenv("BENCH_CONCURRENCY", "1"),
+    )
+    parser.add_argument(
+        "--reuse-images",
+        help="Only build and push images in the first iteration, the others use them from the registry",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--bench-output",
+        help="Path to write the results to as JSON",
+        type=str,
+        default=os.getenv("BENCH_OUTPUT", ""),
+    )
+    parser.add_argument(
+        "--label",
+        help="Free text stored with the results, e.g. the platform release under test",
+        type=str,
+        default=os.getenv("BENCH_LABEL", ""),
+    )
@@ -0,0 +1,19 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+
+
+def parse_deadline_secs(parser):
+
+    parser.add_argument(
+        "--deadline-secs",
+        help="Overall time budget in seconds for the run, after which it is cancelled and cleaned up. "
+        "0 means no deadline.",
+        type=int,
+        default=int(os.getenv("DEADLINE_SECS", "0")),
+    )
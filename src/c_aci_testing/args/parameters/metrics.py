@@ -0,0 +1,27 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+
+
+def parse_metrics_args(parser):
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Sample CPU and memory usage of the container groups and compare it to their requests",
+    )
+    parser.add_argument(
+        "--metrics-interval-secs",
+        type=int,
+        default=os.getenv("METRICS_INTERVAL_SECS", "60"),
+    )
+    parser.add_argument(
+        "--metrics-output",
+        help="Path to write the sampled time series and summary to, as JSON",
+        type=str,
+        default=os.getenv("METRICS_OUTPUT", ""),
+    )
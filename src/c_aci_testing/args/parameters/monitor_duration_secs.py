@@ -12,7 +12,10 @@ def parse_monitor_duration_secs(parser):
 
     parser.add_argument(
         "--monitor-duration-secs",
-        help="How long to check continuously that the deployment is stable (currently for vn2 only)",
+        help=(
+            "How long to check continuously that the deployment is stable (vn2),"
+            " or to sample container metrics for (aci monitor --metrics)"
+        ),
         type=int,
         default=os.getenv("MONITOR_DURATION_SECS", "0"),
     )
@@ -0,0 +1,15 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+
+def parse_no_cache(parser):
+
+    parser.add_argument(
+        "--no-cache",
+        help="Compile bicep files even if an ARM template of identical inputs is cached",
+        action="store_true",
+    )
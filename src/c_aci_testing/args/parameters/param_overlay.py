@@ -0,0 +1,16 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+
+def parse_param_overlay(parser):
+
+    parser.add_argument(
+        "--param-overlay",
+        help="Keep the parameters of the run in memory instead of writing them to the target's bicepparam file,"
+        " so that runs of one target can run at the same time",
+        action="store_true",
+    )
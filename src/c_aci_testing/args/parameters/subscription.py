@@ -6,7 +6,17 @@
 from __future__ import annotations
 
 import os
-import subprocess
+
+from c_aci_testing.utils.cmd_executor import execute
+
+
+def _default_subscription() -> str:
+    # Only ask az when the environment doesn't say, every az call costs seconds
+    subscription = os.getenv("SUBSCRIPTION")
+    if subscription is not None:
+        return subscription
+    res = execute(["az", "account", "show", "--query", "id", "--output", "tsv"], check=True, echo_stderr=True)
+    return res.stdout.rstrip(os.linesep)
 
 
 def parse_subscription(parser):
@@ -15,14 +25,5 @@ def parse_subscription(parser):
         "--subscription",
         help="The Azure subcription ID to use",
         type=str,
-        default=os.getenv(
-            "SUBSCRIPTION",
-            subprocess.run(
-                ["az", "account", "show", "--query", "id", "--output", "tsv"],
-                stdout=subprocess.PIPE,
-                check=True,
-            )
-            .stdout.decode()
-            .rstrip(os.linesep),
-        ),
+        default=_default_subscription(),
     )
@@ -0,0 +1,18 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+
+
+def parse_trace_file(parser):
+
+    parser.add_argument(
+        "--trace-file",
+        help="Write a Chrome trace (viewable in https://ui.perfetto.dev) of all stages and external calls to this path",
+        type=str,
+        default=os.getenv("CACI_TRACE_FILE", ""),
+    )
@@ -10,8 +10,10 @@ import argparse
 import os
 
 from .subparsers.aci import subparse_aci
+from .subparsers.bench import subparse_bench
 from .subparsers.env import subparse_env
 from .subparsers.github import subparse_github
+from .subparsers.history import subparse_history
 from .subparsers.images import subparse_images
 from .subparsers.infra import subparse_infra
 from .subparsers.policies import subparse_policies
@@ -29,8 +31,10 @@ def parse_command():
 
     subparser = arg_parser.add_subparsers(dest="command", required=True)
     subparser.add_parser("aci")
+    subparser.add_parser("bench")
     subparser.add_parser("env")
     subparser.add_parser("github")
+    subparser.add_parser("history")
     subparser.add_parser("infra")
     subparser.add_parser("images")
     subparser.add_parser("policies")
@@ -43,10 +47,14 @@ def parse_command():
 
     if args.command == "aci":
         subparse_aci(subparser.choices["aci"])
+    elif args.command == "bench":
+        subparse_bench(subparser.choices["bench"])
     elif args.command == "env":
         subparse_env(subparser.choices["env"])
     elif args.command == "github":
         subparse_github(subparser.choices["github"])
+    elif args.command == "history":
+        subparse_history(subparser.choices["history"])
     elif args.command == "infra":
         subparse_infra(subparser.choices["infra"])
     elif args.command == "images":
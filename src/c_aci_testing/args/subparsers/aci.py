@@ -12,8 +12,11 @@ from ..parameters.deployment_name import parse_deployment_name
 from ..parameters.follow import parse_follow
 from ..parameters.location import parse_location
 from ..parameters.managed_identity import parse_managed_identity
+from ..parameters.metrics import parse_metrics_args
+from ..parameters.monitor_duration_secs import parse_monitor_duration_secs
 from ..parameters.resource_group import parse_resource_group
 from ..parameters.subscription import parse_subscription
+from ..parameters.no_cache import parse_no_cache
 from ..parameters.target_path import parse_target_path
 from ..parameters.timeout import parse_timeout
 
@@ -26,6 +29,7 @@ def subparse_aci(aci: argparse.ArgumentParser):
 
     deploy = aci_subparser.add_parser("deploy")
     parse_target_path(deploy)
+    parse_no_cache(deploy)
     parse_deployment_name(deploy)
     parse_subscription(deploy)
     parse_resource_group(deploy)
@@ -39,6 +43,13 @@ def subparse_aci(aci: argparse.ArgumentParser):
     parse_subscription(monitor)
     parse_resource_group(monitor)
     parse_follow(monitor)
+    parse_metrics_args(monitor)
+    parse_monitor_duration_secs(monitor)
+
+    startup_report = aci_subparser.add_parser("startup-report")
+    parse_deployment_name(startup_report)
+    parse_subscription(startup_report)
+    parse_resource_group(startup_report)
 
     remove = aci_subparser.add_parser("remove")
     parse_deployment_name(remove)
@@ -0,0 +1,33 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+
+from ..parameters.bench import parse_bench_args
+from ..parameters.no_cleanup import parse_no_cleanup
+from .target import parse_target_run_args
+from .vm import parse_vm_deploy_args
+from .vn2 import parse_vn2_target_run_args
+
+
+def subparse_bench(bench: argparse.ArgumentParser):
+
+    bench_subparser = bench.add_subparsers(dest="bench_command", required=True)
+
+    target = bench_subparser.add_parser("target")
+    parse_target_run_args(target)
+    parse_bench_args(target)
+
+    vn2 = bench_subparser.add_parser("vn2")
+    parse_vn2_target_run_args(vn2)
+    parse_no_cleanup(vn2)
+    parse_bench_args(vn2)
+
+    vm = bench_subparser.add_parser("vm")
+    parse_vm_deploy_args(vm)
+    parse_no_cleanup(vm)
+    parse_bench_args(vm)
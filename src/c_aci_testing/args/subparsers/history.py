@@ -0,0 +1,36 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+
+
+def subparse_history(history: argparse.ArgumentParser):
+
+    history.add_argument(
+        "--days",
+        help="Only include runs started in the last number of days",
+        type=float,
+        default=30,
+    )
+    history.add_argument(
+        "--target",
+        help="Only include runs of the target with this name",
+        type=str,
+        default="",
+    )
+    history.add_argument(
+        "--region",
+        help="Only include runs in this region",
+        type=str,
+        default="",
+    )
+    history.add_argument(
+        "--kind",
+        help="Only include runs of this kind",
+        choices=["", "target run", "vn2 target run", "vm deploy"],
+        default="",
+    )
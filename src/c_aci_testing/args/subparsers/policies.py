@@ -14,6 +14,7 @@ from ..parameters.repository import parse_repository
 from ..parameters.resource_group import parse_resource_group
 from ..parameters.subscription import parse_subscription
 from ..parameters.tag import parse_tag
+from ..parameters.no_cache import parse_no_cache
 from ..parameters.target_path import parse_target_path
 from ..parameters.fragments_json import parse_fragments_json
 from ..parameters.infrastructure_svn import parse_infrastructure_svn
@@ -25,6 +26,7 @@ def subparse_policies(policies: argparse.ArgumentParser):
 
     gen = policies_subparser.add_parser("gen")
     parse_target_path(gen)
+    parse_no_cache(gen)
     parse_deployment_name(gen)
     parse_subscription(gen)
     parse_resource_group(gen)
@@ -17,9 +17,13 @@ from ..parameters.repository import parse_repository
 from ..parameters.resource_group import parse_resource_group
 from ..parameters.subscription import parse_subscription
 from ..parameters.tag import parse_tag
+from ..parameters.no_cache import parse_no_cache
+from ..parameters.param_overlay import parse_param_overlay
 from ..parameters.target_path import parse_target_path
 from ..parameters.no_cleanup import parse_no_cleanup
 from ..parameters.prefer_pull import parse_prefer_pull
+from ..parameters.deadline_secs import parse_deadline_secs
+from ..parameters.trace_file import parse_trace_file
 
 
 def subparse_target(target: argparse.ArgumentParser):
@@ -40,7 +44,13 @@ def subparse_target(target: argparse.ArgumentParser):
     parse_target_path(add_test)
 
     run = target_subparser.add_parser("run")
+    parse_target_run_args(run)
+
+
+def parse_target_run_args(run: argparse.ArgumentParser):
     parse_target_path(run)
+    parse_no_cache(run)
+    parse_param_overlay(run)
     parse_deployment_name(run)
     parse_subscription(run)
     parse_resource_group(run)
@@ -53,3 +63,5 @@ def subparse_target(target: argparse.ArgumentParser):
     parse_follow(run)
     parse_no_cleanup(run)
     parse_prefer_pull(run)
+    parse_deadline_secs(run)
+    parse_trace_file(run)
@@ -14,6 +14,8 @@ from ..parameters.location import parse_location
 from ..parameters.managed_identity import parse_managed_identity
 from ..parameters.resource_group import parse_resource_group
 from ..parameters.subscription import parse_subscription
+from ..parameters.no_cache import parse_no_cache
+from ..parameters.param_overlay import parse_param_overlay
 from ..parameters.target_path import parse_target_path
 from ..parameters.registry import parse_registry
 from ..parameters.repository import parse_repository
@@ -32,6 +34,7 @@ from ..parameters.vm import (
 )
 from ..parameters.storage_account import parse_storage_account
 from ..parameters.resource_tags import parse_resource_tags
+from ..parameters.trace_file import parse_trace_file
 
 
 def subparse_vm(vm: argparse.ArgumentParser):
@@ -67,6 +70,7 @@ def subparse_vm(vm: argparse.ArgumentParser):
 
     generate_scripts = vm_subparser.add_parser("generate_scripts")
     parse_target_path(generate_scripts)
+    parse_no_cache(generate_scripts)
     generate_scripts.add_argument("output_dir", type=str)
     parse_subscription(generate_scripts)
     parse_resource_group(generate_scripts)
@@ -79,6 +83,7 @@ def subparse_vm(vm: argparse.ArgumentParser):
 
     runc = vm_subparser.add_parser("runc")
     parse_target_path(runc)
+    parse_no_cache(runc)
     parse_deployment_name(runc)
     parse_subscription(runc)
     parse_resource_group(runc)
@@ -97,23 +102,7 @@ def subparse_vm(vm: argparse.ArgumentParser):
     parse_runc_prefix(check)
 
     deploy = vm_subparser.add_parser("deploy")
-    parse_target_path(deploy)
-    parse_deployment_name(deploy)
-    parse_subscription(deploy)
-    parse_resource_group(deploy)
-    parse_location(deploy)
-    parse_managed_identity(deploy)
-    parse_registry(deploy)
-    parse_repository(deploy)
-    parse_tag(deploy)
-    parse_cplat_args(deploy)
-    parse_storage_account(deploy)
-    parse_vm_image(deploy)
-    parse_runc_prefix(deploy)
-    parse_vm_size(deploy)
-    parse_vm_win_flavor(deploy)
-    parse_vm_zones(deploy)
-    parse_resource_tags(deploy)
+    parse_vm_deploy_args(deploy)
 
     remove = vm_subparser.add_parser("remove")
     parse_deployment_name(remove)
@@ -161,3 +150,26 @@ def subparse_vm(vm: argparse.ArgumentParser):
     cache_cplat = vm_subparser.add_parser("cache_cplat")
     parse_cplat_args(cache_cplat)
     parse_storage_account(cache_cplat)
+
+
+def parse_vm_deploy_args(deploy: argparse.ArgumentParser):
+    parse_target_path(deploy)
+    parse_no_cache(deploy)
+    parse_param_overlay(deploy)
+    parse_deployment_name(deploy)
+    parse_subscription(deploy)
+    parse_resource_group(deploy)
+    parse_location(deploy)
+    parse_managed_identity(deploy)
+    parse_registry(deploy)
+    parse_repository(deploy)
+    parse_tag(deploy)
+    parse_cplat_args(deploy)
+    parse_storage_account(deploy)
+    parse_vm_image(deploy)
+    parse_runc_prefix(deploy)
+    parse_vm_size(deploy)
+    parse_vm_win_flavor(deploy)
+    parse_vm_zones(deploy)
+    parse_resource_tags(deploy)
+    parse_trace_file(deploy)
@@ -11,6 +11,8 @@ from ..parameters.deployment_name import parse_deployment_name
 from ..parameters.managed_identity import parse_managed_identity
 from ..parameters.resource_group import parse_resource_group
 from ..parameters.subscription import parse_subscription
+from ..parameters.no_cache import parse_no_cache
+from ..parameters.param_overlay import parse_param_overlay
 from ..parameters.target_path import parse_target_path
 from ..parameters.registry import parse_registry
 from ..parameters.repository import parse_repository
@@ -25,6 +27,8 @@ from ..parameters.deploy_output_file import parse_deploy_output_file
 from ..parameters.no_cleanup import parse_no_cleanup
 from ..parameters.prefer_pull import parse_prefer_pull
 from ..parameters.replicas import parse_replicas
+from ..parameters.deadline_secs import parse_deadline_secs
+from ..parameters.trace_file import parse_trace_file
 
 
 def subparse_vn2(vm: argparse.ArgumentParser):
@@ -35,6 +39,7 @@ def subparse_vn2(vm: argparse.ArgumentParser):
     parse_deployment_name(generate_yaml)
     parse_managed_identity(generate_yaml)
     parse_target_path(generate_yaml)
+    parse_no_cache(generate_yaml)
     parse_subscription(generate_yaml)
     parse_resource_group(generate_yaml)
     parse_registry(generate_yaml)
@@ -67,6 +72,7 @@ def subparse_vn2(vm: argparse.ArgumentParser):
     # Policygen command
     policygen = vn2_subparser.add_parser("policygen")
     parse_target_path(policygen)
+    parse_no_cache(policygen)
     parse_yaml_path(policygen)
     parse_policy_type(policygen)
     parse_fragments_json(policygen)
@@ -89,7 +95,13 @@ def subparse_vn2(vm: argparse.ArgumentParser):
     target_subparser = target.add_subparsers(dest="target_command", required=True)
 
     run = target_subparser.add_parser("run")
+    parse_vn2_target_run_args(run)
+
+
+def parse_vn2_target_run_args(run: argparse.ArgumentParser):
     parse_target_path(run)
+    parse_no_cache(run)
+    parse_param_overlay(run)
     parse_deployment_name(run)
     parse_subscription(run)
     parse_resource_group(run)
@@ -102,3 +114,5 @@ def subparse_vn2(vm: argparse.ArgumentParser):
     parse_prefer_pull(run)
     parse_replicas(run)
     parse_monitor_duration_secs(run)
+    parse_deadline_secs(run)
+    parse_trace_file(run)
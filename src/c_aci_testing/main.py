@@ -5,12 +5,28 @@
 
 from __future__ import annotations
 
+import os
+import sys
+
 from .args.parser import parse_command
+from .utils import trace
 
 
 def main():
     args = parse_command()
 
+    if getattr(args, "no_cache", False):
+        from .utils.bicep_build import NO_CACHE_ENV
+
+        os.environ[NO_CACHE_ENV] = "1"
+
+    trace_file = getattr(args, "trace_file", "") or os.getenv(trace.TRACE_FILE_ENV, "")
+    with trace.tracing(trace_file, name=" ".join(["c-aci-testing", *sys.argv[1:3]])):
+        run_command(args)
+
+
+def run_command(args):
+
     if args.command == "env":
 
         if args.env_command == "create":
@@ -107,6 +123,11 @@ def main():
 
             aci_monitor(**vars(args))
 
+        elif args.aci_command == "startup-report":
+            from .tools.aci_startup_report import aci_startup_report
+
+            aci_startup_report(**vars(args))
+
         elif args.aci_command == "deploy":
             from .tools.aci_deploy import aci_deploy
 
@@ -199,6 +220,16 @@ def main():
         else:
             print(f"vm command: {args.vm_command} not recognised")
 
+    elif args.command == "history":
+        from .tools.history import history
+
+        history(**vars(args))
+
+    elif args.command == "bench":
+        from .tools.bench import bench
+
+        bench(**vars(args))
+
     elif args.command == "vscode":
 
         if args.vscode_command == "run_debug":
@@ -8,6 +8,7 @@ import os
 import unittest
 import uuid
 
+from c_aci_testing.args.parameters.deadline_secs import parse_deadline_secs
 from c_aci_testing.args.parameters.location import parse_location
 from c_aci_testing.args.parameters.managed_identity import parse_managed_identity
 from c_aci_testing.args.parameters.registry import parse_registry
@@ -15,6 +16,7 @@ from c_aci_testing.args.parameters.repository import parse_repository
 from c_aci_testing.args.parameters.resource_group import parse_resource_group
 from c_aci_testing.args.parameters.subscription import parse_subscription
 from c_aci_testing.args.parameters.tag import parse_tag
+from c_aci_testing.args.parameters.trace_file import parse_trace_file
 from c_aci_testing.tools.aci_get_ips import aci_get_ips
 from c_aci_testing.tools.target_run import target_run_ctx
 
@@ -30,6 +32,8 @@ class ExampleTest(unittest.TestCase):
         parse_tag(parser)
         parse_location(parser)
         parse_managed_identity(parser)
+        parse_deadline_secs(parser)
+        parse_trace_file(parser)
         args = parser.parse_args()
 
         target_path = os.path.realpath(os.path.dirname(__file__))
@@ -7,12 +7,28 @@ from __future__ import annotations
 
 import json
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
 import time
 
+from c_aci_testing.utils.arm import ArmError, get_arm_client, parse_timestamp, use_arm_client
+from c_aci_testing.utils import deadline, retry, trace
+from c_aci_testing.utils.poller import Poller
+from c_aci_testing.utils.bicep_build import build_params
+from c_aci_testing.utils.cmd_executor import execute
+
 from .aci_param_set import aci_param_set
 
+# Every poll already retries transient failures, this bounds how many polls
+# in a row may still fail before giving up.
+MAX_FAILED_POLLS = 3
+
+# Deployments failing validation do so within seconds, those which succeed take minutes
+DEPLOYMENT_POLL_INITIAL_SECS = 2
+DEPLOYMENT_POLL_MAX_SECS = 15
+
 
 def aci_deploy(
     target_path: str,
@@ -50,24 +66,6 @@ def aci_deploy(
     if not bicepparam_file_path:
         raise FileNotFoundError(f"No bicepparam file found in {target_path}")
 
-    az_command = [
-        "az",
-        "deployment",
-        "group",
-        "create",
-        "-n",
-        deployment_name,
-        "--subscription",
-        subscription,
-        "--resource-group",
-        resource_group,
-        "--template-file",
-        bicep_file_path,
-        "--parameters",
-        bicepparam_file_path,
-        "--no-wait",
-    ]
-
     print(f"{os.linesep}Deploying to Azure, view deployment here:")
     print("%2F".join([
         "https://ms.portal.azure.com/#blade/HubsExtension/DeploymentDetailsBlade/id/",
@@ -80,19 +78,69 @@ def aci_deploy(
     sys.stdout.flush()
     sys.stderr.flush()
 
-    res = subprocess.run(az_command)
-    if res.returncode != 0:
-        raise RuntimeError(f"Deployment failed with return code {res.returncode}")
+    # The ARM template policies were generated from (usually cached), rather than
+    # have az compile the bicep files again
+    template, parameters = build_params(bicepparam_file_path)
+    if use_arm_client():
+        try:
+            get_arm_client().create_deployment(
+                subscription, resource_group, deployment_name, template, parameters["parameters"]
+            )
+        except ArmError as e:
+            raise RuntimeError(f"Deployment failed: {e}") from e
+    else:
+        # Private to this deployment, as the run's parameters may only be in its overlay
+        compiled_dir = tempfile.mkdtemp(prefix=f"{deployment_name}-")
+        try:
+            template_path, parameters_path = _write_compiled_files(template, parameters, compiled_dir)
+            # Captured (and echoed) so that transient failures can be recognised and retried
+            res = execute(
+                [
+                    "az",
+                    "deployment",
+                    "group",
+                    "create",
+                    "-n",
+                    deployment_name,
+                    "--subscription",
+                    subscription,
+                    "--resource-group",
+                    resource_group,
+                    "--template-file",
+                    template_path,
+                    "--parameters",
+                    f"@{parameters_path}",
+                    "--no-wait",
+                ],
+                echo_stderr=True,
+            )
+        finally:
+            shutil.rmtree(compiled_dir, ignore_errors=True)
+        if res.returncode != 0:
+            raise RuntimeError(f"Deployment failed with return code {res.returncode}")
 
     start_time = time.time()
     correlation_id = None
     consecutive_failures = 0
+    poller = Poller(
+        "deployment",
+        initial=DEPLOYMENT_POLL_INITIAL_SECS,
+        max_interval=DEPLOYMENT_POLL_MAX_SECS,
+        deployment=deployment_name,
+    )
+
+    def show():
+        try:
+            return _show_deployment(deployment_name, subscription, resource_group)
+        except DeploymentQueryError as e:
+            _write_output_file(deploy_output_file, error=str(e), correlation_id=correlation_id)
+            raise RuntimeError(str(e)) from e
 
     while True:
         elapsed = time.time() - start_time
         if timeout > 0 and elapsed >= timeout:
             # One final check before timing out
-            show_result = _show_deployment(deployment_name, subscription, resource_group)
+            show_result = show()
             if show_result is not None:
                 state = show_result.get("properties", {}).get("provisioningState", "")
                 if state == "Succeeded":
@@ -102,14 +150,20 @@ def aci_deploy(
             _write_output_file(deploy_output_file, error=error_msg, correlation_id=correlation_id)
             raise RuntimeError(error_msg)
 
-        time.sleep(15)
+        try:
+            poller.wait(at_most=timeout - elapsed if timeout > 0 else None)
+        except deadline.DeadlineExceeded as e:
+            _write_output_file(deploy_output_file, error=str(e), correlation_id=correlation_id)
+            raise
 
-        show_result = _show_deployment(deployment_name, subscription, resource_group)
+        with trace.span("poll deployment", cat="poll", deployment=deployment_name) as poll:
+            show_result = show()
+            poll["state"] = (show_result or {}).get("properties", {}).get("provisioningState", "unavailable")
 
         if show_result is None:
             consecutive_failures += 1
-            if consecutive_failures >= 3:
-                error_msg = "Failed to query deployment status 3 consecutive times"
+            if consecutive_failures >= MAX_FAILED_POLLS:
+                error_msg = f"Failed to query deployment status {MAX_FAILED_POLLS} consecutive times"
                 _write_output_file(deploy_output_file, error=error_msg, correlation_id=correlation_id)
                 raise RuntimeError(error_msg)
             continue
@@ -122,6 +176,8 @@ def aci_deploy(
                 print(f"Deployment created with correlation ID: {correlation_id}")
 
         state = show_result.get("properties", {}).get("provisioningState", "")
+        changed_at = parse_timestamp(show_result.get("properties", {}).get("timestamp"))
+        poller.observe(state, changed_at=changed_at.timestamp() if changed_at else None)
 
         if state == "Succeeded":
             return _handle_success(show_result, start_time, deploy_output_file)
@@ -150,9 +206,44 @@ def _build_error_message(show_result: dict, state: str) -> str:
     return "\n".join(parts)
 
 
+def _write_compiled_files(template: dict, parameters: dict, directory: str) -> tuple[str, str]:
+    """
+    Write an ARM template and its parameters file to directory, returning their paths.
+    """
+    template_path = os.path.join(directory, "template.json")
+    parameters_path = os.path.join(directory, "parameters.json")
+    with open(template_path, "w", encoding="utf-8") as f:
+        json.dump(template, f)
+    with open(parameters_path, "w", encoding="utf-8") as f:
+        json.dump(parameters, f)
+    return template_path, parameters_path
+
+
+class DeploymentQueryError(Exception):
+    """
+    Querying the deployment's status failed in a way which retrying won't fix.
+    """
+
+
 def _show_deployment(deployment_name: str, subscription: str, resource_group: str) -> dict | None:
+    """
+    Get the deployment's current state.  Transient failures are retried by
+    the executor/ARM client, if they persist None is returned so that the
+    next poll can try again, fatal ones raise DeploymentQueryError.
+    """
+    failure = f"Failed to query deployment status for {deployment_name} in resource group {resource_group}"
+    if use_arm_client():
+        try:
+            return get_arm_client().show_deployment(subscription, resource_group, deployment_name)
+        except ArmError as e:
+            error_msg = f"{failure}: {e}"
+            if retry.classify_status(e.status) == retry.FATAL:
+                raise DeploymentQueryError(error_msg) from e
+            print(error_msg, file=sys.stderr, flush=True)
+            return None
+
     try:
-        res = subprocess.run(
+        res = execute(
             [
                 "az",
                 "deployment",
@@ -168,17 +259,14 @@ def _show_deployment(deployment_name: str, subscription: str, resource_group: st
                 "json",
             ],
             check=True,
-            text=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            use_cache=False,
         )
         return json.loads(res.stdout)
     except subprocess.CalledProcessError as e:
-        print(
-            f"Failed to query deployment status for {deployment_name} in resource group {resource_group}: {e.stderr}",
-            file=sys.stderr,
-            flush=True,
-        )
+        error_msg = f"{failure}: {e.stderr}"
+        if retry.classify(e.stderr) == retry.FATAL:
+            raise DeploymentQueryError(error_msg) from e
+        print(error_msg, file=sys.stderr, flush=True)
         return None
 
 
@@ -5,10 +5,13 @@
 
 from __future__ import annotations
 
-import os
+import json
 import subprocess
 import sys
 
+from c_aci_testing.utils.arm import ArmError, get_arm_client, use_arm_client
+from c_aci_testing.utils.cmd_executor import execute
+
 
 def aci_get_ids(
     deployment_name: str,
@@ -16,28 +19,32 @@ def aci_get_ids(
     resource_group: str,
     **kwargs,
 ) -> list[str]:
+    if use_arm_client():
+        return _aci_get_ids_arm(deployment_name, subscription, resource_group)
+
     try:
-        res = subprocess.run(
+        # Same query as aci_deploy's status poll, so that within a run the
+        # final poll's result is reused rather than asked again.
+        res = execute(
             [
                 "az",
                 "deployment",
                 "group",
                 "show",
-                "--name",
+                "-n",
                 deployment_name,
                 "--subscription",
                 subscription,
-                "--resource-group",
+                "-g",
                 resource_group,
-                "--query",
-                "properties.outputs.ids.value",
                 "-o",
-                "tsv",
+                "json",
             ],
             check=True,
-            stdout=subprocess.PIPE,
+            echo_stderr=True,
         )
-        ids = [id for id in res.stdout.decode().split(os.linesep) if id]
+        outputs = json.loads(res.stdout).get("properties", {}).get("outputs") or {}
+        ids = [id for id in outputs.get("ids", {}).get("value", []) if id]
         return ids
     except subprocess.CalledProcessError:
         print(
@@ -47,7 +54,7 @@ def aci_get_ids(
         )
 
     try:
-        container_res = subprocess.run(
+        container_res = execute(
             [
                 "az",
                 "container",
@@ -64,9 +71,9 @@ def aci_get_ids(
                 "tsv",
             ],
             check=True,
-            stdout=subprocess.PIPE,
+            echo_stderr=True,
         )
-        container_id = container_res.stdout.decode().strip()
+        container_id = container_res.stdout.strip()
         if container_id:
             return [container_id]
     except subprocess.CalledProcessError:
@@ -77,3 +84,29 @@ def aci_get_ids(
         )
 
     return []
+
+
+def _aci_get_ids_arm(deployment_name: str, subscription: str, resource_group: str) -> list[str]:
+    client = get_arm_client()
+    try:
+        deployment = client.show_deployment(subscription, resource_group, deployment_name)
+        outputs = deployment.get("properties", {}).get("outputs") or {}
+        return [id for id in outputs.get("ids", {}).get("value", []) if id]
+    except ArmError as e:
+        print(
+            f"Failed to get deployment output for {deployment_name} ({e}). "
+            "Attempting to find container group by name...",
+            flush=True,
+            file=sys.stderr,
+        )
+
+    group_id = (
+        f"/subscriptions/{subscription}/resourceGroups/{resource_group}"
+        f"/providers/Microsoft.ContainerInstance/containerGroups/{deployment_name}"
+    )
+    try:
+        return [client.get_container_group(group_id)["id"]]
+    except ArmError as e:
+        print(f"Failed to find container group {deployment_name} by name ({e}).", flush=True, file=sys.stderr)
+
+    return []
@@ -5,7 +5,8 @@
 
 from __future__ import annotations
 
-import subprocess
+from c_aci_testing.utils.arm import get_arm_client, map_concurrently, use_arm_client
+from c_aci_testing.utils.cmd_executor import execute_all
 
 from .aci_get_ids import aci_get_ids
 
@@ -16,17 +17,26 @@ def aci_get_ips(
     resource_group: str,
     **kwargs,
 ) -> list[str]:
-    ip_addresses = []
+    if use_arm_client():
+        client = get_arm_client()
+        return map_concurrently(
+            lambda id: client.get_container_group(id)["properties"].get("ipAddress", {}).get("ip", ""),
+            aci_get_ids(deployment_name, subscription, resource_group),
+        )
 
-    for id in aci_get_ids(deployment_name, subscription, resource_group):
-        result = subprocess.run([
-            "az", "container", "show",
-            "--query", "ipAddress.ip",
-            "--output", "tsv",
-            "--subscription", subscription,
-            "--resource-group", resource_group,
-            "--ids", id,
-        ], capture_output=True, text=True, check=True)
-        ip_addresses.append(result.stdout.rstrip("\n"))
+    results = execute_all(
+        [
+            [
+                "az", "container", "show",
+                "--query", "ipAddress.ip",
+                "--output", "tsv",
+                "--subscription", subscription,
+                "--resource-group", resource_group,
+                "--ids", id,
+            ]
+            for id in aci_get_ids(deployment_name, subscription, resource_group)
+        ],
+        check=True,
+    )
 
-    return ip_addresses
+    return [result.stdout.rstrip("\n") for result in results]
@@ -6,7 +6,9 @@
 from __future__ import annotations
 
 import json
-import subprocess
+
+from c_aci_testing.utils.arm import ArmError, get_arm_client, map_concurrently, use_arm_client
+from c_aci_testing.utils.cmd_executor import execute_all
 
 from .aci_get_ids import aci_get_ids
 
@@ -25,22 +27,36 @@ def aci_get_is_live(
         return False
 
     for id in aci_ids:
-        group_name = id.split("/")[-1]
-        print(f"Checking {group_name}")
+        print(f"Checking {id.split('/')[-1]}")
+
+    if use_arm_client():
+        return all(map_concurrently(_is_running_arm, aci_ids))
 
-        result = subprocess.run([
+    results = execute_all([
+        [
             "az", "container", "show", "--ids", id,
             "--subscription", subscription,
             "--resource-group", resource_group,
-        ], capture_output=True)
+        ]
+        for id in aci_ids
+    ], use_cache=False)
 
+    for result in results:
         if result.returncode != 0:
             return False
         try:
-            container_state = json.loads(result.stdout.decode())
+            container_state = json.loads(result.stdout)
             if container_state["instanceView"]["state"] != "Running":
                 return False
         except Exception:
             return False
 
     return True
+
+
+def _is_running_arm(id: str) -> bool:
+    try:
+        container_group = get_arm_client().get_container_group(id)
+        return container_group["properties"]["instanceView"]["state"] == "Running"
+    except (ArmError, KeyError):
+        return False
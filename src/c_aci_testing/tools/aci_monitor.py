@@ -5,8 +5,14 @@
 
 from __future__ import annotations
 
-import subprocess
+import asyncio
+import contextvars
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from c_aci_testing.utils import container_metrics
+from c_aci_testing.utils.cmd_executor import CmdExecutor, execute_all, run_sync
 
 from .aci_get_ids import aci_get_ids
 
@@ -16,27 +22,109 @@ def aci_monitor(
     subscription: str,
     resource_group: str,
     follow: bool = False,
+    metrics: bool = False,
+    metrics_interval_secs: int = 60,
+    metrics_output: str = "",
+    monitor_duration_secs: int = 0,
     **kwargs,
 ):
-    for id in aci_get_ids(deployment_name, subscription, resource_group):
-        group_name = id.split("/")[-1]
-        res = subprocess.run(
-            [
-                "az", "container", "show",
-                "--name", group_name,
-                "--subscription", subscription,
-                "--resource-group", resource_group,
-            ],
-            stdout=subprocess.PIPE,
-        )
-        group_json = json.loads(res.stdout)
-        for container_json in group_json["containers"]:
-            print(f"Logs from {group_name} - {container_json['name']}")
-            subprocess.run([
-                "az", "container", "logs",
-                *(["--follow"] if follow else []),
-                "--subscription", subscription,
-                "--resource-group", resource_group,
-                "--name", group_name,
-                "--container-name", container_json["name"]
-            ], check=not follow)
+    """
+    Print the logs of every container of the deployment.
+
+    With metrics, also sample the CPU and memory usage of its container
+    groups: while following the logs (for at most monitor_duration_secs if
+    set), otherwise for monitor_duration_secs before printing the logs.
+    Then print how peak usage compares to the containers' requests.
+    """
+    group_ids = aci_get_ids(deployment_name, subscription, resource_group)
+    group_names = [id.split("/")[-1] for id in group_ids]
+
+    # Same query as aci_get_is_live, so a run can reuse its results
+    group_results = execute_all([
+        [
+            "az", "container", "show", "--ids", id,
+            "--subscription", subscription,
+            "--resource-group", resource_group,
+        ]
+        for id in group_ids
+    ], echo_stderr=True)
+
+    groups = [json.loads(res.stdout) for res in group_results]
+    containers = [
+        (group_name, container_json["name"])
+        for group_name, group in zip(group_names, groups)
+        for container_json in group["containers"]
+    ]
+
+    def logs_cmd(group_name: str, container_name: str) -> list[str]:
+        return [
+            "az", "container", "logs",
+            *(["--follow"] if follow else []),
+            "--subscription", subscription,
+            "--resource-group", resource_group,
+            "--name", group_name,
+            "--container-name", container_name,
+        ]
+
+    if follow:
+        # Following blocks until the container exits, so follow every
+        # container at once and tell their lines apart by prefix.
+        executor = CmdExecutor(max_concurrency=max(1, len(containers)))
+
+        async def follow_all():
+            for group_name, container_name in containers:
+                print(f"Logs from {group_name} - {container_name}")
+            await asyncio.gather(*(
+                executor.run(
+                    logs_cmd(group_name, container_name),
+                    stream=True,
+                    prefix=f"[{group_name}/{container_name}] ",
+                )
+                for group_name, container_name in containers
+            ))
+
+        if not metrics:
+            run_sync(follow_all())
+            return
+
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            sampling = pool.submit(
+                contextvars.copy_context().run,
+                container_metrics.sample_metrics,
+                group_ids,
+                monitor_duration_secs,
+                metrics_interval_secs,
+                stop,
+            )
+            try:
+                run_sync(follow_all())
+            finally:
+                stop.set()
+            samples = sampling.result()
+        _report_metrics(groups, samples, metrics_output)
+        return
+
+    if metrics:
+        print(f"Sampling container metrics for {monitor_duration_secs}s...", flush=True)
+        samples = container_metrics.sample_metrics(group_ids, monitor_duration_secs, metrics_interval_secs)
+
+    log_results = execute_all(
+        [logs_cmd(group_name, container_name) for group_name, container_name in containers],
+        check=True,
+        echo_stderr=True,
+    )
+    for (group_name, container_name), res in zip(containers, log_results):
+        print(f"Logs from {group_name} - {container_name}")
+        print(res.stdout, end="", flush=True)
+
+    if metrics:
+        _report_metrics(groups, samples, metrics_output)
+
+
+def _report_metrics(groups: list, samples: list, metrics_output: str):
+    summary = container_metrics.summarize(groups, samples)
+    print(container_metrics.format_summary(summary), flush=True)
+    if metrics_output:
+        container_metrics.write_metrics(metrics_output, samples, summary)
+        print(f"Container metrics written to {metrics_output}", flush=True)
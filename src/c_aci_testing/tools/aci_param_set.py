@@ -6,9 +6,7 @@
 
 from __future__ import annotations
 
-import os
-import re
-
+from c_aci_testing.utils import bicepparam, param_overlay
 from c_aci_testing.utils.find_bicep import find_bicep_files
 
 
@@ -21,62 +19,24 @@ def aci_param_set(
     _, bicepparam_file_path = find_bicep_files(target_path)
     # find_bicep_files already returns paths joined with target_path; don't re-join.
 
+    overlay = param_overlay.current()
+    if overlay is not None:
+        for key, value in parameters.items():
+            print(f"Setting parameter '{key}' of this run to {value[:50]}{'...' if len(value) > 50 else ''}")
+        overlay.set(bicepparam_file_path, parameters, add=add)
+        return
+
     # Load the param file
-    with open(bicepparam_file_path, encoding="utf-8") as f:
+    with open(bicepparam_file_path, encoding="utf-8", newline="") as f:
         biceparam_content = f.read()
 
-    # Set parameters
     for key, value in parameters.items():
-        escaped_key = re.escape(key)
         print(f"Setting parameter '{key}' to {value[:50]}{'...' if len(value) > 50 else ''}")
 
-        # Prepare regex patterns with parameter types
-        patterns = [
-            # (pattern, param_type)
-            (rf"(param\s+{escaped_key}\s*=\s*)('.*?')", "string"),
-            (rf"(param\s+{escaped_key}\s*=\s*)({{.*?}})", "object"),
-            (rf"(param\s+{escaped_key}\s*=\s*)(\[.*?\])", "array"),
-            (rf"(param\s+{escaped_key}\s*=\s*)([-+]?\d+)", "int"),
-            (rf"(param\s+{escaped_key}\s*=\s*)(true|false)", "bool"),
-        ]
-
-        # Flag to check if parameter was found and replaced
-        param_found = False
-
-        for pattern, param_type in patterns:
-
-            def replace_func(match):
-                nonlocal param_found
-                param_found = True
-                if param_type == "string":
-                    # Ensure the value is enclosed in single quotes
-                    val = value.strip("'\"")
-                    return f"{match.group(1)}'{val}'"
-                else:
-                    # For other types, use the value as-is
-                    return f"{match.group(1)}{value}"
-
-            biceparam_content, num_subs = re.subn(pattern, replace_func, biceparam_content, flags=re.DOTALL)
-            if param_found:
-                break  # Stop if we've found and replaced the parameter
-
-        # Add new parameter if not found
-        if not param_found and add:
-            # Determine parameter type based on value
-            if value.lower() in ["true", "false"]:
-                param_line = f"param {key}={value.lower()}"
-            elif re.match(r"^[-+]?\d+$", value):
-                param_line = f"param {key}={value}"
-            elif value.startswith("{") and value.endswith("}"):
-                param_line = f"param {key}={value}"
-            elif value.startswith("[") and value.endswith("]"):
-                param_line = f"param {key}={value}"
-            else:
-                # Assume string parameter, add quotes
-                val = value.strip("'\"")
-                param_line = f"param {key}='{val}'"
-            biceparam_content += f"{os.linesep}{param_line}"
+    # Set all parameters in one pass, keeping comments and formatting
+    new_content = bicepparam.update(biceparam_content, parameters, add=add)
 
-    # Save the new file
-    with open(bicepparam_file_path, "w", encoding="utf-8") as f:
-        f.write(biceparam_content)
+    # Save the new file, unless nothing changed so its modification time is kept
+    if new_content != biceparam_content:
+        with open(bicepparam_file_path, "w", encoding="utf-8", newline="") as f:
+            f.write(new_content)
@@ -5,7 +5,8 @@
 
 from __future__ import annotations
 
-import subprocess
+from c_aci_testing.utils.arm import get_arm_client, map_concurrently, use_arm_client
+from c_aci_testing.utils.cmd_executor import execute_all
 
 from .aci_get_ids import aci_get_ids
 
@@ -16,17 +17,30 @@ def aci_remove(
     resource_group: str,
     **kwargs,
 ):
-    resources = aci_get_ids(deployment_name, subscription, resource_group)
+    group_ids = aci_get_ids(deployment_name, subscription, resource_group)
+    group_names = [id.split("/")[-1] for id in group_ids]
 
-    for id in resources:
-        group_name = id.split("/")[-1]
+    if use_arm_client():
+        # Like --no-wait below, ARM accepts the delete and removes the group
+        # in the background. Deleting a missing group also succeeds.
+        map_concurrently(get_arm_client().delete_container_group, group_ids)
+    else:
         # az resource delete will return successfully even if the resource does
         # not exist.
-        subprocess.run([
-            "az", "resource", "delete", "--no-wait",
-            "--subscription", subscription,
-            "--resource-group", resource_group,
-            "--resource-type", "Microsoft.ContainerInstance/containerGroups",
-            "--name", group_name,
-        ], check=True)
+        execute_all(
+            [
+                [
+                    "az", "resource", "delete", "--no-wait",
+                    "--subscription", subscription,
+                    "--resource-group", resource_group,
+                    "--resource-type", "Microsoft.ContainerInstance/containerGroups",
+                    "--name", group_name,
+                ]
+                for group_name in group_names
+            ],
+            check=True,
+            stream=True,
+        )
+
+    for group_name in group_names:
         print(f"Removed container group: {group_name}")
@@ -0,0 +1,213 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from c_aci_testing.utils.arm import (
+    CONTAINER_GROUPS_API_VERSION,
+    get_arm_client,
+    map_concurrently,
+    parse_timestamp,
+    resource_properties,
+    use_arm_client,
+)
+from c_aci_testing.utils.cmd_executor import execute, execute_all
+
+from .aci_get_ids import aci_get_ids
+
+_DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:([\d.]+)S)?)?$")
+
+
+def parse_duration(value: str | None) -> Optional[timedelta]:
+    """
+    Parse an ISO 8601 duration as used by ARM deployments, e.g. PT1M30.5S.
+    """
+    match = _DURATION.match(value or "")
+    if not match or not value:
+        return None
+    days, hours, minutes, seconds = match.groups()
+    return timedelta(
+        days=int(days or 0), hours=int(hours or 0), minutes=int(minutes or 0), seconds=float(seconds or 0)
+    )
+
+
+def _event_time(events: List[dict], name: str, last: bool = False) -> Optional[datetime]:
+    times = [
+        parse_timestamp(event.get("lastTimestamp" if last else "firstTimestamp"))
+        for event in events
+        if event.get("name") == name
+    ]
+    times = [t for t in times if t is not None]
+    if not times:
+        return None
+    return max(times) if last else min(times)
+
+
+def _seconds(start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds()
+
+
+def _deployment_submitted(deployment: dict) -> Optional[datetime]:
+    """
+    When the deployment was submitted: its last update minus how long it took.
+    """
+    properties = deployment.get("properties", {})
+    timestamp = parse_timestamp(properties.get("timestamp"))
+    duration = parse_duration(properties.get("duration"))
+    if timestamp is None or duration is None:
+        return None
+    return timestamp - duration
+
+
+def _first_log_time(logs: str) -> Optional[datetime]:
+    for line in logs.splitlines():
+        timestamp = parse_timestamp(line.split(" ", 1)[0])
+        if timestamp is not None:
+            return timestamp
+    return None
+
+
+def container_startup(group: dict, submitted: Optional[datetime], logs: dict) -> List[dict]:
+    """
+    Startup breakdown of every container of a container group.
+
+    :param logs: Container logs with timestamps by container name
+    """
+    group_name = group.get("name", "")
+    containers = resource_properties(group).get("containers", [])
+    instance_views = [resource_properties(container).get("instanceView") or {} for container in containers]
+
+    created = parse_timestamp((group.get("systemData") or {}).get("createdAt"))
+    if created is None:
+        # Without systemData, the first event of any container is the closest to creation
+        event_times = [
+            parse_timestamp(event.get("firstTimestamp"))
+            for view in instance_views
+            for event in view.get("events") or []
+        ]
+        event_times = [t for t in event_times if t is not None]
+        created = min(event_times) if event_times else None
+
+    report = []
+    for container, view in zip(containers, instance_views):
+        events = view.get("events") or []
+        pulling = _event_time(events, "Pulling")
+        pulled = _event_time(events, "Pulled", last=True)
+        started = _event_time(events, "Started") or parse_timestamp((view.get("currentState") or {}).get("startTime"))
+        first_log = _first_log_time(logs.get(container["name"], ""))
+        report.append({
+            "container_group": group_name,
+            "container": container["name"],
+            "state": (view.get("currentState") or {}).get("state"),
+            "restarts": view.get("restartCount", 0),
+            "submit_to_created": _seconds(submitted, created),
+            "image_pull": _seconds(pulling, pulled),
+            "submit_to_started": _seconds(submitted, started),
+            "submit_to_first_log": _seconds(submitted, first_log),
+        })
+    return report
+
+
+def format_report(report: List[dict]) -> str:
+    def fmt(value: Optional[float]) -> str:
+        return f"{value:.1f}s" if value is not None else "-"
+
+    lines = [
+        "Container startup (from deployment submit):",
+        f"  {'container':<40} {'created':>9} {'pull':>9} {'started':>9} {'first log':>10}",
+    ]
+    for entry in report:
+        name = f"{entry['container_group']}/{entry['container']}"
+        lines.append(
+            f"  {name:<40} {fmt(entry['submit_to_created']):>9} {fmt(entry['image_pull']):>9}"
+            f" {fmt(entry['submit_to_started']):>9} {fmt(entry['submit_to_first_log']):>10}"
+        )
+    return "\n".join(lines)
+
+
+def aci_startup_report(
+    deployment_name: str,
+    subscription: str,
+    resource_group: str,
+    **kwargs,
+) -> List[dict]:
+    """
+    Print and return the cold start breakdown of a deployment's containers:
+    time from deployment submit to container group creation, image pull
+    duration, and time to container start and to its first log line.
+    """
+    group_ids = aci_get_ids(deployment_name, subscription, resource_group)
+
+    if use_arm_client():
+        client = get_arm_client()
+        deployment = client.show_deployment(subscription, resource_group, deployment_name)
+        groups = map_concurrently(client.get_container_group, group_ids)
+    else:
+        # Same query as aci_get_ids, so a target run can reuse its result
+        deployment = json.loads(
+            execute(
+                [
+                    "az", "deployment", "group", "show",
+                    "-n", deployment_name,
+                    "--subscription", subscription,
+                    "-g", resource_group,
+                    "-o", "json",
+                ],
+                check=True,
+                echo_stderr=True,
+            ).stdout
+        )
+        # Not from the run's cache: the states and restart counts may have changed during the test
+        groups = [
+            json.loads(res.stdout)
+            for res in execute_all([
+                [
+                    "az", "container", "show", "--ids", id,
+                    "--subscription", subscription,
+                    "--resource-group", resource_group,
+                ]
+                for id in group_ids
+            ], check=True, echo_stderr=True, use_cache=False)
+        ]
+
+    containers = [
+        (group_id, container["name"])
+        for group_id, group in zip(group_ids, groups)
+        for container in resource_properties(group).get("containers", [])
+    ]
+    if use_arm_client():
+        contents = map_concurrently(
+            lambda c: get_arm_client().get_container_logs(c[0], c[1], timestamps=True), containers
+        )
+    else:
+        # az container logs can't include timestamps
+        results = execute_all([
+            [
+                "az", "rest", "--method", "get",
+                "--url", f"{group_id}/containers/{name}/logs"
+                f"?api-version={CONTAINER_GROUPS_API_VERSION}&timestamps=true",
+            ]
+            for group_id, name in containers
+        ])
+        contents = [
+            (json.loads(res.stdout or "{}").get("content") or "") if res.returncode == 0 else "" for res in results
+        ]
+    logs = {(group_id, name): content for (group_id, name), content in zip(containers, contents)}
+
+    submitted = _deployment_submitted(deployment)
+    report = []
+    for group_id, group in zip(group_ids, groups):
+        group_logs = {name: content for (gid, name), content in logs.items() if gid == group_id}
+        report.extend(container_startup(group, submitted, group_logs))
+
+    print(format_report(report), flush=True)
+    return report
@@ -0,0 +1,196 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import platform
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from c_aci_testing.utils.deadline import DeadlineExceeded, RunBudget, StageRecord
+from c_aci_testing.utils.run_history import DEADLINE_EXCEEDED, FAILED, SUCCEEDED, percentile
+
+from .target_run import target_run_ctx
+from .vm_deploy import vm_deploy
+from .vm_remove import vm_remove
+from .vn2_target_run import vn2_target_run_ctx
+
+
+@dataclass
+class BenchRun:
+    iteration: int
+    deployment_name: str
+    outcome: str
+    duration: float
+    stages: List[StageRecord] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+@dataclass
+class BenchStageStats:
+    stage: str
+    count: int
+    failures: int
+    min: Optional[float]
+    p50: Optional[float]
+    p95: Optional[float]
+    max: Optional[float]
+
+
+def _run_once(bench_command: str, budget: RunBudget, **kwargs):
+    if bench_command == "target":
+        with target_run_ctx(budget=budget, **kwargs):
+            ...
+    elif bench_command == "vn2":
+        with vn2_target_run_ctx(budget=budget, **kwargs):
+            ...
+    elif bench_command == "vm":
+        try:
+            vm_deploy(budget=budget, **kwargs)
+        finally:
+            if kwargs.get("cleanup", True):
+                with budget.cleanup_stage("vm_remove"):
+                    vm_remove(**kwargs)
+    else:
+        raise ValueError(f"bench command: {bench_command} not recognised")
+
+
+def run_iteration(bench_command: str, iteration: int, deployment_name: str, deadline_secs: int = 0, **kwargs):
+    """
+    Run the target once, recording the outcome and stage timings rather than raising.
+    """
+    budget = RunBudget(deadline_secs)
+    start = time.monotonic()
+    outcome, error = SUCCEEDED, None
+    try:
+        _run_once(bench_command, budget, deployment_name=deployment_name, deadline_secs=deadline_secs, **kwargs)
+    except DeadlineExceeded as e:
+        outcome, error = DEADLINE_EXCEEDED, str(e)
+    except Exception as e:
+        outcome, error = FAILED, str(e) or type(e).__name__
+    return BenchRun(iteration, deployment_name, outcome, time.monotonic() - start, budget.stages, error)
+
+
+def stage_stats(runs: List[BenchRun]) -> List[BenchStageStats]:
+    """
+    Duration percentiles of each stage's successful runs, in the order stages first ran.
+    """
+    durations: Dict[str, List[float]] = {}
+    failures: Dict[str, int] = {}
+    for run in runs:
+        for stage in run.stages:
+            durations.setdefault(stage.name, [])
+            failures.setdefault(stage.name, 0)
+            if stage.status == "ok":
+                durations[stage.name].append(stage.duration)
+            else:
+                failures[stage.name] += 1
+
+    stats = []
+    for name, values in durations.items():
+        values.sort()
+        stats.append(
+            BenchStageStats(
+                name,
+                len(values),
+                failures[name],
+                values[0] if values else None,
+                percentile(values, 50) if values else None,
+                percentile(values, 95) if values else None,
+                values[-1] if values else None,
+            )
+        )
+    return stats
+
+
+def format_results(runs: List[BenchRun], stats: List[BenchStageStats]) -> str:
+    def fmt(value: Optional[float]) -> str:
+        return f"{value:.1f}s" if value is not None else "-"
+
+    outcomes: Dict[str, int] = {}
+    for run in runs:
+        outcomes[run.outcome] = outcomes.get(run.outcome, 0) + 1
+
+    summary = ", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items()))
+    lines = [f"{len(runs)} iterations: {summary}"]
+    lines.append(f"  {'stage':<24} {'ok':>4} {'failed':>6} {'min':>9} {'p50':>9} {'p95':>9} {'max':>9}")
+    for s in stats:
+        lines.append(
+            f"  {s.stage:<24} {s.count:>4} {s.failures:>6} {fmt(s.min):>9} {fmt(s.p50):>9}"
+            f" {fmt(s.p95):>9} {fmt(s.max):>9}"
+        )
+    for run in runs:
+        if run.error:
+            lines.append(f"  {run.deployment_name}: {run.outcome}: {run.error}")
+    return "\n".join(lines)
+
+
+def bench(
+    bench_command: str,
+    deployment_name: str,
+    iterations: int = 5,
+    concurrency: int = 1,
+    reuse_images: bool = False,
+    bench_output: str = "",
+    label: str = "",
+    **kwargs,
+) -> dict:
+    """
+    Run a target (bench_command "target", "vn2" or "vm") repeatedly, each
+    iteration with a fresh deployment name, and report min/p50/p95/max of
+    every stage along with failure counts.
+
+    :param concurrency: Number of iterations to run at the same time, not supported by "vn2"
+    :param reuse_images: Only build and push images in the first iteration
+    """
+    if bench_command == "vn2" and concurrency > 1:
+        # Every iteration generates the pod YAML in the target's directory and deploys from it
+        raise ValueError("vn2 bench iterations can't run concurrently, they share the target's generated YAML")
+    # Concurrent iterations would race on the target's bicepparam file
+    kwargs["param_overlay"] = kwargs.get("param_overlay", False) or concurrency > 1
+    # Distinguishes this bench's deployments from those of earlier ones which failed to clean up
+    bench_id = uuid.uuid4().hex[:4]
+    kwargs.pop("trace_file", None)
+    started_at = time.time()
+
+    def run(iteration: int, skip_images: bool) -> BenchRun:
+        name = f"{deployment_name}-{bench_id}-{iteration + 1}"
+        print(f"Bench iteration {iteration + 1}/{iterations}: {name}", flush=True)
+        result = run_iteration(bench_command, iteration, name, skip_images=skip_images, **kwargs)
+        print(f"Bench iteration {iteration + 1}/{iterations} {result.outcome} in {result.duration:.1f}s", flush=True)
+        return result
+
+    runs: List[BenchRun] = []
+    first = 0
+    if reuse_images and iterations > 0:
+        runs.append(run(0, skip_images=False))
+        first = 1
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        runs.extend(pool.map(lambda i: run(i, skip_images=reuse_images), range(first, iterations)))
+
+    stats = stage_stats(runs)
+    print(format_results(runs, stats), flush=True)
+
+    results = {
+        "kind": bench_command,
+        "target": kwargs.get("target_path"),
+        "label": label,
+        "host": platform.node(),
+        "started_at": started_at,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "reuse_images": reuse_images,
+        "stages": [asdict(s) for s in stats],
+        "runs": [asdict(r) for r in runs],
+    }
+    if bench_output:
+        with open(bench_output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Bench results written to {bench_output}", flush=True)
+    return results
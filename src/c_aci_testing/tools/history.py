@@ -0,0 +1,63 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import time
+
+from c_aci_testing.utils import run_history
+
+
+def _print_stats(title: str, stats: list, by_region: bool):
+    print(title)
+    header = f"  {'region':<16} " if by_region else "  "
+    print(f"{header}{'stage':<24} {'runs':>5} {'p50':>9} {'p95':>9} {'max':>9}")
+    for s in stats:
+        region = f"  {s.region or '-':<16} " if by_region else "  "
+        print(f"{region}{s.stage:<24} {s.count:>5} {s.p50:>8.1f}s {s.p95:>8.1f}s {s.max:>8.1f}s")
+
+
+def history(
+    days: float = 30,
+    target: str = "",
+    region: str = "",
+    kind: str = "",
+    **kwargs,
+):
+    path = run_history.history_path()
+    if not path:
+        print(f"Run history is disabled ({run_history.HISTORY_DB_ENV} is empty)")
+        return
+
+    since = time.time() - days * 24 * 3600
+    filters = dict(target=target, region=region, kind=kind, path=path)
+
+    outcomes = run_history.outcome_counts(since, **filters)
+    if not outcomes:
+        print(f"No runs recorded in the last {days:g} days")
+        return
+
+    print(f"Runs in the last {days:g} days:")
+    for (run_kind, outcome), count in sorted(outcomes.items()):
+        print(f"  {run_kind:<16} {outcome:<18} {count:>5}")
+    print()
+    _print_stats("Successful stage durations:", run_history.stage_stats(since, **filters), by_region=False)
+    print()
+    _print_stats(
+        "Successful stage durations per region:",
+        run_history.stage_stats(since, by_region=True, **filters),
+        by_region=True,
+    )
+
+    detections = run_history.detection_stats(since, **filters)
+    if detections:
+        print()
+        print("Detection lag of polled state changes:")
+        print(f"  {'poller':<16} {'state':<16} {'count':>5} {'p50':>9} {'p95':>9} {'max':>9} {'exact':>6} {'polls':>6}")
+        for d in detections:
+            print(
+                f"  {d.poller:<16} {d.state:<16} {d.count:>5} {d.p50:>8.1f}s {d.p95:>8.1f}s {d.max:>8.1f}s"
+                f" {d.exact:>6} {d.p50_polls:>6.0f}"
+            )
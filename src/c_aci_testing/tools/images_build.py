@@ -7,7 +7,8 @@
 from __future__ import annotations
 
 import os
-import subprocess
+
+from c_aci_testing.utils.cmd_executor import execute
 
 
 def images_build(
@@ -26,7 +27,7 @@ def images_build(
         build_command.append(service)
 
     print(f"Building images for {registry}")
-    subprocess.run(
+    execute(
         build_command,
         env={
             **os.environ,
@@ -37,6 +38,7 @@ def images_build(
         },
         cwd=target_path,
         check=True,
+        capture=False,
     )
 
     print("Built all images successfully")
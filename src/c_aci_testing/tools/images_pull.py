@@ -7,8 +7,8 @@
 from __future__ import annotations
 
 import os
-import subprocess
 
+from c_aci_testing.utils.cmd_executor import execute
 from c_aci_testing.utils.acr import login_with_retry, strip_acr_suffix
 
 
@@ -23,8 +23,8 @@ def images_pull(
         login_with_retry(registry)
 
     print(f"Pulling images for {registry}")
-    for stderr_val in (None, subprocess.PIPE):
-        result = subprocess.run(
+    for capture in (False, True):
+        result = execute(
             ["docker", "compose", "pull"],
             env={
                 **os.environ,
@@ -34,12 +34,11 @@ def images_pull(
                 **({"TAG": tag} if tag else {}),
             },
             cwd=target_path,
-            check=False,
-            stderr=stderr_val,
+            capture=capture,
         )
 
     images_not_pulled = []
-    for line in result.stderr.decode().split(os.linesep):
+    for line in result.stderr.split(os.linesep):
         if line.strip().startswith("docker compose build"):
             images_not_pulled.extend(line.split()[3:])
 
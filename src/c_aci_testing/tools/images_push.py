@@ -7,7 +7,8 @@
 from __future__ import annotations
 
 import os
-import subprocess
+
+from c_aci_testing.utils.cmd_executor import execute
 
 
 def images_push(
@@ -17,10 +18,10 @@ def images_push(
     tag: str | None,
     **kwargs,
 ):
-    subprocess.run(["az", "acr", "login", "--name", registry], check=True)
+    execute(["az", "acr", "login", "--name", registry], check=True, capture=False)
 
     print(f"Pushing images for {registry}")
-    subprocess.run(
+    execute(
         ["docker", "compose", "push"],
         env={
             **os.environ,
@@ -31,6 +32,7 @@ def images_push(
         },
         cwd=target_path,
         check=True,
+        capture=False,
     )
 
     print("Pushed all images successfully")
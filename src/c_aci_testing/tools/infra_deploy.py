@@ -7,7 +7,8 @@
 from __future__ import annotations
 
 import os
-import subprocess
+
+from c_aci_testing.utils.cmd_executor import execute, execute_all
 
 
 def infra_deploy(
@@ -22,18 +23,16 @@ def infra_deploy(
 ):
     bicep_template_dir = os.path.join(os.path.dirname(__file__), "..", "bicep")
 
-    subprocess.run(["az", "account", "set", "--subscription", subscription])
+    execute(["az", "account", "set", "--subscription", subscription], capture=False)
 
     print("Checking if resource group exists")
-    result = subprocess.run(
-        ["az", "group", "exists", "--name", resource_group], capture_output=True, text=True, check=True
-    )
+    result = execute(["az", "group", "exists", "--name", resource_group], check=True)
     rg_exists = result.stdout.strip().lower() == "true"
     print(f"{resource_group} " + ("exists" if rg_exists else "does not exist"))
 
     if not rg_exists:
         print("Creating resource group and all resources")
-        result = subprocess.run(
+        execute(
             [
                 "az",
                 "deployment",
@@ -53,23 +52,45 @@ def infra_deploy(
                 f"githubRepo={github_repo}",
                 "--parameters",
                 f"storageAccountName={storage_account}",
-            ]
+            ],
+            capture=False,
         )
         return
 
     # XXX: is this really necessary?
 
+    # The existence checks are independent of each other, so run them together
     print("Checking if container registry exists")
-    result = subprocess.run(
-        ["az", "acr", "show", "--name", registry, "--query", "name"], capture_output=True, text=True
-    )
-    deployed_name = result.stdout.rstrip(os.linesep).strip('"') + ".azurecr.io"
-    registry_exists = result is not None and deployed_name == registry
+    print(f"Checking if managed identity '{managed_identity}' exists")
+    check_cmds = [
+        ["az", "acr", "show", "--name", registry, "--query", "name"],
+        ["az", "identity", "show", "--name", managed_identity, "--resource-group", resource_group, "--query", "name"],
+    ]
+    if storage_account:
+        print(f"Checking if storage account '{storage_account}' exists")
+        check_cmds.append(
+            [
+                "az",
+                "storage",
+                "account",
+                "show",
+                "--name",
+                storage_account,
+                "--resource-group",
+                resource_group,
+                "--query",
+                "name",
+            ]
+        )
+    registry_result, identity_result, *storage_result = execute_all(check_cmds)
+
+    deployed_name = registry_result.stdout.rstrip(os.linesep).strip('"') + ".azurecr.io"
+    registry_exists = deployed_name == registry
     print(f"{registry} " + ("exists" if registry_exists else "does not exist"))
 
     if not registry_exists:
         print("Creating container registry")
-        result = subprocess.run(
+        execute(
             [
                 "az",
                 "deployment",
@@ -85,20 +106,15 @@ def infra_deploy(
                 f"location={location}",
             ],
             check=True,
+            capture=False,
         )
 
-    print(f"Checking if managed identity '{managed_identity}' exists")
-    result = subprocess.run(
-        ["az", "identity", "show", "--name", managed_identity, "--resource-group", resource_group, "--query", "name"],
-        capture_output=True,
-        text=True,
-    )
-    identity_exists = result is not None and result.stdout.replace('"', "").strip() == managed_identity
+    identity_exists = identity_result.stdout.replace('"', "").strip() == managed_identity
     print(f"{managed_identity} " + ("exists" if identity_exists else "does not exist"))
 
     if not identity_exists:
         print("Creating managed identity")
-        result = subprocess.run(
+        execute(
             [
                 "az",
                 "deployment",
@@ -116,32 +132,16 @@ def infra_deploy(
                 f"githubRepo={github_repo}",
             ],
             check=True,
+            capture=False,
         )
 
     if storage_account:
-        print(f"Checking if storage account '{storage_account}' exists")
-        result = subprocess.run(
-            [
-                "az",
-                "storage",
-                "account",
-                "show",
-                "--name",
-                storage_account,
-                "--resource-group",
-                resource_group,
-                "--query",
-                "name",
-            ],
-            capture_output=True,
-            text=True,
-        )
-        account_exists = result is not None and result.stdout.replace('"', "").strip() == storage_account
+        account_exists = storage_result[0].stdout.replace('"', "").strip() == storage_account
         print(f"{storage_account} " + ("exists" if account_exists else "does not exist"))
 
         if not account_exists:
             print("Creating storage account")
-            result = subprocess.run(
+            execute(
                 [
                     "az",
                     "deployment",
@@ -159,4 +159,5 @@ def infra_deploy(
                     f"managedIdName={managed_identity}",
                 ],
                 check=True,
+                capture=False,
             )
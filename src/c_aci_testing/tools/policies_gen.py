@@ -11,18 +11,19 @@ import json
 import os
 import pathlib
 import re
-import subprocess
 import tempfile
 import shutil
 import sys
 import tempfile
+import threading
 
 from .aci_param_set import aci_param_set
+from c_aci_testing.utils.cmd_executor import execute
 from c_aci_testing.utils.parse_bicep import (
     find_bicep_files,
     arm_template_for_each_container_group_with_fixup,
-    parse_bicep,
 )
+from c_aci_testing.utils.target_model import TargetModel, load_target_model
 
 ALLOW_ALL_POLICY_REGO_PATH = os.path.join(
     os.path.dirname(__file__),
@@ -50,8 +51,12 @@ def policies_gen(
     policy_type: str,
     fragments_json: str | None = None,
     infrastructure_svn: int | None = None,
+    model: TargetModel | None = None,
     **kwargs,
 ):
+    """
+    :param model: Model of the target from an earlier stage, instead of loading it
+    """
 
     # Inform the user of the policy type
     print(f"Using the policy type: {policy_type}")
@@ -70,14 +75,14 @@ def policies_gen(
         print("This template doesn't use generated policies, skipping policy gen")
         return
 
-    arm_template_json = parse_bicep(
+    model = model or load_target_model(
         target_path, subscription, resource_group, deployment_name, registry, repository, tag
     )
 
     policies = {}
 
     for container_group, containers in arm_template_for_each_container_group_with_fixup(
-        arm_template_json,
+        model.arm_template(),
     ):
         # Derive container group ID
         # This is used in the ccePolicies object.
@@ -132,7 +137,7 @@ def policies_gen(
                 json.dump({"resources": [cg_for_confcom]}, file, indent=2)
 
             print("Calling acipolicygen and saving policy to file")
-            subprocess.run(["az", "extension", "add", "--name", "confcom", "--yes"], check=True)
+            execute(["az", "extension", "add", "--name", "confcom", "--yes"], check=True, capture=False)
             args = [
                 "az",
                 "confcom",
@@ -146,16 +151,16 @@ def policies_gen(
             ]
             print("Running: " + " ".join(args), flush=True)
             sys.stderr.flush()
-            res = subprocess.run(
-                args,
-                check=True,
-                stdout=subprocess.PIPE,
-            )
-            policy = res.stdout.decode()
+            res = execute(args, check=True, echo_stderr=True)
+            policy = res.stdout
             os.remove(tmp_arm_template_path)
 
-        with open(os.path.join(target_path, f"policy_{container_group_id}.rego"), "w") as file:
+        # Replaced in one go, as concurrent runs of the target (e.g. bench iterations) write it too
+        policy_path = os.path.join(target_path, f"policy_{container_group_id}.rego")
+        tmp_policy_path = f"{policy_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_policy_path, "w") as file:
             file.write(policy)
+        os.replace(tmp_policy_path, policy_path)
 
         policies[container_group_id] = base64.b64encode(policy.encode()).decode()
 
@@ -7,11 +7,18 @@ from __future__ import annotations
 
 from contextlib import contextmanager
 
+from c_aci_testing.utils import arm_governor, run_history, trace
+from c_aci_testing.utils.deadline import DeadlineExceeded, RunBudget
+from c_aci_testing.utils.param_overlay import run_overlay
+from c_aci_testing.utils.query_cache import run_cache
+from c_aci_testing.utils.target_model import load_target_model
+
 from .aci_deploy import aci_deploy
 from .aci_get_ids import aci_get_ids
 from .aci_get_is_live import aci_get_is_live
 from .aci_monitor import aci_monitor
 from .aci_remove import aci_remove
+from .aci_startup_report import aci_startup_report
 from .images_build import images_build
 from .images_pull import images_pull
 from .images_push import images_push
@@ -33,83 +40,168 @@ def target_run_ctx(
     follow: bool = False,
     cleanup: bool = True,
     prefer_pull: bool = False,
+    deadline_secs: int = 0,
+    trace_file: str = "",
+    skip_images: bool = False,
+    param_overlay: bool = False,
+    budget: RunBudget | None = None,
     **kwargs,
 ):
-    aci_ids = aci_get_ids(
+    """
+    :param skip_images: Use the images already in the registry, e.g. from a previous run
+    :param param_overlay: Keep parameters in memory instead of the target's bicepparam file
+    :param budget: Budget to time the run's stages with, instead of one of deadline_secs
+    """
+    budget = budget or RunBudget(deadline_secs)
+    history = run_history.recording(
+        "target run",
+        budget,
+        target_path=target_path,
         deployment_name=deployment_name,
-        subscription=subscription,
-        resource_group=resource_group,
+        region=location,
+        registry=registry,
+        repository=repository,
+        tag=tag,
     )
+    with history, run_cache(), budget.activate(), trace.tracing(trace_file), run_overlay(param_overlay):
+        try:
+            with budget.stage("aci_get_ids"):
+                aci_ids = aci_get_ids(
+                    deployment_name=deployment_name,
+                    subscription=subscription,
+                    resource_group=resource_group,
+                )
 
-    if not aci_get_is_live(
-        deployment_name=deployment_name,
-        subscription=subscription,
-        resource_group=resource_group,
-        aci_ids=aci_ids,
-    ):
-        unpulled_services = []
-        if prefer_pull:
-            unpulled_services = images_pull(
-                target_path=target_path,
-                registry=registry,
-                repository=repository,
-                tag=tag,
-            )
-        if not prefer_pull or unpulled_services:
-            images_build(
-                target_path=target_path,
-                registry=registry,
-                repository=repository,
-                tag=tag,
-                services=unpulled_services,
-            )
-            images_push(
-                target_path=target_path,
-                registry=registry,
-                repository=repository,
-                tag=tag,
-            )
-        policies_gen(
-            target_path=target_path,
-            deployment_name=deployment_name,
-            subscription=subscription,
-            resource_group=resource_group,
-            registry=registry,
-            repository=repository,
-            tag=tag,
-            policy_type=policy_type,
-        )
-        aci_ids = aci_deploy(
-            target_path=target_path,
-            deployment_name=deployment_name,
-            subscription=subscription,
-            resource_group=resource_group,
-            location=location,
-            managed_identity=managed_identity,
-        )
+            with budget.stage("aci_get_is_live"):
+                is_live = aci_get_is_live(
+                    deployment_name=deployment_name,
+                    subscription=subscription,
+                    resource_group=resource_group,
+                    aci_ids=aci_ids,
+                )
+
+            if not is_live:
+                unpulled_services = []
+                if prefer_pull and not skip_images:
+                    with budget.stage("images_pull"):
+                        unpulled_services = images_pull(
+                            target_path=target_path,
+                            registry=registry,
+                            repository=repository,
+                            tag=tag,
+                        )
+                if not skip_images and (not prefer_pull or unpulled_services):
+                    with budget.stage("images_build"):
+                        images_build(
+                            target_path=target_path,
+                            registry=registry,
+                            repository=repository,
+                            tag=tag,
+                            services=unpulled_services,
+                        )
+                    with budget.stage("images_push"):
+                        images_push(
+                            target_path=target_path,
+                            registry=registry,
+                            repository=repository,
+                            tag=tag,
+                        )
+                with budget.stage("target_model"):
+                    model = load_target_model(
+                        target_path=target_path,
+                        subscription=subscription,
+                        resource_group=resource_group,
+                        deployment_name=deployment_name,
+                        registry=registry,
+                        repository=repository,
+                        tag=tag,
+                    )
+                with budget.stage("policies_gen"):
+                    policies_gen(
+                        target_path=target_path,
+                        deployment_name=deployment_name,
+                        subscription=subscription,
+                        resource_group=resource_group,
+                        registry=registry,
+                        repository=repository,
+                        tag=tag,
+                        policy_type=policy_type,
+                        model=model,
+                    )
+                with budget.stage("aci_deploy"):
+                    aci_ids = aci_deploy(
+                        target_path=target_path,
+                        deployment_name=deployment_name,
+                        subscription=subscription,
+                        resource_group=resource_group,
+                        location=location,
+                        managed_identity=managed_identity,
+                    )
+        except DeadlineExceeded:
+            # Whatever was deployed before the deadline still needs removing
+            if cleanup:
+                with budget.cleanup_stage("aci_remove"):
+                    aci_remove(
+                        deployment_name=deployment_name,
+                        subscription=subscription,
+                        resource_group=resource_group,
+                    )
+            print(budget.report())
+            raise
 
-    error = None
-    try:
+        error = None
         try:
-            yield aci_ids
-        except Exception as e:
-            cleanup = False
-            error = e
-        aci_monitor(
-            deployment_name=deployment_name,
-            subscription=subscription,
-            resource_group=resource_group,
-            follow=follow,
-        )
-    finally:
-        if cleanup:
-            aci_remove(
-                deployment_name=deployment_name,
-                subscription=subscription,
-                resource_group=resource_group,
-            )
-        if error:
-            raise error
+            try:
+                with budget.stage("test"):
+                    yield aci_ids
+            except DeadlineExceeded as e:
+                error = e
+            except Exception as e:
+                cleanup = False
+                error = e
+            if isinstance(error, DeadlineExceeded):
+                # Still show the logs of a run which hung, but don't wait for more
+                with budget.cleanup_stage("aci_monitor"):
+                    aci_monitor(
+                        deployment_name=deployment_name,
+                        subscription=subscription,
+                        resource_group=resource_group,
+                        follow=False,
+                    )
+            else:
+                with budget.stage("aci_monitor"):
+                    aci_monitor(
+                        deployment_name=deployment_name,
+                        subscription=subscription,
+                        resource_group=resource_group,
+                        follow=follow,
+                    )
+                with budget.stage("aci_startup_report"):
+                    try:
+                        aci_startup_report(
+                            deployment_name=deployment_name,
+                            subscription=subscription,
+                            resource_group=resource_group,
+                        )
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as e:
+                        # Only informational, so don't fail the run over it
+                        print(f"Failed to report container startup times: {e}")
+        finally:
+            if cleanup:
+                with budget.cleanup_stage("aci_remove"):
+                    aci_remove(
+                        deployment_name=deployment_name,
+                        subscription=subscription,
+                        resource_group=resource_group,
+                    )
+            if arm_governor.metrics.delayed_calls:
+                print(arm_governor.metrics.summary())
+            if budget.deadline is not None or budget.exceeded_in:
+                print(budget.report())
+            if error:
+                raise error
 
 
 def target_run(**kwargs):
@@ -6,10 +6,11 @@
 from __future__ import annotations
 
 import json
-import subprocess
 import tarfile
 import tempfile
 
+from c_aci_testing.utils.cmd_executor import execute
+
 VM_CONTAINER_NAME = "container"
 
 def containerplat_cache_from_path(storage_account: str, container_name: str, blob_name: str, cplat_path: str):
@@ -51,7 +52,7 @@ def containerplat_cache_from_path(storage_account: str, container_name: str, blo
     with tarfile.open(tar_path, "w:gz") as tar:
         tar.add(cplat_path, arcname="containerplat_build")
 
-    subprocess.run(
+    execute(
         [
             "az",
             "storage",
@@ -70,6 +71,7 @@ def containerplat_cache_from_path(storage_account: str, container_name: str, blo
             "--overwrite",
         ],
         check=True,
+        capture=False,
     )
 
 
@@ -77,7 +79,7 @@ def containerplat_cache_from_ado(
     storage_account: str, container_name: str, blob_name: str, cplat_feed: str, cplat_name: str, cplat_version: str
 ):
     with tempfile.TemporaryDirectory() as temp_dir:
-        subprocess.run(
+        execute(
             [
                 "az",
                 "artifacts",
@@ -99,6 +101,7 @@ def containerplat_cache_from_ado(
                 temp_dir,
             ],
             check=True,
+            capture=False,
         )
 
         containerplat_cache_from_path(storage_account, container_name, blob_name, temp_dir)
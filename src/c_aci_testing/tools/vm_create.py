@@ -7,10 +7,13 @@ from __future__ import annotations
 
 import os
 import subprocess
-import time
 import shutil
 import tempfile
+import time
 
+from c_aci_testing.utils import trace
+from c_aci_testing.utils.cmd_executor import execute
+from c_aci_testing.utils.poller import Poller
 from c_aci_testing.utils.vm import (
     run_on_vm,
     download_single_file_from_vm,
@@ -24,9 +27,21 @@ VM_CONTAINER_NAME = "container"
 
 # Confidential WCOW first boot needs Hyper-V regflags + reboot + post-reboot
 # scheduled task + cplat install, which can take ~8 min. Bumped from the
-# previous 12 (=4 min) to give us margin.
-BOOTSTRAP_POLL_INTERVAL_SECS = 20
-BOOTSTRAP_POLL_MAX_TRIES = 30
+# previous 4 min to give us margin.  Only time spent waiting between checks
+# counts, each check (a run-command on the VM) takes tens of seconds on top.
+BOOTSTRAP_MAX_WAIT_SECS = 600
+# Other VMs bootstrap in a minute or two
+BOOTSTRAP_POLL_INITIAL_SECS = 5
+BOOTSTRAP_POLL_MAX_SECS = 30
+
+
+def _wait(poller: Poller, at_most: float) -> float:
+    """
+    Wait for the poller's next check, returning the seconds waited.
+    """
+    started = time.monotonic()
+    poller.wait(at_most=at_most)
+    return time.monotonic() - started
 
 
 def check_vm_exists(
@@ -35,7 +50,7 @@ def check_vm_exists(
     vm_name: str,
 ) -> bool:
     try:
-        subprocess.run(
+        execute(
             [
                 "az",
                 "vm",
@@ -48,8 +63,6 @@ def check_vm_exists(
                 resource_group,
             ],
             check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
         )
         return True
     except subprocess.CalledProcessError:
@@ -159,10 +172,15 @@ def vm_create(
     )
 
     tries = 0
+    waited = 0.0
+    poller = Poller(
+        "vm bootstrap", initial=BOOTSTRAP_POLL_INITIAL_SECS, max_interval=BOOTSTRAP_POLL_MAX_SECS, vm=vm_name
+    )
     fd, tmp_log_file = tempfile.mkstemp()
     os.close(fd)
     while True:
         tries += 1
+        remaining = BOOTSTRAP_MAX_WAIT_SECS - waited
 
         try:
             download_single_file_from_vm(
@@ -177,9 +195,9 @@ def vm_create(
             )
         except Exception as e:
             print(f"Failed to download bootstrap.log: {e}")
-            if tries < BOOTSTRAP_POLL_MAX_TRIES:
-                print(f"Retrying ({tries}/{BOOTSTRAP_POLL_MAX_TRIES})...")
-                time.sleep(BOOTSTRAP_POLL_INTERVAL_SECS)
+            if remaining > 0:
+                print(f"Retrying ({waited:.0f}s/{BOOTSTRAP_MAX_WAIT_SECS}s waited)...")
+                waited += _wait(poller, remaining)
                 continue
             raise
 
@@ -187,17 +205,20 @@ def vm_create(
             output = decode_utf8_or_utf16(f.read())
         os.remove(tmp_log_file)
 
+        state = "success" if "DEPLOY-SUCCESS" in output else "error" if "DEPLOY-ERROR" in output else "running"
+        trace.instant("poll bootstrap", cat="poll", vm=vm_name, attempt=tries, state=state)
+        poller.observe(state)
         if "DEPLOY-SUCCESS" in output:
             print(output)
             break
         if "DEPLOY-ERROR" in output:
             print(output)
             raise Exception("Bootstrap error detected")
-        if tries < BOOTSTRAP_POLL_MAX_TRIES:
-            print(f"Waiting for VM to finish bootstrapping ({tries}/{BOOTSTRAP_POLL_MAX_TRIES})...")
+        if remaining > 0:
+            print(f"Waiting for VM to finish bootstrapping ({waited:.0f}s/{BOOTSTRAP_MAX_WAIT_SECS}s waited)...")
             print("Current output:")
             print(output)
-            time.sleep(BOOTSTRAP_POLL_INTERVAL_SECS)
+            waited += _wait(poller, remaining)
             continue
         print(output)
         raise Exception("VM did not finish bootstrapping in time")
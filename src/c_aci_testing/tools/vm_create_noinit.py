@@ -7,12 +7,12 @@ from __future__ import annotations
 
 import json
 import os
-import subprocess
 import tempfile
 import uuid
 import re
 
 from c_aci_testing.tools.vm_get_ids import vm_get_ids
+from c_aci_testing.utils.cmd_executor import execute
 
 VM_CONTAINER_NAME = "container"
 
@@ -103,7 +103,7 @@ def vm_create_noinit(
     )
     print("")
 
-    subprocess.run(
+    execute(
         [
             "az",
             "deployment",
@@ -121,6 +121,7 @@ def vm_create_noinit(
             f"@{parameters_file}",
         ],
         check=True,
+        capture=False,
     )
 
     ids = vm_get_ids(
@@ -5,6 +5,11 @@
 
 from __future__ import annotations
 
+from c_aci_testing.utils import run_history
+from c_aci_testing.utils.deadline import RunBudget
+from c_aci_testing.utils.param_overlay import run_overlay
+from c_aci_testing.utils.target_model import load_target_model
+
 from .vm_create import vm_create
 from .vm_runc import vm_runc
 
@@ -34,6 +39,8 @@ def vm_deploy(
     prefix: str,
     vm_zone: str,
     resource_tags: dict[str, str],
+    param_overlay: bool = False,
+    budget: RunBudget | None = None,
     **kwargs,
 ):
     """
@@ -41,40 +48,70 @@ def vm_deploy(
     :param cplat_name: Name of the containerplat package, can be empty
     :param cplat_version: Version of the containerplat package, can be empty
     :param cplat_blob_name: Name to use for the containerplat blob, can be empty for per-deployment blobs
+    :param param_overlay: Keep parameters in memory instead of the target's bicepparam file
+    :param budget: Budget to time the deployment's stages with
     """
 
-    vm_create(
-        deployment_name=deployment_name,
-        subscription=subscription,
-        resource_group=resource_group,
-        location=location,
-        managed_identity=managed_identity,
-        use_official_images=use_official_images,
-        official_image_sku=official_image_sku,
-        official_image_version=official_image_version,
-        vm_image=vm_image,
-        win_flavor=win_flavor,
-        cplat_feed=cplat_feed,
-        cplat_name=cplat_name,
-        cplat_version=cplat_version,
-        cplat_path=cplat_path,
-        cplat_blob_name=cplat_blob_name,
-        storage_account=storage_account,
-        vm_size=vm_size,
-        vm_zone=vm_zone,
-        resource_tags=resource_tags,
-    )
-
-    vm_runc(
+    budget = budget or RunBudget()
+    history = run_history.recording(
+        "vm deploy",
+        budget,
         target_path=target_path,
         deployment_name=deployment_name,
-        subscription=subscription,
-        resource_group=resource_group,
-        managed_identity=managed_identity,
-        storage_account=storage_account,
-        win_flavor=win_flavor,
+        region=location,
+        vm_size=vm_size,
         registry=registry,
         repository=repository,
         tag=tag,
-        prefix=prefix,
     )
+    with history, budget.activate(), run_overlay(param_overlay):
+        # Before creating the VM, so that errors in the bicep files don't cost one
+        with budget.stage("target_model"):
+            model = load_target_model(
+                target_path=target_path,
+                subscription=subscription,
+                resource_group=resource_group,
+                deployment_name=deployment_name,
+                registry=registry,
+                repository=repository,
+                tag=tag,
+            )
+
+        with budget.stage("vm_create"):
+            vm_create(
+                deployment_name=deployment_name,
+                subscription=subscription,
+                resource_group=resource_group,
+                location=location,
+                managed_identity=managed_identity,
+                use_official_images=use_official_images,
+                official_image_sku=official_image_sku,
+                official_image_version=official_image_version,
+                vm_image=vm_image,
+                win_flavor=win_flavor,
+                cplat_feed=cplat_feed,
+                cplat_name=cplat_name,
+                cplat_version=cplat_version,
+                cplat_path=cplat_path,
+                cplat_blob_name=cplat_blob_name,
+                storage_account=storage_account,
+                vm_size=vm_size,
+                vm_zone=vm_zone,
+                resource_tags=resource_tags,
+            )
+
+        with budget.stage("vm_runc"):
+            vm_runc(
+                target_path=target_path,
+                deployment_name=deployment_name,
+                subscription=subscription,
+                resource_group=resource_group,
+                managed_identity=managed_identity,
+                storage_account=storage_account,
+                win_flavor=win_flavor,
+                registry=registry,
+                repository=repository,
+                tag=tag,
+                prefix=prefix,
+                model=model,
+            )
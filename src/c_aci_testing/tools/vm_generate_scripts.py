@@ -9,7 +9,7 @@ import json
 import os
 import pathlib
 
-from c_aci_testing.utils.parse_bicep import parse_bicep, arm_template_for_each_container_group
+from c_aci_testing.utils.target_model import TargetModel, load_target_model
 from c_aci_testing.utils.find_bicep import find_bicep_files
 from c_aci_testing.utils.vm import resolve_manifest_hash
 
@@ -77,7 +77,11 @@ def make_configs(
     prefix: str,
     output_conf_dir: str,
     no_resolve_manifest_hash: bool = False,
+    model: TargetModel | None = None,
 ):
+    """
+    :param model: Model of the target from an earlier stage, instead of loading it
+    """
     print(f"Constructing LCOW configs and scripts in {output_conf_dir}...")
 
     bicep_file_path, _ = find_bicep_files(target_path)
@@ -139,7 +143,7 @@ def make_configs(
     if win_flavor == "ws2022":
         del container_group_template["annotations"]["io.microsoft.virtualmachine.lcow.hcl-enabled"]
 
-    arm_template_json = parse_bicep(
+    model = model or load_target_model(
         target_path,
         subscription,
         resource_group,
@@ -151,7 +155,7 @@ def make_configs(
 
     has_privileged_containers = False
 
-    cgs = list(arm_template_for_each_container_group(arm_template_json))
+    cgs = list(model.for_each_container_group())
     single_pod = len(cgs) <= 1
     for container_group, containers in cgs:
         # Detect osType per CG: Windows triggers the confidential WCOW path
@@ -5,9 +5,10 @@
 
 from __future__ import annotations
 
-import os
 import subprocess
 
+from c_aci_testing.utils.cmd_executor import execute
+
 
 def vm_get_ids(
     deployment_name: str,
@@ -16,7 +17,7 @@ def vm_get_ids(
     **kwargs,
 ) -> list[str]:
     try:
-        res = subprocess.run(
+        res = execute(
             [
                 "az",
                 "deployment",
@@ -34,11 +35,11 @@ def vm_get_ids(
                 "tsv",
             ],
             check=True,
-            stdout=subprocess.PIPE,
+            echo_stderr=True,
         )
     except subprocess.CalledProcessError:
         print(f"Failed to get deployment outputs for {deployment_name}")
         return []
 
-    ids = [id for id in res.stdout.decode().split(os.linesep) if id]
+    ids = [id for id in res.stdout.splitlines() if id]
     return ids
@@ -5,7 +5,8 @@
 
 from __future__ import annotations
 
-import subprocess
+from c_aci_testing.utils.arm import ArmError, get_arm_client, map_concurrently, use_arm_client
+from c_aci_testing.utils.cmd_executor import execute, execute_all
 
 from .vm_get_ids import vm_get_ids
 
@@ -38,44 +39,11 @@ def vm_remove(
         iteration += 1
         print(f"Deleting {len(remaining_resources)} resources (attempt {iteration}/{MAX_DELETE_ITERATIONS})...")
 
-        res = subprocess.run(
-            [
-                "az",
-                "resource",
-                "delete",
-                "--subscription",
-                subscription,
-                "--resource-group",
-                resource_group,
-                "--ids",
-                *remaining_resources,
-            ],
-            check=False,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        if res.returncode != 0:
-            print(f"Failed to delete some resources: {res.stderr.decode()}")
-
-        deleted_resources = set()
-        for res_id in remaining_resources:
-            res_name = res_id.split("/")[-1]
-            res = subprocess.run(
-                [
-                    "az",
-                    "resource",
-                    "show",
-                    "--ids",
-                    res_id,
-                ],
-                check=False,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
+        _delete_resources(sorted(remaining_resources), subscription, resource_group)
 
-            if res.returncode != 0:
-                deleted_resources.add(res_id)
-                print(f"Removed resource: {res_name}")
+        deleted_resources = _find_deleted(sorted(remaining_resources))
+        for res_id in sorted(deleted_resources):
+            print(f"Removed resource: {res_id.split('/')[-1]}")
 
         # Bail if no progress this iteration: something is blocking
         # (e.g. a stuck child run-command resource on a VM). Caller should
@@ -99,3 +67,50 @@ def vm_remove(
             for res_id in sorted(remaining_resources):
                 print(f"  {res_id.split('/')[-1]} ({res_id})")
             return
+
+
+def _delete_resources(resource_ids: list[str], subscription: str, resource_group: str):
+    if use_arm_client():
+        client = get_arm_client()
+
+        def delete(res_id: str):
+            try:
+                client.delete_resource(res_id, wait=True)
+            except ArmError as e:
+                print(f"Failed to delete {res_id.split('/')[-1]}: {e}")
+
+        map_concurrently(delete, resource_ids)
+        return
+
+    res = execute(
+        [
+            "az",
+            "resource",
+            "delete",
+            "--subscription",
+            subscription,
+            "--resource-group",
+            resource_group,
+            "--ids",
+            *resource_ids,
+        ],
+    )
+    if res.returncode != 0:
+        print(f"Failed to delete some resources: {res.stderr}")
+
+
+def _find_deleted(resource_ids: list[str]) -> set[str]:
+    if use_arm_client():
+        client = get_arm_client()
+
+        def exists(res_id: str) -> bool:
+            try:
+                return client.resource_exists(res_id)
+            except ArmError:
+                # Same as a failing `az resource show`
+                return False
+
+        return {res_id for res_id, found in zip(resource_ids, map_concurrently(exists, resource_ids)) if not found}
+
+    show_results = execute_all([["az", "resource", "show", "--ids", res_id] for res_id in resource_ids])
+    return {res_id for res_id, show_res in zip(resource_ids, show_results) if show_res.returncode != 0}
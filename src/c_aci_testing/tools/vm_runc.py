@@ -9,6 +9,7 @@ import tempfile
 
 from c_aci_testing.tools.vm_generate_scripts import make_configs
 from c_aci_testing.tools.vm_create import VM_CONTAINER_NAME
+from c_aci_testing.utils.target_model import TargetModel
 from c_aci_testing.utils.vm import upload_to_vm_and_run, run_on_vm
 
 
@@ -24,6 +25,7 @@ def vm_runc(
     tag: str,
     prefix: str,
     no_resolve_manifest_hash: bool = False,
+    model: TargetModel | None = None,
     **kwargs,
 ):
     lcow_config_blob_name = f"lcow_config_{deployment_name}"
@@ -43,6 +45,7 @@ def vm_runc(
         prefix=prefix,
         output_conf_dir=temp_dir,
         no_resolve_manifest_hash=no_resolve_manifest_hash,
+        model=model,
     )
 
     print(f"Uploading LCOW config and scripts to {vm_name}...")
@@ -8,6 +8,7 @@ from __future__ import annotations
 import subprocess
 import sys
 
+from c_aci_testing.utils.cmd_executor import execute
 from c_aci_testing.utils.acr import get_acr_token, strip_acr_suffix, azurecr_io_suffix
 
 
@@ -36,17 +37,10 @@ def vn2_create_pull_secret(registry: str, **kwargs):
     pull_secret_name = get_pull_secret_name(registry)
     assert pull_secret_name
 
-    try:
-        subprocess.run(
-            ["kubectl", "delete", "secret", pull_secret_name],
-            stderr=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL,
-        )
-    except subprocess.CalledProcessError:
-        pass
+    execute(["kubectl", "delete", "secret", pull_secret_name])
 
     try:
-        subprocess.run(
+        execute(
             [
                 "kubectl",
                 "create",
@@ -57,8 +51,7 @@ def vn2_create_pull_secret(registry: str, **kwargs):
                 f"--docker-username={username}",
                 f"--docker-password={password}",
             ],
-            stdout=subprocess.DEVNULL,
-            check=True
+            check=True,
         )
     except subprocess.CalledProcessError as e:
         # don't expose the token to console
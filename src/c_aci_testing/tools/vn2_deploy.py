@@ -7,7 +7,6 @@ from __future__ import annotations
 
 from typing import Optional
 
-import subprocess
 import time
 import json
 import yaml
@@ -16,6 +15,8 @@ import os
 import re
 from io import StringIO
 
+from c_aci_testing.utils import deadline, trace
+from c_aci_testing.utils.cmd_executor import execute
 from c_aci_testing.utils.run_cmd import run_cmd
 from c_aci_testing.utils.find_bicep import find_bicep_files
 
@@ -185,7 +186,7 @@ def vn2_deploy(target_path: str, yaml_path: str, monitor_duration_secs: int, dep
         pods_data = json.loads(pods_json)
         if not pods_data.get("items"):
             print("No pods created yet.", flush=True)
-            time.sleep(5)
+            deadline.sleep(5)
             continue
 
         has_issue = False
@@ -204,15 +205,17 @@ def vn2_deploy(target_path: str, yaml_path: str, monitor_duration_secs: int, dep
                         f"\x1b[31;1mERROR: Issue detected for pod {pod['metadata']['name']}. Pod info dump follows:\x1b[0m",
                         flush=True,
                     )
-                    subprocess.run(
+                    execute(
                         ["kubectl", "describe", "pod", pod["metadata"]["name"]],
                         check=True,
+                        capture=False,
                     )
                     has_issue = True
                     nb_bad_pod += 1
                 else:
                     sys.stdout.flush()
                     nb_good_pod += 1
+        trace.instant("poll pods", cat="poll", running=nb_pods_running, replicas=replicas, issue=has_issue)
         if has_issue:
             write_deploy_output(f"Exiting due to issues detected during startup.")
             sys.exit(1)
@@ -224,7 +227,7 @@ def vn2_deploy(target_path: str, yaml_path: str, monitor_duration_secs: int, dep
             sys.exit(1)
 
         print("Waiting for all pods to be running...", flush=True)
-        time.sleep(5)
+        deadline.sleep(5)
 
     if nb_pods_running < replicas:
         write_deploy_output("Timeout reached: not all pods are Running.")
@@ -262,9 +265,7 @@ def vn2_deploy(target_path: str, yaml_path: str, monitor_duration_secs: int, dep
                     f"\x1b[31;1mERROR: Issue detected for pod {pod_name}. Pod info dump follows:\x1b[0m",
                     file=out_buf,
                 )
-                dump_res = subprocess.run(
-                    ["kubectl", "describe", "pod", pod_name], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-                )
+                dump_res = execute(["kubectl", "describe", "pod", pod_name])
                 if dump_res.stdout:
                     out_buf.write(dump_res.stdout)
                 if dump_res.stderr:
@@ -282,13 +283,14 @@ def vn2_deploy(target_path: str, yaml_path: str, monitor_duration_secs: int, dep
         while time.time() < monitor_start + monitor_duration_secs:
             out_buf = StringIO()
             res = check_pod_breakage(out_buf)
+            trace.instant("stability check", cat="poll", good=nb_good_pod, bad=nb_bad_pod)
             if first_time or res:
                 print(out_buf.getvalue(), flush=True)
                 first_time = False
             if res:
                 write_deploy_output("Pod breakage detected. Exiting with error.")
                 sys.exit(1)
-            time.sleep(10)
+            deadline.sleep(10)
 
     # Final check for any failed containers that may have been replaced
     if failed_container_ids:
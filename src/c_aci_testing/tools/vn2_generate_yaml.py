@@ -9,7 +9,7 @@ import os
 import yaml
 import re
 
-from c_aci_testing.utils.parse_bicep import parse_bicep, arm_template_for_each_container_group
+from c_aci_testing.utils.target_model import TargetModel, load_target_model
 from c_aci_testing.utils.find_bicep import find_bicep_files
 from c_aci_testing.tools.aci_param_set import aci_param_set
 
@@ -26,30 +26,36 @@ def vn2_generate_yaml(
     tag: str | None,
     replicas: int,
     ignore_vnets: bool,
+    model: TargetModel | None = None,
     **kwargs,
 ):
+    """
+    :param model: Model of the target from an earlier stage, instead of loading it,
+        which must have the managedIDName parameter set
+    """
     bicep_file_path, _ = find_bicep_files(target_path)
     bicep_file_name = re.sub(r"\.bicep$", "", os.path.basename(bicep_file_path))
 
-    aci_param_set(
-        target_path,
-        parameters={
-            "managedIDName": managed_identity,
-        },
-        add=False,
-    )
-
-    arm_template_json = parse_bicep(
-        target_path,
-        subscription,
-        resource_group,
-        deployment_name,
-        registry,
-        repository,
-        tag,
-    )
-
-    container_groups = list(arm_template_for_each_container_group(arm_template_json))
+    if model is None:
+        aci_param_set(
+            target_path,
+            parameters={
+                "managedIDName": managed_identity,
+            },
+            add=False,
+        )
+
+        model = load_target_model(
+            target_path,
+            subscription,
+            resource_group,
+            deployment_name,
+            registry,
+            repository,
+            tag,
+        )
+
+    container_groups = list(model.for_each_container_group())
     if not container_groups:
         raise ValueError("No container groups found in the ARM template")
 
@@ -8,8 +8,14 @@ import json
 import time
 import sys
 
+from c_aci_testing.utils import trace
+from c_aci_testing.utils.poller import Poller
 from c_aci_testing.utils.run_cmd import run_cmd
 
+# Load balancers mostly get their IP within a minute
+IP_POLL_INITIAL_SECS = 1
+IP_POLL_MAX_SECS = 10
+
 
 def vn2_get_ip(deployment_name: str, timeout: int = 300, **kwargs):
     """
@@ -25,6 +31,7 @@ def vn2_get_ip(deployment_name: str, timeout: int = 300, **kwargs):
     print(f"Waiting for external IP on service/{deployment_name} (timeout: {timeout}s)", file=sys.stderr, flush=True)
 
     start_time = time.time()
+    poller = Poller("service ip", initial=IP_POLL_INITIAL_SECS, max_interval=IP_POLL_MAX_SECS, service=deployment_name)
     while time.time() - start_time < timeout:
         try:
             service_json = run_cmd(["kubectl", "get", "service", deployment_name, "-o", "json"], retries=2, log_run_to=sys.stderr)
@@ -38,19 +45,20 @@ def vn2_get_ip(deployment_name: str, timeout: int = 300, **kwargs):
                 if ingress and "ip" in ingress[0]:
                     external_ip = ingress[0]["ip"]
 
+            trace.instant("poll service ip", cat="poll", service=deployment_name, ip=external_ip or "pending")
+            poller.observe("assigned" if external_ip else "pending")
             if external_ip:
                 print(external_ip, flush=True)
                 return external_ip
 
-            time.sleep(5)
-
         except Exception as e:
             if "NotFound" in str(e):
                 print(f"Service {deployment_name} not found, waiting...", file=sys.stderr, flush=True)
-                time.sleep(5)
+                poller.observe("not found")
             else:
                 print(f"Error retrieving service information: {e}", file=sys.stderr, flush=True)
-                time.sleep(5)
+
+        poller.wait(at_most=timeout - (time.time() - start_time))
 
     print(f"service/{deployment_name} did not get an external IP within {timeout} seconds.", file=sys.stderr, flush=True)
     sys.exit(1)
@@ -7,12 +7,12 @@ from __future__ import annotations
 
 from pathlib import Path
 import re
-import subprocess
 import sys
 import os
 import yaml
 import base64
 
+from c_aci_testing.utils.cmd_executor import execute
 from c_aci_testing.utils.find_bicep import find_bicep_files
 
 ALLOW_ALL_POLICY_REGO_PATH = os.path.join(
@@ -41,7 +41,7 @@ def vn2_policygen(
 
     if policy_type != "allow_all":
         print("Calling acipolicygen and saving policy to file")
-        subprocess.run(["az", "extension", "add", "--name", "confcom", "--yes"], check=True)
+        execute(["az", "extension", "add", "--name", "confcom", "--yes"], check=True, capture=False)
         args = [
             "az",
             "confcom",
@@ -55,12 +55,8 @@ def vn2_policygen(
         ]
         print("Running: " + " ".join(args), flush=True)
         sys.stderr.flush()
-        res = subprocess.run(
-            args,
-            check=True,
-            stdout=subprocess.PIPE,
-        )
-        policy = res.stdout.decode()
+        res = execute(args, check=True, echo_stderr=True)
+        policy = res.stdout
     else:
         with open(ALLOW_ALL_POLICY_REGO_PATH, encoding="utf-8") as policy_file:
             policy = policy_file.read()
@@ -9,6 +9,8 @@ import time
 import json
 import sys
 
+from c_aci_testing.utils import deadline, trace
+from c_aci_testing.utils.cmd_executor import execute
 from c_aci_testing.utils.run_cmd import run_cmd
 
 def vn2_remove(deployment_name: str, **kwargs):
@@ -32,12 +34,7 @@ def vn2_remove(deployment_name: str, **kwargs):
     # Delete the deployment using kubectl
     try:
         print(f"Deleting deployment {deployment_name}")
-        result = subprocess.run(
-            ["kubectl", "delete", f"deployments/{deployment_name}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        result = execute(["kubectl", "delete", f"deployments/{deployment_name}"])
 
         if result.returncode != 0:
             if "NotFound" in result.stderr:
@@ -79,7 +76,7 @@ def vn2_remove(deployment_name: str, **kwargs):
                     has_pods = True
                     if verbose:
                         print("Pod not deleted - info dump follows:\n")
-                        subprocess.run(["kubectl", "describe", "pod", pod_name])
+                        execute(["kubectl", "describe", "pod", pod_name], capture=False)
                 else:
                     print("Pod exists but status is not running - ignoring.")
             return has_pods
@@ -92,10 +89,11 @@ def vn2_remove(deployment_name: str, **kwargs):
     print("Waiting for all pods to be deleted...")
     while time.time() - start < 300:  # 5 minutes timeout
         has_pods = check_has_pods()
+        trace.instant("poll pods deleted", cat="poll", pods_left=has_pods)
         if not has_pods:
             print("No pods left, deletion successful.")
             return
-        time.sleep(20)
+        deadline.sleep(20)
 
     # If we get here, the pods weren't deleted within the timeout period
     check_has_pods(verbose=True)
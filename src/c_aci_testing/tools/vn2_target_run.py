@@ -7,6 +7,13 @@ from __future__ import annotations
 
 from contextlib import contextmanager
 
+from c_aci_testing.utils import run_history, trace
+from c_aci_testing.utils.deadline import DeadlineExceeded, RunBudget
+from c_aci_testing.utils.param_overlay import run_overlay
+from c_aci_testing.utils.target_model import load_target_model
+
+from .aci_param_set import aci_param_set
+
 from .vn2_generate_yaml import vn2_generate_yaml
 from .vn2_deploy import vn2_deploy
 from .vn2_logs import vn2_logs
@@ -34,73 +41,141 @@ def vn2_target_run_ctx(
     replicas: int = 1,
     monitor_duration_secs: int = 60,
     ignore_vnets: bool = False,
+    deadline_secs: int = 0,
+    trace_file: str = "",
+    skip_images: bool = False,
+    param_overlay: bool = False,
+    budget: RunBudget | None = None,
     **kwargs,
 ):
-    unpulled_services = []
-    if prefer_pull:
-        unpulled_services = images_pull(
-            target_path=target_path,
-            registry=registry,
-            repository=repository,
-            tag=tag,
-        )
-    if not prefer_pull or unpulled_services:
-        images_build(
-            target_path=target_path,
-            registry=registry,
-            repository=repository,
-            tag=tag,
-            services=unpulled_services,
-        )
-        images_push(
-            target_path=target_path,
-            registry=registry,
-            repository=repository,
-            tag=tag,
-        )
-    vn2_generate_yaml(
+    """
+    :param skip_images: Use the images already in the registry, e.g. from a previous run
+    :param param_overlay: Keep parameters in memory instead of the target's bicepparam file
+    :param budget: Budget to time the run's stages with, instead of one of deadline_secs
+    """
+    budget = budget or RunBudget(deadline_secs)
+    history = run_history.recording(
+        "vn2 target run",
+        budget,
         target_path=target_path,
-        yaml_path="",
-        subscription=subscription,
-        resource_group=resource_group,
         deployment_name=deployment_name,
-        managed_identity=managed_identity,
         registry=registry,
         repository=repository,
         tag=tag,
-        replicas=replicas,
-        ignore_vnets=ignore_vnets,
-    )
-    vn2_policygen(
-        target_path=target_path,
-        yaml_path="",
-        policy_type=policy_type,
-    )
-    vn2_deploy(
-        target_path=target_path,
-        yaml_path="",
-        monitor_duration_secs=monitor_duration_secs,
-        deploy_output_file=""
     )
+    with history, budget.activate(), trace.tracing(trace_file), run_overlay(param_overlay):
+        try:
+            unpulled_services = []
+            if prefer_pull and not skip_images:
+                with budget.stage("images_pull"):
+                    unpulled_services = images_pull(
+                        target_path=target_path,
+                        registry=registry,
+                        repository=repository,
+                        tag=tag,
+                    )
+            if not skip_images and (not prefer_pull or unpulled_services):
+                with budget.stage("images_build"):
+                    images_build(
+                        target_path=target_path,
+                        registry=registry,
+                        repository=repository,
+                        tag=tag,
+                        services=unpulled_services,
+                    )
+                with budget.stage("images_push"):
+                    images_push(
+                        target_path=target_path,
+                        registry=registry,
+                        repository=repository,
+                        tag=tag,
+                    )
+            with budget.stage("target_model"):
+                aci_param_set(
+                    target_path,
+                    parameters={
+                        "managedIDName": managed_identity,
+                    },
+                    add=False,
+                )
+                model = load_target_model(
+                    target_path=target_path,
+                    subscription=subscription,
+                    resource_group=resource_group,
+                    deployment_name=deployment_name,
+                    registry=registry,
+                    repository=repository,
+                    tag=tag,
+                )
+            with budget.stage("vn2_generate_yaml"):
+                vn2_generate_yaml(
+                    target_path=target_path,
+                    yaml_path="",
+                    subscription=subscription,
+                    resource_group=resource_group,
+                    deployment_name=deployment_name,
+                    managed_identity=managed_identity,
+                    registry=registry,
+                    repository=repository,
+                    tag=tag,
+                    replicas=replicas,
+                    ignore_vnets=ignore_vnets,
+                    model=model,
+                )
+            with budget.stage("vn2_policygen"):
+                vn2_policygen(
+                    target_path=target_path,
+                    yaml_path="",
+                    policy_type=policy_type,
+                )
+            with budget.stage("vn2_deploy"):
+                vn2_deploy(
+                    target_path=target_path,
+                    yaml_path="",
+                    monitor_duration_secs=monitor_duration_secs,
+                    deploy_output_file=""
+                )
+        except DeadlineExceeded:
+            if cleanup:
+                with budget.cleanup_stage("vn2_remove"):
+                    vn2_remove(
+                        deployment_name=deployment_name,
+                    )
+            print(budget.report())
+            raise
 
-    error = None
-    try:
+        error = None
         try:
-            yield
-        except Exception as e:
-            cleanup = False
-            error = e
-        vn2_logs(
-            deployment_name=deployment_name,
-            follow=follow,
-        )
-    finally:
-        if cleanup:
-            vn2_remove(
-                deployment_name=deployment_name,
-            )
-        if error:
-            raise error
+            try:
+                with budget.stage("test"):
+                    yield
+            except DeadlineExceeded as e:
+                error = e
+            except Exception as e:
+                cleanup = False
+                error = e
+            if isinstance(error, DeadlineExceeded):
+                with budget.cleanup_stage("vn2_logs"):
+                    vn2_logs(
+                        deployment_name=deployment_name,
+                        follow=False,
+                    )
+            else:
+                with budget.stage("vn2_logs"):
+                    vn2_logs(
+                        deployment_name=deployment_name,
+                        follow=follow,
+                    )
+        finally:
+            if cleanup:
+                with budget.cleanup_stage("vn2_remove"):
+                    vn2_remove(
+                        deployment_name=deployment_name,
+                    )
+            if budget.deadline is not None or budget.exceeded_in:
+                print(budget.report())
+            if error:
+                raise error
 
 
 def vn2_target_run(**kwargs):
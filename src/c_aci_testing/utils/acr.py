@@ -5,7 +5,9 @@
 
 import subprocess
 import json
-import time
+
+from c_aci_testing.utils.cmd_executor import execute
+from c_aci_testing.utils.retry import RetryPolicy
 
 azurecr_io_suffix = ".azurecr.io"
 
@@ -29,34 +31,27 @@ def get_acr_token(registry: str) -> str:
     if not registry_name:
         raise ValueError("Registry is not ACR")
 
-    tries = 0
-    while tries < 5:
-        try:
-            res = subprocess.run(
-                ["az", "acr", "login", "-n", registry_name, "--expose-token"],
-                stdout=subprocess.PIPE,
-                check=True,
-            )
-            return json.loads(res.stdout)["accessToken"]
-        except subprocess.CalledProcessError:
-            tries += 1
-            time.sleep(1)
-    raise Exception("Failed to get ACR token in 5 tries")
+    try:
+        res = execute(
+            ["az", "acr", "login", "-n", registry_name, "--expose-token"],
+            check=True,
+            echo_stderr=True,
+            retry=RetryPolicy(max_attempts=5, base_delay=1, retry_unknown=True),
+        )
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"Failed to get ACR token: {e.stderr}") from e
+    return json.loads(res.stdout)["accessToken"]
 
 
 def login_with_retry(registry: str):
-    attempts = 0
-    max_attempts = 3
-    while attempts < max_attempts:
-        try:
-            subprocess.run(["az", "acr", "login", "--name", registry], check=True)
-            return
-        except subprocess.CalledProcessError:
-            attempts += 1
-            if attempts == max_attempts:
-                print(f"Failed to login to {registry} after {max_attempts} attempts.")
-                raise
-            else:
-                sleep_s = 2 ** (attempts + 1)
-                print(f"Retrying login to {registry} in {sleep_s}s...")
-                time.sleep(sleep_s)
+    try:
+        res = execute(
+            ["az", "acr", "login", "--name", registry],
+            check=True,
+            echo_stderr=True,
+            retry=RetryPolicy(max_attempts=3, base_delay=4, retry_unknown=True),
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Failed to login to {registry}: {e.stderr}")
+        raise
+    print(res.stdout, end="", flush=True)
@@ -0,0 +1,482 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Small client for the Azure Resource Manager REST API.
+
+Every `az deployment group show` or `az container show` starts a new CLI
+process, loads azure-cli, acquires a token and opens a new TLS connection,
+which makes polling and per-resource fan-out slow.  With CACI_ARM_BACKEND=rest
+the tools which only need a handful of ARM operations talk to ARM directly
+instead, reusing keep-alive connections and a single cached access token
+(obtained from `az account get-access-token` and refreshed on expiry).
+
+CACI_ARM_ENDPOINT overrides the ARM endpoint, e.g. to point at a local
+stand-in server in tests.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import http.client
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from c_aci_testing.utils import arm_governor, cassette, deadline, query_cache, retry, trace
+from c_aci_testing.utils.cmd_executor import execute, get_max_concurrency
+from c_aci_testing.utils.retry import RetryPolicy
+
+ARM_BACKEND_ENV = "CACI_ARM_BACKEND"
+ARM_ENDPOINT_ENV = "CACI_ARM_ENDPOINT"
+DEFAULT_ENDPOINT = "https://management.azure.com"
+
+DEPLOYMENTS_API_VERSION = "2021-04-01"
+CONTAINER_GROUPS_API_VERSION = "2023-05-01"
+PROVIDERS_API_VERSION = "2021-04-01"
+METRICS_API_VERSION = "2018-01-01"
+
+CONTAINER_GROUP_TYPE = "Microsoft.ContainerInstance/containerGroups"
+
+# Refresh tokens a little before they expire so requests in flight don't fail
+TOKEN_REFRESH_MARGIN_SECS = 300
+
+_TIMESTAMP = re.compile(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)?")
+
+TokenProvider = Callable[[str], Tuple[str, float]]
+
+
+class ArmError(Exception):
+    """
+    Error response from ARM, carrying the HTTP status and ARM error code.
+    """
+
+    def __init__(self, status: int, code: str, message: str, body: Any = None):
+        super().__init__(f"{status} {code}: {message}" if code else f"{status}: {message}")
+        self.status = status
+        self.code = code
+        self.message = message
+        self.body = body
+
+
+def use_arm_client() -> bool:
+    return os.getenv(ARM_BACKEND_ENV, "az").lower() == "rest"
+
+
+def az_access_token(resource: str) -> Tuple[str, float]:
+    """
+    Get an ARM access token for the logged in az account.
+
+    :return: (token, expiry as a unix timestamp)
+    """
+    res = execute(
+        ["az", "account", "get-access-token", "--resource", resource, "-o", "json"],
+        check=True,
+        echo_stderr=True,
+    )
+    token = json.loads(res.stdout)
+    if "expires_on" in token:
+        expires_at = float(token["expires_on"])
+    else:
+        # Older CLI versions only report expiry in local time
+        expires_at = datetime.strptime(token["expiresOn"], "%Y-%m-%d %H:%M:%S.%f").timestamp()
+    return token["accessToken"], expires_at
+
+
+def parse_timestamp(value: str | None) -> Optional[datetime]:
+    """
+    Parse ARM and container log timestamps, which may have up to nanosecond precision.
+    """
+    match = _TIMESTAMP.match(value or "")
+    if not match:
+        return None
+    base, fraction, zone = match.groups()
+    parsed = datetime.strptime(base, "%Y-%m-%dT%H:%M:%S")
+    if fraction:
+        parsed += timedelta(microseconds=int(fraction[:6].ljust(6, "0")))
+    if zone and zone != "Z":
+        sign = 1 if zone[0] == "+" else -1
+        parsed -= sign * timedelta(hours=int(zone[1:3]), minutes=int(zone[4:6]))
+    return parsed.replace(tzinfo=timezone.utc)
+
+
+def resource_properties(resource: dict) -> dict:
+    """
+    Properties of a resource as returned by either backend: az flattens
+    "properties" into the resource, ARM doesn't.
+    """
+    return resource.get("properties", resource)
+
+
+def parse_resource_id(resource_id: str) -> Dict[str, str]:
+    """
+    Split a resource ID into subscription, resource_group, namespace, type and
+    name.  Child resources get a nested type, e.g. virtualMachines/extensions.
+    """
+    parts = resource_id.strip("/").split("/")
+    lowered = [part.lower() for part in parts]
+    result = {
+        "subscription": parts[lowered.index("subscriptions") + 1],
+        "resource_group": parts[lowered.index("resourcegroups") + 1],
+    }
+    if "providers" in lowered:
+        provider_idx = lowered.index("providers")
+        rest = parts[provider_idx + 2 :]
+        result["namespace"] = parts[provider_idx + 1]
+        result["type"] = "/".join(rest[0::2])
+        result["name"] = rest[-1]
+    return result
+
+
+class ArmClient:
+    """
+    ARM client sharing a pool of keep-alive connections and one access token
+    between all calls, safe to use from multiple threads.
+    """
+
+    def __init__(
+        self,
+        endpoint: str | None = None,
+        token_provider: TokenProvider | None = None,
+        timeout: float = 60,
+        retry_policy: RetryPolicy | None = None,
+    ):
+        self.endpoint = (endpoint or os.getenv(ARM_ENDPOINT_ENV) or DEFAULT_ENDPOINT).rstrip("/")
+        url = urllib.parse.urlsplit(self.endpoint)
+        self._scheme = url.scheme
+        self._netloc = url.netloc
+        self._token_provider = token_provider or az_access_token
+        self._timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+
+        self._pool: List[http.client.HTTPConnection] = []
+        self._pool_lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+        self._api_versions: Dict[str, str] = {}
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        with self._pool_lock:
+            if self._pool:
+                return self._pool.pop()
+        if self._scheme == "http":
+            return http.client.HTTPConnection(self._netloc, timeout=self._timeout)
+        return http.client.HTTPSConnection(self._netloc, timeout=self._timeout)
+
+    def _release(self, conn: http.client.HTTPConnection):
+        with self._pool_lock:
+            self._pool.append(conn)
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, []
+        for conn in pool:
+            conn.close()
+
+    def get_token(self, force_refresh: bool = False) -> str:
+        with self._token_lock:
+            expiring = time.time() >= self._token_expires_at - TOKEN_REFRESH_MARGIN_SECS
+            if force_refresh or self._token is None or expiring:
+                self._token, self._token_expires_at = self._token_provider(self.endpoint + "/")
+            return self._token
+
+    def _send(self, method: str, url: str, body: bytes | None, token: str) -> Tuple[int, Dict[str, str], bytes]:
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/json",
+        }
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+
+        tape = cassette.current()
+        if tape is not None and tape.replaying:
+            status, response_headers, data, latency = tape.replay_http(method, url)
+            deadline.sleep(latency)
+            return status, response_headers, data
+
+        subscription = arm_governor.subscription_of([url])
+        arm_governor.acquire(arm_governor.READ if method == "GET" else arm_governor.WRITE, subscription)
+        with trace.span(f"ARM {method}", cat="arm", url=url) as span:
+            start = time.monotonic()
+            status, response_headers, data = self._roundtrip(method, url, body, headers)
+            span["status"] = status
+        if tape is not None:
+            tape.record_http(method, url, status, response_headers, data, time.monotonic() - start)
+        return status, response_headers, data
+
+    def _roundtrip(
+        self, method: str, url: str, body: bytes | None, headers: Dict[str, str]
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        # A pooled connection may have been closed by the server since its
+        # last use, in which case retry once on a fresh connection.
+        attempts_left = 2
+        while True:
+            attempts_left -= 1
+            conn = self._acquire()
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionError):
+                conn.close()
+                if not attempts_left:
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, data
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        api_version: str | None = None,
+        body: Any = None,
+    ) -> Tuple[int, Dict[str, str], Any]:
+        """
+        Make a request to ARM, path may be relative to the endpoint or an
+        absolute URL (e.g. from a Location header).
+
+        :return: (status, headers with lower case names, decoded JSON body or None)
+        """
+        if path.startswith("http"):
+            url = urllib.parse.urlsplit(path)
+            path = url.path + (f"?{url.query}" if url.query else "")
+        if api_version:
+            path += ("&" if "?" in path else "?") + f"api-version={api_version}"
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                status, headers, raw = self._send(method, path, data, self.get_token())
+                if status == 401:
+                    status, headers, raw = self._send(method, path, data, self.get_token(force_refresh=True))
+            except (OSError, http.client.HTTPException) as e:
+                # Network errors, including timeouts
+                if not self.retry_policy.should_retry(attempt, retry.TRANSIENT):
+                    raise
+                delay = self.retry_policy.backoff(attempt)
+                reason = str(e) or type(e).__name__
+            else:
+                if not self.retry_policy.should_retry(attempt, retry.classify_status(status)):
+                    break
+                retry_after = retry.parse_retry_after_header(headers.get("retry-after"))
+                delay = self.retry_policy.backoff(attempt, retry_after)
+                reason = f"HTTP {status}"
+            print(
+                f"ARM {method} failed ({reason}, attempt {attempt}/{self.retry_policy.max_attempts}), "
+                f"retrying in {delay:.1f}s",
+                file=sys.stderr,
+                flush=True,
+            )
+            deadline.sleep(delay)
+
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            # e.g. the HTML error page of a gateway
+            payload = None
+        if status >= 400:
+            error = payload.get("error", {}) if isinstance(payload, dict) else {}
+            message = error.get("message") or raw.decode("utf-8", errors="replace")
+            raise ArmError(status, error.get("code", ""), message, payload)
+        return status, headers, payload
+
+    def wait_for_operation(self, headers: Dict[str, str], poll_interval: float = 5):
+        """
+        Wait for an asynchronous operation (202 Accepted) to complete by
+        polling its Location header.
+        """
+        location = headers.get("location")
+        while location:
+            retry_after = retry.parse_retry_after_header(headers.get("retry-after"))
+            deadline.sleep(poll_interval if retry_after is None else retry_after)
+            status, headers, _ = self.request("GET", location)
+            if status != 202:
+                return
+
+    # Deployments
+
+    def _deployment_path(self, subscription: str, resource_group: str, name: str) -> str:
+        return (
+            f"/subscriptions/{subscription}/resourceGroups/{resource_group}"
+            f"/providers/Microsoft.Resources/deployments/{name}"
+        )
+
+    def create_deployment(
+        self,
+        subscription: str,
+        resource_group: str,
+        name: str,
+        template: dict,
+        parameters: dict,
+        mode: str = "Incremental",
+    ) -> dict:
+        """
+        Start a deployment without waiting for it, like `az deployment group create --no-wait`.
+        """
+        query_cache.invalidate(resource_group)
+        _, _, deployment = self.request(
+            "PUT",
+            self._deployment_path(subscription, resource_group, name),
+            DEPLOYMENTS_API_VERSION,
+            {"properties": {"mode": mode, "template": template, "parameters": parameters}},
+        )
+        return deployment
+
+    def show_deployment(self, subscription: str, resource_group: str, name: str) -> dict:
+        _, _, deployment = self.request(
+            "GET",
+            self._deployment_path(subscription, resource_group, name),
+            DEPLOYMENTS_API_VERSION,
+        )
+        return deployment
+
+    # Container groups
+
+    def get_container_group(self, resource_id: str) -> dict:
+        _, _, group = self.request("GET", resource_id, CONTAINER_GROUPS_API_VERSION)
+        return group
+
+    def list_container_groups(self, subscription: str, resource_group: str) -> List[dict]:
+        groups: List[dict] = []
+        path: Optional[str] = (
+            f"/subscriptions/{subscription}/resourceGroups/{resource_group}/providers/{CONTAINER_GROUP_TYPE}"
+        )
+        api_version: Optional[str] = CONTAINER_GROUPS_API_VERSION
+        while path:
+            _, _, page = self.request("GET", path, api_version)
+            groups.extend(page.get("value", []))
+            # nextLink already carries the api-version
+            path, api_version = page.get("nextLink"), None
+        return groups
+
+    def get_container_logs(self, resource_id: str, container_name: str, timestamps: bool = False) -> str:
+        path = f"{resource_id}/containers/{container_name}/logs" + ("?timestamps=true" if timestamps else "")
+        _, _, logs = self.request("GET", path, CONTAINER_GROUPS_API_VERSION)
+        return (logs or {}).get("content") or ""
+
+    def delete_container_group(self, resource_id: str, wait: bool = False):
+        self.delete_resource(resource_id, CONTAINER_GROUPS_API_VERSION, wait=wait)
+
+    # Azure Monitor
+
+    def get_metrics(
+        self,
+        resource_id: str,
+        metric_names: Sequence[str],
+        timespan: str,
+        interval: str = "PT1M",
+        aggregation: str = "Average,Maximum",
+        filter: str | None = None,  # pylint: disable=redefined-builtin
+    ) -> dict:
+        """
+        Metric values of a resource, like `az monitor metrics list`.
+        """
+        query = {
+            "metricnames": ",".join(metric_names),
+            "timespan": timespan,
+            "interval": interval,
+            "aggregation": aggregation,
+            **({"$filter": filter} if filter else {}),
+        }
+        path = f"{resource_id}/providers/Microsoft.Insights/metrics?{urllib.parse.urlencode(query)}"
+        _, _, metrics = self.request("GET", path, METRICS_API_VERSION)
+        return metrics or {}
+
+    # Generic resources
+
+    def api_version_for(self, resource_id: str) -> str:
+        """
+        Latest stable API version for the resource's type, looked up from its
+        resource provider like `az resource` does, and cached.
+        """
+        parsed = parse_resource_id(resource_id)
+        key = f"{parsed['namespace']}/{parsed['type']}".lower()
+        if key not in self._api_versions:
+            _, _, provider = self.request(
+                "GET",
+                f"/subscriptions/{parsed['subscription']}/providers/{parsed['namespace']}",
+                PROVIDERS_API_VERSION,
+            )
+            for resource_type in provider.get("resourceTypes", []):
+                versions = resource_type.get("apiVersions", [])
+                stable = [v for v in versions if "preview" not in v.lower()]
+                if versions:
+                    type_key = f"{parsed['namespace']}/{resource_type['resourceType']}".lower()
+                    self._api_versions[type_key] = max(stable or versions)
+        if key not in self._api_versions:
+            raise ArmError(404, "NoRegisteredProviderFound", f"No API version found for {key}")
+        return self._api_versions[key]
+
+    def get_resource(self, resource_id: str, api_version: str | None = None) -> dict:
+        _, _, resource = self.request("GET", resource_id, api_version or self.api_version_for(resource_id))
+        return resource
+
+    def resource_exists(self, resource_id: str, api_version: str | None = None) -> bool:
+        try:
+            self.get_resource(resource_id, api_version)
+            return True
+        except ArmError as e:
+            if e.status == 404:
+                return False
+            raise
+
+    def delete_resource(self, resource_id: str, api_version: str | None = None, wait: bool = False):
+        """
+        Delete a resource, succeeding if it doesn't exist.  With wait=True,
+        block until the deletion has completed.
+        """
+        parsed = parse_resource_id(resource_id)
+        query_cache.invalidate(parsed["resource_group"], [parsed.get("name", "")])
+        status, headers, _ = self.request("DELETE", resource_id, api_version or self.api_version_for(resource_id))
+        if wait and status == 202:
+            self.wait_for_operation(headers)
+
+
+_client: Optional[ArmClient] = None
+_client_lock = threading.Lock()
+
+
+def get_arm_client() -> ArmClient:
+    """
+    Process wide client, so that connections and the token are shared
+    between tools called from the same run.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ArmClient()
+        return _client
+
+
+def map_concurrently(fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+    """
+    Apply fn to every item on a thread pool bounded by CACI_MAX_CONCURRENCY,
+    returning results in order.  Each call runs in a copy of the caller's
+    context, so e.g. the active query cache is still visible.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=min(len(items), get_max_concurrency())) as pool:
+        return list(pool.map(lambda ctx, item: ctx.run(fn, item), contexts, items))
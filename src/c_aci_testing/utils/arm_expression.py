@@ -3,14 +3,23 @@
 #   Licensed under the MIT License. See LICENSE in project root for information.
 #   ---------------------------------------------------------------------------------
 
-from typing import Any, List, Callable
+from __future__ import annotations
+
+import functools
 import json
+import re
+from typing import Any, Callable, List, NamedTuple, Tuple, Union
 
 """
-This is a bit complicated and also not fully correct (it does not handle escape
-sequences in strings, does not handle member functions like
-storageAccount.listKeys()), etc.  But for us it's good enough, and crucially,
-easy to add more functions to should the need arise in the future.
+Evaluation of ARM template expressions, i.e. the part between [ and ] of a
+template string.  Expressions are tokenized and parsed to an AST, which is
+compiled to a Python closure taking the function handler.  Compiled
+expressions are memoized by their source, as templates repeat the same
+expressions across resources.
+
+Functions are evaluated by the caller's handler, with all arguments already
+evaluated, which keeps adding more functions easy.  Member calls like
+storageAccount.listKeys() call the handler with the object as first argument.
 
 I have attempted to find a Python implementation of the ARM expression parser,
 but did not find anything satisfactory.  There is an official C# implementation
@@ -19,102 +28,188 @@ tho.
 
 debug = False
 
-def evaluate_expr(expr: str, _handle_func: Callable[[str, List[Any]], Any]) -> Any:
+FuncHandler = Callable[[str, List[Any]], Any]
+Compiled = Callable[[FuncHandler], Any]
+
+
+class Literal(NamedTuple):
+    value: Any
+
+
+class Call(NamedTuple):
+    name: str
+    args: Tuple["Node", ...]
+
+
+class Property(NamedTuple):
+    target: "Node"
+    name: str
+
+
+class Index(NamedTuple):
+    target: "Node"
+    index: "Node"
+
+
+Node = Union[Literal, Call, Property, Index]
+
+_TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<dstring>"[^"]*")
+      | (?P<number>-?\d+)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<punct>[().,\[\]])
+    )""",
+    re.VERBOSE,
+)
+
+_KEYWORDS = {"true": True, "false": False, "null": None}
+
+
+def tokenize(expr: str) -> List[Tuple[str, Any]]:
     """
-    For simplicity, we assume expressions are of the form:
-        functionName '(' arg ',' arg ',' ... ')' [ '.' property '.' property ... ] |
-        \' string \' |
-        number |
-        true | false | null
-    i.e. no things like func(a, b).member_func(c, d) or a.func()
-    We also assume strings never contains ' in them
+    (kind, value) pairs of expr, kind being one of string, number, name or the punctuation itself.
     """
+    tokens: List[Tuple[str, Any]] = []
+    pos, end = 0, len(expr.rstrip())
+    while pos < end:
+        match = _TOKEN_PATTERN.match(expr, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Unexpected character at {pos}: {expr[pos:pos + 10]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "string":
+            tokens.append(("string", text[1:-1].replace("''", "'")))
+        elif kind == "dstring":
+            tokens.append(("string", text[1:-1]))
+        elif kind == "number":
+            tokens.append(("number", int(text)))
+        elif kind == "name":
+            tokens.append(("name", text))
+        else:
+            tokens.append((text, text))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    expression := primary ( '.' name [ '(' arguments ')' ] | '[' expression ']' )*
+    primary    := string | number | true | false | null | name '(' arguments ')'
+    """
+
+    def __init__(self, expr: str):
+        self.tokens = tokenize(expr)
+        self.pos = 0
 
-    orig_expr = expr
+    def parse(self) -> Node:
+        node = self.expression()
+        if self.pos < len(self.tokens):
+            raise ValueError(f"Unexpected trailing {self.tokens[self.pos][1]!r}")
+        return node
 
-    expr = expr.strip()
+    def peek(self) -> str:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else ""
 
+    def take(self, kind: str) -> Any:
+        if self.peek() != kind:
+            found = repr(self.tokens[self.pos][1]) if self.pos < len(self.tokens) else "end of expression"
+            raise ValueError(f"Expected {kind} but found {found}")
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def arguments(self) -> Tuple[Node, ...]:
+        self.take("(")
+        args = []
+        if self.peek() != ")":
+            args.append(self.expression())
+            while self.peek() == ",":
+                self.take(",")
+                args.append(self.expression())
+        self.take(")")
+        return tuple(args)
+
+    def primary(self) -> Node:
+        kind = self.peek()
+        if kind in ("string", "number"):
+            return Literal(self.take(kind))
+        name = self.take("name")
+        if name in _KEYWORDS and self.peek() != "(":
+            return Literal(_KEYWORDS[name])
+        return Call(name, self.arguments())
+
+    def expression(self) -> Node:
+        node = self.primary()
+        while self.peek() in (".", "["):
+            if self.take(self.peek()) == ".":
+                name = self.take("name")
+                if self.peek() == "(":
+                    node = Call(name, (node, *self.arguments()))
+                else:
+                    node = Property(node, name)
+            else:
+                node = Index(node, self.expression())
+                self.take("]")
+        return node
+
+
+def parse_expr(expr: str) -> Node:
+    return _Parser(expr).parse()
+
+
+def _access(target: Any, key: Any) -> Any:
+    if isinstance(target, dict):
+        return target.get(key)
+    if isinstance(target, list) and isinstance(key, int):
+        return target[key]
+    raise ValueError(f"Cannot access {key!r} of {type(target).__name__}")
+
+
+def _compile(node: Node) -> Compiled:
+    if isinstance(node, Literal):
+        value = node.value
+        return lambda handle_func: value
+    if isinstance(node, Call):
+        name = node.name
+        args = [_compile(arg) for arg in node.args]
+        return lambda handle_func: handle_func(name, [arg(handle_func) for arg in args])
+    if isinstance(node, Property):
+        target, prop = _compile(node.target), node.name
+        return lambda handle_func: _access(target(handle_func), prop)
+    target, index = _compile(node.target), _compile(node.index)
+    return lambda handle_func: _access(target(handle_func), index(handle_func))
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_expr(expr: str) -> Compiled:
+    """
+    Compile an expression (without the enclosing brackets) to a function of the function handler.
+    """
+    return _compile(parse_expr(expr))
+
+
+def evaluate_expr(expr: str, _handle_func: FuncHandler) -> Any:
+    """
+    Evaluate an expression (without the enclosing brackets), calling
+    _handle_func(name, evaluated_args) for each function call.
+    """
     try:
-        if expr.startswith("'") and expr.endswith("'"):
-            return expr[1:-1]
-        if expr.startswith('"') and expr.endswith('"'):
-            return expr[1:-1]
-        if expr == "true":
-            return True
-        if expr == "false":
-            return False
-        if expr == "null":
-            return None
-        if expr.isdigit():
-            return int(expr)
-
-        def _find_next_unenclosed(
-            s: str, start: int, char: str, open_chars: str, close_chars: str, pair_chars: str
-        ) -> int:
-            """
-            Find the next occurrence of char in s, starting from start, that is
-            not enclosed in any pair of (open_chars, close_chars), ignoring occurrence within pair_chars.
-
-            Example:
-                _find_next_unenclosed("a(b(c,'d))',e),f), g", 1, "), "(", ")", "'") == 16
-            """
-            depth = 0
-            pair_opened = False
-            for i in range(start, len(s)):
-                if s[i] == char and depth == 0 and not pair_opened:
-                    return i
-                elif s[i] in pair_chars:
-                    pair_opened = not pair_opened
-                elif s[i] in open_chars and not pair_opened:
-                    depth += 1
-                elif s[i] in close_chars and not pair_opened:
-                    depth -= 1
-            return -1
-
-        assert _find_next_unenclosed("a(b(c,'d))',e),f), g", 2, ")", "(", ")", "'") == 16
-
-        result = None
-        if "(" in expr:
-            # do function call
-            param_start = expr.find("(")
-            param_end = _find_next_unenclosed(expr, param_start + 1, ")", "(", ")", "'")
-            if param_end == -1:
-                raise ValueError(f"Failed to find matching ')' for function call")
-            function_name = expr[:param_start]
-            if not function_name.isalnum():
-                raise ValueError(f"Invalid function name: {function_name}")
-            param_list_str = expr[param_start + 1 : param_end]
-            param_list = []
-            i = 0
-            while i < len(param_list_str):
-                next_comma = _find_next_unenclosed(param_list_str, i, ",", "(", ")", "'")
-                if next_comma == -1:
-                    param_list.append(param_list_str[i:].strip())
-                    break
-                param_list.append(param_list_str[i:next_comma].strip())
-                i = next_comma + 1
-            result = _handle_func(function_name, [evaluate_expr(p, _handle_func) for p in param_list])
-            expr = expr[param_end + 1 :].strip()
-        else:
-            raise ValueError(f"Expected to find a function call at expression root")
-
-        # Handle property access
-        while expr.startswith("."):
-            prop_end = expr.find(".", 1)
-            if prop_end == -1:
-                prop_end = len(expr)
-            prop_name = expr[1:prop_end]
-            if not prop_name:
-                raise ValueError(f"Failed to parse property access")
-            assert isinstance(result, dict)
-            result = result.get(prop_name)
-            expr = expr[prop_end + 1 :].strip()
-
-        if expr:
-            raise ValueError(f"Unexpected trailing string: {expr}")
-
-        if debug:
-            print(f"Evaluated expression '{orig_expr}' to {json.dumps(result)}", flush=True)
-        return result
+        result = compile_expr(expr)(_handle_func)
     except Exception as e:
-        raise ValueError(f"Failed to parse expression '{orig_expr}': {e}") from e
+        raise ValueError(f"Failed to parse expression '{expr}': {e}") from e
+    if debug:
+        print(f"Evaluated expression '{expr}' to {json.dumps(result)}", flush=True)
+    return result
+
+
+def evaluate_template_string(value: str, _handle_func: FuncHandler) -> Any:
+    """
+    Evaluate a template string value, which is an expression if enclosed in
+    [ and ], unless it starts with [[ which escapes a literal [.
+    """
+    if value.startswith("[["):
+        return value[1:]
+    if value.startswith("[") and value.endswith("]"):
+        return evaluate_expr(value[1:-1], _handle_func)
+    return value
@@ -0,0 +1,221 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Token bucket rate limiting of Azure Resource Manager calls.
+
+ARM throttles each subscription (per region of the ARM front door) at roughly
+12000 reads and 1200 writes per hour.  Many target runs sharing one host can
+blow through that with status polling alone, after which deployments fail
+with 429s.  Every ARM-bound az command and ARM client request reserves a
+token from a bucket per (subscription, read/write) first.  Bucket state lives
+in a small file in the cache directory, locked while updating, so threads
+and processes on the same host share the budget.
+
+Reservations may drive the bucket negative: the caller then waits until its
+token has been refilled, which keeps waiters in arrival order with a single
+locked update each.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+from c_aci_testing.utils import deadline, trace
+from c_aci_testing.utils.cache_dir import get_cache_dir
+from c_aci_testing.utils.query_cache import MUTATING_VERBS
+
+try:
+    import fcntl
+except ImportError:  # Windows: only serialise threads of this process
+    fcntl = None  # type: ignore[assignment]
+
+READ = "read"
+WRITE = "write"
+
+DEFAULT_READS_PER_HOUR = 10000
+DEFAULT_WRITES_PER_HOUR = 1000
+DEFAULT_BURST = 50
+
+# az commands which don't call ARM
+_NON_ARM_COMMANDS = [
+    ("account",),
+    ("bicep",),
+    ("confcom",),
+    ("login",),
+    ("logout",),
+    ("version",),
+    ("config",),
+    ("extension",),
+    ("storage", "blob"),
+]
+
+_SUBSCRIPTION_IN_ID = re.compile(r"/subscriptions/([^/]+)", re.IGNORECASE)
+
+_thread_lock = threading.Lock()
+
+
+def _rate_per_hour(env: str, default: int) -> float:
+    try:
+        return max(0.0, float(os.getenv(env, str(default))))
+    except ValueError:
+        return float(default)
+
+
+def _burst() -> float:
+    try:
+        return max(1.0, float(os.getenv("CACI_ARM_BURST", str(DEFAULT_BURST))))
+    except ValueError:
+        return float(DEFAULT_BURST)
+
+
+def rate_per_second(kind: str) -> float:
+    """
+    Refill rate for a kind of call, 0 means not limited.
+    """
+    if kind == WRITE:
+        return _rate_per_hour("CACI_ARM_WRITES_PER_HOUR", DEFAULT_WRITES_PER_HOUR) / 3600
+    return _rate_per_hour("CACI_ARM_READS_PER_HOUR", DEFAULT_READS_PER_HOUR) / 3600
+
+
+@dataclass
+class GovernorMetrics:
+    calls: int = 0
+    delayed_calls: int = 0
+    total_delay: float = 0.0
+    max_delay: float = 0.0
+
+    def add(self, delay: float):
+        self.calls += 1
+        if delay > 0:
+            self.delayed_calls += 1
+            self.total_delay += delay
+            self.max_delay = max(self.max_delay, delay)
+
+    def summary(self) -> str:
+        return (
+            f"ARM rate governor: {self.delayed_calls}/{self.calls} calls delayed, "
+            f"{self.total_delay:.1f}s total, {self.max_delay:.1f}s max"
+        )
+
+
+# Delays seen by this process; totals across processes are kept in the bucket files
+metrics = GovernorMetrics()
+
+
+def _bucket_path(kind: str, subscription: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", subscription.lower()) or "default"
+    return os.path.join(get_cache_dir("arm-governor"), f"{safe}.{kind}.json")
+
+
+def reserve(kind: str, subscription: str | None = None) -> float:
+    """
+    Take a token for one ARM call.
+
+    :return: Seconds the caller must wait before making the call
+    """
+    rate = rate_per_second(kind)
+    if rate <= 0:
+        return 0.0
+    burst = _burst()
+
+    with _thread_lock, open(_bucket_path(kind, subscription or "default"), "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+            now = time.time()
+            tokens = float(state.get("tokens", burst))
+            updated = float(state.get("updated", now))
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate) - 1
+            delay = -tokens / rate if tokens < 0 else 0.0
+
+            state.update(
+                tokens=tokens,
+                updated=now,
+                calls=state.get("calls", 0) + 1,
+                delayed_calls=state.get("delayed_calls", 0) + (1 if delay > 0 else 0),
+                total_delay=state.get("total_delay", 0.0) + delay,
+            )
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state))
+            f.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    metrics.add(delay)
+    return delay
+
+
+def acquire(kind: str, subscription: str | None = None) -> float:
+    """
+    Blocking form of reserve() for synchronous callers.
+
+    :return: Seconds waited
+    """
+    delay = reserve(kind, subscription)
+    if delay > 0:
+        with trace.span("ARM rate limit", cat="wait", kind=kind, delay=delay):
+            deadline.sleep(delay)
+    return delay
+
+
+def classify_argv(argv: Sequence[str]) -> Optional[str]:
+    """
+    READ or WRITE for an ARM-bound az command, None for anything else.
+    """
+    if len(argv) < 2 or argv[0] != "az":
+        return None
+    positional = []
+    for arg in argv[1:]:
+        if arg.startswith("-"):
+            break
+        positional.append(arg)
+    if any(tuple(positional[: len(command)]) == command for command in _NON_ARM_COMMANDS):
+        return None
+    return WRITE if any(word in MUTATING_VERBS for word in positional) else READ
+
+
+def subscription_of(argv: Sequence[str]) -> Optional[str]:
+    for i, arg in enumerate(argv):
+        if arg == "--subscription" and i + 1 < len(argv):
+            return argv[i + 1]
+        match = _SUBSCRIPTION_IN_ID.search(arg)
+        if match:
+            return match.group(1)
+    return os.getenv("SUBSCRIPTION")
+
+
+def reserve_for_argv(argv: Sequence[str]) -> float:
+    kind = classify_argv(argv)
+    if kind is None:
+        return 0.0
+    return reserve(kind, subscription_of(argv))
+
+
+def get_totals(subscription: str | None = None) -> Dict[str, dict]:
+    """
+    Shared counters of all processes for a subscription, per kind of call.
+    """
+    totals = {}
+    for kind in (READ, WRITE):
+        try:
+            with open(_bucket_path(kind, subscription or "default")) as f:
+                totals[kind] = json.load(f)
+        except (OSError, ValueError):
+            totals[kind] = {}
+    return totals
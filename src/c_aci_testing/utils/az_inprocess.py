@@ -0,0 +1,161 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Runs `az ...` commands inside this Python process instead of spawning the CLI.
+
+Every `az` process pays for starting Python, importing azure-cli and loading
+its extensions before doing any work.  With CACI_AZ_BACKEND=inprocess, a
+single azure-cli context is loaded on first use and reused for every later
+call (the same way `az interactive` does).  Calls are made from one worker
+thread, so in-process az invocations are serialised.
+
+If azure-cli cannot be imported in this interpreter (it usually lives in its
+own virtualenv), we fall back to spawning `az`.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple
+
+AZ_BACKEND_ENV = "CACI_AZ_BACKEND"
+
+_cli: Any = None
+_available: Optional[bool] = None
+_worker: Optional[ThreadPoolExecutor] = None
+_init_lock = threading.Lock()
+
+
+class _ThreadRoutedStream:
+    """
+    Stand-in for sys.stdout/sys.stderr which sends writes made by the worker
+    thread to a per-call buffer, and everything else to the original stream.
+    This lets us capture output of commands that print() directly (e.g.
+    confcom) without redirecting other threads' output.
+    """
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def set_buffer(self, buffer: Optional[io.StringIO]):
+        self._local.buffer = buffer
+
+    def _target(self):
+        return getattr(self._local, "buffer", None) or self._default
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._default, name)
+
+
+def use_inprocess() -> bool:
+    return os.getenv(AZ_BACKEND_ENV, "subprocess").lower() == "inprocess"
+
+
+def is_available() -> bool:
+    global _available
+    if _available is None:
+        try:
+            import azure.cli.core  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+
+            _available = True
+        except ImportError:
+            print(
+                f"Warning: {AZ_BACKEND_ENV}=inprocess but azure-cli is not importable, spawning az instead",
+                file=sys.stderr,
+                flush=True,
+            )
+            _available = False
+    return _available
+
+
+def can_run_inprocess(argv: Sequence[str], **kwargs) -> bool:
+    """
+    Whether a command can be served by the in-process backend.  Calls which
+    need their own environment or working directory, a timeout (threads can't
+    be killed) or live output, stay on the subprocess path.
+    """
+    return (
+        len(argv) > 1
+        and argv[0] == "az"
+        and "--follow" not in argv
+        and not kwargs.get("env")
+        and not kwargs.get("cwd")
+        and not kwargs.get("timeout")
+        and not kwargs.get("stream")
+        and use_inprocess()
+        and is_available()
+    )
+
+
+def _get_cli():
+    global _cli
+    if _cli is None:
+        from azure.cli.core import get_default_cli  # pylint: disable=import-outside-toplevel
+
+        _cli = get_default_cli()
+    return _cli
+
+
+def _install_streams() -> Tuple[_ThreadRoutedStream, _ThreadRoutedStream]:
+    if not isinstance(sys.stdout, _ThreadRoutedStream):
+        sys.stdout = _ThreadRoutedStream(sys.stdout)  # type: ignore[assignment]
+    if not isinstance(sys.stderr, _ThreadRoutedStream):
+        sys.stderr = _ThreadRoutedStream(sys.stderr)  # type: ignore[assignment]
+    return sys.stdout, sys.stderr  # type: ignore[return-value]
+
+
+def invoke(argv: List[str], capture: bool = True) -> Tuple[int, str, str]:
+    """
+    Run `az <args>` using the shared CLI context.  Must be called from the
+    worker thread, see get_worker().
+
+    :return: (returncode, stdout, stderr)
+    """
+    global _cli
+    stdout_stream, stderr_stream = _install_streams()
+    out_buf = io.StringIO() if capture else None
+    err_buf = io.StringIO() if capture else None
+    stdout_stream.set_buffer(out_buf)
+    stderr_stream.set_buffer(err_buf)
+    try:
+        cli = _get_cli()
+        try:
+            returncode = cli.invoke(argv[1:], out_file=out_buf or stdout_stream)
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else 1
+        except Exception as e:  # pylint: disable=broad-except
+            # Don't reuse a context that may have been left half-initialised
+            _cli = None
+            print(f"In-process az failed: {e}", file=sys.stderr)
+            returncode = 1
+    finally:
+        stdout_stream.set_buffer(None)
+        stderr_stream.set_buffer(None)
+
+    return (
+        returncode or 0,
+        out_buf.getvalue() if out_buf else "",
+        err_buf.getvalue() if err_buf else "",
+    )
+
+
+def get_worker() -> ThreadPoolExecutor:
+    global _worker
+    with _init_lock:
+        if _worker is None:
+            _worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="az-inprocess")
+        return _worker
@@ -0,0 +1,277 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Compilation of bicepparam files to ARM templates, with a disk cache.
+
+`az bicep build-params` takes seconds and runs for every policies gen, vm
+runc, vn2 generate_yaml etc. of a target, even when nothing changed.  Its
+output is cached in the user cache directory under a hash of the bicepparam
+file, the bicep file it uses and every file they reference (modules, imports,
+load*() functions), the current values of the environment variables the
+bicepparam file reads, and the bicep CLI version.  The least recently used
+entries are evicted once the cache exceeds CACI_BICEP_CACHE_MAX_MB.
+
+Setting parameters (aci_param_set) changes the bicepparam file, but mostly
+only literal values, which the compiled parameters hold as they are.  Each
+entry is also found by a key of its inputs with those values masked, so a
+file which only differs in literal values is answered with the cached
+template and its own values, without compiling.
+
+Set CACI_NO_BICEP_CACHE=1 (or pass --no-cache) to always compile.  Compiling
+is done by a long-lived bicep process with CACI_BICEP_BACKEND=server, see
+bicep_server.py.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from typing import Iterator, Optional, Set, Tuple
+
+from c_aci_testing.utils import bicep_server, bicepparam, param_overlay, trace
+from c_aci_testing.utils.bicep_server import find_bicep
+from c_aci_testing.utils.cache_dir import get_cache_dir
+from c_aci_testing.utils.cmd_executor import execute
+
+NO_CACHE_ENV = "CACI_NO_BICEP_CACHE"
+MAX_SIZE_ENV = "CACI_BICEP_CACHE_MAX_MB"
+DEFAULT_MAX_SIZE_MB = 200
+
+# using/module/import statements and load*() functions take a quoted path
+_REFERENCE_PATTERN = re.compile(
+    r"(?:\busing\s+|\bmodule\s+\w+\s+|\bfrom\s+|\bload\w+\(\s*)'((?:[^'\\]|\\.)*)'",
+)
+# Modules from registries and template specs can't be hashed by content, their reference has to do
+_REMOTE_PREFIXES = ("br:", "br/", "ts:", "ts/")
+
+
+def cache_enabled() -> bool:
+    return os.getenv(NO_CACHE_ENV, "").lower() not in ("1", "true", "yes")
+
+
+@functools.lru_cache(maxsize=None)
+def bicep_version() -> str:
+    """
+    Identifies the bicep CLI az uses, by its binary when it can be found and
+    otherwise by `az bicep version`.
+    """
+    path = find_bicep()
+    if path:
+        stat = os.stat(path)
+        return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+    res = execute(["az", "bicep", "version"])
+    return res.stdout.strip() if res.returncode == 0 else ""
+
+
+def _references(path: str, seen: Set[str]) -> Iterator[Tuple[str, bytes]]:
+    """
+    (reference, content) of path and everything it references, transitively.
+    """
+    path = os.path.normpath(path)
+    if path in seen:
+        return
+    seen.add(path)
+    with open(path, "rb") as f:
+        content = f.read()
+    yield path, content
+    if not path.endswith((".bicep", ".bicepparam")):
+        return
+    for match in _REFERENCE_PATTERN.finditer(content.decode("utf-8", errors="replace")):
+        reference = match.group(1)
+        if reference.startswith(_REMOTE_PREFIXES):
+            yield reference, b""
+            continue
+        referenced = os.path.join(os.path.dirname(path), reference)
+        if os.path.isfile(referenced):
+            yield from _references(referenced, seen)
+
+
+def cache_key(bicepparam_file_path: str, bicepparam_content: Optional[bytes] = None) -> str:
+    """
+    Hash of everything compiling the bicepparam file depends on, with its own
+    content replaced by bicepparam_content if given.
+    """
+    hasher = hashlib.sha256(bicep_version().encode())
+    path = os.path.abspath(bicepparam_file_path)
+    root = os.path.dirname(path)
+    for reference, content in _references(path, set()):
+        if reference == path and bicepparam_content is not None:
+            content = bicepparam_content
+        # Relative, so that copies of a target share their entries
+        name = reference if reference.startswith(_REMOTE_PREFIXES) else os.path.relpath(reference, root)
+        hasher.update(f"\0{name}\0{len(content)}\0".encode())
+        hasher.update(content)
+        if reference.endswith(".bicepparam"):
+            hasher.update(_environment(content).encode())
+    return hasher.hexdigest()
+
+
+def _environment(bicepparam_content: bytes) -> str:
+    """
+    The values of the environment variables a bicepparam file reads, which
+    compiling evaluates, of all of them if it's not clear which.
+    """
+    if b"readEnvironmentVariable" not in bicepparam_content:
+        return ""
+    try:
+        names = bicepparam.environment_variables(bicepparam_content.decode("utf-8", errors="replace"))
+    except bicepparam.BicepParamSyntaxError:
+        names = None
+    if names is None:
+        return json.dumps(sorted(os.environ.items()))
+    return json.dumps([[name, os.environ.get(name)] for name in sorted(set(names))])
+
+
+def _masked_key(bicepparam_file_path: str) -> Tuple[Optional[str], dict]:
+    """
+    (key, values) of the bicepparam file with its literal parameter values
+    masked, key being None if the file's compilation can't be derived from
+    its literal values.
+    """
+    with open(bicepparam_file_path, encoding="utf-8", newline="") as f:
+        text = f.read()
+    try:
+        split = bicepparam.split_literals(text)
+    except bicepparam.BicepParamSyntaxError:
+        split = None
+    if split is None:
+        return None, {}
+    masked, values = split
+    return cache_key(bicepparam_file_path, masked.encode()), values
+
+
+def evict(cache_dir: str, keep: str):
+    """
+    Remove the least recently used entries of cache_dir until it fits in CACI_BICEP_CACHE_MAX_MB.
+    """
+    try:
+        max_bytes = float(os.getenv(MAX_SIZE_ENV, str(DEFAULT_MAX_SIZE_MB))) * 1024 * 1024
+    except ValueError:
+        max_bytes = DEFAULT_MAX_SIZE_MB * 1024 * 1024
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _compile(bicepparam_file_path: str) -> str:
+    if bicep_server.use_server():
+        output = bicep_server.compile_params(bicepparam_file_path)
+        if output is not None:
+            return output
+    res = execute(
+        ["az", "bicep", "build-params", "--file", bicepparam_file_path, "--stdout"],
+        check=True,
+        echo_stderr=True,
+    )
+    return res.stdout
+
+
+def _parse(output: str) -> Tuple[dict, dict]:
+    res_json = json.loads(output)
+    return json.loads(res_json["templateJson"]), json.loads(res_json["parametersJson"])
+
+
+def build_params(bicepparam_file_path: str) -> Tuple[dict, dict]:
+    """
+    Compile a bicepparam file (and the bicep file it uses) into an ARM
+    template and its parameters file, i.e. {"parameters": {name: {"value": ...}}},
+    with the values of the run's parameter overlay if any.
+    """
+    template, parameters = _build_params(bicepparam_file_path)
+    return template, param_overlay.apply(bicepparam_file_path, parameters)
+
+
+def _read_entry(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            output = f.read()
+        _parse(output)
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError):
+        print(f"Ignoring corrupt cached ARM template {path}", file=sys.stderr, flush=True)
+        return None
+    # Recently used entries are evicted last
+    os.utime(path)
+    return output
+
+
+def _write(path: str, content: str):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _with_values(output: str, values: dict) -> str:
+    """
+    Compiled output with the given parameter values.
+    """
+    res_json = json.loads(output)
+    parameters_json = json.loads(res_json["parametersJson"])
+    for name, value in values.items():
+        parameters_json.setdefault("parameters", {})[name] = {"value": value}
+    return json.dumps({**res_json, "parametersJson": json.dumps(parameters_json)})
+
+
+def _build_params(bicepparam_file_path: str) -> Tuple[dict, dict]:
+    cache_dir = get_cache_dir("bicep")
+    key = cache_key(bicepparam_file_path)
+    path = os.path.join(cache_dir, f"{key}.json")
+    masked_key, values = _masked_key(bicepparam_file_path)
+    # Points at the latest entry whose inputs only differ in literal parameter values
+    masked_path = os.path.join(cache_dir, f"{masked_key}.masked") if masked_key else None
+
+    output = None
+    if cache_enabled():
+        output = _read_entry(path)
+        if output is not None:
+            trace.instant("az bicep build-params", cat="cache hit", file=bicepparam_file_path)
+            print(f"Using cached ARM template of {bicepparam_file_path}", flush=True)
+            return _parse(output)
+        if masked_path:
+            try:
+                with open(masked_path, encoding="utf-8") as f:
+                    similar = _read_entry(os.path.join(cache_dir, f"{f.read().strip()}.json"))
+            except FileNotFoundError:
+                similar = None
+            if similar is not None:
+                output = _with_values(similar, values)
+                trace.instant("az bicep build-params", cat="cache hit", file=bicepparam_file_path, values="current")
+                print(f"Using cached ARM template of {bicepparam_file_path} with its current parameters", flush=True)
+
+    if output is None:
+        output = _compile(bicepparam_file_path)
+    result = _parse(output)
+    try:
+        _write(path, output)
+        if masked_path:
+            _write(masked_path, key)
+        evict(cache_dir, keep=path)
+    except OSError as e:
+        print(f"Failed to cache ARM template of {bicepparam_file_path}: {e}", file=sys.stderr, flush=True)
+    return result
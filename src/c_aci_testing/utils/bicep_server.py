@@ -0,0 +1,230 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Compiles bicepparam files with one long-lived bicep process.
+
+`az bicep build-params` starts az and then the bicep .NET binary from cold
+for every compilation.  With CACI_BICEP_BACKEND=server, the bicep binary az
+installed (or the one on PATH) is started once in its JSON-RPC server mode
+(`bicep jsonrpc --stdio`) on first use, and every later compilation of this
+process is a request to it.  Requests are serialised, the server is stopped
+when the process exits or a different bicep binary is found.
+
+If there is no bicep binary or the server fails, we fall back to
+`az bicep build-params`.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+from c_aci_testing.utils import deadline, trace
+
+BICEP_BACKEND_ENV = "CACI_BICEP_BACKEND"
+
+# Compilations of large templates with many modules take a while
+REQUEST_TIMEOUT_SECS = 300
+
+
+class BicepServerError(Exception):
+    """
+    The server couldn't be started or stopped responding.
+    """
+
+
+class BicepCompileError(Exception):
+    """
+    The bicep files have errors.
+    """
+
+
+def use_server() -> bool:
+    return os.getenv(BICEP_BACKEND_ENV, "az").lower() == "server"
+
+
+def find_bicep() -> Optional[str]:
+    """
+    The bicep binary az installed, or else the one on PATH.
+    """
+    config_dir = os.getenv("AZURE_CONFIG_DIR") or os.path.join(os.path.expanduser("~"), ".azure")
+    for name in ("bicep", "bicep.exe"):
+        path = os.path.join(config_dir, "bin", name)
+        if os.path.isfile(path):
+            return path
+    return shutil.which("bicep")
+
+
+class BicepServer:
+    """
+    A `bicep jsonrpc --stdio` process, exchanging JSON-RPC messages framed
+    with Content-Length headers.
+    """
+
+    def __init__(self, bicep_path: str):
+        self.bicep_path = bicep_path
+        try:
+            self._process = subprocess.Popen(
+                [bicep_path, "jsonrpc", "--stdio"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise BicepServerError(f"Failed to start {bicep_path}: {e}") from e
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._responses: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        threading.Thread(target=self._read, name="bicep-jsonrpc", daemon=True).start()
+
+    def _read(self):
+        stream = self._process.stdout
+        try:
+            while True:
+                headers = {}
+                while True:
+                    line = stream.readline()
+                    if not line:
+                        return
+                    line = line.decode("ascii").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = stream.read(int(headers["content-length"]))
+                self._responses.put(json.loads(body))
+        except (ValueError, KeyError, OSError):
+            return
+        finally:
+            # Wakes up a request waiting for a response which won't come
+            self._responses.put(None)
+
+    def request(self, method: str, params: Dict[str, Any]) -> Any:
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            body = json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}).encode()
+            try:
+                self._process.stdin.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                self._process.stdin.flush()
+            except OSError as e:
+                raise BicepServerError(f"bicep server exited: {e}") from e
+
+            while True:
+                try:
+                    response = self._responses.get(timeout=deadline.bounded(REQUEST_TIMEOUT_SECS))
+                except queue.Empty:
+                    deadline.check()
+                    raise BicepServerError(f"bicep server did not respond to {method}") from None
+                if response is None:
+                    raise BicepServerError("bicep server exited")
+                # Anything else is a notification or the response to a request which timed out
+                if response.get("id") == request_id:
+                    break
+            if "error" in response:
+                raise BicepServerError(f"{method} failed: {response['error'].get('message', response['error'])}")
+            return response.get("result")
+
+    def compile_params(self, bicepparam_file_path: str) -> str:
+        """
+        The same JSON as `az bicep build-params --stdout` writes.
+        """
+        path = os.path.abspath(bicepparam_file_path)
+        with trace.span("bicep/compileParams", cat="command", file=path):
+            result = self.request("bicep/compileParams", {"path": path, "parameterOverrides": {}})
+        if not result.get("success"):
+            raise BicepCompileError(
+                f"Failed to compile {bicepparam_file_path}:{os.linesep}" + os.linesep.join(_diagnostics(result))
+            )
+        return json.dumps({"parametersJson": result["parameters"], "templateJson": result["template"]})
+
+    def close(self):
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+
+
+def _diagnostics(result: Dict[str, Any]) -> List[str]:
+    lines = []
+    for diagnostic in result.get("diagnostics") or []:
+        start = (diagnostic.get("range") or {}).get("start") or {}
+        location = f"({start.get('line', 0) + 1},{start.get('char', 0) + 1})" if start else ""
+        lines.append(
+            f"{diagnostic.get('source', '')}{location} : {diagnostic.get('level', 'Error')}"
+            f" {diagnostic.get('code', '')}: {diagnostic.get('message', '')}"
+        )
+    return lines
+
+
+_server: Optional[BicepServer] = None
+_failed = False
+_server_lock = threading.Lock()
+
+
+def _get_server() -> Optional[BicepServer]:
+    global _server, _failed
+    with _server_lock:
+        if _failed:
+            return None
+        bicep_path = find_bicep()
+        if _server is not None and _server.bicep_path != bicep_path:
+            _server.close()
+            _server = None
+        if _server is None:
+            if bicep_path is None:
+                print(
+                    f"Warning: {BICEP_BACKEND_ENV}=server but no bicep binary was found, using az bicep instead",
+                    file=sys.stderr,
+                    flush=True,
+                )
+                _failed = True
+                return None
+            _server = BicepServer(bicep_path)
+        return _server
+
+
+def compile_params(bicepparam_file_path: str) -> Optional[str]:
+    """
+    Compile with the server, or return None if it isn't available (and az should be used).
+
+    :raises BicepCompileError: if the bicep files have errors
+    """
+    global _server, _failed
+    try:
+        server = _get_server()
+        if server is None:
+            return None
+        return server.compile_params(bicepparam_file_path)
+    except BicepServerError as e:
+        print(f"Warning: {e}, using az bicep instead", file=sys.stderr, flush=True)
+        with _server_lock:
+            _failed = True
+            if _server is not None:
+                _server.close()
+                _server = None
+        return None
+
+
+def close_server():
+    global _server, _failed
+    with _server_lock:
+        if _server is not None:
+            _server.close()
+        _server = None
+        _failed = False
+
+
+atexit.register(close_server)
@@ -0,0 +1,394 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+A lossless parser of bicepparam files, for setting parameter values without
+disturbing the rest of the file.
+
+The file is tokenized (comments, strings with escapes and ${} interpolation,
+''' multi-line strings, words, numbers and punctuation) and split into its
+top-level statements.  A statement ends at a newline outside of brackets, so
+the value of a param statement is the span from after its = to its last
+token, which may be a multi-line object or array.  Updates replace those
+spans in one pass, every other character of the file is kept as is.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class BicepParamSyntaxError(ValueError):
+    """
+    The file can't be tokenized, e.g. a string isn't terminated.
+    """
+
+
+class Token(NamedTuple):
+    # One of space, newline, comment, string, number, word or punct
+    kind: str
+    start: int
+    end: int
+
+
+class Param(NamedTuple):
+    name: str
+    # Span of the value expression in the text
+    value_start: int
+    value_end: int
+    # The value is a single string literal
+    is_string: bool
+
+
+_SIMPLE_TOKEN = re.compile(
+    r"(?P<space>[ \t]+)|(?P<newline>\r?\n)|(?P<number>\d+)|(?P<word>[A-Za-z_][A-Za-z0-9_]*)",
+)
+# Characters of a single line string which need attention
+_STRING_SPECIAL = ("\\", "$", "\n")
+_QUOTES = "'\""
+_OPEN = "([{"
+_CLOSE = ")]}"
+
+
+def _scan_string(text: str, pos: int) -> int:
+    """
+    End of the string starting at pos.
+    """
+    if text.startswith("'''", pos):
+        end = text.find("'''", pos + 3)
+        if end < 0:
+            raise BicepParamSyntaxError(f"Unterminated multi-line string at {pos}")
+        return end + 3
+    i = pos + 1
+    while True:
+        # Strings are mostly long runs of plain characters, e.g. base64 policies, which find skips fastest
+        end = text.find("'", i)
+        if end < 0:
+            raise BicepParamSyntaxError(f"Unterminated string at {pos}")
+        special = min((j for j in (text.find(c, i, end) for c in _STRING_SPECIAL) if j >= 0), default=end)
+        char = text[special]
+        if char == "'":
+            return end + 1
+        if char == "\\":
+            i = special + 2
+        elif text.startswith("${", special):
+            i = _scan_interpolation(text, special + 2)
+        elif char == "$":
+            i = special + 1
+        else:
+            raise BicepParamSyntaxError(f"Unterminated string at {pos}")
+
+
+def _scan_interpolation(text: str, pos: int) -> int:
+    """
+    End of the ${ ... } whose expression starts at pos.
+    """
+    depth = 1
+    for token in _tokens(text, pos):
+        if token.kind == "punct":
+            char = text[token.start]
+            if char in _OPEN:
+                depth += 1
+            elif char in _CLOSE:
+                depth -= 1
+                if depth == 0:
+                    return token.end
+    raise BicepParamSyntaxError(f"Unterminated string interpolation at {pos}")
+
+
+def _tokens(text: str, pos: int = 0) -> Iterator[Token]:
+    n = len(text)
+    while pos < n:
+        char = text[pos]
+        if char == "'":
+            end = _scan_string(text, pos)
+            yield Token("string", pos, end)
+        elif text.startswith("//", pos):
+            end = text.find("\n", pos)
+            end = n if end < 0 else end
+            # The \r of a \r\n belongs to the newline
+            if text[end - 1] == "\r":
+                end -= 1
+            yield Token("comment", pos, end)
+        elif text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            if end < 0:
+                raise BicepParamSyntaxError(f"Unterminated comment at {pos}")
+            end += 2
+            yield Token("comment", pos, end)
+        else:
+            match = _SIMPLE_TOKEN.match(text, pos)
+            if match:
+                end = match.end()
+                yield Token(match.lastgroup, pos, end)
+            else:
+                end = pos + 1
+                yield Token("punct", pos, end)
+        pos = end
+
+
+def tokenize(text: str) -> List[Token]:
+    return list(_tokens(text))
+
+
+def _statements(text: str, tokens: List[Token]) -> List[List[Token]]:
+    """
+    The significant (not space, newline or comment) tokens of each top-level statement.
+    """
+    statements: List[List[Token]] = []
+    current: List[Token] = []
+    depth = 0
+    for token in tokens:
+        if token.kind == "newline" and depth == 0:
+            if current:
+                statements.append(current)
+                current = []
+            continue
+        if token.kind in ("space", "newline", "comment"):
+            continue
+        if token.kind == "punct":
+            if text[token.start] in _OPEN:
+                depth += 1
+            elif text[token.start] in _CLOSE:
+                depth = max(depth - 1, 0)
+        current.append(token)
+    if current:
+        statements.append(current)
+    return statements
+
+
+def parse(text: str) -> Dict[str, Param]:
+    """
+    The param statements of a bicepparam file by name.
+    """
+    params: Dict[str, Param] = {}
+    for statement in _statements(text, tokenize(text)):
+        words = [text[t.start : t.end] for t in statement[:3]]
+        if len(statement) < 4 or words[0] != "param" or statement[1].kind != "word" or words[2] != "=":
+            continue
+        value = statement[3:]
+        params.setdefault(
+            words[1],
+            Param(words[1], value[0].start, value[-1].end, len(value) == 1 and value[0].kind == "string"),
+        )
+    return params
+
+
+def quote(value: str) -> str:
+    """
+    A bicep string literal of value.
+    """
+    escaped = (
+        value.replace("\\", "\\\\")
+        .replace("'", "\\'")
+        .replace("${", "\\${")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+        .replace("\t", "\\t")
+    )
+    return f"'{escaped}'"
+
+
+def _looks_like_string(value: str) -> bool:
+    # The type of a new parameter is determined based on its value
+    if value.lower() in ("true", "false") or re.match(r"^[-+]?\d+$", value):
+        return False
+    return not ((value.startswith("{") and value.endswith("}")) or (value.startswith("[") and value.endswith("]")))
+
+
+def _new_param_line(name: str, value: str) -> str:
+    if _looks_like_string(value):
+        return f"param {name}={quote(value.strip(_QUOTES))}"
+    return f"param {name}={value.lower() if value.lower() in ('true', 'false') else value}"
+
+
+def update(text: str, parameters: Dict[str, str], add: bool = True) -> str:
+    """
+    Set parameter values of a bicepparam file's text.
+
+    Values of parameters which are string literals are quoted, others are bicep
+    expressions, e.g. "{\\n  key: 'value'\\n}".  Parameters which aren't in the
+    file are appended if add is set.
+    """
+    params = parse(text)
+    newline = "\r\n" if "\r\n" in text else "\n"
+    edits: List[Tuple[int, int, str]] = []
+    appended = ""
+    for name, value in parameters.items():
+        param = params.get(name)
+        if param is None:
+            if add:
+                appended += f"{newline}{_new_param_line(name, value)}"
+            continue
+        # Ensure string values are enclosed in (single) quotes, others are used as-is
+        replacement = quote(value.strip(_QUOTES)) if param.is_string else value
+        edits.append((param.value_start, param.value_end, replacement))
+
+    pieces = []
+    pos = 0
+    for start, end, replacement in sorted(edits):
+        pieces.append(text[pos:start])
+        pieces.append(replacement)
+        pos = end
+    pieces.append(text[pos:])
+    return "".join(pieces) + appended
+
+
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "\\": "\\", "'": "'", "$": "$"}
+
+
+def _string_value(source: str) -> str:
+    """
+    The value of a string token without interpolations.
+    """
+    if source.startswith("'''"):
+        # A newline right after the opening quotes isn't part of the string
+        body = source[3:-3]
+        return body[2:] if body.startswith("\r\n") else body[1:] if body.startswith("\n") else body
+    if "${" in source.replace("\\${", ""):
+        raise BicepParamSyntaxError(f"Not a literal: {source}")
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(0)), source[1:-1])
+
+
+class _LiteralParser:
+    """
+    literal := string | number | true | false | null | '[' literal* ']' | '{' (key ':' literal)* '}'
+
+    Items and properties are separated by newlines or commas.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = [t for t in _tokens(text) if t.kind not in ("space", "newline", "comment")]
+        self.pos = 0
+
+    def peek(self) -> str:
+        return self.source(self.tokens[self.pos]) if self.pos < len(self.tokens) else ""
+
+    def source(self, token: Token) -> str:
+        return self.text[token.start : token.end]
+
+    def take(self) -> Token:
+        if self.pos >= len(self.tokens):
+            raise BicepParamSyntaxError("Unexpected end of value")
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    def string(self, token: Token) -> str:
+        return _string_value(self.source(token))
+
+    def value(self) -> Any:
+        token = self.take()
+        source = self.source(token)
+        if token.kind == "string":
+            return self.string(token)
+        if token.kind == "number":
+            return int(source)
+        if source == "-" and self.pos < len(self.tokens) and self.tokens[self.pos].kind == "number":
+            return -int(self.source(self.take()))
+        if source in _KEYWORDS:
+            return _KEYWORDS[source]
+        if source == "[":
+            items = []
+            while self.peek() != "]":
+                items.append(self.value())
+                if self.peek() == ",":
+                    self.take()
+            self.take()
+            return items
+        if source == "{":
+            obj = {}
+            while self.peek() != "}":
+                key_token = self.take()
+                key = self.string(key_token) if key_token.kind == "string" else self.source(key_token)
+                if self.source(self.take()) != ":":
+                    raise BicepParamSyntaxError(f"Expected : after {key}")
+                obj[key] = self.value()
+                if self.peek() == ",":
+                    self.take()
+            self.take()
+            return obj
+        raise BicepParamSyntaxError(f"Not a literal: {source}")
+
+
+_KEYWORDS = {"true": True, "false": False, "null": None}
+
+
+def literal(text: str) -> Any:
+    """
+    The value of a bicep literal, i.e. strings, numbers, booleans, null, and
+    arrays and objects of them.
+
+    :raises BicepParamSyntaxError: if text is any other expression
+    """
+    parser = _LiteralParser(text)
+    value = parser.value()
+    if parser.pos != len(parser.tokens):
+        raise BicepParamSyntaxError(f"Not a literal: {text}")
+    return value
+
+
+def value_of(value: str, is_string: Optional[bool]) -> Any:
+    """
+    The value update() sets a parameter to, given whether the parameter's
+    current value is a string literal, or None if it isn't in the file.
+    """
+    if is_string or (is_string is None and _looks_like_string(value)):
+        return value.strip(_QUOTES)
+    return literal(value.lower() if value.lower() in ("true", "false") else value)
+
+
+def split_literals(text: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    The text with the values of its literal parameters replaced by a
+    placeholder, and those values, e.g. to tell files which only differ in
+    parameter values apart from others.
+
+    None if the file has statements other than using and param (e.g. var or
+    import), whose values may depend on its parameters.
+    """
+    statements = _statements(text, tokenize(text))
+    if any(text[statement[0].start : statement[0].end] not in ("using", "param") for statement in statements):
+        return None
+    values: Dict[str, Any] = {}
+    edits: List[Tuple[int, int]] = []
+    for name, param in parse(text).items():
+        try:
+            values[name] = literal(text[param.value_start : param.value_end])
+        except BicepParamSyntaxError:
+            continue
+        edits.append((param.value_start, param.value_end))
+
+    pieces = []
+    pos = 0
+    for start, end in sorted(edits):
+        pieces.append(text[pos:start])
+        pieces.append("\0")
+        pos = end
+    pieces.append(text[pos:])
+    return "".join(pieces), values
+
+
+def environment_variables(text: str) -> Optional[List[str]]:
+    """
+    Names of the environment variables the file reads with readEnvironmentVariable(),
+    None if a name isn't a string literal.
+    """
+    tokens = [t for t in tokenize(text) if t.kind not in ("space", "newline", "comment")]
+    names = []
+    for i, token in enumerate(tokens):
+        if text[token.start : token.end] != "readEnvironmentVariable":
+            continue
+        if i + 2 >= len(tokens) or text[tokens[i + 1].start : tokens[i + 1].end] != "(":
+            return None
+        argument = tokens[i + 2]
+        if argument.kind != "string":
+            return None
+        try:
+            names.append(_string_value(text[argument.start : argument.end]))
+        except BicepParamSyntaxError:
+            return None
+    return names
@@ -0,0 +1,27 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+
+CACHE_DIR_ENV = "CACI_CACHE_DIR"
+
+
+def get_cache_dir(*subdirs: str) -> str:
+    """
+    Per-user directory for state shared between c-aci-testing processes,
+    CACI_CACHE_DIR or the platform's user cache directory.  Created on demand.
+    """
+    root = os.getenv(CACHE_DIR_ENV)
+    if not root:
+        if os.name == "nt":
+            base = os.getenv("LOCALAPPDATA") or os.path.expanduser("~")
+        else:
+            base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        root = os.path.join(base, "c-aci-testing")
+    path = os.path.join(root, *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
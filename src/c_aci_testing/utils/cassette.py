@@ -0,0 +1,313 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Record and replay of external calls.
+
+With CACI_CASSETTE_MODE=record every command run through the executor and
+every ARM request of the ARM client is appended to the cassette file named by
+CACI_CASSETTE: argv (or method and URL), explicitly set environment, output,
+exit code (or status), wall time and the contents of files the command wrote
+to paths on its command line.  With CACI_CASSETTE_MODE=replay the same calls
+are answered from the cassette instead, without touching Azure, docker, etc.,
+waiting the recorded wall time scaled by CACI_REPLAY_LATENCY_SCALE (0, the
+default, doesn't wait at all).
+
+Calls are matched on their arguments with temporary directories and GUIDs
+normalised away, so that a replayed run doesn't need the same temp paths or
+generated ids as the recording.  Calls with the same arguments are answered
+in recorded order, the last answer repeating once they run out (for status
+polls made more often than when recording).
+
+Credentials are redacted before they are recorded: token fields of JSON
+output (e.g. of `az account get-access-token`), bearer tokens and the values
+of secret looking command line options, environment variables and headers.  Replayed calls get
+REDACTED in their place.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: only serialise threads of this process
+    fcntl = None  # type: ignore[assignment]
+
+CASSETTE_ENV = "CACI_CASSETTE"
+MODE_ENV = "CACI_CASSETTE_MODE"
+LATENCY_SCALE_ENV = "CACI_REPLAY_LATENCY_SCALE"
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Files written by a command larger than this aren't recorded
+MAX_RECORDED_FILE_SIZE = 4 * 1024 * 1024
+
+REDACTED = "REDACTED"
+
+_SECRET_NAME = re.compile(r"token|secret|password|passwd|credential|authorization|api[_-]?key", re.IGNORECASE)
+_SECRET_FIELD = re.compile(
+    r"""(["']?(?:accessToken|access_token|refresh_token|id_token|token|password|client_secret|Authorization)"""
+    r"""["']?\s*[:=]\s*["']?)((?:Bearer\s+)?[^"'\s,}]+)""",
+    re.IGNORECASE,
+)
+# Options whose value is a credential, e.g. --docker-password=<token>, --password <token> or -p <token>
+_SECRET_OPTION = re.compile(
+    r"--?[\w-]*(?:token|secret|password|passwd|credential|authorization|key)[\w-]*|-p", re.IGNORECASE
+)
+_BEARER = re.compile(r"(Bearer\s+)[A-Za-z0-9\-._~+/]+=*", re.IGNORECASE)
+
+_GUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def _temp_dir_pattern() -> re.Pattern:
+    roots = {tempfile.gettempdir(), os.path.realpath(tempfile.gettempdir())}
+    alternatives = "|".join(re.escape(root.rstrip(os.sep)) for root in sorted(roots, key=len, reverse=True))
+    return re.compile(rf"(?:{alternatives})[\\/][^\\/\s\"']+")
+
+
+def normalize(text: str) -> str:
+    """
+    Text with the parts which differ from run to run (temp directories, GUIDs) replaced by placeholders.
+    """
+    return _GUID.sub("<guid>", _temp_dir_pattern().sub("<tmp>", text))
+
+
+def redact(text: str) -> str:
+    """
+    Text with token fields and bearer tokens replaced by REDACTED.
+    """
+    return _BEARER.sub(rf"\g<1>{REDACTED}", _SECRET_FIELD.sub(rf"\g<1>{REDACTED}", text))
+
+
+def redact_argv(argv: Sequence[str]) -> List[str]:
+    """
+    Command line with the values of credential options replaced by REDACTED.
+    """
+    redacted = []
+    value_follows = False
+    for arg in argv:
+        arg = str(arg)
+        if value_follows and not arg.startswith("-"):
+            redacted.append(REDACTED)
+            value_follows = False
+            continue
+        option, sep, _ = arg.partition("=")
+        # Flags like --password-stdin don't take a value
+        value_follows = bool(_SECRET_OPTION.fullmatch(option)) and not option.endswith("-stdin")
+        if value_follows and sep:
+            redacted.append(f"{option}={REDACTED}")
+            value_follows = False
+        else:
+            redacted.append(redact(arg))
+    return redacted
+
+
+def _redact_values(values: Dict[str, str]) -> Dict[str, str]:
+    return {k: REDACTED if _SECRET_NAME.search(k) else redact(v) for k, v in values.items()}
+
+
+def _command_key(argv: Sequence[str]) -> str:
+    return normalize(json.dumps(redact_argv(argv)))
+
+
+def _http_key(method: str, url: str) -> str:
+    return normalize(f"{method} {url}")
+
+
+def _path_args(argv: Sequence[str], cwd: str | None) -> Dict[int, str]:
+    """
+    Arguments which may name a file, by position.
+    """
+    paths = {}
+    for i, arg in enumerate(argv[1:], start=1):
+        if arg.startswith("-") or "://" in arg or not (os.sep in arg or "." in arg):
+            continue
+        paths[i] = os.path.join(cwd or os.getcwd(), arg)
+    return paths
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime_ns if os.path.isfile(path) else None
+    except OSError:
+        return None
+
+
+class Cassette:
+    """
+    :param path: Cassette file, JSON lines of recorded calls
+    :param mode: RECORD to append calls to the cassette, REPLAY to answer calls from it
+    :param latency_scale: Factor applied to recorded wall times when replaying
+    """
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 0.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected {RECORD!r} or {REPLAY!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[dict]] = {}
+        self._served: Dict[str, int] = {}
+        if mode == REPLAY:
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def _load(self):
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            # Other processes (e.g. a target's test script) may record to the same cassette
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _next(self, key: str, description: str) -> dict:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded result in {self.path} for: {description}")
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return entries[min(served, len(entries) - 1)]
+
+    def latency(self, entry: dict) -> float:
+        return entry.get("duration", 0.0) * self.latency_scale
+
+    # Commands
+
+    def watch(self, argv: Sequence[str], cwd: str | None = None) -> Dict[int, Optional[float]]:
+        """
+        Modification times of the files named on a command line, to be passed to record_command().
+        """
+        return {i: _mtime(path) for i, path in _path_args(argv, cwd).items()}
+
+    def record_command(
+        self,
+        argv: Sequence[str],
+        returncode: int,
+        stdout: str,
+        stderr: str,
+        duration: float,
+        before: Dict[int, Optional[float]],
+        env: Dict[str, str] | None = None,
+        cwd: str | None = None,
+    ):
+        files = {}
+        for i, path in _path_args(argv, cwd).items():
+            mtime = _mtime(path)
+            if mtime is None or mtime == before.get(i) or os.path.getsize(path) > MAX_RECORDED_FILE_SIZE:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    files[str(i)] = redact(f.read())
+            except (OSError, UnicodeDecodeError):
+                pass
+        self._append({
+            "type": "command",
+            "key": _command_key(argv),
+            "argv": redact_argv(argv),
+            "env": _redact_values({k: v for k, v in (env or {}).items() if os.environ.get(k) != v}),
+            "cwd": cwd,
+            "returncode": returncode,
+            "stdout": redact(stdout),
+            "stderr": redact(stderr),
+            "duration": duration,
+            "files": files,
+        })
+
+    def replay_command(self, argv: Sequence[str], cwd: str | None = None) -> Tuple[int, str, str, float]:
+        """
+        Answer a command from the cassette, writing back the files it wrote when recorded.
+
+        :return: returncode, stdout, stderr and the (scaled) time it would have taken
+        """
+        entry = self._next(_command_key(argv), " ".join(redact_argv(argv)))
+        paths = _path_args(argv, cwd)
+        for i, content in entry.get("files", {}).items():
+            path = paths.get(int(i))
+            if path is not None:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(content)
+        return entry["returncode"], entry["stdout"], entry["stderr"], self.latency(entry)
+
+    # ARM requests
+
+    def record_http(self, method: str, url: str, status: int, headers: Dict[str, str], data: bytes, duration: float):
+        self._append({
+            "type": "http",
+            "key": _http_key(method, url),
+            "method": method,
+            "url": url,
+            "status": status,
+            "headers": _redact_values(headers),
+            "body": redact(data.decode("utf-8", errors="replace")),
+            "duration": duration,
+        })
+
+    def replay_http(self, method: str, url: str) -> Tuple[int, Dict[str, str], bytes, float]:
+        entry = self._next(_http_key(method, url), f"{method} {url}")
+        return entry["status"], entry["headers"], entry["body"].encode("utf-8"), self.latency(entry)
+
+
+_active: Optional[Cassette] = None
+_active_lock = threading.Lock()
+
+
+def current() -> Optional[Cassette]:
+    """
+    The cassette configured by CACI_CASSETTE and CACI_CASSETTE_MODE, if any.
+    """
+    global _active
+    path = os.getenv(CASSETTE_ENV)
+    if not path:
+        return None
+    mode = os.getenv(MODE_ENV, REPLAY)
+    try:
+        scale = max(0.0, float(os.getenv(LATENCY_SCALE_ENV, "0")))
+    except ValueError:
+        scale = 0.0
+    with _active_lock:
+        if _active is None or (_active.path, _active.mode, _active.latency_scale) != (path, mode, scale):
+            _active = Cassette(path, mode, scale)
+        return _active
+
+
+def reset():
+    """
+    Forget the active cassette, so that a replay starts again from the first recorded answers.
+    """
+    global _active
+    with _active_lock:
+        _active = None
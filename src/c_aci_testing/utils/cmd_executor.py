@@ -0,0 +1,388 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Shared executor for external commands (az, docker, kubectl, oras, ...).
+
+Commands run as asyncio subprocesses so that fan-out steps, such as one
+`az container show` per container group, can run in parallel under a common
+concurrency limit instead of one after another.  The synchronous helpers
+`execute` and `execute_all` wrap the executor for the (mostly synchronous)
+tools.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import IO, Any, Coroutine, Dict, List, Optional, Sequence, Tuple
+
+from c_aci_testing.utils import arm_governor, az_inprocess, cassette, deadline, query_cache, trace
+from c_aci_testing.utils import retry as retry_policy
+from c_aci_testing.utils.retry import RetryPolicy
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# asyncio's default 64KiB line limit is too small for some az output lines
+# (e.g. base64 encoded policies in deployment JSON).
+_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+def command_name(argv: Sequence[str]) -> str:
+    """
+    Short name of a command for display, e.g. "az container show".
+    """
+    words = [os.path.basename(argv[0])]
+    for arg in argv[1:4]:
+        if arg.startswith("-"):
+            break
+        words.append(arg)
+    return " ".join(words)
+
+
+def get_max_concurrency() -> int:
+    """
+    Concurrency limit for fan-out steps, configurable via CACI_MAX_CONCURRENCY.
+    """
+    try:
+        return max(1, int(os.getenv("CACI_MAX_CONCURRENCY", str(DEFAULT_MAX_CONCURRENCY))))
+    except ValueError:
+        return DEFAULT_MAX_CONCURRENCY
+
+
+@dataclass
+class CmdResult:
+    argv: List[str]
+    returncode: int
+    stdout: str
+    stderr: str
+    duration: float
+
+    def check_returncode(self) -> CmdResult:
+        if self.returncode != 0:
+            raise subprocess.CalledProcessError(self.returncode, self.argv, output=self.stdout, stderr=self.stderr)
+        return self
+
+
+async def _read_stream(reader: Optional[asyncio.StreamReader], echo_to: Optional[IO[str]], prefix: str) -> str:
+    if reader is None:
+        return ""
+
+    if echo_to is None:
+        return (await reader.read()).decode("utf-8", errors="replace")
+
+    chunks = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        text = line.decode("utf-8", errors="replace")
+        chunks.append(text)
+        echo_to.write(f"{prefix}{text}" if prefix else text)
+        echo_to.flush()
+    return "".join(chunks)
+
+
+def _kill(proc: asyncio.subprocess.Process):
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+class CmdExecutor:
+    """
+    Runs external commands on an asyncio event loop with at most
+    max_concurrency of them in flight at any time.
+    """
+
+    def __init__(self, max_concurrency: int | None = None):
+        self.max_concurrency = max_concurrency or get_max_concurrency()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the loop they were first used on, and the
+        # synchronous helpers create a fresh loop per call.
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def run(
+        self,
+        argv: Sequence[str],
+        check: bool = False,
+        capture: bool = True,
+        stream: bool = False,
+        echo_stderr: bool = False,
+        prefix: str = "",
+        timeout: float | None = None,
+        env: Dict[str, str] | None = None,
+        cwd: str | None = None,
+        use_cache: bool = True,
+        retry: RetryPolicy | None = None,
+    ) -> CmdResult:
+        """
+        :param capture: Pipe and collect stdout/stderr, otherwise both are inherited from this process
+        :param stream: Echo captured stdout/stderr line by line as it arrives
+        :param echo_stderr: Echo captured stderr line by line as it arrives
+        :param prefix: Prepended to every echoed line, useful to tell parallel commands apart
+        :param timeout: Seconds after which the command is killed and subprocess.TimeoutExpired raised.
+            Within a run budget (see deadline.RunBudget) commands are also killed when the budget runs
+            out, raising deadline.DeadlineExceeded.
+        :param use_cache: Inside query_cache.run_cache(), allow answering read-only queries from the cache.
+            Pass False for queries whose answer is expected to change, such as status polls.
+        :param retry: Policy for retrying failed attempts, by default only failures classified as
+            transient from their (captured) stderr are retried.  Pass retry.NO_RETRY to disable.
+        """
+        argv = [str(arg) for arg in argv]
+        cache = query_cache.current()
+        cacheable = cache is not None and capture and not stream and query_cache.is_cacheable(argv)
+        cached = cache.get(argv) if cacheable and use_cache else None
+        if cached is not None:
+            trace.instant(command_name(argv), cat="cache hit", argv=" ".join(cassette.redact_argv(argv)))
+            result = CmdResult(argv, *cached, duration=0.0)
+            if check:
+                result.check_returncode()
+            return result
+
+        policy = retry or RetryPolicy()
+        attempt = 0
+        while True:
+            attempt += 1
+            # Wait for ARM rate budget outside of the concurrency limit, so
+            # that waiting doesn't hold up commands which aren't ARM-bound.
+            tape = cassette.current()
+            delay = arm_governor.reserve_for_argv(argv) if tape is None or not tape.replaying else 0.0
+            if delay > 0:
+                with trace.span("ARM rate limit", cat="wait", parallel=True, delay=delay):
+                    await asyncio.sleep(deadline.bounded(delay))
+            attempt_timeout = deadline.command_timeout(timeout)
+            try:
+                # Only a timeout of the caller's own keeps a command off the in-process backend, the
+                # run's budget is checked after in-process calls instead of killing them
+                result = await self._run_once(
+                    argv, capture, stream, echo_stderr, prefix, attempt_timeout, env, cwd, inprocess_ok=not timeout
+                )
+            except subprocess.TimeoutExpired as e:
+                budget = deadline.current()
+                if budget is not None and attempt_timeout != timeout:
+                    # Killed because the run's budget ran out
+                    raise budget.exceeded() from e
+                raise
+            if result.returncode == 0:
+                break
+            # Without captured stderr there is nothing to classify
+            kind = retry_policy.classify(result.stderr) if capture else retry_policy.UNKNOWN
+            if not policy.should_retry(attempt, kind):
+                break
+            delay = policy.backoff(attempt, retry_policy.parse_retry_after(result.stderr))
+            print(
+                f"{prefix}Command failed ({kind}, attempt {attempt}/{policy.max_attempts}), "
+                f"retrying in {delay:.1f}s: {' '.join(cassette.redact_argv(argv))}",
+                file=sys.stderr,
+                flush=True,
+            )
+            with trace.span("retry backoff", cat="wait", parallel=True, attempt=attempt, kind=kind):
+                await asyncio.sleep(deadline.bounded(delay))
+
+        if cacheable:
+            cache.store(argv, result.returncode, result.stdout, result.stderr)
+        elif cache is not None:
+            cache.invalidate_for(argv)
+        if check:
+            result.check_returncode()
+        return result
+
+    async def _run_once(
+        self,
+        argv: List[str],
+        capture: bool,
+        stream: bool,
+        echo_stderr: bool,
+        prefix: str,
+        timeout: float | None,
+        env: Dict[str, str] | None,
+        cwd: str | None,
+        inprocess_ok: bool = True,
+    ) -> CmdResult:
+        async with self._get_semaphore():
+            shown = " ".join(cassette.redact_argv(argv))
+            with trace.span(command_name(argv), cat="command", parallel=True, argv=shown) as span:
+                start = time.monotonic()
+                returncode, stdout, stderr = await self._dispatch(
+                    argv, capture, stream, echo_stderr, prefix, timeout, env, cwd, inprocess_ok
+                )
+                span["returncode"] = returncode
+
+        return CmdResult(
+            argv=argv,
+            returncode=returncode,
+            stdout=stdout,
+            stderr=stderr,
+            duration=time.monotonic() - start,
+        )
+
+    async def _dispatch(
+        self,
+        argv: List[str],
+        capture: bool,
+        stream: bool,
+        echo_stderr: bool,
+        prefix: str,
+        timeout: float | None,
+        env: Dict[str, str] | None,
+        cwd: str | None,
+        inprocess_ok: bool = True,
+    ) -> Tuple[int, str, str]:
+        tape = cassette.current()
+        if tape is not None and tape.replaying:
+            return await self._replay(tape, argv, capture, stream, echo_stderr, prefix, timeout, cwd)
+
+        start = time.monotonic()
+        before = tape.watch(argv, cwd) if tape is not None else {}
+        inprocess = inprocess_ok and az_inprocess.can_run_inprocess(argv, env=env, cwd=cwd, stream=stream)
+        if inprocess:
+            returncode, stdout, stderr = await self._run_inprocess(argv, capture, echo_stderr, prefix)
+        else:
+            returncode, stdout, stderr = await self._spawn(
+                argv, capture, stream, echo_stderr, prefix, timeout, env, cwd
+            )
+        if tape is not None:
+            tape.record_command(argv, returncode, stdout, stderr, time.monotonic() - start, before, env=env, cwd=cwd)
+        if inprocess:
+            deadline.check()
+        return returncode, stdout, stderr
+
+    async def _replay(
+        self,
+        tape: cassette.Cassette,
+        argv: List[str],
+        capture: bool,
+        stream: bool,
+        echo_stderr: bool,
+        prefix: str,
+        timeout: float | None,
+        cwd: str | None,
+    ) -> Tuple[int, str, str]:
+        returncode, stdout, stderr, latency = tape.replay_command(argv, cwd)
+        if timeout is not None and latency > timeout:
+            await asyncio.sleep(timeout)
+            raise subprocess.TimeoutExpired(argv, timeout)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        for text, echo, to in ((stdout, stream, sys.stdout), (stderr, stream or echo_stderr, sys.stderr)):
+            if (echo or not capture) and text:
+                to.write("".join(f"{prefix}{line}" for line in text.splitlines(keepends=True)))
+                to.flush()
+        if not capture:
+            return returncode, "", ""
+        return returncode, stdout, stderr
+
+    async def _spawn(
+        self,
+        argv: List[str],
+        capture: bool,
+        stream: bool,
+        echo_stderr: bool,
+        prefix: str,
+        timeout: float | None,
+        env: Dict[str, str] | None,
+        cwd: str | None,
+    ) -> Tuple[int, str, str]:
+        pipe = asyncio.subprocess.PIPE if capture else None
+        sys.stdout.flush()
+        sys.stderr.flush()
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=pipe,
+            stderr=pipe,
+            env=env,
+            cwd=cwd,
+            limit=_STREAM_LIMIT,
+        )
+
+        async def communicate():
+            return await asyncio.gather(
+                _read_stream(proc.stdout, sys.stdout if stream else None, prefix),
+                _read_stream(proc.stderr, sys.stderr if stream or echo_stderr else None, prefix),
+                proc.wait(),
+            )
+
+        try:
+            stdout, stderr, returncode = await asyncio.wait_for(communicate(), timeout)
+        except asyncio.TimeoutError:
+            _kill(proc)
+            await proc.wait()
+            raise subprocess.TimeoutExpired(argv, timeout)  # type: ignore[arg-type]
+        except BaseException:
+            # Includes cancellation: never leave an orphaned child behind.
+            _kill(proc)
+            await proc.wait()
+            raise
+        return returncode, stdout, stderr
+
+    async def _run_inprocess(
+        self,
+        argv: List[str],
+        capture: bool,
+        echo_stderr: bool,
+        prefix: str,
+    ) -> Tuple[int, str, str]:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        loop = asyncio.get_running_loop()
+        returncode, stdout, stderr = await loop.run_in_executor(
+            az_inprocess.get_worker(), az_inprocess.invoke, argv, capture
+        )
+        if echo_stderr and stderr:
+            sys.stderr.write("".join(f"{prefix}{line}" for line in stderr.splitlines(keepends=True)))
+            sys.stderr.flush()
+        return returncode, stdout, stderr
+
+    async def run_all(self, argvs: Sequence[Sequence[str]], **kwargs) -> List[CmdResult]:
+        """
+        Run all commands concurrently (bounded by max_concurrency), returning
+        results in the order of argvs.  If any command raises (for example a
+        failure with check=True), the remaining ones are cancelled.
+        """
+        tasks = [asyncio.ensure_future(self.run(argv, **kwargs)) for argv in argvs]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+def run_sync(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Run an executor coroutine from synchronous code.
+    """
+    return asyncio.run(coro)
+
+
+def execute(argv: Sequence[str], **kwargs) -> CmdResult:
+    """
+    Synchronously run a single command, see CmdExecutor.run for options.
+    """
+    return run_sync(CmdExecutor(1).run(argv, **kwargs))
+
+
+def execute_all(argvs: Sequence[Sequence[str]], max_concurrency: int | None = None, **kwargs) -> List[CmdResult]:
+    """
+    Synchronously run several independent commands in parallel, see CmdExecutor.run_all.
+    """
+    if not argvs:
+        return []
+    return run_sync(CmdExecutor(max_concurrency).run_all(argvs, **kwargs))
@@ -0,0 +1,218 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+CPU and memory usage of running container groups, from Azure Monitor.
+
+While `aci monitor --metrics` watches a deployment, every container group is
+sampled at a fixed interval.  Each sample asks for the last hour of one
+minute CpuUsage and MemoryUsage points split by container, so a missed or
+late sample loses nothing and later samples refine the current minute.  The
+resulting time series is summarised against the resources.requests each
+container declares, with a suggested request of peak usage plus headroom.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from c_aci_testing.utils import deadline
+from c_aci_testing.utils.arm import (
+    ArmError,
+    get_arm_client,
+    map_concurrently,
+    resource_properties,
+    use_arm_client,
+)
+from c_aci_testing.utils.cmd_executor import execute_all
+
+METRIC_NAMES = ("CpuUsage", "MemoryUsage")
+WINDOW = timedelta(hours=1)
+
+# Headroom over peak usage for the suggested requests, and their granularity
+HEADROOM = 0.25
+CPU_STEP = 0.1
+MEMORY_STEP_GB = 0.1
+
+_BYTES_PER_GB = 1024**3
+
+
+def query_metrics(group_ids: Sequence[str]) -> List[Optional[dict]]:
+    """
+    Recent metrics of each container group, None where the query failed.
+    """
+    if use_arm_client():
+        end = datetime.now(timezone.utc).replace(microsecond=0)
+        timespan = f"{(end - WINDOW).isoformat()}/{end.isoformat()}"
+
+        def get(group_id: str) -> Optional[dict]:
+            try:
+                return get_arm_client().get_metrics(
+                    group_id, METRIC_NAMES, timespan, filter="containerName eq '*'"
+                )
+            except ArmError as e:
+                print(f"Failed to get metrics of {group_id}: {e}", file=sys.stderr, flush=True)
+                return None
+
+        return map_concurrently(get, group_ids)
+
+    results = execute_all([
+        [
+            "az", "monitor", "metrics", "list",
+            "--resource", group_id,
+            "--metrics", *METRIC_NAMES,
+            "--interval", "PT1M",
+            "--aggregation", "Average", "Maximum",
+            "--filter", "containerName eq '*'",
+            "--offset", f"{WINDOW.total_seconds() / 3600:.0f}h",
+            "-o", "json",
+        ]
+        for group_id in group_ids
+    ], echo_stderr=True)
+    return [json.loads(res.stdout or "{}") if res.returncode == 0 else None for res in results]
+
+
+def parse_metrics(group_name: str, metrics: dict) -> List[dict]:
+    """
+    Samples of one container group's metrics response, one per container and minute.
+    """
+    samples: Dict[Tuple[str, str], dict] = {}
+    for metric in metrics.get("value") or []:
+        name = (metric.get("name") or {}).get("value")
+        if name not in METRIC_NAMES:
+            continue
+        for series in metric.get("timeseries") or []:
+            container = next(
+                (
+                    m.get("value")
+                    for m in series.get("metadatavalues") or []
+                    if (m.get("name") or {}).get("value", "").lower() == "containername"
+                ),
+                "",
+            )
+            for point in series.get("data") or []:
+                value = point.get("maximum", point.get("average"))
+                if value is None:
+                    continue
+                sample = samples.setdefault(
+                    (container, point["timeStamp"]),
+                    {"time": point["timeStamp"], "container_group": group_name, "container": container},
+                )
+                if name == "CpuUsage":
+                    # millicores
+                    sample["cpu"] = value / 1000
+                else:
+                    sample["memory_gb"] = value / _BYTES_PER_GB
+    return list(samples.values())
+
+
+def sample_metrics(
+    group_ids: Sequence[str],
+    duration_secs: float = 0,
+    interval_secs: float = 60,
+    stop: threading.Event | None = None,
+) -> List[dict]:
+    """
+    Sample the metrics of the container groups every interval_secs, for
+    duration_secs or until stop is set, whichever comes first.  With
+    neither, sample once.
+
+    :return: Samples ordered by time
+    """
+    group_names = [group_id.split("/")[-1] for group_id in group_ids]
+    samples: Dict[Tuple[str, str, str], dict] = {}
+    end = time.monotonic() + duration_secs if duration_secs else None
+
+    while True:
+        for group_name, metrics in zip(group_names, query_metrics(group_ids)):
+            for sample in parse_metrics(group_name, metrics or {}):
+                # Later samples have a more complete view of the same minute
+                samples[(sample["container_group"], sample["container"], sample["time"])] = sample
+
+        if stop is None and end is None:
+            break
+        if (stop is not None and stop.is_set()) or (end is not None and time.monotonic() >= end):
+            break
+        wait = interval_secs if end is None else max(0.0, min(interval_secs, end - time.monotonic()))
+        if stop is None:
+            deadline.sleep(wait)
+        else:
+            stop.wait(deadline.bounded(wait))
+            deadline.check()
+
+    return sorted(samples.values(), key=lambda s: (s["time"], s["container_group"], s["container"]))
+
+
+def _suggest(peak: Optional[float], step: float) -> Optional[float]:
+    if peak is None:
+        return None
+    return round(max(step, math.ceil(peak * (1 + HEADROOM) / step) * step), 2)
+
+
+def summarize(groups: Sequence[dict], samples: Sequence[dict]) -> List[dict]:
+    """
+    Peak and average usage of every container compared to its requests.
+    """
+    summary = []
+    for group in groups:
+        group_name = group.get("name", "")
+        for container in resource_properties(group).get("containers") or []:
+            requests = (resource_properties(container).get("resources") or {}).get("requests") or {}
+            own = [s for s in samples if s["container_group"] == group_name and s["container"] == container["name"]]
+            cpu = [s["cpu"] for s in own if "cpu" in s]
+            memory = [s["memory_gb"] for s in own if "memory_gb" in s]
+            cpu_peak = max(cpu) if cpu else None
+            memory_peak = max(memory) if memory else None
+            summary.append({
+                "container_group": group_name,
+                "container": container["name"],
+                "samples": len(own),
+                "cpu_request": requests.get("cpu"),
+                "cpu_peak": cpu_peak,
+                "cpu_average": sum(cpu) / len(cpu) if cpu else None,
+                "suggested_cpu": _suggest(cpu_peak, CPU_STEP),
+                "memory_request_gb": requests.get("memoryInGB"),
+                "memory_peak_gb": memory_peak,
+                "memory_average_gb": sum(memory) / len(memory) if memory else None,
+                "suggested_memory_gb": _suggest(memory_peak, MEMORY_STEP_GB),
+            })
+    return summary
+
+
+def format_summary(summary: Sequence[dict]) -> str:
+    def fmt(value: Optional[float]) -> str:
+        return f"{value:.2f}" if value is not None else "-"
+
+    def usage(peak: Optional[float], request: Optional[float]) -> str:
+        if peak is None or not request:
+            return fmt(peak)
+        return f"{fmt(peak)} ({peak / request:.0%})"
+
+    lines = [
+        "Container resource usage (peak vs requests):",
+        f"  {'container':<40} {'cpu req':>8} {'cpu peak':>14} {'suggest':>8}"
+        f" {'mem GB req':>10} {'mem GB peak':>14} {'suggest':>8}",
+    ]
+    for entry in summary:
+        name = f"{entry['container_group']}/{entry['container']}"
+        lines.append(
+            f"  {name:<40} {fmt(entry['cpu_request']):>8}"
+            f" {usage(entry['cpu_peak'], entry['cpu_request']):>14} {fmt(entry['suggested_cpu']):>8}"
+            f" {fmt(entry['memory_request_gb']):>10}"
+            f" {usage(entry['memory_peak_gb'], entry['memory_request_gb']):>14}"
+            f" {fmt(entry['suggested_memory_gb']):>8}"
+        )
+    return "\n".join(lines)
+
+
+def write_metrics(path: str, samples: Sequence[dict], summary: Sequence[dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"samples": list(samples), "summary": list(summary)}, f, indent=2)
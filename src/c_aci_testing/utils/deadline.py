@@ -0,0 +1,187 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Overall time budget for a target run.
+
+A RunBudget is activated for the duration of a run and split into named
+stages.  While it is active every external command gets the remaining
+budget as its timeout (and is killed when it runs out), and polling loops
+sleep through deadline.sleep(), so a hung stage raises DeadlineExceeded
+instead of blocking a CI runner forever.  Cleanup runs in its own grace
+budget so that it still happens after the deadline has passed.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from c_aci_testing.utils import trace
+
+DEFAULT_CLEANUP_SECS = 600
+
+
+class DeadlineExceeded(TimeoutError):
+    def __init__(self, budget: "RunBudget"):
+        self.stage = budget.current_stage
+        self.deadline_secs = budget.total_secs
+        stage = f" during {self.stage}" if self.stage else ""
+        super().__init__(f"Deadline of {budget.total_secs:.0f}s exceeded{stage}")
+
+
+@dataclass
+class StageRecord:
+    name: str
+    duration: float
+    status: str
+
+
+class RunBudget:
+    """
+    :param total_secs: Budget for the whole run, 0 or None for no deadline
+    :param cleanup_secs: Separate budget for each cleanup stage
+    """
+
+    def __init__(self, total_secs: float | None = None, cleanup_secs: float = DEFAULT_CLEANUP_SECS):
+        self.total_secs = total_secs or 0
+        self.cleanup_secs = cleanup_secs
+        self.start = time.monotonic()
+        self.deadline = self.start + self.total_secs if self.total_secs else None
+        self.current_stage: Optional[str] = None
+        self.stages: List[StageRecord] = []
+        self.exceeded_in: Optional[str] = None
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def check(self):
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise self.exceeded()
+
+    def exceeded(self) -> DeadlineExceeded:
+        """
+        Record that the budget ran out in the current stage.
+        """
+        if self.exceeded_in is None:
+            self.exceeded_in = self.current_stage
+        return DeadlineExceeded(self)
+
+    @contextmanager
+    def activate(self) -> Iterator[RunBudget]:
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time a stage of the run, failing immediately if no budget is left.
+        """
+        previous, self.current_stage = self.current_stage, name
+        start = time.monotonic()
+        status = "ok"
+        try:
+            self.check()
+            with trace.span(name, cat="stage"):
+                yield
+        except DeadlineExceeded:
+            status = "deadline exceeded"
+            if self.exceeded_in is None:
+                self.exceeded_in = name
+            raise
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            self.stages.append(StageRecord(name, time.monotonic() - start, status))
+            self.current_stage = previous
+
+    @contextmanager
+    def cleanup_stage(self, name: str) -> Iterator[None]:
+        """
+        Like stage(), but with a fresh budget of cleanup_secs, so that cleanup
+        still runs when the run's deadline has already passed.
+        """
+        grace = RunBudget(self.cleanup_secs if self.deadline is not None else None)
+        try:
+            with grace.activate(), grace.stage(name):
+                yield
+        finally:
+            self.stages.extend(grace.stages)
+
+    def report(self) -> str:
+        lines = ["Run stages:"]
+        for record in self.stages:
+            lines.append(f"  {record.name:<24} {record.duration:8.1f}s  {record.status}")
+        elapsed = time.monotonic() - self.start
+        if self.deadline is not None:
+            lines.append(f"  {'total':<24} {elapsed:8.1f}s  of {self.total_secs:.0f}s budget")
+        else:
+            lines.append(f"  {'total':<24} {elapsed:8.1f}s")
+        if self.exceeded_in:
+            consumed = sum(r.duration for r in self.stages if r.name == self.exceeded_in)
+            lines.append(f"Budget exhausted by stage {self.exceeded_in} ({consumed:.1f}s)")
+        return os.linesep.join(lines)
+
+
+_current: contextvars.ContextVar[Optional[RunBudget]] = contextvars.ContextVar("run_budget", default=None)
+
+
+def current() -> Optional[RunBudget]:
+    return _current.get()
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left in the active run budget, None if there is no deadline.
+    """
+    budget = _current.get()
+    return budget.remaining() if budget is not None else None
+
+
+def check():
+    budget = _current.get()
+    if budget is not None:
+        budget.check()
+
+
+def command_timeout(timeout: float | None) -> float | None:
+    """
+    Timeout for a command about to be started: the smaller of its own timeout
+    and the remaining budget.  Raises DeadlineExceeded if none is left.
+    """
+    check()
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def bounded(secs: float) -> float:
+    """
+    secs, cut short to what is left of the budget.
+    """
+    left = remaining()
+    return secs if left is None else max(0.0, min(secs, left))
+
+
+def sleep(secs: float):
+    """
+    time.sleep() for polling loops, raising DeadlineExceeded instead of
+    sleeping past the deadline.
+    """
+    with trace.span("sleep", cat="wait", secs=secs):
+        time.sleep(bounded(secs))
+    check()
@@ -0,0 +1,119 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Parameter values of a run held in memory instead of written to the target's
+bicepparam file.
+
+target run, vn2 run and vm deploy set location, managedIDName, registry,
+repository, tag and ccePolicies in the checked-in bicepparam file, so runs of
+one target from one checkout race on it.  Within run_overlay() (enabled with
+--param-overlay or CACI_PARAM_OVERLAY=1, and always by bench with a
+concurrency above 1) aci_param_set records the values in an overlay of the
+run instead.  The bicepparam file is still compiled as is (and cached), and
+the overlay is applied to the compiled parameters, which aci deploy submits
+as private temporary ARM template and parameters files.
+
+Overlays are per context, so concurrent runs in threads each have their own.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from c_aci_testing.utils import bicepparam
+
+PARAM_OVERLAY_ENV = "CACI_PARAM_OVERLAY"
+
+
+def use_overlay() -> bool:
+    return os.getenv(PARAM_OVERLAY_ENV, "").lower() in ("1", "true", "yes")
+
+
+class ParamOverlay:
+    def __init__(self):
+        # bicepparam file path -> parameter name -> value as aci_param_set takes it
+        self._values: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, bicepparam_file_path: str, parameters: Dict[str, str], add: bool = True):
+        """
+        Same as aci_param_set, without writing the file.
+        """
+        path = os.path.abspath(bicepparam_file_path)
+        params = bicepparam.parse(_read(path))
+        with self._lock:
+            values = self._values.setdefault(path, {})
+            for name, value in parameters.items():
+                if add or name in params or name in values:
+                    values[name] = value
+
+    def values(self, bicepparam_file_path: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._values.get(os.path.abspath(bicepparam_file_path), {}))
+
+    def fingerprint(self, bicepparam_file_path: str) -> str:
+        values = self.values(bicepparam_file_path)
+        return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest() if values else ""
+
+    def apply(self, bicepparam_file_path: str, parameters_json: dict) -> dict:
+        """
+        The compiled parameters of the bicepparam file with the overlay's values.
+        """
+        values = self.values(bicepparam_file_path)
+        if not values:
+            return parameters_json
+        params = bicepparam.parse(_read(bicepparam_file_path))
+        parameters = dict(parameters_json.get("parameters", {}))
+        for name, value in values.items():
+            param = params.get(name)
+            parameters[name] = {"value": bicepparam.value_of(value, param.is_string if param else None)}
+        return {**parameters_json, "parameters": parameters}
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+_current: contextvars.ContextVar[Optional[ParamOverlay]] = contextvars.ContextVar("param_overlay", default=None)
+
+
+def current() -> Optional[ParamOverlay]:
+    return _current.get()
+
+
+@contextmanager
+def run_overlay(enabled: bool = False) -> Iterator[Optional[ParamOverlay]]:
+    """
+    Hold parameter values in a fresh overlay until exit if enabled (or
+    CACI_PARAM_OVERLAY is set), unless the caller already has one.
+    """
+    overlay = current()
+    if overlay is not None or not (enabled or use_overlay()):
+        yield overlay
+        return
+    overlay = ParamOverlay()
+    token = _current.set(overlay)
+    try:
+        yield overlay
+    finally:
+        _current.reset(token)
+
+
+def apply(bicepparam_file_path: str, parameters_json: dict) -> dict:
+    overlay = current()
+    return parameters_json if overlay is None else overlay.apply(bicepparam_file_path, parameters_json)
+
+
+def fingerprint(bicepparam_file_path: str) -> str:
+    overlay = current()
+    return "" if overlay is None else overlay.fingerprint(bicepparam_file_path)
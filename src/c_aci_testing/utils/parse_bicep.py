@@ -7,65 +7,266 @@
 from __future__ import annotations
 
 import base64
+import copy
+import functools
+import math
 import traceback
 import json
-import subprocess
 import sys
-from typing import Iterable, Tuple, Any, Dict, List
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Any, Dict, List, Union
 
 from c_aci_testing.tools.aci_param_set import aci_param_set
+from c_aci_testing.utils.bicep_build import build_params
 from c_aci_testing.utils.find_bicep import find_bicep_files
-from c_aci_testing.utils.arm_expression import evaluate_expr
+from c_aci_testing.utils.arm_expression import evaluate_template_string
 
 
-def _resolve_arm_functions(
-    templateJson: Dict[str, Any], parametersJson: Dict[str, Any], resource_group, subscription, deployment_name
-):
-    parameters_defaults_dict = {
-        key: value.get("defaultValue", None) for key, value in templateJson["parameters"].items()
-    }
-    parameters_dict = {key: value["value"] for key, value in parametersJson["parameters"].items()}
-    parameters = {}
-    parameters.update(parameters_defaults_dict)
-    parameters.update(parameters_dict)
+# A copy loop's iteration, by loop name, and None for the resource's own loop
+CopyIndices = Dict[Optional[str], int]
+
+# ARM allows at most 800 iterations
+MAX_COPY_COUNT = 800
+
+
+def _string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+def _bool(value: Any) -> bool:
+    if isinstance(value, str):
+        if value.lower() not in ("true", "false"):
+            raise ValueError(f"Cannot convert '{value}' to bool")
+        return value.lower() == "true"
+    return bool(value)
+
+
+def _union(*args: Any) -> Any:
+    if all(isinstance(arg, dict) for arg in args):
+        merged: Dict[str, Any] = {}
+        for arg in args:
+            merged.update(arg)
+        return merged
+    items: List[Any] = []
+    for arg in args:
+        items.extend(item for item in arg if item not in items)
+    return items
+
+
+def _intersection(first: Any, *others: Any) -> Any:
+    if isinstance(first, dict):
+        return {k: v for k, v in first.items() if all(k in o and o[k] == v for o in others)}
+    items: List[Any] = []
+    for item in first:
+        if item not in items and all(item in o for o in others):
+            items.append(item)
+    return items
 
-    variables = templateJson.get("variables", {}) or {}
 
-    def _handle_func(func_name: str, args: List[Any]) -> Any:
+def _min_max(func: Callable[..., Any]) -> Callable[..., Any]:
+    # Takes either an array or several integers
+    return lambda *args: func(args[0] if len(args) == 1 and isinstance(args[0], list) else args)
+
+
+def _split(value: str, delimiters: Union[str, List[str]]) -> List[str]:
+    parts = [value]
+    for delimiter in [delimiters] if isinstance(delimiters, str) else delimiters:
+        parts = [piece for part in parts for piece in part.split(delimiter)]
+    return parts
+
+
+def _contains(container: Any, item: Any) -> bool:
+    if isinstance(container, dict):
+        return any(key.lower() == str(item).lower() for key in container)
+    if isinstance(container, str):
+        return _string(item) in container
+    return item in container
+
+
+def _index_of(value: str, search: str, last: bool = False) -> int:
+    value, search = value.lower(), search.lower()
+    return value.rfind(search) if last else value.find(search)
+
+
+# ARM functions which only depend on their arguments
+_ARM_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "length": len,
+    "range": lambda start, count: list(range(start, start + count)),
+    "union": _union,
+    "intersection": _intersection,
+    "string": _string,
+    "int": int,
+    "bool": _bool,
+    "true": lambda: True,
+    "false": lambda: False,
+    "json": json.loads,
+    "array": lambda value: value if isinstance(value, list) else [value],
+    "items": lambda obj: [{"key": key, "value": obj[key]} for key in sorted(obj, key=str.lower)],
+    "mul": lambda a, b: a * b,
+    # Integer division and remainder truncate towards zero
+    "div": lambda a, b: int(a / b),
+    "mod": lambda a, b: int(math.fmod(a, b)),
+    "min": _min_max(min),
+    "max": _min_max(max),
+    "and": lambda *args: all(args),
+    "or": lambda *args: any(args),
+    "greater": lambda a, b: a > b,
+    "greaterOrEquals": lambda a, b: a >= b,
+    "less": lambda a, b: a < b,
+    "lessOrEquals": lambda a, b: a <= b,
+    "coalesce": lambda *args: next((arg for arg in args if arg is not None), None),
+    "contains": _contains,
+    "first": lambda value: value[0] if value else None,
+    "last": lambda value: value[-1] if value else None,
+    "take": lambda value, count: value[: max(count, 0)],
+    "skip": lambda value, count: value[max(count, 0) :],
+    "join": lambda items, delimiter: delimiter.join(_string(item) for item in items),
+    "split": _split,
+    "replace": lambda value, old, new: value.replace(old, new),
+    "substring": lambda value, start, length=None: value[start:] if length is None else value[start : start + length],
+    "toLower": lambda value: value.lower(),
+    "toUpper": lambda value: value.upper(),
+    "trim": lambda value: value.strip(),
+    "padLeft": lambda value, total, char=" ": _string(value).rjust(total, char),
+    # Comparisons of strings are case insensitive
+    "startsWith": lambda value, prefix: value.lower().startswith(prefix.lower()),
+    "endsWith": lambda value, suffix: value.lower().endswith(suffix.lower()),
+    "indexOf": _index_of,
+    "lastIndexOf": lambda value, search: _index_of(value, search, last=True),
+}
+
+
+class ArmReferenceCycleError(ValueError):
+    """
+    A parameter or variable refers to itself, directly or through others.
+    """
+
+
+def _cycle_cause(e: BaseException | None) -> ArmReferenceCycleError | None:
+    # Errors of nested expressions are wrapped by each enclosing expression
+    while e is not None:
+        if isinstance(e, ArmReferenceCycleError):
+            return e
+        e = e.__cause__
+    return None
+
+
+class ArmTemplateResolver:
+    """
+    Resolves the expressions of an ARM template on demand.
+
+    Only what is asked for is resolved, e.g. resources(CONTAINER_GROUP_TYPES)
+    doesn't touch the vnets, storage accounts and identities of a template.
+    Parameters and variables are resolved the first time they are referenced
+    and memoized, references which form a cycle raise ArmReferenceCycleError.
+
+    Copy loops of resources, properties and variables are expanded, resources
+    one iteration at a time.  Expressions which don't use copyIndex() are
+    resolved once and shared by every iteration.
+    """
+
+    def __init__(
+        self,
+        templateJson: Dict[str, Any],
+        parametersJson: Dict[str, Any],
+        resource_group: str,
+        subscription: str,
+        deployment_name: str,
+    ):
+        self.template_json = templateJson
+        self.resource_group = resource_group
+        self.subscription = subscription
+        self.deployment_name = deployment_name
+
+        self._raw: Dict[str, Dict[str, Any]] = {
+            "parameters": {key: value.get("defaultValue", None) for key, value in templateJson["parameters"].items()},
+            "variables": templateJson.get("variables", {}) or {},
+        }
+        self._raw["parameters"].update({key: value["value"] for key, value in parametersJson["parameters"].items()})
+        # Variable copy loops define a variable each
+        variable_copies = self._raw["variables"].get("copy")
+        if isinstance(variable_copies, list):
+            self._raw["variables"] = {k: v for k, v in self._raw["variables"].items() if k != "copy"}
+            self._variable_copies = {loop["name"]: loop for loop in variable_copies}
+        else:
+            self._variable_copies = {}
+        self._resolved: Dict[Tuple[str, str], Any] = {}
+        self._resolving: List[Tuple[str, str]] = []
+        # Template strings which don't depend on copyIndex() resolve the same everywhere
+        self._expressions: Dict[str, Any] = {}
+
+    def _reference(self, kind: str, name: str) -> Any:
+        key = (kind, name)
+        if key in self._resolved:
+            return self._resolved[key]
+        copy_loop = self._variable_copies.get(name) if kind == "variables" else None
+        if name not in self._raw[kind] and copy_loop is None:
+            raise ValueError(f"Invalid {kind[:-1]}: {name}")
+        if key in self._resolving:
+            cycle = self._resolving[self._resolving.index(key) :] + [key]
+            raise ArmReferenceCycleError("Circular reference: " + " -> ".join(f"{k}('{n}')" for k, n in cycle))
+        self._resolving.append(key)
+        try:
+            value = self._copy_loop(copy_loop, {}) if copy_loop is not None else self.resolve(self._raw[kind][name])
+        finally:
+            self._resolving.pop()
+        self._resolved[key] = value
+        return value
+
+    def parameter(self, name: str) -> Any:
+        return self._reference("parameters", name)
+
+    def variable(self, name: str) -> Any:
+        return self._reference("variables", name)
+
+    def _handle_func(self, func_name: str, args: List[Any], indices: Optional[CopyIndices] = None) -> Any:
         """
         Handle ARM functions. All args are already evaluated
         """
         if func_name == "concat":
+            if args and all(isinstance(arg, list) for arg in args):
+                return [item for arg in args for item in arg]
             assert all(isinstance(arg, str) for arg in args)
             return "".join(args)
+        elif func_name == "copyIndex":
+            assert len(args) <= 2
+            loop = args[0] if args and isinstance(args[0], str) else None
+            offset = args[-1] if args and isinstance(args[-1], int) else 0
+            if indices is None or loop not in indices:
+                raise ValueError(f"copyIndex({loop or ''}) outside of its copy loop")
+            return indices[loop] + offset
         elif func_name == "subscription":
             return {
-                "subscriptionId": subscription,
+                "subscriptionId": self.subscription,
             }
         elif func_name == "resourceGroup":
             return {
-                "name": resource_group,
+                "name": self.resource_group,
             }
         elif func_name == "deployment":
             return {
-                "name": deployment_name,
+                "name": self.deployment_name,
             }
         elif func_name == "resourceId":
             assert all(isinstance(arg, str) for arg in args)
             if len(args) == 3:
-                return f"/subscriptions/{subscription}/resourceGroups/{args[0]}/providers/{args[1]}/{args[2]}"
+                return f"/subscriptions/{self.subscription}/resourceGroups/{args[0]}/providers/{args[1]}/{args[2]}"
             elif len(args) == 2:
-                return f"/subscriptions/{subscription}/resourceGroups/{resource_group}/providers/{args[0]}/{args[1]}"
+                return (
+                    f"/subscriptions/{self.subscription}/resourceGroups/{self.resource_group}"
+                    f"/providers/{args[0]}/{args[1]}"
+                )
         elif func_name == "parameters":
             assert len(args) == 1 and isinstance(args[0], str)
-            if args[0] not in parameters:
-                raise ValueError(f"Invalid parameter: {args[0]}")
-            return parameters[args[0]]
+            return self.parameter(args[0])
         elif func_name == "variables":
             assert len(args) == 1 and isinstance(args[0], str)
-            if args[0] not in variables:
-                raise ValueError(f"Invalid variable: {args[0]}")
-            return variables[args[0]]
+            return self.variable(args[0])
         elif func_name == "if":
             assert len(args) == 3
             assert isinstance(args[0], bool)
@@ -74,8 +275,8 @@ def _resolve_arm_functions(
             else:
                 return args[2]
         elif func_name == "empty":
-            assert len(args) == 1 and isinstance(args[0], str)
-            return args[0] == ""
+            assert len(args) == 1 and isinstance(args[0], (str, list, dict, type(None)))
+            return not args[0]
         elif func_name == "format":
             assert len(args) >= 1
             assert isinstance(args[0], str)
@@ -127,6 +328,8 @@ def _resolve_arm_functions(
         elif func_name == "null":
             assert len(args) == 0
             return None
+        elif func_name in _ARM_FUNCTIONS:
+            return _ARM_FUNCTIONS[func_name](*args)
         else:
             ret_str = f"{func_name}("
             first = True
@@ -143,44 +346,117 @@ def _resolve_arm_functions(
             print(f"Warning: Unknown function: {ret_str}", file=sys.stderr, flush=True)
             return ret_str
 
-    def _resolve_val(val: Any) -> Any:
-        if isinstance(val, str) and val.startswith("[") and val.endswith("]"):
+    def resolve(self, val: Any, indices: Optional[CopyIndices] = None) -> Any:
+        """
+        Resolve the expressions in a value of the template, in the given
+        iterations of the copy loops it is in.
+        """
+        if isinstance(val, str) and val.startswith("["):
+            shared = "copyIndex" not in val
+            if shared and val in self._expressions:
+                return self._expressions[val]
+            handle_func = self._handle_func if shared else functools.partial(self._handle_func, indices=indices)
             try:
-                return evaluate_expr(val[1:-1], _handle_func)
-            except Exception:
+                result = evaluate_template_string(val, handle_func)
+            except Exception as e:
+                cycle = _cycle_cause(e)
+                if cycle is not None:
+                    raise cycle from None
                 sys.stdout.flush()
                 print(f"Warning: Failed to parse expression '{val}':", flush=True, file=sys.stderr)
                 traceback.print_exc()
-                return val
+                result = val
+            if shared:
+                self._expressions[val] = result
+            return result
         elif isinstance(val, list):
-            return [_resolve_val(v) for v in val]
+            return [self.resolve(v, indices) for v in val]
         elif isinstance(val, dict):
-            return {_resolve_val(k): _resolve_val(v) for k, v in val.items()}
+            resolved = {self.resolve(k, indices): self.resolve(v, indices) for k, v in val.items() if k != "copy"}
+            if "copy" not in val:
+                return resolved
+            if not isinstance(val["copy"], list):
+                # Only property copy loops are lists, keep anything else as is
+                return {**resolved, "copy": self.resolve(val["copy"], indices)}
+            for loop in val["copy"]:
+                resolved[loop["name"]] = self._copy_loop(loop, indices or {})
+            return resolved
         else:
             return val
 
-    for k in parameters.keys():
-        parameters[k] = _resolve_val(parameters[k])
+    def _copy_count(self, loop: dict, indices: CopyIndices) -> int:
+        count = self.resolve(loop.get("count"), indices)
+        if isinstance(count, bool) or not isinstance(count, int) or not 0 <= count <= MAX_COPY_COUNT:
+            raise ValueError(f"Invalid count of copy loop '{loop.get('name')}': {count}")
+        return count
+
+    def _copy_loop(self, loop: dict, indices: CopyIndices) -> List[Any]:
+        """
+        The values of a property or variable copy loop.
+        """
+        name = loop["name"]
+        return [self.resolve(loop["input"], {**indices, name: i}) for i in range(self._copy_count(loop, indices))]
+
+    def _expand(self, resource: dict) -> Iterator[dict]:
+        """
+        The deployed instances of a resource, i.e. one per iteration of its copy
+        loop and none if its condition is false.
+        """
+        loop = resource.get("copy")
+        if isinstance(loop, dict):
+            resource = {k: v for k, v in resource.items() if k != "copy"}
+            count = self._copy_count(loop, {})
+            iterations: Iterable[CopyIndices] = ({None: i, loop.get("name"): i} for i in range(count))
+        else:
+            iterations = [{}]
+        for indices in iterations:
+            if "condition" in resource and self.resolve(resource["condition"], indices) is False:
+                continue
+            yield self.resolve(resource, indices)
 
-    return _resolve_val(templateJson)
+    def resources(self, types: Iterable[str] | None = None) -> Iterator[dict]:
+        """
+        The resolved resources, only those of the given types if any.
+        """
+        resources = self.template_json.get("resources") or []
+        # Templates with symbolic names have resources keyed by name
+        if isinstance(resources, dict):
+            resources = resources.values()
+        types = None if types is None else set(types)
+        for resource in resources:
+            if types is not None and self.resolve(resource.get("type")) not in types:
+                continue
+            yield from self._expand(resource)
 
+    def template(self) -> dict:
+        """
+        The whole template, resolved, with its copy loops expanded.
+        """
+        resolved = {}
+        for key, value in self.template_json.items():
+            if key == "variables":
+                names = [*self._raw["variables"], *self._variable_copies]
+                resolved[key] = {name: self.variable(name) for name in names}
+            elif key == "resources":
+                resolved[key] = list(self.resources())
+            else:
+                resolved[self.resolve(key)] = self.resolve(value)
+        return resolved
 
-def parse_bicep(
-    target_path: str,
-    subscription: str,
-    resource_group: str,
-    deployment_name: str,
-    registry: str,
-    repository: str | None,
-    tag: str | None,
-) -> dict:
+
+def _resolve_arm_functions(
+    templateJson: Dict[str, Any], parametersJson: Dict[str, Any], resource_group, subscription, deployment_name
+):
+    return ArmTemplateResolver(templateJson, parametersJson, resource_group, subscription, deployment_name).template()
+
+
+def set_image_parameters(target_path: str, registry: str, repository: str | None, tag: str | None) -> str:
     """
-    Returns ARM template JSON with parameters inlined
+    Set the parameters every target takes in its bicepparam file, and return its path
     """
 
     _, bicepparam_file_path = find_bicep_files(target_path)
 
-    # Set required parameters in bicep param file
     aci_param_set(
         target_path,
         parameters={
@@ -190,35 +466,53 @@ def parse_bicep(
         },
         add=False,  # If the user removed a field, don't re-add it
     )
+    return bicepparam_file_path
+
 
+def resolve_bicep(
+    bicepparam_file_path: str,
+    subscription: str,
+    resource_group: str,
+    deployment_name: str,
+) -> ArmTemplateResolver:
     print("Converting bicep files to an ARM template", flush=True)
     sys.stderr.flush()
-    res = subprocess.run(
-        [
-            "az",
-            "bicep",
-            "build-params",
-            "--file",
-            bicepparam_file_path,
-            "--stdout",
-        ],
-        check=True,
-        stdout=subprocess.PIPE,
-    )
-    res_json = json.loads(res.stdout.decode())
-    arm_template_json = _resolve_arm_functions(
-        json.loads(res_json["templateJson"]),
-        json.loads(res_json["parametersJson"]),
+    template_json, parameters_json = build_params(bicepparam_file_path)
+    return ArmTemplateResolver(
+        template_json,
+        parameters_json,
         resource_group=resource_group,
         subscription=subscription,
         deployment_name=deployment_name,
     )
 
-    return arm_template_json
+
+def parse_bicep(
+    target_path: str,
+    subscription: str,
+    resource_group: str,
+    deployment_name: str,
+    registry: str,
+    repository: str | None,
+    tag: str | None,
+) -> ArmTemplateResolver:
+    """
+    Returns the ARM template, whose parts are resolved with parameters inlined
+    as they are asked for
+    """
+
+    bicepparam_file_path = set_image_parameters(target_path, registry, repository, tag)
+    return resolve_bicep(bicepparam_file_path, subscription, resource_group, deployment_name)
+
+
+CONTAINER_GROUP_TYPES = (
+    "Microsoft.ContainerInstance/containerGroups",
+    "Microsoft.ContainerInstance/containerGroupProfiles",
+)
 
 
 def arm_template_for_each_container_group(
-    arm_template_json: dict,
+    arm_template_json: Union[dict, ArmTemplateResolver],
 ) -> Iterable[Tuple[dict, Iterable[dict]]]:
     """
     Return an iterater of tuples:
@@ -226,15 +520,17 @@ def arm_template_for_each_container_group(
     where:
         - container_group_resource_json is the ARM JSON for a container group
         - containers is an iterable of the containers in the container group
+
+    Only the container groups of an ArmTemplateResolver are resolved.
     """
 
-    for resource in arm_template_json["resources"]:
+    if isinstance(arm_template_json, ArmTemplateResolver):
+        resources = arm_template_json.resources(CONTAINER_GROUP_TYPES)
+    else:
         # Only handle container groups
-        if resource["type"] not in (
-            "Microsoft.ContainerInstance/containerGroups",
-            "Microsoft.ContainerInstance/containerGroupProfiles",
-        ):
-            continue
+        resources = (r for r in arm_template_json["resources"] if r["type"] in CONTAINER_GROUP_TYPES)
+
+    for resource in resources:
 
         def get_containers(group) -> Iterable[dict]:
             if "containers" in group["properties"]:
@@ -245,7 +541,7 @@ def arm_template_for_each_container_group(
 
 
 def arm_template_for_each_container_group_with_fixup(
-    arm_template_json: dict,
+    arm_template_json: Union[dict, ArmTemplateResolver],
 ) -> Iterable[Tuple[dict, Iterable[dict]]]:
     """
     Same interface as arm_template_for_each_container_group, but with some
@@ -254,7 +550,9 @@ def arm_template_for_each_container_group_with_fixup(
 
     for resource, containers in arm_template_for_each_container_group(arm_template_json):
 
-        containers = list(containers)
+        # The template may be shared with other stages, which need the original
+        resource = copy.deepcopy(resource)
+        containers = list(resource["properties"].get("containers", []))
 
         # Workaround for acipolicygen not supporting empty environment variables
         for container in containers:
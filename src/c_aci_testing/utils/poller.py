@@ -0,0 +1,147 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Adaptive polling of long running operations: deployments, load balancer IPs
+and VM bootstrap.
+
+The first checks come quickly, so that an operation failing in seconds (e.g.
+a deployment failing validation) is noticed in seconds, then the interval
+grows by a factor up to a ceiling during long phases.  When the observed
+state changes the operation is checked again immediately, as the next state
+often follows quickly, and the interval starts over.  CACI_POLL_MAX_INTERVAL_SECS
+caps the ceiling of every poller.
+
+The time between a state change and observing it, the detection lag, is
+traced and recorded in the run history, to tune the intervals with.  It is
+exact when the operation reports when its state changed (ARM deployments
+do), otherwise the interval since the previous check bounds it and half of
+that is recorded.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from c_aci_testing.utils import deadline, trace
+
+POLL_MAX_INTERVAL_ENV = "CACI_POLL_MAX_INTERVAL_SECS"
+
+
+def max_interval_override() -> Optional[float]:
+    value = os.getenv(POLL_MAX_INTERVAL_ENV, "")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        print(f"Ignoring invalid {POLL_MAX_INTERVAL_ENV}={value}", file=sys.stderr, flush=True)
+        return None
+
+
+@dataclass
+class Detection:
+    poller: str
+    state: str
+    # Seconds between the state change and its observation
+    lag: float
+    # Whether lag is measured from when the operation reported the change, rather than estimated
+    exact: bool
+    # Checks made until the state was observed
+    polls: int
+
+
+class Poller:
+    """
+    :param name: What is polled, e.g. "deployment", as recorded with detection lags
+    :param initial: Seconds before the first check, and after a state change
+    :param factor: Growth of the interval after each check which saw no change
+    :param max_interval: Ceiling of the interval, lowered by CACI_POLL_MAX_INTERVAL_SECS
+    :param trace_args: Recorded with the traced state changes
+    """
+
+    def __init__(self, name: str, initial: float, factor: float = 1.5, max_interval: float = 15, **trace_args):
+        override = max_interval_override()
+        self.name = name
+        self.max_interval = max_interval if override is None else min(max_interval, override)
+        self.initial = min(initial, self.max_interval)
+        self.factor = factor
+        self.trace_args = trace_args
+        self.interval = self.initial
+        self.polls = 0
+        self.state: Optional[str] = None
+        self.detections: List[Detection] = []
+        self._last_check = time.monotonic()
+
+    def wait(self, at_most: Optional[float] = None):
+        """
+        Sleep until the next check is due, at most at_most seconds.
+        """
+        secs = self.interval if at_most is None else max(0.0, min(self.interval, at_most))
+        if secs > 0:
+            deadline.sleep(secs)
+
+    def observe(self, state: str, changed_at: Optional[float] = None) -> bool:
+        """
+        Record the state seen by a check, changed_at being when the operation
+        says the state changed (seconds since the epoch) if it does.  Returns
+        whether the state changed.
+        """
+        now = time.monotonic()
+        since_last_check, self._last_check = now - self._last_check, now
+        self.polls += 1
+        if state == self.state:
+            self._back_off()
+            return False
+
+        # The change happened after the previous check, which saw another state
+        if changed_at is not None:
+            lag, exact = min(max(0.0, time.time() - changed_at), since_last_check), True
+        else:
+            lag, exact = since_last_check / 2, False
+        detection = Detection(self.name, state, lag, exact, self.polls)
+        self.detections.append(detection)
+        collected = _collected.get()
+        if collected is not None:
+            collected.append(detection)
+        trace.instant(
+            f"{self.name} {state}", cat="poll", lag=round(lag, 3), exact=exact, polls=self.polls, **self.trace_args
+        )
+
+        changed, self.state = self.state is not None, state
+        if changed:
+            # Check again right away, the next state often follows quickly
+            self.interval = 0
+        else:
+            self._back_off()
+        return changed
+
+    def _back_off(self):
+        # After the immediate check following a change, start over with quick checks
+        self.interval = self.initial if self.interval == 0 else min(self.interval * self.factor, self.max_interval)
+
+
+_collected: contextvars.ContextVar[Optional[List[Detection]]] = contextvars.ContextVar(
+    "poll_detections", default=None
+)
+
+
+@contextmanager
+def collecting() -> Iterator[List[Detection]]:
+    """
+    Collect the detections of every poller in the block, e.g. those of a run.
+    """
+    detections: List[Detection] = []
+    token = _collected.set(detections)
+    try:
+        yield detections
+    finally:
+        _collected.reset(token)
@@ -0,0 +1,193 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Run-scoped cache for read-only `az` queries.
+
+During a target run the same facts are looked up several times, e.g. the
+container group ids are queried at the start, when monitoring and again when
+removing.  Inside `with run_cache():` successful results of idempotent
+queries (deployment/container/vm/identity show) are remembered by argv and
+served from memory.  Any mutating command drops the cached results for the
+resources it touches, a deployment drops everything in its resource group.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+CACHEABLE_QUERIES = [
+    ("deployment", "group", "show"),
+    ("container", "show"),
+    ("vm", "show"),
+    ("identity", "show"),
+]
+
+# Commands which can change any resource in their resource group
+GROUP_WIDE_MUTATIONS = [
+    ("deployment", "group", "create"),
+    ("deployment", "group", "delete"),
+    ("group", "delete"),
+]
+
+MUTATING_VERBS = {
+    "create",
+    "delete",
+    "update",
+    "set",
+    "start",
+    "stop",
+    "restart",
+    "deallocate",
+    "redeploy",
+    "invoke",
+    "assign",
+    "remove",
+    "add",
+}
+
+_NAME_FLAGS = {"-n", "--name"}
+_ID_FLAGS = {"--ids"}
+_GROUP_FLAGS = {"-g", "--resource-group"}
+
+
+def _matches(argv: Sequence[str], command: Tuple[str, ...]) -> bool:
+    return len(argv) > len(command) and argv[0] == "az" and tuple(argv[1 : 1 + len(command)]) == command
+
+
+def _scope(argv: Sequence[str]) -> Tuple[Optional[str], Set[str]]:
+    """
+    Resource group and (lower cased) resource names an az command refers to.
+    """
+    resource_group = None
+    names: Set[str] = set()
+    flag = None
+    for arg in argv:
+        if arg.startswith("-"):
+            flag = arg
+            continue
+        if flag in _GROUP_FLAGS:
+            resource_group = arg.lower()
+        elif flag in _NAME_FLAGS:
+            names.add(arg.lower())
+        elif flag in _ID_FLAGS:
+            parts = arg.strip("/").split("/")
+            names.add(parts[-1].lower())
+            lowered = [part.lower() for part in parts]
+            if "resourcegroups" in lowered:
+                resource_group = lowered[lowered.index("resourcegroups") + 1]
+        # Only --ids takes multiple values
+        if flag not in _ID_FLAGS:
+            flag = None
+    return resource_group, names
+
+
+def is_cacheable(argv: Sequence[str]) -> bool:
+    return any(_matches(argv, query) for query in CACHEABLE_QUERIES)
+
+
+def is_mutating(argv: Sequence[str]) -> bool:
+    if not argv or argv[0] != "az" or is_cacheable(argv):
+        return False
+    positional = []
+    for arg in argv[1:]:
+        if arg.startswith("-"):
+            break
+        positional.append(arg)
+    return any(word in MUTATING_VERBS for word in positional)
+
+
+class QueryCache:
+    def __init__(self):
+        self._entries: Dict[Tuple[str, ...], Tuple[int, str, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, argv: Sequence[str]) -> Optional[Tuple[int, str, str]]:
+        """
+        :return: (returncode, stdout, stderr) of an earlier identical query, if any
+        """
+        with self._lock:
+            entry = self._entries.get(tuple(argv))
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def store(self, argv: Sequence[str], returncode: int, stdout: str, stderr: str):
+        """
+        Remember the result of a query, failures aren't cached as they usually
+        mean the resource doesn't exist yet.
+        """
+        if returncode == 0:
+            with self._lock:
+                self._entries[tuple(argv)] = (returncode, stdout, stderr)
+
+    def invalidate_for(self, argv: Sequence[str]):
+        """
+        Drop cached queries affected by a command, if it is mutating.
+        """
+        if not is_mutating(argv):
+            return
+        resource_group, names = _scope(argv)
+        if any(_matches(argv, command) for command in GROUP_WIDE_MUTATIONS):
+            names = set()
+        self.invalidate(resource_group, names)
+
+    def invalidate(self, resource_group: str | None = None, names: Set[str] | None = None):
+        """
+        Drop cached queries in resource_group (all groups if None) which refer
+        to any of names (any resource if empty).
+        """
+        resource_group = resource_group.lower() if resource_group else None
+        names = {name.lower() for name in names or ()}
+        with self._lock:
+            for key in list(self._entries):
+                entry_group, entry_names = _scope(key)
+                if resource_group and entry_group and entry_group != resource_group:
+                    continue
+                if names and entry_names and not names & entry_names:
+                    continue
+                del self._entries[key]
+
+
+_current: contextvars.ContextVar[Optional[QueryCache]] = contextvars.ContextVar("query_cache", default=None)
+
+
+def current() -> Optional[QueryCache]:
+    return _current.get()
+
+
+@contextmanager
+def run_cache() -> Iterator[QueryCache]:
+    """
+    Cache read-only queries until the end of the block.  Nested blocks share
+    the outermost cache.
+    """
+    cache = _current.get()
+    if cache is not None:
+        yield cache
+        return
+    cache = QueryCache()
+    token = _current.set(cache)
+    try:
+        yield cache
+    finally:
+        _current.reset(token)
+
+
+def invalidate(resource_group: str | None = None, names: List[str] | None = None):
+    """
+    Invalidate the active cache (if any) after a change made outside of az,
+    e.g. through the ARM REST client.
+    """
+    cache = _current.get()
+    if cache is not None:
+        cache.invalidate(resource_group, set(names or ()))
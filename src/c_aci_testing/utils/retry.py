@@ -0,0 +1,183 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Retry policy shared by all external calls.
+
+Failures are classified from their error output: throttling (429), server
+errors and network blips are transient and retried with exponential backoff
+and jitter, honouring Retry-After when the service sends one.  Errors which
+can't succeed on a retry (bad arguments, missing resources, permissions)
+are fatal and returned immediately.  Anything else is unknown, which is only
+retried by callers that opt in with retry_unknown=True.
+"""
+
+from __future__ import annotations
+
+import email.utils
+import math
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+TRANSIENT = "transient"
+FATAL = "fatal"
+UNKNOWN = "unknown"
+
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+DEFAULT_MAX_ATTEMPTS = 4
+
+_TRANSIENT_PATTERN = re.compile(
+    "|".join([
+        r"\b(status|code|HTTP)\D{0,12}(408|429|500|502|503|504)\b",
+        r"TooManyRequests",
+        r"Throttl",
+        r"RetryableError",
+        r"InternalServerError",
+        r"ServiceUnavailable",
+        r"GatewayTimeout",
+        r"BadGateway",
+        r"ServerTimeout",
+        r"AnotherOperationInProgress",
+        r"temporarily unavailable",
+        r"Connection (reset|aborted|refused)",
+        r"RemoteDisconnected",
+        r"EOF occurred in violation of protocol",
+        r"timed? ?out",
+        r"Temporary failure in name resolution",
+        r"TLS handshake timeout",
+        r"net/http: request canceled",
+        r"unexpected EOF",
+    ]),
+    re.IGNORECASE,
+)
+
+_FATAL_PATTERN = re.compile(
+    "|".join([
+        r"AuthorizationFailed",
+        r"AuthenticationFailed",
+        r"InvalidAuthenticationToken",
+        r"Please run 'az login'",
+        r"InvalidTemplate",
+        r"InvalidParameter",
+        r"InvalidRequestContent",
+        r"ValidationError",
+        r"BadRequest",
+        r"ResourceNotFound",
+        r"ResourceGroupNotFound",
+        r"DeploymentNotFound",
+        r"SubscriptionNotFound",
+        r"unrecognized arguments",
+        r"the following arguments are required",
+        r"is misspelled or not recognized",
+        r"\(NotFound\)",
+        r"was not found",
+        r"could not be found",
+        r"denied",
+        r"Forbidden",
+    ]),
+    re.IGNORECASE,
+)
+
+_RETRY_AFTER_PATTERN = re.compile(r"retry[- ]after\D{0,20}(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def classify(error_output: str | None) -> str:
+    """
+    Classify a failed call by its error output as TRANSIENT, FATAL or UNKNOWN.
+    """
+    if not error_output:
+        return UNKNOWN
+    if _TRANSIENT_PATTERN.search(error_output):
+        return TRANSIENT
+    if _FATAL_PATTERN.search(error_output):
+        return FATAL
+    return UNKNOWN
+
+
+def classify_status(status: int) -> str:
+    if status in TRANSIENT_STATUSES:
+        return TRANSIENT
+    if 400 <= status < 500:
+        return FATAL
+    return UNKNOWN
+
+
+def parse_retry_after(error_output: str | None) -> Optional[float]:
+    """
+    Seconds to wait as requested by the service, if mentioned in the output.
+    """
+    match = _RETRY_AFTER_PATTERN.search(error_output or "")
+    return float(match.group(1)) if match else None
+
+
+def parse_retry_after_header(value: str | None) -> Optional[float]:
+    """
+    Seconds to wait as requested by a Retry-After header, given either as
+    seconds or as an HTTP date.  None without a header or one that can't be parsed.
+    """
+    if not value:
+        return None
+    try:
+        secs = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+        if when is None:
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        secs = (when - datetime.now(timezone.utc)).total_seconds()
+    return max(0.0, secs) if math.isfinite(secs) else None
+
+
+def _default_max_attempts() -> int:
+    try:
+        return max(1, int(os.getenv("CACI_RETRY_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))))
+    except ValueError:
+        return DEFAULT_MAX_ATTEMPTS
+
+
+@dataclass
+class RetryPolicy:
+    """
+    :param max_attempts: Total number of attempts including the first, configurable via CACI_RETRY_MAX_ATTEMPTS
+    :param base_delay: Delay before the first retry, doubling for every further retry
+    :param max_delay: Upper bound for the backoff delay (not for Retry-After)
+    :param retry_unknown: Also retry failures which aren't known to be transient
+    """
+
+    max_attempts: int = field(default_factory=_default_max_attempts)
+    base_delay: float = 2.0
+    max_delay: float = 60.0
+    retry_unknown: bool = False
+
+    def should_retry(self, attempt: int, kind: str) -> bool:
+        """
+        Whether to make another attempt after attempt number `attempt` (1-based) failed.
+        """
+        if attempt >= self.max_attempts:
+            return False
+        return kind == TRANSIENT or (kind == UNKNOWN and self.retry_unknown)
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Seconds to wait after attempt number `attempt` failed.  Jitter keeps
+        parallel callers which failed together from retrying in lockstep.
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(delay / 2, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
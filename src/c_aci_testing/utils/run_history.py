@@ -0,0 +1,345 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Local history of runs, to spot regressions in stage durations (ACI cold
+start, VM bootstrap, ...) across weeks.
+
+Every target run, vn2 target run and vm deploy appends its outcome, stage
+timings (from its RunBudget), the detection lags of its polling (see
+poller.py), region, target, VM size and image digests to an SQLite
+database, CACI_HISTORY_DB or run-history.sqlite in the cache directory.
+Setting CACI_HISTORY_DB to an empty string disables recording.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from c_aci_testing.utils import poller
+from c_aci_testing.utils.cache_dir import get_cache_dir
+from c_aci_testing.utils.cmd_executor import execute
+from c_aci_testing.utils.deadline import DeadlineExceeded, RunBudget
+
+HISTORY_DB_ENV = "CACI_HISTORY_DB"
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+DEADLINE_EXCEEDED = "deadline exceeded"
+CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    target TEXT,
+    deployment_name TEXT,
+    region TEXT,
+    vm_size TEXT,
+    images TEXT,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS detections (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    poller TEXT NOT NULL,
+    state TEXT NOT NULL,
+    lag REAL NOT NULL,
+    exact INTEGER NOT NULL,
+    polls INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs(started_at);
+"""
+
+
+def history_path() -> Optional[str]:
+    path = os.environ.get(HISTORY_DB_ENV)
+    if path is None:
+        return os.path.join(get_cache_dir(), "run-history.sqlite")
+    return path or None
+
+
+def connect(path: str | None = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or history_path() or ":memory:", timeout=30)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+@dataclass
+class RunRecord:
+    kind: str
+    outcome: str
+    started_at: float
+    duration: float
+    stages: Sequence = ()
+    target: Optional[str] = None
+    deployment_name: Optional[str] = None
+    region: Optional[str] = None
+    vm_size: Optional[str] = None
+    images: Optional[Dict[str, str]] = None
+    error: Optional[str] = None
+    detections: Sequence = ()
+
+
+def record_run(record: RunRecord, path: str | None = None) -> int:
+    with closing(connect(path)) as conn, conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (kind, target, deployment_name, region, vm_size, images, outcome, error, started_at,"
+            " duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                record.kind,
+                record.target,
+                record.deployment_name,
+                record.region,
+                record.vm_size,
+                json.dumps(record.images) if record.images else None,
+                record.outcome,
+                record.error,
+                record.started_at,
+                record.duration,
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO stages (run_id, name, duration, status) VALUES (?, ?, ?, ?)",
+            [(cursor.lastrowid, stage.name, stage.duration, stage.status) for stage in record.stages],
+        )
+        conn.executemany(
+            "INSERT INTO detections (run_id, poller, state, lag, exact, polls) VALUES (?, ?, ?, ?, ?, ?)",
+            [(cursor.lastrowid, d.poller, d.state, d.lag, int(d.exact), d.polls) for d in record.detections],
+        )
+        return cursor.lastrowid
+
+
+def image_digests(target_path: str, registry: str, repository: str | None, tag: str | None) -> Dict[str, str]:
+    """
+    Digests of the target's images in the local docker image store, by image reference.
+    """
+    env = {
+        **os.environ,
+        "TARGET": target_path,
+        "REGISTRY": registry,
+        **({"REPOSITORY": repository} if repository else {}),
+        **({"TAG": tag} if tag else {}),
+    }
+    refs = execute(["docker", "compose", "config", "--images"], env=env, cwd=target_path)
+    images = sorted(set(refs.stdout.split()))
+    if refs.returncode != 0 or not images:
+        return {}
+    inspect = execute(["docker", "image", "inspect", *images])
+    digests = {}
+    for image in json.loads(inspect.stdout or "[]"):
+        repo_digests = image.get("RepoDigests") or []
+        for ref in image.get("RepoTags") or []:
+            name = ref.rsplit(":", 1)[0]
+            digest = next((d.split("@", 1)[1] for d in repo_digests if d.startswith(name + "@")), image.get("Id"))
+            digests[ref] = digest
+    return digests
+
+
+@contextmanager
+def recording(
+    kind: str,
+    budget: RunBudget,
+    target_path: str | None = None,
+    deployment_name: str | None = None,
+    region: str | None = None,
+    vm_size: str | None = None,
+    registry: str | None = None,
+    repository: str | None = None,
+    tag: str | None = None,
+) -> Iterator[None]:
+    """
+    Record the run in the block, with the stages of its budget and the
+    detection lags of its pollers, once it has finished.
+    """
+    started_at = time.time()
+    outcome, error = SUCCEEDED, None
+    detections: List[poller.Detection] = []
+    try:
+        with poller.collecting() as detections:
+            yield
+    except DeadlineExceeded as e:
+        outcome, error = DEADLINE_EXCEEDED, str(e)
+        raise
+    except (KeyboardInterrupt, GeneratorExit):
+        outcome = CANCELLED
+        raise
+    except BaseException as e:
+        outcome, error = FAILED, str(e) or type(e).__name__
+        raise
+    finally:
+        path = history_path()
+        if path:
+            # History is best effort and must never fail the run
+            try:
+                images = image_digests(target_path, registry, repository, tag) if target_path and registry else {}
+            except Exception:
+                images = {}
+            try:
+                record_run(
+                    RunRecord(
+                        kind=kind,
+                        outcome=outcome,
+                        started_at=started_at,
+                        duration=time.time() - started_at,
+                        stages=budget.stages,
+                        target=os.path.basename(os.path.normpath(target_path)) if target_path else None,
+                        deployment_name=deployment_name,
+                        region=region,
+                        vm_size=vm_size,
+                        images=images,
+                        error=error,
+                        detections=detections,
+                    ),
+                    path,
+                )
+            except (sqlite3.Error, OSError) as e:
+                print(f"Failed to record run history in {path}: {e}", file=sys.stderr)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values.
+    """
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _run_filters(since: float, target: str | None, region: str | None, kind: str | None):
+    where = "runs.started_at >= ?"
+    params: list = [since]
+    for column, value in (("target", target), ("region", region), ("kind", kind)):
+        if value:
+            where += f" AND runs.{column} = ?"
+            params.append(value)
+    return where, params
+
+
+@dataclass
+class StageStats:
+    stage: str
+    region: Optional[str]
+    count: int
+    p50: float
+    p95: float
+    max: float
+
+
+def stage_stats(
+    since: float,
+    target: str | None = None,
+    region: str | None = None,
+    kind: str | None = None,
+    by_region: bool = False,
+    path: str | None = None,
+) -> List[StageStats]:
+    """
+    Duration percentiles of the successful stages of runs started since the given time.
+    """
+    where, params = _run_filters(since, target, region, kind)
+    query = (
+        "SELECT stages.name, runs.region, stages.duration FROM stages JOIN runs ON stages.run_id = runs.id"
+        f" WHERE {where} AND stages.status = 'ok'"
+    )
+
+    durations: Dict[tuple, List[float]] = {}
+    with closing(connect(path)) as conn:
+        for name, run_region, duration in conn.execute(query, params):
+            durations.setdefault((name, run_region if by_region else None), []).append(duration)
+
+    stats = []
+    for (name, run_region), values in durations.items():
+        values.sort()
+        stats.append(
+            StageStats(name, run_region, len(values), percentile(values, 50), percentile(values, 95), values[-1])
+        )
+    return sorted(stats, key=lambda s: (s.region or "", s.stage))
+
+
+def outcome_counts(
+    since: float,
+    target: str | None = None,
+    region: str | None = None,
+    kind: str | None = None,
+    path: str | None = None,
+) -> Dict[tuple, int]:
+    """
+    Number of runs started since the given time, by kind and outcome.
+    """
+    where, params = _run_filters(since, target, region, kind)
+    with closing(connect(path)) as conn:
+        rows = conn.execute(
+            f"SELECT runs.kind, runs.outcome, COUNT(*) FROM runs WHERE {where} GROUP BY runs.kind, runs.outcome",
+            params,
+        )
+        return {(run_kind, outcome): count for run_kind, outcome, count in rows}
+
+
+@dataclass
+class DetectionStats:
+    poller: str
+    state: str
+    count: int
+    p50: float
+    p95: float
+    max: float
+    # Number of the detections whose lag is exact rather than estimated
+    exact: int
+    p50_polls: float
+
+
+def detection_stats(
+    since: float,
+    target: str | None = None,
+    region: str | None = None,
+    kind: str | None = None,
+    path: str | None = None,
+) -> List[DetectionStats]:
+    """
+    Detection lag percentiles of the states observed by pollers of runs started since the given time.
+    """
+    where, params = _run_filters(since, target, region, kind)
+    query = (
+        "SELECT detections.poller, detections.state, detections.lag, detections.exact, detections.polls"
+        f" FROM detections JOIN runs ON detections.run_id = runs.id WHERE {where}"
+    )
+
+    observed: Dict[tuple, List[tuple]] = {}
+    with closing(connect(path)) as conn:
+        for name, state, lag, exact, polls in conn.execute(query, params):
+            observed.setdefault((name, state), []).append((lag, exact, polls))
+
+    stats = []
+    for (name, state), values in observed.items():
+        lags = sorted(lag for lag, _, _ in values)
+        polls = sorted(float(p) for _, _, p in values)
+        stats.append(
+            DetectionStats(
+                name,
+                state,
+                len(values),
+                percentile(lags, 50),
+                percentile(lags, 95),
+                lags[-1],
+                sum(exact for _, exact, _ in values),
+                percentile(polls, 50),
+            )
+        )
+    return sorted(stats, key=lambda s: (s.poller, s.state))
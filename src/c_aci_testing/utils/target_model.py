@@ -0,0 +1,214 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+The container groups of a target, converted from its bicep files once.
+
+policies gen, vm runc (make_configs) and vn2 generate_yaml each need the
+resolved container groups of the same target.  load_target_model builds a
+TargetModel once per target content and deployment: models are memoized in
+the process, so the stages of target run, vm deploy and vn2 run share one,
+and are written to the cache directory, so separate invocations of a
+workflow share one too.  The key is the bicep build cache key (the content
+of every file the bicepparam file references) and the deployment, so
+anything that changes the result, like new policies, makes a new model.
+
+Set CACI_NO_BICEP_CACHE=1 (or pass --no-cache) to always build.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from c_aci_testing.utils import bicep_build, param_overlay, parse_bicep, trace
+from c_aci_testing.utils.cache_dir import get_cache_dir
+from c_aci_testing.utils.find_bicep import find_bicep_files
+
+# Bump when the model changes, so older cached models are ignored
+MODEL_VERSION = 2
+
+
+@dataclass
+class ContainerGroup:
+    # The key of the container group in ccePolicies and the names of generated files
+    id: str
+    name: str
+    # Resolved ARM resource
+    resource: dict
+
+    @property
+    def properties(self) -> dict:
+        return self.resource.get("properties", {})
+
+    @property
+    def containers(self) -> List[dict]:
+        return self.properties.get("containers", [])
+
+    @property
+    def volumes(self) -> List[dict]:
+        return self.properties.get("volumes", [])
+
+    @property
+    def os_type(self) -> str:
+        return self.properties.get("osType", "Linux")
+
+    @property
+    def is_wcow(self) -> bool:
+        return isinstance(self.os_type, str) and self.os_type.lower() == "windows"
+
+    @property
+    def sku(self) -> str:
+        return self.properties.get("sku", "Standard")
+
+    @property
+    def images(self) -> List[str]:
+        return [container["properties"]["image"] for container in self.containers]
+
+
+@dataclass
+class TargetModel:
+    key: str
+    deployment_name: str
+    container_groups: List[ContainerGroup] = field(default_factory=list)
+
+    @property
+    def images(self) -> List[str]:
+        return [image for group in self.container_groups for image in group.images]
+
+    def for_each_container_group(self) -> Iterator[Tuple[dict, List[dict]]]:
+        """
+        The same (container_group_resource_json, containers) as arm_template_for_each_container_group.
+        """
+        for group in self.container_groups:
+            yield group.resource, group.containers
+
+    def arm_template(self) -> dict:
+        """
+        An ARM template of the container groups, for the helpers of parse_bicep.
+        """
+        return {"resources": [group.resource for group in self.container_groups]}
+
+    def to_json(self) -> str:
+        return json.dumps({"version": MODEL_VERSION, **asdict(self)})
+
+    @classmethod
+    def from_json(cls, text: str) -> "TargetModel":
+        data = json.loads(text)
+        if data.pop("version", None) != MODEL_VERSION:
+            raise ValueError("Target model of another version")
+        groups = [ContainerGroup(**group) for group in data.pop("container_groups")]
+        return cls(container_groups=groups, **data)
+
+
+def container_group_id(name: str, deployment_name: str, bicep_file_path: str) -> str:
+    return name.replace(deployment_name, pathlib.Path(bicep_file_path).stem).replace("-", "_")
+
+
+def build_target_model(
+    target_path: str,
+    subscription: str,
+    resource_group: str,
+    deployment_name: str,
+    key: str = "",
+) -> TargetModel:
+    """
+    Build the model of a target whose bicepparam file is already set up, see load_target_model.
+    """
+    bicep_file_path, bicepparam_file_path = find_bicep_files(target_path)
+    arm_template = parse_bicep.resolve_bicep(bicepparam_file_path, subscription, resource_group, deployment_name)
+    groups = [
+        ContainerGroup(
+            id=container_group_id(resource["name"], deployment_name, bicep_file_path),
+            name=resource["name"],
+            resource=resource,
+        )
+        for resource, _ in parse_bicep.arm_template_for_each_container_group(arm_template)
+    ]
+    return TargetModel(key=key, deployment_name=deployment_name, container_groups=groups)
+
+
+_models: Dict[str, TargetModel] = {}
+_models_lock = threading.Lock()
+
+
+def _model_key(bicepparam_file_path: str, subscription: str, resource_group: str, deployment_name: str) -> str:
+    hasher = hashlib.sha256(bicep_build.cache_key(bicepparam_file_path).encode())
+    overlay = param_overlay.fingerprint(bicepparam_file_path)
+    hasher.update(json.dumps([MODEL_VERSION, subscription, resource_group, deployment_name, overlay]).encode())
+    return hasher.hexdigest()
+
+
+def load_target_model(
+    target_path: str,
+    subscription: str,
+    resource_group: str,
+    deployment_name: str,
+    registry: str,
+    repository: str | None,
+    tag: str | None,
+) -> TargetModel:
+    """
+    Set the image parameters of a target, and return its model, built only
+    if it wasn't already for the same content and deployment.
+    """
+    bicepparam_file_path = parse_bicep.set_image_parameters(target_path, registry, repository, tag)
+    if not bicep_build.cache_enabled():
+        return build_target_model(target_path, subscription, resource_group, deployment_name)
+
+    key = _model_key(bicepparam_file_path, subscription, resource_group, deployment_name)
+    with _models_lock:
+        model = _models.get(key)
+    if model is not None:
+        trace.instant("target model", cat="cache hit", target=target_path)
+        return model
+
+    cache_dir = get_cache_dir("bicep")
+    path = os.path.join(cache_dir, f"{key}.model.json")
+    model = _read(path)
+    if model is not None:
+        trace.instant("target model", cat="cache hit", file=path)
+        print(f"Using cached target model of {target_path}", flush=True)
+    else:
+        model = build_target_model(target_path, subscription, resource_group, deployment_name, key=key)
+        _write(path, model)
+        bicep_build.evict(cache_dir, keep=path)
+    with _models_lock:
+        _models[key] = model
+    return model
+
+
+def _read(path: str) -> Optional[TargetModel]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            model = TargetModel.from_json(f.read())
+        os.utime(path)
+        return model
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError):
+        print(f"Ignoring invalid cached target model {path}", file=sys.stderr, flush=True)
+        return None
+
+
+def _write(path: str, model: TargetModel):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(model.to_json())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Failed to cache target model {path}: {e}", file=sys.stderr, flush=True)
+
+
+def clear_memo():
+    with _models_lock:
+        _models.clear()
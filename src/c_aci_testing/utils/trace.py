@@ -0,0 +1,213 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+"""
+Chrome trace-event export of a run, to be loaded in Perfetto (ui.perfetto.dev)
+or chrome://tracing.
+
+While tracing() is active, pipeline stages, external commands, ARM requests,
+poll iterations and waits (rate limiting, retry backoff) are recorded as
+nested spans, which are written to the trace file when tracing ends.
+Commands run in parallel by one thread are put on separate "parallel" tracks
+so that overlapping spans stay readable; serial waits show up as gaps
+between spans on a single track.
+
+Child processes tracing to the same file (e.g. a target's test script
+running c-aci-testing) are merged into it as further processes.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent writers may drop each other's events
+    fcntl = None  # type: ignore[assignment]
+
+TRACE_FILE_ENV = "CACI_TRACE_FILE"
+
+# Track ids of a thread's parallel tracks are offset from its own by this
+_LANES_PER_THREAD = 1000
+
+
+def _now_us() -> float:
+    return time.time() * 1e6
+
+
+class Tracer:
+    def __init__(self, path: str, name: str = "c-aci-testing"):
+        self.path = path
+        self.name = name
+        self.pid = os.getpid()
+        self.start = time.time()
+        self._lock = threading.Lock()
+        self._events: List[dict] = []
+        self._threads: Dict[int, Tuple[int, str]] = {}
+        self._busy_lanes: Dict[int, Set[int]] = {}
+        self._tracks: Dict[int, str] = {}
+
+    def _thread_index(self) -> Tuple[int, str]:
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            self._threads[thread.ident] = (len(self._threads), thread.name)
+        return self._threads[thread.ident]
+
+    def _take_track(self, parallel: bool) -> Tuple[int, Optional[int]]:
+        """
+        Track for a new span: the thread's own one, or for a span which may
+        overlap others of the same thread the first free parallel track.
+        """
+        with self._lock:
+            index, thread_name = self._thread_index()
+            base = index * _LANES_PER_THREAD + 1
+            if not parallel:
+                self._tracks.setdefault(base, thread_name)
+                return base, None
+            busy = self._busy_lanes.setdefault(index, set())
+            lane = 0
+            while lane in busy:
+                lane += 1
+            busy.add(lane)
+            self._tracks.setdefault(base + lane, thread_name if lane == 0 else f"{thread_name} parallel {lane}")
+            return base + lane, lane
+
+    def _release_track(self, tid: int, lane: Optional[int]):
+        if lane is not None:
+            with self._lock:
+                self._busy_lanes[(tid - 1) // _LANES_PER_THREAD].discard(lane)
+
+    @contextmanager
+    def span(self, name: str, cat: str, parallel: bool = False, **args) -> Iterator[Dict[str, Any]]:
+        tid, lane = self._take_track(parallel)
+        start = _now_us()
+        began = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args.setdefault("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start,
+                "dur": (time.perf_counter() - began) * 1e6,
+                "pid": self.pid,
+                "tid": tid,
+                "args": args,
+            }
+            with self._lock:
+                self._events.append(event)
+            self._release_track(tid, lane)
+
+    def instant(self, name: str, cat: str, **args):
+        tid, _ = self._take_track(False)
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "i",
+            "s": "t",
+            "ts": _now_us(),
+            "pid": self.pid,
+            "tid": tid,
+            "args": args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def events(self) -> List[dict]:
+        with self._lock:
+            metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": self.name}}]
+            metadata += [
+                {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self._tracks.items()
+            ]
+            metadata += [
+                {"name": "thread_sort_index", "ph": "M", "pid": self.pid, "tid": tid, "args": {"sort_index": tid}}
+                for tid in self._tracks
+            ]
+            return metadata + sorted(self._events, key=lambda e: e["ts"])
+
+    def write(self):
+        """
+        Write the trace, merging in events other processes wrote to the file during this run.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                events = self.events()
+                f.seek(0)
+                try:
+                    existing = json.loads(f.read() or "{}")
+                except ValueError:
+                    existing = {}
+                if os.fstat(f.fileno()).st_mtime >= self.start:
+                    events = [e for e in existing.get("traceEvents", []) if e.get("pid") != self.pid] + events
+                f.seek(0)
+                f.truncate()
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def current() -> Optional[Tracer]:
+    return _tracer
+
+
+@contextmanager
+def tracing(path: str | None, name: str = "c-aci-testing") -> Iterator[Optional[Tracer]]:
+    """
+    Trace everything until the end of the block into path.  Does nothing if
+    path is empty or tracing is already active.
+    """
+    global _tracer
+    if not path or _tracer is not None:
+        yield _tracer
+        return
+    _tracer = Tracer(path, name)
+    try:
+        yield _tracer
+    finally:
+        tracer, _tracer = _tracer, None
+        tracer.write()
+        print(f"Trace written to {path}, open it in https://ui.perfetto.dev", file=sys.stderr)
+
+
+@contextmanager
+def span(name: str, cat: str = "stage", parallel: bool = False, **args) -> Iterator[Dict[str, Any]]:
+    """
+    Record the block as a span, if tracing.  Yields the span's args, which
+    may be added to inside the block (e.g. the state observed by a poll).
+
+    :param parallel: The block may run concurrently with others of the same
+        thread (e.g. asyncio tasks), so give it a track of its own if needed
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield args
+        return
+    with tracer.span(name, cat, parallel, **args) as span_args:
+        yield span_args
+
+
+def instant(name: str, cat: str = "event", **args):
+    tracer = _tracer
+    if tracer is not None:
+        tracer.instant(name, cat, **args)
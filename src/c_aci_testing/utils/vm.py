@@ -15,16 +15,14 @@ import datetime
 import os
 import re
 
+from c_aci_testing.utils import cassette
+from c_aci_testing.utils.cmd_executor import execute
+
 
 def invoke_oras_get_json_output(argv: List[str]) -> dict:
     try:
         print(f"Invoking: {' '.join(argv)}")
-        res = subprocess.run(
-            argv,
-            check=True,
-            stdout=subprocess.PIPE,
-            text=True,
-        )
+        res = execute(argv, check=True, echo_stderr=True)
         return json.loads(res.stdout)
     except subprocess.CalledProcessError as e:
         print(f"Command failed with exit code {e.returncode}")
@@ -67,6 +65,10 @@ def resolve_manifest_hash(image_ref: str, platform: str) -> str:
 
 
 def async_delete_storage_blob(storage_account: str, container_name: str, blob_name: str):
+    tape = cassette.current()
+    if tape is not None and tape.replaying:
+        # Fire and forget, so there is no result to replay
+        return
     subprocess.Popen(
         [
             "az",
@@ -107,7 +109,7 @@ def run_on_vm(
     """
 
     print(f"Running command on VM: {command}")
-    res = subprocess.run(
+    res = execute(
         [
             "az",
             "vm",
@@ -125,7 +127,7 @@ def run_on_vm(
             command,
         ],
         check=True,
-        stdout=subprocess.PIPE,
+        echo_stderr=True,
     )
     out = json.loads(res.stdout)
 
@@ -173,7 +175,7 @@ def download_single_file_from_vm(
         command=f'C:\\storage_put.ps1 -Uri "{blobUrl}" -InFile "{file_path}" {maybeBinary}',
     )
 
-    subprocess.run(
+    execute(
         [
             "az",
             "storage",
@@ -191,7 +193,7 @@ def download_single_file_from_vm(
             out_file,
         ],
         check=True,
-        stdout=subprocess.PIPE,
+        echo_stderr=True,
     )
     async_delete_storage_blob(storage_account, container_name, blob_name)
 
@@ -228,7 +230,7 @@ def upload_to_vm_and_run(
                 for item in os.listdir(src):
                     tar.add(os.path.join(src, item), arcname=item)
 
-        subprocess.run(
+        execute(
             [
                 "az",
                 "storage",
@@ -247,6 +249,7 @@ def upload_to_vm_and_run(
                 "--overwrite",
             ],
             check=True,
+            capture=False,
         )
 
     blobUrl = f"https://{storage_account}.blob.core.windows.net/{container_name}/{blob_name}"
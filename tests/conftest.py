@@ -10,11 +10,22 @@ In VSCode, Code Coverage is recorded in config.xml. Delete this file to reset re
 
 from __future__ import annotations
 
+import os
+import random
+import time
 from typing import List
 
 import pytest
 from _pytest.nodes import Item
 
+from c_aci_testing.utils import arm, bicep_server, cassette, target_model
+from c_aci_testing.utils.arm import ArmClient
+
+from fake_arm import FakeArm
+from fake_cli import FakeCli
+
+CASSETTE_DIR = os.path.join(os.path.dirname(__file__), "cassettes")
+
 
 def pytest_collection_modifyitems(items: list[Item]):
     for item in items:
@@ -24,7 +35,70 @@ def pytest_collection_modifyitems(items: list[Item]):
             item.add_marker(pytest.mark.integration)
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep shared state (e.g. ARM rate limit buckets) of tests out of the user's cache directory."""
+    monkeypatch.setenv("CACI_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+    target_model.clear_memo()
+
+
+@pytest.fixture
+def unit_test_mocks(request, monkeypatch):
+    """
+    Replay the external commands of a test from tests/cassettes/<test name>.jsonl to run it offline and fast.
+
+    Set CACI_RECORD_CASSETTES=1 to (re)record the cassettes against Azure, tests without a cassette run live.
+    """
+    path = os.path.join(CASSETTE_DIR, f"{request.node.name}.jsonl")
+    if os.getenv("CACI_RECORD_CASSETTES"):
+        os.makedirs(CASSETTE_DIR, exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        mode = cassette.RECORD
+    elif os.path.exists(path):
+        mode = cassette.REPLAY
+    else:
+        yield
+        return
+
+    # Generated names (e.g. deployment names) must be the same when recording and replaying, live runs
+    # keep drawing unique ones so that concurrent runs don't collide
+    random.seed(request.node.nodeid)
+    monkeypatch.setenv(cassette.CASSETTE_ENV, path)
+    monkeypatch.setenv(cassette.MODE_ENV, mode)
+    cassette.reset()
+    yield
+    cassette.reset()
+    random.seed()
+
+
+@pytest.fixture
+def fake_cli(tmp_path_factory, monkeypatch):
+    """
+    Put offline stand-ins for az, bicep, docker, kubectl and oras on PATH, see fake_cli.py.
+    """
+    cli = FakeCli(str(tmp_path_factory.mktemp("fake_cli")))
+    cli.install(monkeypatch)
+    yield cli
+    bicep_server.close_server()
+
+
+@pytest.fixture
+def fake_arm():
+    """
+    Serve a local stand-in for ARM, see fake_arm.py.
+    """
+    with FakeArm() as server:
+        yield server
+
+
 @pytest.fixture
-def unit_test_mocks(monkeypatch: None):
-    """Include Mocks here to execute all commands offline and fast."""
-    pass
+def arm_backend(fake_arm, monkeypatch):
+    """
+    Make the tools talk to fake_arm over the REST backend.
+    """
+    client = ArmClient(fake_arm.endpoint, token_provider=lambda _: (fake_arm.token, time.time() + 3600))
+    monkeypatch.setenv(arm.ARM_BACKEND_ENV, "rest")
+    monkeypatch.setattr(arm, "_client", client)
+    yield fake_arm
+    client.close()
@@ -0,0 +1,271 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+"""
+Local stand-in for Azure Resource Manager, implementing just enough of the
+deployments, container groups, providers, Azure Monitor metrics and generic
+resource APIs for c_aci_testing.utils.arm to be tested offline.
+
+Deployments move through PROVISIONING_STATES, one state per GET, and on
+success create the container groups declared in their template.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+PROVISIONING_STATES = ("Accepted", "Running", "Succeeded")
+
+CONTAINER_GROUP_TYPE = "Microsoft.ContainerInstance/containerGroups"
+
+
+class FakeArm:
+    def __init__(self, token: str = "fake-token", states=PROVISIONING_STATES):
+        self.token = token
+        self.states = states
+        self.deployment_error: Optional[dict] = None
+        # Statuses to answer the next requests with, e.g. [429, 503]
+        self.fail_next: List[int] = []
+        # Retry-After sent with injected failures and accepted operations
+        self.retry_after = "0"
+        # Body of injected failures instead of an ARM error, e.g. a gateway's HTML page
+        self.failure_body: Optional[str] = None
+        self.requests: List[Tuple[str, str]] = []
+        self.connections = 0
+        self.deployments: Dict[str, dict] = {}
+        self.resources: Dict[str, dict] = {}
+        # Container logs by (container group name, container name), lines prefixed with timestamps
+        self.logs: Dict[Tuple[str, str], str] = {}
+        # One minute (CpuUsage millicores, MemoryUsage bytes) points by (container group name, container name)
+        self.metrics: Dict[Tuple[str, str], List[Tuple[float, float]]] = {}
+        self.metrics_start = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+        self._operations: Dict[str, int] = {}
+        self._ips = (f"10.0.0.{i}" for i in itertools.count(4))
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(_Handler):
+            arm = fake
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> FakeArm:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_container_group(self, subscription: str, resource_group: str, name: str, state: str = "Running") -> str:
+        resource_id = (
+            f"/subscriptions/{subscription}/resourceGroups/{resource_group}/providers/{CONTAINER_GROUP_TYPE}/{name}"
+        )
+        self.resources[resource_id.lower()] = {
+            "id": resource_id,
+            "name": name,
+            "type": CONTAINER_GROUP_TYPE,
+            "properties": {
+                "provisioningState": "Succeeded",
+                "instanceView": {"state": state},
+                "ipAddress": {"ip": next(self._ips)},
+                "containers": [],
+            },
+        }
+        return resource_id
+
+    def add_resource(self, resource_id: str) -> str:
+        self.resources[resource_id.lower()] = {"id": resource_id, "name": resource_id.split("/")[-1]}
+        return resource_id
+
+    # Request handling, called from the server's threads
+
+    def handle(self, method: str, path: str, query: Dict[str, str], body: Any) -> Tuple[int, Dict[str, str], Any]:
+        with self._lock:
+            self.requests.append((method, path))
+            if self.fail_next:
+                status = self.fail_next.pop(0)
+                payload = self.failure_body or _error("InjectedFailure", f"Injected {status}")
+                return status, {"Retry-After": self.retry_after}, payload
+            parts = path.strip("/").split("/")
+            lowered = [part.lower() for part in parts]
+
+            if parts[0] == "operations":
+                return self._poll_operation(parts[1])
+            if "api-version" not in query:
+                return 400, {}, _error("MissingApiVersionParameter", "The api-version query parameter is required")
+            if lowered[-3:] == ["providers", "microsoft.insights", "metrics"]:
+                return self._handle_metrics(parts[-4], query)
+            if "deployments" in lowered:
+                return self._handle_deployment(method, path, parts[-1], body)
+            if lowered[-2:-1] == ["providers"] and len(parts) == 4:
+                return self._handle_provider(parts[-1])
+            if len(parts) > 3 and lowered[-1] == "logs" and lowered[-3] == "containers":
+                return self._handle_logs(parts[-4], parts[-2], query.get("timestamps") == "true")
+            if "/".join(lowered[-2:]) == CONTAINER_GROUP_TYPE.lower():
+                prefix = path.lower() + "/"
+                return 200, {}, {"value": [r for k, r in self.resources.items() if k.startswith(prefix)]}
+            return self._handle_resource(method, path)
+
+    def _handle_deployment(self, method: str, path: str, name: str, body: Any):
+        key = path.lower()
+        if method == "PUT":
+            self.deployments[key] = {
+                "id": path,
+                "name": name,
+                "template": body["properties"]["template"],
+                "parameters": body["properties"]["parameters"],
+                "polls": 0,
+                "correlationId": str(uuid.uuid4()),
+                "submitted": datetime.now(timezone.utc),
+            }
+            return 201, {}, self._deployment_view(self.deployments[key])
+        if key not in self.deployments:
+            return 404, {}, _error("DeploymentNotFound", f"Deployment '{name}' could not be found.")
+        deployment = self.deployments[key]
+        deployment["polls"] += 1
+        return 200, {}, self._deployment_view(deployment)
+
+    def _deployment_view(self, deployment: dict) -> dict:
+        state = self.states[min(deployment["polls"], len(self.states) - 1)]
+        now = datetime.now(timezone.utc)
+        properties: Dict[str, Any] = {
+            "provisioningState": state,
+            "correlationId": deployment["correlationId"],
+            "timestamp": now.isoformat().replace("+00:00", "Z"),
+            "duration": f"PT{(now - deployment['submitted']).total_seconds():.3f}S",
+        }
+        if state == "Succeeded":
+            if self.deployment_error:
+                properties.update(provisioningState="Failed", error=self.deployment_error)
+            else:
+                properties["outputs"] = {"ids": {"type": "Array", "value": self._deploy_resources(deployment)}}
+        return {"id": deployment["id"], "name": deployment["name"], "properties": properties}
+
+    def _deploy_resources(self, deployment: dict) -> List[str]:
+        if "ids" not in deployment:
+            subscription, resource_group = deployment["id"].split("/")[2:5:2]
+            deployment["ids"] = [
+                self.add_container_group(subscription, resource_group, resource["name"])
+                for resource in deployment["template"].get("resources", [])
+                if resource.get("type") == CONTAINER_GROUP_TYPE
+            ]
+        return deployment["ids"]
+
+    def _handle_provider(self, namespace: str):
+        types = {CONTAINER_GROUP_TYPE}
+        for resource in self.resources.values():
+            parts = resource["id"].split("/")
+            types.add(parts[6] + "/" + "/".join(parts[7::2]))
+        return 200, {}, {
+            "namespace": namespace,
+            "resourceTypes": [
+                {"resourceType": t.split("/", 1)[1], "apiVersions": ["2099-01-01-preview", "2024-01-01", "2023-01-01"]}
+                for t in sorted(types)
+                if t.lower().startswith(namespace.lower() + "/")
+            ],
+        }
+
+    def _handle_logs(self, group_name: str, container_name: str, timestamps: bool):
+        lines = self.logs.get((group_name, container_name), "").splitlines(keepends=True)
+        if not timestamps:
+            lines = [line.split(" ", 1)[-1] for line in lines]
+        return 200, {}, {"content": "".join(lines)}
+
+    def _handle_metrics(self, group_name: str, query: Dict[str, str]):
+        value = []
+        for index, metric in enumerate(query["metricnames"].split(",")):
+            timeseries = [
+                {
+                    "metadatavalues": [{"name": {"value": "containername"}, "value": container}],
+                    "data": [
+                        {
+                            "timeStamp": (self.metrics_start + timedelta(minutes=minute)).isoformat(),
+                            "average": point[index] / 2,
+                            "maximum": point[index],
+                        }
+                        for minute, point in enumerate(points)
+                    ],
+                }
+                for (group, container), points in self.metrics.items()
+                if group == group_name
+            ]
+            value.append({"name": {"value": metric}, "timeseries": timeseries})
+        return 200, {}, {"value": value}
+
+    def _handle_resource(self, method: str, path: str):
+        key = path.lower()
+        if method == "GET":
+            if key not in self.resources:
+                return 404, {}, _error("ResourceNotFound", f"The Resource '{path}' was not found.")
+            return 200, {}, self.resources[key]
+        if method == "DELETE":
+            if self.resources.pop(key, None) is None:
+                return 204, {}, None
+            operation = uuid.uuid4().hex
+            self._operations[operation] = 1
+            return 202, {"Location": f"{self.endpoint}/operations/{operation}", "Retry-After": self.retry_after}, None
+        return 405, {}, _error("MethodNotAllowed", method)
+
+    def _poll_operation(self, operation: str):
+        if self._operations.get(operation, 0) > 0:
+            self._operations[operation] -= 1
+            return 202, {"Location": f"{self.endpoint}/operations/{operation}", "Retry-After": self.retry_after}, None
+        return 200, {}, None
+
+
+def _error(code: str, message: str) -> dict:
+    return {"error": {"code": code, "message": message}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    arm: FakeArm
+
+    def setup(self):
+        super().setup()
+        with self.arm._lock:
+            self.arm.connections += 1
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length)) if length else None
+
+        if self.headers.get("Authorization") != f"Bearer {self.arm.token}":
+            status, headers, payload = 401, {}, _error("ExpiredAuthenticationToken", "The access token expired.")
+        else:
+            url = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            status, headers, payload = self.arm.handle(self.command, url.path, query, body)
+
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/html"
+        else:
+            data, content_type = json.dumps(payload).encode() if payload is not None else b"", "application/json"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_PUT = do_DELETE = _dispatch
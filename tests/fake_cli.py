@@ -0,0 +1,846 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+"""
+Offline stand-ins for the az, bicep, docker, kubectl and oras CLIs, implementing just
+enough of what c_aci_testing's tools call for target run, vm runc and vn2
+deploy to run end to end without Azure, a registry or a cluster.
+
+FakeCli.install() puts an executable for each CLI on PATH which runs this
+module.  The executables share their state (deployments, container groups,
+images, kubernetes deployments) through a JSON file in FAKE_CLI_HOME and
+model:
+
+- latency: every call sleeps for the latency configured for the longest
+  matching command prefix, e.g. "az deployment group create", +/- jitter
+- failures: the next calls of a command fail with a given exit code and error
+- deployments: Accepted, Running, then Succeeded deployment_secs after
+  being created, when their container groups appear
+- pods: Pending for pod_start_secs after kubectl apply, then Running
+
+Every call is logged with its argv and when it started and ended, to tell
+time spent in the CLIs from time spent orchestrating them.  `bicep jsonrpc`
+serves compileParams requests until its stdin is closed, the latency of
+"bicep jsonrpc" modelling its start and that of "bicep compileParams" each
+request, which are logged as ["bicep", "jsonrpc", method, path].
+"""
+
+from __future__ import annotations
+
+import copy
+import fcntl
+import hashlib
+import json
+import os
+import random
+import re
+import stat
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+HOME_ENV = "FAKE_CLI_HOME"
+TOOLS = ("az", "bicep", "docker", "kubectl", "oras")
+
+CONTAINER_GROUP_TYPE = "Microsoft.ContainerInstance/containerGroups"
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    # Seconds by command prefix, e.g. {"az": 0.1, "az deployment group create": 2}
+    "latency": {},
+    # Fraction of the latency to randomly add or remove
+    "jitter": 0.0,
+    # Injected failures, see FakeCli.fail_next
+    "failures": [],
+    "deployment_secs": 0.5,
+    # ARM error of deployments which fail instead of succeeding
+    "deployment_error": None,
+    "pod_start_secs": 0.5,
+    "pod_restarts": 0,
+}
+
+# Compiled form of templates/target/example.bicep, standing in for `az bicep
+# build-params` for targets created by `target create`
+EXAMPLE_TEMPLATE: Dict[str, Any] = {
+    "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentTemplate.json#",
+    "contentVersion": "1.0.0.0",
+    "parameters": {
+        "location": {"type": "string"},
+        "registry": {"type": "string"},
+        "repository": {"type": "string"},
+        "tag": {"type": "string"},
+        "ccePolicies": {"type": "object"},
+        "managedIDGroup": {"type": "string", "defaultValue": "[resourceGroup().name]"},
+        "managedIDName": {"type": "string"},
+    },
+    "resources": [
+        {
+            "type": CONTAINER_GROUP_TYPE,
+            "apiVersion": "2023-05-01",
+            "name": "[deployment().name]",
+            "location": "[parameters('location')]",
+            "identity": {
+                "type": "UserAssigned",
+                "userAssignedIdentities": {
+                    "[resourceId(parameters('managedIDGroup'), 'Microsoft.ManagedIdentity/userAssignedIdentities',"
+                    " parameters('managedIDName'))]": {}
+                },
+            },
+            "properties": {
+                "osType": "Linux",
+                "sku": "Confidential",
+                "restartPolicy": "Never",
+                "ipAddress": {"ports": [{"protocol": "TCP", "port": 80}], "type": "Public"},
+                "confidentialComputeProperties": {"ccePolicy": "[parameters('ccePolicies').example]"},
+                "imageRegistryCredentials": [
+                    {
+                        "server": "[parameters('registry')]",
+                        "identity": "[resourceId(parameters('managedIDGroup'),"
+                        " 'Microsoft.ManagedIdentity/userAssignedIdentities', parameters('managedIDName'))]",
+                    }
+                ],
+                "containers": [
+                    {
+                        "name": "primary",
+                        "properties": {
+                            "image": "[format('{0}/{1}/primary:{2}', parameters('registry'),"
+                            " if(empty(parameters('repository')), 'example', parameters('repository')),"
+                            " if(empty(parameters('tag')), 'latest', parameters('tag')))]",
+                            "ports": [{"protocol": "TCP", "port": 80}],
+                            "resources": {"requests": {"memoryInGB": 4, "cpu": 1}},
+                        },
+                    }
+                ],
+            },
+        }
+    ],
+}
+
+
+class CliError(Exception):
+    def __init__(self, message: str, returncode: int = 1):
+        super().__init__(message)
+        self.returncode = returncode
+
+
+# Test side
+
+
+class FakeCli:
+    """
+    Configures the fake CLIs and reads back what they were asked to do.
+    """
+
+    def __init__(self, home: str):
+        self.home = home
+        self.bin_dir = os.path.join(home, "bin")
+        self.config: Dict[str, Any] = copy.deepcopy(DEFAULT_CONFIG)
+
+    def install(self, monkeypatch):
+        os.makedirs(self.bin_dir, exist_ok=True)
+        import c_aci_testing  # pylint: disable=import-outside-toplevel
+
+        pythonpath = os.pathsep.join([
+            os.path.dirname(os.path.dirname(c_aci_testing.__file__)),
+            os.path.dirname(__file__),
+        ])
+        for tool in TOOLS:
+            path = os.path.join(self.bin_dir, tool)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(
+                    "#!/bin/sh\n"
+                    f'PYTHONPATH="{pythonpath}" exec "{sys.executable}" "{os.path.abspath(__file__)}" {tool} "$@"\n'
+                )
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        monkeypatch.setenv(HOME_ENV, self.home)
+        monkeypatch.setenv("PATH", self.bin_dir + os.pathsep + os.environ.get("PATH", ""))
+        self._save_config()
+
+    def configure(self, **config):
+        self.config.update(config)
+        self._save_config()
+
+    def fail_next(self, command: str, times: int = 1, returncode: int = 1, stderr: str = "ERROR: injected failure"):
+        """
+        Fail the next calls of command (a prefix like "az deployment group show").
+        """
+        self.config["failures"].append(
+            {"id": uuid.uuid4().hex, "command": command, "times": times, "returncode": returncode, "stderr": stderr}
+        )
+        self._save_config()
+
+    def calls(self) -> List[dict]:
+        path = os.path.join(self.home, "calls.jsonl")
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def state(self) -> dict:
+        with _locked_state(self.home) as state:
+            return copy.deepcopy(state)
+
+    def _save_config(self):
+        with open(os.path.join(self.home, "config.json"), "w", encoding="utf-8") as f:
+            json.dump(self.config, f)
+
+
+# CLI side
+
+
+@contextmanager
+def _locked_state(home: str) -> Iterator[dict]:
+    path = os.path.join(home, "state.json")
+    with open(path + ".lock", "a+", encoding="utf-8") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        for key in ("deployments", "groups", "images", "pushed", "k8s", "failures_used"):
+            state.setdefault(key, {})
+        yield state
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+
+def _words(tool: str, args: Sequence[str]) -> List[str]:
+    """
+    The command's name, i.e. its leading arguments which aren't options.
+    """
+    words = [tool]
+    for arg in args:
+        if arg.startswith("-"):
+            break
+        words.append(arg)
+    return words
+
+
+def _matches(words: Sequence[str], command: str) -> bool:
+    prefix = command.split()
+    return list(words[: len(prefix)]) == prefix
+
+
+def _latency(config: dict, words: Sequence[str]) -> float:
+    matching = [command for command in config["latency"] if _matches(words, command)]
+    if not matching:
+        return 0.0
+    latency = config["latency"][max(matching, key=lambda c: len(c.split()))]
+    jitter = config.get("jitter", 0.0)
+    return max(0.0, latency * (1 + random.uniform(-jitter, jitter)))
+
+
+def _take_failure(state: dict, config: dict, words: Sequence[str]) -> Optional[dict]:
+    for failure in config["failures"]:
+        used = state["failures_used"].get(failure["id"], 0)
+        if used < failure["times"] and _matches(words, failure["command"]):
+            state["failures_used"][failure["id"]] = used + 1
+            return failure
+    return None
+
+
+def _opt(args: Sequence[str], *names: str, default: Optional[str] = None) -> Optional[str]:
+    for i, arg in enumerate(args):
+        if arg in names and i + 1 < len(args):
+            return args[i + 1]
+        for name in names:
+            if arg.startswith(name + "="):
+                return arg.split("=", 1)[1]
+    return default
+
+
+def _opts(args: Sequence[str], name: str) -> List[str]:
+    """
+    Values of an option taking several, e.g. --metrics CpuUsage MemoryUsage.
+    """
+    if name not in args:
+        return []
+    values = []
+    for arg in args[args.index(name) + 1 :]:
+        if arg.startswith("-"):
+            break
+        values.append(arg)
+    return values
+
+
+def _now_iso(at: float | None = None) -> str:
+    return datetime.fromtimestamp(time.time() if at is None else at, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _digest(*parts: str) -> str:
+    return "sha256:" + hashlib.sha256("/".join(parts).encode()).hexdigest()
+
+
+# az
+
+
+def _bicepparam_values(path: str) -> Dict[str, Any]:
+    """
+    Parameter values of a bicepparam file, for the literals aci_param_set writes.
+    """
+
+    def literal(text: str) -> Any:
+        text = text.strip()
+        if text.startswith("'") and text.endswith("'"):
+            return text[1:-1].replace("\\'", "'")
+        if text in ("true", "false"):
+            return text == "true"
+        if re.fullmatch(r"-?\d+", text):
+            return int(text)
+        return text
+
+    values: Dict[str, Any] = {}
+    with open(path, encoding="utf-8") as f:
+        lines = iter(f.read().splitlines())
+    for line in lines:
+        match = re.match(r"\s*param\s+(\w+)\s*=\s*(.*)$", line)
+        if not match:
+            continue
+        name, value = match.groups()
+        if value.strip().startswith("{"):
+            obj: Dict[str, Any] = {}
+            body = value.strip()[1:]
+            while "}" not in body:
+                entry = re.match(r"\s*(\w+)\s*:\s*(.*)$", body)
+                if entry:
+                    obj[entry.group(1)] = literal(entry.group(2))
+                body = next(lines)
+            values[name] = obj
+        else:
+            values[name] = literal(value)
+    return values
+
+
+def _template_for(bicep_path: str) -> dict:
+    compiled = os.path.splitext(bicep_path)[0] + ".json"
+    if os.path.exists(compiled):
+        with open(compiled, encoding="utf-8") as f:
+            return json.load(f)
+    # Targets made by `target create` only differ from the template by name
+    stem = os.path.splitext(os.path.basename(bicep_path))[0]
+    return json.loads(json.dumps(EXAMPLE_TEMPLATE).replace("example", stem))
+
+
+def _build_params(bicepparam_path: str) -> dict:
+    with open(bicepparam_path, encoding="utf-8") as f:
+        using = re.search(r"using\s+'([^']+)'", f.read())
+    if not using:
+        raise CliError(f"ERROR: {bicepparam_path} has no using declaration")
+    bicep_path = os.path.normpath(os.path.join(os.path.dirname(bicepparam_path), using.group(1)))
+    parameters = {name: {"value": value} for name, value in _bicepparam_values(bicepparam_path).items()}
+    return {
+        "templateJson": json.dumps(_template_for(bicep_path)),
+        "parametersJson": json.dumps({"contentVersion": "1.0.0.0", "parameters": parameters}),
+    }
+
+
+def _group_id(subscription: str, resource_group: str, name: str) -> str:
+    return f"/subscriptions/{subscription}/resourceGroups/{resource_group}/providers/{CONTAINER_GROUP_TYPE}/{name}"
+
+
+def _deployment_state(deployment: dict, config: dict) -> str:
+    elapsed = time.time() - deployment["created"]
+    if elapsed >= config["deployment_secs"]:
+        return "Failed" if deployment.get("error") else "Succeeded"
+    return "Running" if elapsed >= config["deployment_secs"] / 3 else "Accepted"
+
+
+def _settle(state: dict, config: dict):
+    """
+    Create the container groups of deployments which have succeeded since the last call.
+    """
+    for deployment in state["deployments"].values():
+        if deployment.get("settled") or _deployment_state(deployment, config) != "Succeeded":
+            continue
+        deployment["settled"] = True
+        finished = deployment["created"] + config["deployment_secs"]
+        for index, resource in enumerate(deployment["resources"]):
+            containers = []
+            for container in resource.get("properties", {}).get("containers", []):
+                pulling = deployment["created"] + 0.2 * config["deployment_secs"]
+                pulled = deployment["created"] + 0.8 * config["deployment_secs"]
+                containers.append({
+                    "name": container["name"],
+                    **container.get("properties", {}),
+                    "instanceView": {
+                        "currentState": {"state": "Running", "startTime": _now_iso(finished)},
+                        "restartCount": 0,
+                        "events": [
+                            {"name": name, "firstTimestamp": _now_iso(at), "lastTimestamp": _now_iso(at), "count": 1}
+                            for name, at in (("Pulling", pulling), ("Pulled", pulled), ("Started", finished))
+                        ],
+                    },
+                })
+            group_id = _group_id(deployment["subscription"], deployment["resource_group"], resource["name"])
+            state["groups"][resource["name"].lower()] = {
+                "id": group_id,
+                "name": resource["name"],
+                "type": CONTAINER_GROUP_TYPE,
+                "resourceGroup": deployment["resource_group"],
+                "location": resource.get("location"),
+                "provisioningState": "Succeeded",
+                **{k: v for k, v in resource.get("properties", {}).items() if k != "containers"},
+                "containers": containers,
+                "instanceView": {"state": "Running", "events": []},
+                "ipAddress": {**resource.get("properties", {}).get("ipAddress", {}), "ip": f"10.0.0.{index + 4}"},
+                "systemData": {"createdAt": _now_iso(deployment["created"] + 0.1 * config["deployment_secs"])},
+            }
+
+
+def _state_changed_at(deployment: dict, config: dict) -> float:
+    """
+    When the deployment entered its current state, see _deployment_state.
+    """
+    elapsed = time.time() - deployment["created"]
+    for fraction in (1, 1 / 3):
+        if elapsed >= config["deployment_secs"] * fraction:
+            return deployment["created"] + config["deployment_secs"] * fraction
+    return deployment["created"]
+
+
+def _deployment_view(deployment: dict, config: dict) -> dict:
+    state = _deployment_state(deployment, config)
+    properties: Dict[str, Any] = {
+        "provisioningState": state,
+        "correlationId": deployment["correlationId"],
+        "timestamp": _now_iso(_state_changed_at(deployment, config)),
+        "duration": f"PT{min(time.time() - deployment['created'], config['deployment_secs']):.3f}S",
+    }
+    if state == "Succeeded":
+        ids = [
+            _group_id(deployment["subscription"], deployment["resource_group"], resource["name"])
+            for resource in deployment["resources"]
+        ]
+        properties["outputs"] = {"ids": {"type": "Array", "value": ids}}
+    elif state == "Failed":
+        properties["error"] = deployment["error"]
+    return {
+        "id": f"/subscriptions/{deployment['subscription']}/resourceGroups/{deployment['resource_group']}"
+        f"/providers/Microsoft.Resources/deployments/{deployment['name']}",
+        "name": deployment["name"],
+        "properties": properties,
+    }
+
+
+def _create_deployment(args: Sequence[str], state: dict, config: dict) -> str:
+    from c_aci_testing.utils.parse_bicep import _resolve_arm_functions  # pylint: disable=import-outside-toplevel
+
+    name = _opt(args, "-n", "--name")
+    subscription = _opt(args, "--subscription", default="00000000-0000-0000-0000-000000000000")
+    resource_group = _opt(args, "-g", "--resource-group")
+    parameters = _opt(args, "--parameters")
+    if parameters.startswith("@"):
+        # Compiled ARM template and parameters files
+        with open(_opt(args, "--template-file"), encoding="utf-8") as f:
+            template_json = json.load(f)
+        with open(parameters[1:], encoding="utf-8") as f:
+            parameters_json = json.load(f)
+    else:
+        built = _build_params(parameters)
+        template_json, parameters_json = json.loads(built["templateJson"]), json.loads(built["parametersJson"])
+    template = _resolve_arm_functions(
+        template_json,
+        parameters_json,
+        resource_group=resource_group,
+        subscription=subscription,
+        deployment_name=name,
+    )
+    deployment = {
+        "name": name,
+        "subscription": subscription,
+        "resource_group": resource_group,
+        "created": time.time(),
+        "correlationId": str(uuid.uuid4()),
+        "error": config.get("deployment_error"),
+        "resources": [r for r in template.get("resources", []) if r.get("type") == CONTAINER_GROUP_TYPE],
+    }
+    state["deployments"][name.lower()] = deployment
+    if "--no-wait" in args:
+        return ""
+    time.sleep(config["deployment_secs"])
+    return json.dumps(_deployment_view(deployment, config))
+
+
+def _find_group(args: Sequence[str], state: dict) -> dict:
+    name = _opt(args, "--ids", default="").split("/")[-1] or _opt(args, "-n", "--name", default="")
+    group = state["groups"].get(name.lower())
+    if group is None:
+        raise CliError(
+            f"ERROR: (ResourceNotFound) The Resource '{CONTAINER_GROUP_TYPE}/{name}' under resource group "
+            f"'{_opt(args, '-g', '--resource-group')}' was not found.",
+            3,
+        )
+    return group
+
+
+def _container_logs(group: dict, container: str, timestamps: bool) -> str:
+    started = group["systemData"]["createdAt"]
+    lines = [f"{container} in {group['name']} started", f"{container} ready"]
+    return "".join(f"{started} {line}\n" if timestamps else f"{line}\n" for line in lines)
+
+
+def _az(args: Sequence[str], state: dict, config: dict) -> str:
+    words = _words("az", args)[1:]
+    _settle(state, config)
+
+    if words[:2] == ["account", "get-access-token"]:
+        return json.dumps({"accessToken": "fake-token", "expires_on": int(time.time()) + 3600})
+    if words[:2] == ["bicep", "version"]:
+        return "Bicep CLI version 0.30.23 (fake)"
+    if words[:2] == ["bicep", "build-params"]:
+        return json.dumps(_build_params(_opt(args, "--file", "-f")))
+    if words[:3] == ["deployment", "group", "create"]:
+        return _create_deployment(args, state, config)
+    if words[:3] == ["deployment", "group", "show"]:
+        name = _opt(args, "-n", "--name")
+        deployment = state["deployments"].get(name.lower())
+        if deployment is None:
+            raise CliError(f"ERROR: (DeploymentNotFound) Deployment '{name}' could not be found.", 3)
+        return json.dumps(_deployment_view(deployment, config))
+    if words[:3] == ["deployment", "group", "delete"]:
+        state["deployments"].pop(_opt(args, "-n", "--name").lower(), None)
+        return ""
+    if words[:2] == ["container", "show"]:
+        group = _find_group(args, state)
+        if _opt(args, "--query") == "id":
+            return group["id"]
+        return json.dumps(group)
+    if words[:2] == ["container", "logs"]:
+        return _container_logs(_find_group(args, state), _opt(args, "--container-name"), timestamps=False)
+    if words[:1] == ["rest"]:
+        url = _opt(args, "--url", "-u", default="")
+        match = re.search(r"/containerGroups/([^/]+)/containers/([^/?]+)/logs", url)
+        if not match or match.group(1).lower() not in state["groups"]:
+            raise CliError(f"ERROR: Not Found({url})", 1)
+        group = state["groups"][match.group(1).lower()]
+        return json.dumps({"content": _container_logs(group, match.group(2), "timestamps=true" in url)})
+    if words[:2] == ["resource", "delete"]:
+        state["groups"].pop(_opt(args, "-n", "--name", default="").lower(), None)
+        return ""
+    if words[:2] == ["acr", "login"]:
+        if "--expose-token" in args:
+            login_server = f"{_opt(args, '-n', '--name')}.azurecr.io"
+            return json.dumps({"accessToken": "fake-acr-token", "loginServer": login_server})
+        return "Login Succeeded"
+    if words[:2] == ["extension", "add"]:
+        return ""
+    if words[:2] == ["confcom", "acipolicygen"]:
+        with open(_opt(args, "-a"), encoding="utf-8") as f:
+            template = json.load(f)
+        images = [
+            container["properties"]["image"]
+            for resource in template.get("resources", [])
+            for container in resource.get("properties", {}).get("containers", [])
+        ]
+        return "package policy\n\n" + "".join(f"# container {image}\n" for image in images)
+    if words[:3] == ["vm", "run-command", "invoke"]:
+        script = _opt(args, "--scripts", default="")
+        stdout = "run.ps1 result: 0" if "run.ps1" in script else "ok"
+        return json.dumps({
+            "value": [
+                {"code": "ComponentStatus/StdOut/succeeded", "message": stdout},
+                {"code": "ComponentStatus/StdErr/succeeded", "message": ""},
+            ]
+        })
+    if words[:2] == ["storage", "blob"]:
+        if words[2:3] == ["download"]:
+            with open(_opt(args, "--file", "-f"), "wb"):
+                pass
+        return ""
+    if words[:3] == ["monitor", "metrics", "list"]:
+        return json.dumps({"value": [{"name": {"value": m}, "timeseries": []} for m in _opts(args, "--metrics")]})
+    raise CliError(f"ERROR: 'az {' '.join(words)}' is not supported by the fake az", 2)
+
+
+# docker
+
+
+def _expand(value: str, env: Dict[str, str]) -> str:
+    def replace(match: re.Match) -> str:
+        name, default = match.group(1) or match.group(3), match.group(2)
+        return env.get(name) or (default or "")
+
+    return re.sub(r"\$\{(\w+)(?::-([^}]*))?\}|\$(\w+)", replace, value)
+
+
+def _compose_images() -> Dict[str, str]:
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    with open(os.path.join(os.getcwd(), "docker-compose.yml"), encoding="utf-8") as f:
+        compose = yaml.safe_load(f)
+    return {
+        service: _expand(definition.get("image", service), dict(os.environ))
+        for service, definition in (compose.get("services") or {}).items()
+    }
+
+
+def _docker(args: Sequence[str], state: dict, config: dict) -> str:
+    words = _words("docker", args)[1:]
+    if words[:1] == ["compose"]:
+        images = _compose_images()
+        services = words[2:] or list(images)
+        if words[1:2] == ["build"]:
+            for service in services:
+                state["images"][images[service]] = _digest(images[service], str(time.time()))
+            return "".join(f"Built {images[s]}\n" for s in services)
+        if words[1:2] == ["push"]:
+            for service in services:
+                if images[service] not in state["images"]:
+                    raise CliError(f"An image does not exist locally with the tag: {images[service]}")
+                state["pushed"][images[service]] = state["images"][images[service]]
+            return "".join(f"Pushed {images[s]}\n" for s in services)
+        if words[1:2] == ["pull"]:
+            missing = [images[s] for s in services if images[s] not in state["pushed"]]
+            for service in services:
+                if images[service] in state["pushed"]:
+                    state["images"][images[service]] = state["pushed"][images[service]]
+            if missing:
+                raise CliError("".join(f"Error response from daemon: manifest for {m} not found\n" for m in missing))
+            return ""
+        if words[1:2] == ["config"] and "--images" in args:
+            return "\n".join(images.values())
+    if words[:2] == ["image", "inspect"]:
+        refs = words[2:]
+        missing = [ref for ref in refs if ref not in state["images"]]
+        if missing:
+            raise CliError(f"Error: No such image: {missing[0]}")
+        return json.dumps([
+            {
+                "Id": state["images"][ref],
+                "RepoTags": [ref],
+                "RepoDigests": [f"{ref.rsplit(':', 1)[0]}@{state['pushed'][ref]}"] if ref in state["pushed"] else [],
+            }
+            for ref in refs
+        ])
+    raise CliError(f"unknown command: docker {' '.join(words)}", 1)
+
+
+# kubectl
+
+
+def _selector_matches(selector: str, labels: Dict[str, str]) -> bool:
+    return all(labels.get(k) == v for k, v in (pair.split("=", 1) for pair in selector.split(",") if pair))
+
+
+def _pods(deployment: dict, config: dict) -> List[dict]:
+    running = time.time() >= deployment["created"] + config["pod_start_secs"]
+    pods = []
+    for index in range(deployment["replicas"]):
+        name = f"{deployment['name']}-{deployment['hash']}-{index}"
+        status: Dict[str, Any] = {
+            "phase": "Running" if running else "Pending",
+            "startTime": _now_iso(deployment["created"]),
+            "conditions": [{"type": "PodScheduled", "lastTransitionTime": _now_iso(deployment["created"])}],
+        }
+        if running:
+            status["conditions"].append({"type": "Ready", "lastTransitionTime": _now_iso()})
+            status["containerStatuses"] = [
+                {
+                    "name": container,
+                    "containerID": f"containerd://{_digest(name, container)[7:23]}",
+                    "imageID": _digest(container),
+                    "restartCount": config.get("pod_restarts", 0),
+                }
+                for container in deployment["containers"]
+            ]
+        pods.append({"metadata": {"name": name, "uid": str(uuid.uuid5(uuid.NAMESPACE_URL, name))}, "status": status})
+    return pods
+
+
+def _kubectl(args: Sequence[str], state: dict, config: dict) -> str:
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    words = _words("kubectl", args)[1:]
+    k8s = state["k8s"]
+    k8s.setdefault("deployments", {})
+    k8s.setdefault("services", {})
+
+    if words[:1] == ["apply"]:
+        with open(_opt(args, "-f"), encoding="utf-8") as f:
+            documents = [d for d in yaml.safe_load_all(f) if d]
+        out = []
+        for document in documents:
+            name = document["metadata"]["name"]
+            if document.get("kind") == "Deployment":
+                spec = document["spec"]
+                k8s["deployments"][name] = {
+                    "name": name,
+                    "hash": hashlib.sha256(name.encode()).hexdigest()[:10],
+                    "replicas": spec.get("replicas", 1),
+                    "labels": spec["selector"]["matchLabels"],
+                    "containers": [c["name"] for c in spec["template"]["spec"]["containers"]],
+                    "created": time.time(),
+                }
+                out.append(f"deployment.apps/{name} created")
+            elif document.get("kind") == "Service":
+                k8s["services"][name] = {"name": name}
+                out.append(f"service/{name} created")
+        return "\n".join(out)
+    if words[:2] == ["get", "pods"]:
+        selector = _opt(args, "-l", "--selector", default="")
+        items = [
+            pod
+            for deployment in k8s["deployments"].values()
+            if _selector_matches(selector, deployment["labels"])
+            for pod in _pods(deployment, config)
+        ]
+        return json.dumps({"apiVersion": "v1", "kind": "List", "items": items})
+    if words[:2] == ["get", "deployment"]:
+        deployment = k8s["deployments"].get(words[2])
+        if deployment is None:
+            raise CliError(f'Error from server (NotFound): deployments.apps "{words[2]}" not found')
+        return json.dumps({
+            "metadata": {"name": deployment["name"]},
+            "spec": {"replicas": deployment["replicas"], "selector": {"matchLabels": deployment["labels"]}},
+        })
+    if words[:2] == ["get", "service"]:
+        if words[2] not in k8s["services"]:
+            raise CliError(f'Error from server (NotFound): services "{words[2]}" not found')
+        ingress = [{"ip": "20.0.0.1"}]
+        return json.dumps({"metadata": {"name": words[2]}, "status": {"loadBalancer": {"ingress": ingress}}})
+    if words[:1] == ["delete"]:
+        kind, _, name = words[1].partition("/")
+        if k8s.get(kind, {}).pop(name, None) is None:
+            raise CliError(f'Error from server (NotFound): {kind}.apps "{name}" not found')
+        return f'{kind}.apps "{name}" deleted'
+    if words[:2] == ["describe", "pod"]:
+        return f"Name: {words[2]}\nStatus: Running\n"
+    if words[:1] == ["logs"]:
+        return "hello from the pod\n"
+    raise CliError(f'error: unknown command "{" ".join(words)}" for "kubectl"')
+
+
+# oras
+
+
+def _oras(args: Sequence[str], state: dict, config: dict) -> str:
+    words = _words("oras", args)[1:]
+    if words[:2] == ["manifest", "fetch"]:
+        ref = words[2] if len(words) > 2 else args[-1]
+        return json.dumps({
+            "mediaType": "application/vnd.oci.image.manifest.v1+json",
+            "digest": _digest(ref, _opt(args, "--platform", default="")),
+        })
+    raise CliError(f"Error: unknown command {' '.join(words)}")
+
+
+# bicep
+
+
+def _read_message(stream) -> Optional[dict]:
+    headers = {}
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.decode("ascii").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return json.loads(stream.read(int(headers["content-length"])))
+
+
+def _write_message(stream, message: dict):
+    body = json.dumps(message).encode()
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    stream.flush()
+
+
+def _bicep_jsonrpc(home: str, config: dict) -> int:
+    started = time.time()
+    latency = _latency(config, ["bicep", "jsonrpc"])
+    time.sleep(latency)
+    call = {"argv": ["bicep", "jsonrpc", "--stdio"], "start": started, "end": time.time(), "latency": latency}
+    _log_call(home, call)
+
+    while True:
+        message = _read_message(sys.stdin.buffer)
+        if message is None:
+            return 0
+        started = time.time()
+        method = message.get("method", "")
+        path = message.get("params", {}).get("path", "")
+        latency = _latency(config, ["bicep", method.split("/")[-1]])
+        time.sleep(latency)
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": message.get("id")}
+        if method == "bicep/compileParams":
+            try:
+                built = _build_params(path)
+                response["result"] = {
+                    "success": True,
+                    "diagnostics": [],
+                    "parameters": built["parametersJson"],
+                    "template": built["templateJson"],
+                    "templateSpecId": None,
+                }
+            except (CliError, OSError) as e:
+                diagnostic = {"source": path, "level": "Error", "code": "BCP091", "message": str(e)}
+                response["result"] = {"success": False, "diagnostics": [diagnostic]}
+        else:
+            response["error"] = {"code": -32601, "message": f"Method not found: {method}"}
+        # Logged first, so that the call is in the log once the client has its response
+        _log_call(
+            home,
+            {"argv": ["bicep", "jsonrpc", method, path], "start": started, "end": time.time(), "latency": latency},
+        )
+        _write_message(sys.stdout.buffer, response)
+
+
+def _bicep(args: Sequence[str], state: dict, config: dict) -> str:
+    raise CliError(f"Unsupported bicep command: {' '.join(args)}", 1)
+
+
+HANDLERS = {"az": _az, "bicep": _bicep, "docker": _docker, "kubectl": _kubectl, "oras": _oras}
+
+
+def _log_call(home: str, call: dict):
+    call.setdefault("returncode", 0)
+    with open(os.path.join(home, "calls.jsonl"), "a", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(json.dumps(call) + "\n")
+
+
+def main(argv: Sequence[str]) -> int:
+    started = time.time()
+    tool, args = argv[0], list(argv[1:])
+    home = os.environ[HOME_ENV]
+    with open(os.path.join(home, "config.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    words = _words(tool, args)
+    if words[:2] == ["bicep", "jsonrpc"]:
+        return _bicep_jsonrpc(home, config)
+
+    with _locked_state(home) as state:
+        failure = _take_failure(state, config, words)
+    latency = _latency(config, words)
+    time.sleep(latency)
+
+    out, err, returncode = "", "", 0
+    if failure:
+        err, returncode = failure["stderr"], failure["returncode"]
+    else:
+        try:
+            with _locked_state(home) as state:
+                out = HANDLERS[tool](args, state, config)
+        except CliError as e:
+            err, returncode = str(e), e.returncode
+
+    if out:
+        print(out, flush=True)
+    if err:
+        print(err, file=sys.stderr, flush=True)
+
+    _log_call(
+        home,
+        {"argv": [tool, *args], "start": started, "end": time.time(), "latency": latency, "returncode": returncode},
+    )
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
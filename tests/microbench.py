@@ -0,0 +1,480 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+"""
+Microbenchmarks of the CPU bound hot paths of a run, on synthetic inputs
+sized like large targets:
+
+- evaluate_expr on a nested ARM expression
+- _resolve_arm_functions on a template of many container groups
+- arm_template_for_each_container_group on a template with many more other
+  resources, which aren't resolved
+- arm_template_for_each_container_group on a copy loop of many container groups
+- aci_param_set on a bicepparam file with hundreds of KB of base64 policies
+- make_configs on a template of many container groups (compiling the bicep
+  file is answered with the synthetic template)
+
+Timings are divided by that of a fixed calibration workload, so that a
+baseline recorded on one machine can be checked against on another.
+
+    python tests/microbench.py run [--output results.json]
+    python tests/microbench.py check [--baseline tests/microbench_baseline.json] [--threshold 0.25] [--update]
+
+`check` exits with 1 if any benchmark got slower than the baseline by more
+than the threshold, `--update` writes the new results as the baseline instead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+from unittest import mock
+
+from c_aci_testing.tools.aci_param_set import aci_param_set
+from c_aci_testing.tools.vm_generate_scripts import make_configs
+from c_aci_testing.utils import parse_bicep as parse_bicep_module
+from c_aci_testing.utils.arm_expression import evaluate_expr
+from c_aci_testing.utils.bicep_build import NO_CACHE_ENV
+from c_aci_testing.utils.parse_bicep import (
+    ArmTemplateResolver,
+    _resolve_arm_functions,
+    arm_template_for_each_container_group,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "microbench_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+SUB = "00000000-0000-0000-0000-000000000000"
+RG = "c-aci-testing"
+DEPLOYMENT_NAME = "bench-deployment"
+REGISTRY = "caci.azurecr.io"
+
+CONTAINER_GROUP_TYPE = "Microsoft.ContainerInstance/containerGroups"
+
+
+@dataclass
+class BenchResult:
+    name: str
+    size: int
+    # Best time of one call, in seconds
+    best: float
+    # best divided by the calibration workload's best
+    normalized: float
+
+
+# Synthetic inputs
+
+
+def synthetic_expression(depth: int) -> str:
+    expr = "parameters('registry')"
+    for i in range(depth):
+        expr = (
+            f"format('{{0}}/{{1}}-{i}', {expr},"
+            f" if(empty(parameters('repository')), concat('repo', '{i}'), parameters('repository')))"
+        )
+    return expr
+
+
+def synthetic_template(groups: int, containers_per_group: int = 2, other_resources: int = 0) -> dict:
+    def container(group: int, index: int) -> dict:
+        return {
+            "name": f"container{index}",
+            "properties": {
+                "image": f"[format('{{0}}/{{1}}/c{group}_{index}:{{2}}', parameters('registry'),"
+                " if(empty(parameters('repository')), 'bench', parameters('repository')), parameters('tag'))]",
+                "command": ["/bin/sh", "-c", f"[concat('serve --group ', '{group}')]"],
+                "environmentVariables": [
+                    {"name": "GROUP", "value": f"[format('{{0}}-cg{group}', deployment().name)]"},
+                    {"name": "LOCATION", "value": "[parameters('location')]"},
+                    {"name": "EMPTY", "value": ""},
+                ],
+                "volumeMounts": [{"name": "scratch", "mountPath": "/scratch"}],
+                "resources": {"requests": {"cpu": 1, "memoryInGB": "[add(1, 1)]"}},
+            },
+        }
+
+    identity = "[resourceId('Microsoft.ManagedIdentity/userAssignedIdentities', parameters('managedIDName'))]"
+    resources = [
+        {
+            "type": CONTAINER_GROUP_TYPE,
+            "apiVersion": "2023-05-01",
+            "name": f"[format('{{0}}-cg{group}', deployment().name)]",
+            "location": "[parameters('location')]",
+            "identity": {"type": "UserAssigned", "userAssignedIdentities": {identity: {}}},
+            "properties": {
+                "osType": "Linux",
+                "sku": "Confidential",
+                "confidentialComputeProperties": {"ccePolicy": f"[parameters('ccePolicies').cg{group}]"},
+                "imageRegistryCredentials": [{"server": "[parameters('registry')]", "identity": identity}],
+                "volumes": [{"name": "scratch", "emptyDir": {}}],
+                "containers": [container(group, index) for index in range(containers_per_group)],
+            },
+        }
+        for group in range(groups)
+    ]
+    # Networking and storage next to the container groups
+    resources += [
+        {
+            "type": "Microsoft.Network/virtualNetworks" if index % 2 else "Microsoft.Storage/storageAccounts",
+            "apiVersion": "2023-05-01",
+            "name": f"[format('{{0}}{index}', variables('prefix'))]",
+            "location": "[parameters('location')]",
+            "properties": {
+                "addressSpace": {"addressPrefixes": [f"[format('10.{{0}}.0.0/16', add({index}, 1))]"]},
+                "subnets": [{"name": f"[concat(variables('prefix'), 'subnet{subnet}')]"} for subnet in range(8)],
+            },
+        }
+        for index in range(other_resources)
+    ]
+    parameters = {name: {"type": "string"} for name in ("location", "registry", "repository", "tag", "managedIDName")}
+    parameters["ccePolicies"] = {"type": "object"}
+    variables = {"prefix": "[format('{0}-net', deployment().name)]"}
+    return {"contentVersion": "1.0.0.0", "parameters": parameters, "variables": variables, "resources": resources}
+
+
+def synthetic_copy_template(containers_per_group: int = 2) -> dict:
+    """
+    The container groups of synthetic_template as one copy loop over the names parameter, as bicep compiles
+    `[for name in names: {...}]`.
+    """
+    [group] = synthetic_template(1, containers_per_group)["resources"]
+    text = json.dumps(group).replace("-cg0", "-{1}").replace("deployment().name)", "deployment().name, copyIndex())")
+    group = json.loads(text.replace("c0_", "c").replace("'0'", "string(copyIndex())"))
+    group["name"] = "[format('{0}-{1}', deployment().name, parameters('names')[copyIndex()])]"
+    group["properties"]["confidentialComputeProperties"]["ccePolicy"] = (
+        "[parameters('ccePolicies')[format('cg{0}', copyIndex())]]"
+    )
+    group["copy"] = {"name": "groups", "count": "[length(parameters('names'))]"}
+    template = synthetic_template(0)
+    template["parameters"]["names"] = {"type": "array"}
+    template["resources"] = [group]
+    return template
+
+
+def synthetic_parameters(groups: int, policy_bytes: int = 0) -> dict:
+    values = {
+        "location": "westeurope",
+        "registry": REGISTRY,
+        "repository": "",
+        "tag": "latest",
+        "managedIDName": "bench-id",
+        "ccePolicies": {f"cg{group}": synthetic_policy(policy_bytes, group) for group in range(groups)},
+    }
+    return {"contentVersion": "1.0.0.0", "parameters": {k: {"value": v} for k, v in values.items()}}
+
+
+def synthetic_policy(size: int, seed: int) -> str:
+    """
+    A base64 encoded policy of about size bytes.
+    """
+    rng = random.Random(seed)
+    rego = "package policy\n"
+    while len(rego) < size * 3 // 4:
+        rego += f'containers := [{{"id": "sha256:{rng.getrandbits(256):064x}", "layers": []}}]\n'
+    return base64.b64encode(rego.encode()).decode()
+
+
+@contextlib.contextmanager
+def synthetic_target(groups: int, policy_bytes: int) -> Iterator[str]:
+    with tempfile.TemporaryDirectory() as target_path:
+        with open(os.path.join(target_path, "bench.bicep"), "w", encoding="utf-8") as f:
+            f.write("// Stands in for the synthetic template\n")
+        policies = "\n".join(f"  cg{group}: '{synthetic_policy(policy_bytes, group)}'" for group in range(groups))
+        with open(os.path.join(target_path, "bench.bicepparam"), "w", encoding="utf-8") as f:
+            f.write(
+                "using './bench.bicep'\n\n"
+                "param registry=''\nparam repository=''\nparam tag=''\n\n"
+                f"param location='westeurope'\nparam ccePolicies={{\n{policies}\n}}\nparam managedIDName='bench-id'\n"
+            )
+        yield target_path
+
+
+# Benchmarks, each sets up its inputs and returns the call to time
+
+
+def bench_evaluate_expr(size: int) -> Callable[[], object]:
+    expr = synthetic_expression(size)
+    parameters = {"registry": REGISTRY, "repository": ""}
+
+    def handle_func(name, args):
+        if name == "parameters":
+            return parameters[args[0]]
+        if name == "format":
+            return args[0].format(*args[1:])
+        if name == "concat":
+            return "".join(args)
+        if name == "empty":
+            return args[0] == ""
+        if name == "if":
+            return args[1] if args[0] else args[2]
+        raise ValueError(name)
+
+    return lambda: evaluate_expr(expr, handle_func)
+
+
+def bench_resolve_arm_functions(size: int) -> Callable[[], object]:
+    template = synthetic_template(size)
+    parameters = synthetic_parameters(size, policy_bytes=1024)
+    return lambda: _resolve_arm_functions(template, parameters, RG, SUB, DEPLOYMENT_NAME)
+
+
+def bench_container_groups(size: int) -> Callable[[], object]:
+    """
+    size being the number of container groups, next to 4 times as many other resources.
+    """
+    template = synthetic_template(size, other_resources=4 * size)
+    parameters = synthetic_parameters(size, policy_bytes=1024)
+
+    def run():
+        resolver = ArmTemplateResolver(template, parameters, RG, SUB, DEPLOYMENT_NAME)
+        return [list(containers) for _, containers in arm_template_for_each_container_group(resolver)]
+
+    return run
+
+
+def bench_copy_loop(size: int) -> Callable[[], object]:
+    """
+    size being the number of iterations of the container group copy loop.
+    """
+    template = synthetic_copy_template()
+    parameters = synthetic_parameters(size, policy_bytes=1024)
+    parameters["parameters"]["names"] = {"value": [f"cg{group}" for group in range(size)]}
+
+    def run():
+        resolver = ArmTemplateResolver(template, parameters, RG, SUB, DEPLOYMENT_NAME)
+        return [list(containers) for _, containers in arm_template_for_each_container_group(resolver)]
+
+    return run
+
+
+@contextlib.contextmanager
+def bench_aci_param_set(size: int) -> Iterator[Callable[[], object]]:
+    """
+    As policies_gen and parse_bicep set parameters, size being the number of ~300KB policies.
+    """
+    with synthetic_target(size, policy_bytes=0) as target_path:
+        policies = "{\n" + "\n".join(f"  cg{g}: '{synthetic_policy(300_000, g)}'" for g in range(size)) + "\n}"
+
+        def run():
+            aci_param_set(target_path, parameters={"ccePolicies": policies})
+            aci_param_set(target_path, parameters={"registry": REGISTRY, "repository": "", "tag": "latest"}, add=False)
+
+        yield run
+
+
+@contextlib.contextmanager
+def bench_make_configs(size: int) -> Iterator[Callable[[], object]]:
+    """
+    size being the number of container groups.
+    """
+    template = json.dumps(synthetic_template(size))
+    parameters = json.dumps(synthetic_parameters(size, policy_bytes=1024))
+
+    def build_params(bicepparam_file_path):
+        return json.loads(template), json.loads(parameters)
+
+    with synthetic_target(size, policy_bytes=1024) as target_path, tempfile.TemporaryDirectory() as output_dir:
+        # Convert the target every time rather than use the cached model
+        no_cache = mock.patch.dict(os.environ, {NO_CACHE_ENV: "1"})
+        with mock.patch.object(parse_bicep_module, "build_params", build_params), no_cache:
+            yield lambda: make_configs(
+                target_path=target_path,
+                subscription=SUB,
+                resource_group=RG,
+                deployment_name=DEPLOYMENT_NAME,
+                win_flavor="ws2025",
+                registry=REGISTRY,
+                repository="",
+                tag="latest",
+                prefix="lcow",
+                output_conf_dir=output_dir,
+                no_resolve_manifest_hash=True,
+            )
+
+
+def calibration(size: int) -> Callable[[], object]:
+    """
+    A fixed mix of the interpreter work the benchmarks do, to normalize timings by.
+    """
+    env = [{"name": f"E{j}", "value": "x" * j} for j in range(20)]
+    document = {"groups": [{"name": f"cg{i}", "env": env} for i in range(size)]}
+
+    def run():
+        text = json.dumps(document)
+        json.loads(text)
+        return sum(len(part) for part in text.split(",") if part.startswith('"'))
+
+    return run
+
+
+BENCHMARKS: Dict[str, tuple] = {
+    # name: (setup, default size)
+    "evaluate_expr": (bench_evaluate_expr, 30),
+    "resolve_arm_functions": (bench_resolve_arm_functions, 60),
+    "container_groups": (bench_container_groups, 60),
+    "copy_loop": (bench_copy_loop, 60),
+    "aci_param_set": (bench_aci_param_set, 10),
+    "make_configs": (bench_make_configs, 60),
+}
+
+
+# Running and checking
+
+
+def time_call(call: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> float:
+    """
+    Best time of one call, over repeat rounds of enough calls to take min_time.
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeat or number >= 1_000_000:
+            break
+        number *= 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            call()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def _time_benchmark(setup: Callable, size: int, min_time: float, repeat: int) -> float:
+    prepared = setup(size)
+    if not isinstance(prepared, contextlib.AbstractContextManager):
+        prepared = contextlib.nullcontext(prepared)
+    with prepared as call:
+        # The tools print progress, which isn't what is measured
+        with contextlib.redirect_stdout(io.StringIO()):
+            return time_call(call, min_time, repeat)
+
+
+def run_benchmarks(
+    names: Optional[List[str]] = None,
+    sizes: Optional[Dict[str, int]] = None,
+    min_time: float = 0.2,
+    repeat: int = 5,
+) -> dict:
+    timings = []
+    for name in names or list(BENCHMARKS):
+        setup, default_size = BENCHMARKS[name]
+        size = (sizes or {}).get(name, default_size)
+        timings.append((name, size, _time_benchmark(setup, size, min_time, repeat)))
+    # Calibrating before and after evens out the machine warming up or getting busy
+    reference = min(_time_benchmark(calibration, 50, min_time, repeat) for _ in range(2))
+    results = [BenchResult(name, size, best, best / reference) for name, size, best in timings]
+    return {
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "calibration": reference,
+        "results": [asdict(r) for r in results],
+    }
+
+
+def _comparable(baseline: dict, current: dict) -> str:
+    """
+    Timings measured on the same machine and Python compare as they are,
+    others only relative to the calibration workload.
+    """
+    same = all(baseline.get(k) == current.get(k) for k in ("host", "python"))
+    return "best" if same else "normalized"
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Descriptions of the benchmarks which regressed by more than threshold
+    (e.g. 0.25 for 25%), comparing normalized timings of the same input sizes.
+    """
+    previous = {(r["name"], r["size"]): r for r in baseline["results"]}
+    key = _comparable(baseline, current)
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["name"], result["size"]))
+        if before is None:
+            continue
+        change = result[key] / before[key] - 1
+        if change > threshold:
+            regressions.append(
+                f"{result['name']} (size {result['size']}) regressed by {change:.0%}:"
+                f" {before['best'] * 1000:.3f}ms -> {result['best'] * 1000:.3f}ms"
+            )
+    return regressions
+
+
+def format_results(results: dict, baseline: Optional[dict] = None) -> str:
+    previous = {(r["name"], r["size"]): r for r in (baseline or {}).get("results", [])}
+    key = _comparable(baseline, results) if baseline else "best"
+    lines = [f"  {'benchmark':<24} {'size':>6} {'best':>12} {'normalized':>11} {'vs baseline':>12}"]
+    for r in results["results"]:
+        before = previous.get((r["name"], r["size"]))
+        change = f"{r[key] / before[key] - 1:+.0%}" if before else "-"
+        lines.append(
+            f"  {r['name']:<24} {r['size']:>6} {r['best'] * 1000:>10.3f}ms {r['normalized']:>11.1f} {change:>12}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks of c-aci-testing's CPU bound hot paths")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run")
+    run.add_argument("--output", type=str, default="")
+    check = subparsers.add_parser("check")
+    check.add_argument("--baseline", type=str, default=BASELINE_PATH)
+    check.add_argument(
+        "--threshold",
+        type=float,
+        default=os.getenv("CACI_MICROBENCH_THRESHOLD", str(DEFAULT_THRESHOLD)),
+        help="Fraction a benchmark may get slower by before failing the check",
+    )
+    check.add_argument("--update", action="store_true", help="Write the results as the new baseline")
+    for subparser in (run, check):
+        subparser.add_argument("--benchmark", action="append", choices=list(BENCHMARKS), dest="names")
+        subparser.add_argument("--min-time", type=float, default=0.2)
+        subparser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names, min_time=args.min_time, repeat=args.repeat)
+
+    if args.command == "run":
+        print(format_results(results))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_results(results, baseline))
+    if args.update or baseline is None:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    regressions = compare(baseline, results, args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from c_aci_testing.tools.aci_startup_report import (
+    aci_startup_report,
+    container_startup,
+    parse_duration,
+)
+from c_aci_testing.utils import arm
+from c_aci_testing.utils.arm import parse_timestamp
+
+SUB = "00000000-0000-0000-0000-000000000000"
+RG = "c-aci-testing"
+
+SUBMITTED = datetime(2024, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def ts(seconds: float) -> str:
+    return (SUBMITTED + timedelta(seconds=seconds)).isoformat().replace("+00:00", "Z")
+
+
+def container(name: str, events: list, start: float) -> dict:
+    return {
+        "name": name,
+        "instanceView": {
+            "currentState": {"state": "Running", "startTime": ts(start)},
+            "restartCount": 0,
+            "events": [
+                {"name": event, "firstTimestamp": ts(first), "lastTimestamp": ts(last), "count": 1}
+                for event, first, last in events
+            ],
+        },
+    }
+
+
+def test_parse_times():
+    assert parse_timestamp("2024-05-01T12:00:01.123456789Z") == SUBMITTED + timedelta(seconds=1, microseconds=123456)
+    assert parse_timestamp("2024-05-01T14:00:00+02:00") == SUBMITTED
+    assert parse_timestamp("not a time") is None
+    assert parse_duration("PT1M30.5S") == timedelta(seconds=90.5)
+    assert parse_duration("P1DT2H") == timedelta(days=1, hours=2)
+
+
+def test_container_startup_breakdown():
+    # az output, with "properties" flattened into the resource
+    group = {
+        "name": "cg",
+        "containers": [
+            container("primary", [("Pulling", 20, 20), ("Pulled", 50, 50), ("Started", 55, 55)], start=55),
+            container("sidecar", [("Pulling", 21, 21), ("Pulled", 31, 31)], start=40),
+        ],
+    }
+    logs = {"primary": f"{ts(58.5)} listening on :8000\n{ts(60)} ready\n"}
+
+    report = container_startup(group, SUBMITTED, logs)
+
+    primary, sidecar = report
+    assert (primary["submit_to_created"], primary["image_pull"]) == (20, 30)
+    assert (primary["submit_to_started"], primary["submit_to_first_log"]) == (55, 58.5)
+    assert (sidecar["image_pull"], sidecar["submit_to_started"], sidecar["submit_to_first_log"]) == (10, 40, None)
+
+
+def test_startup_report_over_rest(arm_backend, capsys):
+    client = arm.get_arm_client()
+    template = {"resources": [{"type": arm.CONTAINER_GROUP_TYPE, "name": "cg"}]}
+    client.create_deployment(SUB, RG, "dep", template, {})
+    for _ in arm_backend.states:
+        if client.show_deployment(SUB, RG, "dep")["properties"]["provisioningState"] == "Succeeded":
+            break
+    else:
+        pytest.fail("Deployment didn't succeed")
+
+    submitted = parse_timestamp(datetime.now(timezone.utc).isoformat())
+    (group,) = [r for r in arm_backend.resources.values() if r["name"] == "cg"]
+    group["properties"]["containers"] = [
+        {"name": "primary", "properties": {"instanceView": {"events": [], "currentState": {"state": "Running"}}}}
+    ]
+    group["systemData"] = {"createdAt": submitted.isoformat()}
+    arm_backend.logs[("cg", "primary")] = f"{(submitted + timedelta(seconds=5)).isoformat()} hello\n"
+
+    (entry,) = aci_startup_report(deployment_name="dep", subscription=SUB, resource_group=RG)
+
+    assert entry["container"] == "primary"
+    assert entry["submit_to_first_log"] == pytest.approx(entry["submit_to_created"] + 5)
+    assert "cg/primary" in capsys.readouterr().out
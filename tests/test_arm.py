@@ -0,0 +1,130 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+
+from c_aci_testing.utils import arm
+from c_aci_testing.utils.arm import ArmClient, ArmError
+
+from fake_arm import FakeArm
+
+SUB = "00000000-0000-0000-0000-000000000000"
+RG = "c-aci-testing"
+VM_ID = f"/subscriptions/{SUB}/resourceGroups/{RG}/providers/Microsoft.Compute/virtualMachines/test-vm"
+
+
+class Tokens:
+    def __init__(self, server: FakeArm, lifetime: float = 3600):
+        self.server = server
+        self.lifetime = lifetime
+        self.calls = 0
+
+    def __call__(self, resource: str):
+        self.calls += 1
+        return self.server.token, time.time() + self.lifetime
+
+
+@pytest.fixture
+def client(fake_arm):
+    client = ArmClient(fake_arm.endpoint, token_provider=Tokens(fake_arm))
+    yield client
+    client.close()
+
+
+def test_deployment_polling_reuses_connection_and_token(fake_arm, client):
+    template = {"resources": [{"type": arm.CONTAINER_GROUP_TYPE, "name": "test-cg"}]}
+    client.create_deployment(SUB, RG, "test-deployment", template, {})
+
+    states = [
+        client.show_deployment(SUB, RG, "test-deployment")["properties"]["provisioningState"] for _ in range(3)
+    ]
+    assert states == ["Running", "Succeeded", "Succeeded"]
+
+    ids = client.show_deployment(SUB, RG, "test-deployment")["properties"]["outputs"]["ids"]["value"]
+    assert [id.split("/")[-1] for id in ids] == ["test-cg"]
+    assert client.get_container_group(ids[0])["properties"]["instanceView"]["state"] == "Running"
+    assert [cg["id"] for cg in client.list_container_groups(SUB, RG)] == ids
+
+    assert fake_arm.connections == 1
+    assert client._token_provider.calls == 1
+
+
+def test_token_refreshed_when_rejected_or_expiring(fake_arm, client):
+    client.list_container_groups(SUB, RG)
+
+    fake_arm.token = "rotated-token"
+    client.list_container_groups(SUB, RG)
+    assert client._token_provider.calls == 2
+
+    client._token_provider.lifetime = arm.TOKEN_REFRESH_MARGIN_SECS / 2
+    client.get_token(force_refresh=True)
+    client.list_container_groups(SUB, RG)
+    assert client._token_provider.calls == 4
+
+
+def test_missing_deployment_raises_arm_error(client):
+    with pytest.raises(ArmError) as e:
+        client.show_deployment(SUB, RG, "missing")
+    assert e.value.status == 404
+    assert e.value.code == "DeploymentNotFound"
+
+
+def test_delete_resource_waits_for_operation(fake_arm, client):
+    fake_arm.add_resource(VM_ID)
+
+    assert client.resource_exists(VM_ID)
+    client.delete_resource(VM_ID, wait=True)
+    assert not client.resource_exists(VM_ID)
+    assert ("GET", f"/subscriptions/{SUB}/providers/Microsoft.Compute") in fake_arm.requests
+
+    # Deleting again succeeds, as with `az resource delete`
+    client.delete_resource(VM_ID, wait=True)
+
+
+def test_aci_tools_use_rest_backend(arm_backend):
+    from c_aci_testing.tools.aci_get_ids import aci_get_ids
+    from c_aci_testing.tools.aci_get_ips import aci_get_ips
+    from c_aci_testing.tools.aci_get_is_live import aci_get_is_live
+    from c_aci_testing.tools.aci_remove import aci_remove
+
+    ids = [arm_backend.add_container_group(SUB, RG, f"test-cg-{i}") for i in range(3)]
+    # Falls back to looking up a container group named after the deployment
+    assert aci_get_ids("test-cg-0", SUB, RG) == [ids[0]]
+
+    assert aci_get_is_live("test", SUB, RG, aci_ids=ids)
+    arm_backend.add_container_group(SUB, RG, "test-cg-2", state="Terminated")
+    assert not aci_get_is_live("test", SUB, RG, aci_ids=ids)
+
+    assert aci_get_ips("test-cg-1", SUB, RG) == ["10.0.0.5"]
+
+    aci_remove("test-cg-1", SUB, RG)
+    assert not aci_get_ids("test-cg-1", SUB, RG)
+
+
+def test_aci_deploy_with_rest_backend(arm_backend, monkeypatch, tmp_path):
+    from c_aci_testing.tools import aci_deploy as aci_deploy_module
+
+    (tmp_path / "main.bicep").write_text("")
+    (tmp_path / "main.bicepparam").write_text(
+        os.linesep.join(["using 'main.bicep'", "param location = ''", "param managedIDName = ''", ""])
+    )
+    template = {"resources": [{"type": arm.CONTAINER_GROUP_TYPE, "name": "test-deploy-cg"}]}
+    monkeypatch.setattr(aci_deploy_module, "build_params", lambda path: (template, {"parameters": {}}))
+    monkeypatch.setattr(aci_deploy_module.time, "sleep", lambda secs: None)
+
+    ids = aci_deploy_module.aci_deploy(
+        str(tmp_path),
+        deployment_name="test-deploy",
+        subscription=SUB,
+        resource_group=RG,
+        location="eastus",
+        managed_identity="id",
+    )
+    assert [id.split("/")[-1] for id in ids] == ["test-deploy-cg"]
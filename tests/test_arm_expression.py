@@ -0,0 +1,208 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import pytest
+
+from c_aci_testing.utils.arm_expression import compile_expr, evaluate_expr, evaluate_template_string
+from c_aci_testing.utils.parse_bicep import (
+    ArmReferenceCycleError,
+    ArmTemplateResolver,
+    _resolve_arm_functions,
+    arm_template_for_each_container_group,
+)
+
+PARAMETERS = {
+    "registry": "caci.azurecr.io",
+    "repository": "",
+    "ccePolicies": {"primary": "cG9saWN5"},
+    "ports": [{"port": 80}, {"port": 443}],
+}
+
+
+def handle_func(name, args):
+    if name == "parameters":
+        return PARAMETERS[args[0]]
+    if name == "concat":
+        return "".join(args)
+    if name == "empty":
+        return not args[0]
+    if name == "if":
+        return args[1] if args[0] else args[2]
+    if name == "createArray":
+        return args
+    if name == "listKeys":
+        return {"keys": [{"value": f"key of {args[0]}"}]}
+    raise ValueError(f"Unknown function {name}")
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        (
+            "concat(parameters('registry'), '/', if(empty(parameters('repository')), 'example', 'other'))",
+            "caci.azurecr.io/example",
+        ),
+        ("  concat( 'a' ,'b' )  ", "ab"),
+        ("'it''s'", "it's"),
+        ("concat('a,(b', ')''')", "a,(b)'"),
+        ("parameters('ccePolicies').primary", "cG9saWN5"),
+        ("parameters('ccePolicies')['primary']", "cG9saWN5"),
+        ("parameters('ports')[1].port", 443),
+        ("createArray(1, -2, true, null)[1]", -2),
+        ("parameters('ccePolicies').missing", None),
+        ("concat('storage', 'account').listKeys().keys[0].value", "key of storageaccount"),
+    ],
+)
+def test_evaluate_expr(expr, expected):
+    assert evaluate_expr(expr, handle_func) == expected
+
+
+@pytest.mark.parametrize("expr", ["concat('a'", "concat('a'))", "concat('a' 'b')", "parameters('registry').x", "a-b"])
+def test_invalid_expressions(expr):
+    with pytest.raises(ValueError, match="Failed to parse expression"):
+        evaluate_expr(expr, handle_func)
+
+
+def test_expressions_are_compiled_once():
+    expr = "concat(parameters('registry'), '/compiled-once')"
+    evaluate_expr(expr, handle_func)
+    hits = compile_expr.cache_info().hits
+
+    assert evaluate_expr(expr, handle_func) == "caci.azurecr.io/compiled-once"
+    assert compile_expr.cache_info().hits == hits + 1
+
+
+def test_template_strings():
+    assert evaluate_template_string("[parameters('registry')]", handle_func) == "caci.azurecr.io"
+    assert evaluate_template_string("[[not an expression]", handle_func) == "[not an expression]"
+    assert evaluate_template_string("plain", handle_func) == "plain"
+
+    template = {
+        "parameters": {"name": {"type": "string"}},
+        "resources": [{"name": "[format('{0}-cg', parameters('name'))]", "tags": {"raw": "[[literal]"}}],
+    }
+    resolved = _resolve_arm_functions(template, {"parameters": {"name": {"value": "dep"}}}, "rg", "sub", "dep")
+    assert resolved["resources"] == [{"name": "dep-cg", "tags": {"raw": "[literal]"}}]
+
+
+def test_only_requested_resources_are_resolved(capsys):
+    template = {
+        "parameters": {"name": {"type": "string"}, "prefix": {"type": "string", "defaultValue": "[variables('a')]"}},
+        "variables": {"a": "[format('{0}-', parameters('name'))]", "broken": "[unknownSyntax(]"},
+        "resources": [
+            {"type": "Microsoft.Network/virtualNetworks", "name": "[variables('broken')]"},
+            {
+                "type": "Microsoft.ContainerInstance/containerGroups",
+                "name": "[concat(parameters('prefix'), 'cg')]",
+                "properties": {"containers": [{"name": "[concat(variables('a'), 'c')]"}]},
+            },
+        ],
+    }
+    resolver = ArmTemplateResolver(template, {"parameters": {"name": {"value": "dep"}}}, "rg", "sub", "dep")
+
+    groups = list(arm_template_for_each_container_group(resolver))
+
+    assert [(group["name"], list(containers)) for group, containers in groups] == [("dep-cg", [{"name": "dep-c"}])]
+    assert "Warning" not in capsys.readouterr().err
+    assert resolver.variable("a") is resolver.variable("a")
+
+
+def test_reference_cycles():
+    template = {
+        "parameters": {"first": {"type": "string", "defaultValue": "[variables('second')]"}},
+        "variables": {"second": "[concat(variables('third'), 'x')]", "third": "[parameters('first')]"},
+        "resources": [{"type": "Microsoft.ContainerInstance/containerGroups", "name": "[parameters('first')]"}],
+    }
+    resolver = ArmTemplateResolver(template, {"parameters": {}}, "rg", "sub", "dep")
+
+    with pytest.raises(ArmReferenceCycleError) as e:
+        list(resolver.resources())
+    assert str(e.value) == (
+        "Circular reference: parameters('first') -> variables('second') -> variables('third') -> parameters('first')"
+    )
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        ("length(range(2, 3))", 3),
+        ("range(2, 3)[2]", 4),
+        ("concat(createArray(1), createArray(2, 3))", [1, 2, 3]),
+        ("union(createObject('a', 1, 'b', 2), createObject('b', 3))", {"a": 1, "b": 3}),
+        ("union(createArray(1, 2), createArray(2, 3))", [1, 2, 3]),
+        ("string(add(int('40'), 2))", "42"),
+        ("string(createObject('a', true()))", '{"a":true}'),
+        ("div(-7, 2)", -3),
+        ("mod(-7, 2)", -1),
+        ("max(createArray(1, 5, 3))", 5),
+        ("join(split('a,b;c', createArray(',', ';')), '-')", "a-b-c"),
+        ("padLeft(string(7), 3, '0')", "007"),
+        ("startsWith('Contoso', 'con')", True),
+        ("empty(createArray())", True),
+        ("first(skip(createArray('a', 'b', 'c'), 1))", "b"),
+    ],
+)
+def test_functions(expr, expected):
+    resolver = ArmTemplateResolver({"parameters": {}}, {"parameters": {}}, "rg", "sub", "dep")
+    assert resolver.resolve(f"[{expr}]") == expected
+
+
+def test_copy_loops(capsys):
+    template = {
+        "parameters": {"count": {"type": "int"}, "tags": {"type": "object"}},
+        "variables": {
+            "copy": [
+                {
+                    "name": "names",
+                    "count": "[parameters('count')]",
+                    "input": "[format('cg-{0}', copyIndex('names', 1))]",
+                }
+            ]
+        },
+        "resources": {
+            "groups": {
+                "copy": {"name": "groupLoop", "count": "[length(variables('names'))]"},
+                "condition": "[not(equals(copyIndex(), 2))]",
+                "type": "Microsoft.ContainerInstance/containerGroups",
+                "name": "[variables('names')[copyIndex()]]",
+                "tags": "[union(parameters('tags'), createObject('scale', 'true'))]",
+                "properties": {
+                    "copy": [
+                        {
+                            "name": "containers",
+                            "count": "[add(copyIndex(), 1)]",
+                            "input": {"name": "[format('c{0}-{1}', copyIndex('groupLoop'), copyIndex('containers'))]"},
+                        }
+                    ]
+                },
+            },
+        },
+    }
+    parameters = {"parameters": {"count": {"value": 4}, "tags": {"value": {"owner": "caci"}}}}
+    resolver = ArmTemplateResolver(template, parameters, "rg", "sub", "dep")
+
+    groups = [group for group, _ in arm_template_for_each_container_group(resolver)]
+
+    assert [group["name"] for group in groups] == ["cg-1", "cg-2", "cg-4"]
+    assert [[c["name"] for c in group["properties"]["containers"]] for group in groups] == [
+        ["c0-0"],
+        ["c1-0", "c1-1"],
+        ["c3-0", "c3-1", "c3-2", "c3-3"],
+    ]
+    assert "copy" not in groups[0]
+    # Expressions which don't depend on the iteration are resolved once
+    assert groups[0]["tags"] == {"owner": "caci", "scale": "true"}
+    assert groups[0]["tags"] is groups[2]["tags"]
+    assert "Warning" not in capsys.readouterr().err
+
+    resolved = _resolve_arm_functions(template, parameters, "rg", "sub", "dep")
+    assert resolved["variables"] == {"names": ["cg-1", "cg-2", "cg-3", "cg-4"]}
+    assert [group["name"] for group in resolved["resources"]] == ["cg-1", "cg-2", "cg-4"]
+
+    parameters["parameters"]["count"] = {"value": 801}
+    with pytest.raises(ValueError, match="Invalid count of copy loop 'names'"):
+        ArmTemplateResolver(template, parameters, "rg", "sub", "dep").variable("names")
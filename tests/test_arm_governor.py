@@ -0,0 +1,58 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import multiprocessing
+
+import pytest
+
+from c_aci_testing.utils import arm_governor
+
+
+@pytest.fixture
+def slow_bucket(monkeypatch):
+    # 3600 reads/hour refills one token per second, with a burst of 2
+    monkeypatch.setenv("CACI_ARM_READS_PER_HOUR", "3600")
+    monkeypatch.setenv("CACI_ARM_BURST", "2")
+
+
+def _reserve(_):
+    return arm_governor.reserve(arm_governor.READ, "sub")
+
+
+def test_burst_then_delays_in_arrival_order(slow_bucket):
+    delays = [arm_governor.reserve(arm_governor.READ, "sub") for _ in range(4)]
+    assert delays[:2] == [0, 0]
+    assert 0.9 < delays[2] <= 1
+    assert 1.9 < delays[3] <= 2
+
+    # Buckets are per subscription
+    assert arm_governor.reserve(arm_governor.READ, "other-sub") == 0
+
+
+def test_bucket_shared_between_processes(slow_bucket):
+    with multiprocessing.get_context("spawn").Pool(2) as pool:
+        delays = pool.map(_reserve, range(4))
+    assert sorted(round(d) for d in delays) == [0, 0, 1, 2]
+
+    totals = arm_governor.get_totals("sub")[arm_governor.READ]
+    assert totals["calls"] == 4
+    assert totals["delayed_calls"] == 2
+
+
+def test_disabled_with_zero_rate(monkeypatch):
+    monkeypatch.setenv("CACI_ARM_READS_PER_HOUR", "0")
+    monkeypatch.setenv("CACI_ARM_BURST", "1")
+    assert [arm_governor.reserve(arm_governor.READ, "sub") for _ in range(3)] == [0, 0, 0]
+
+
+def test_classify_argv():
+    sub_id = "/subscriptions/1234/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm"
+    assert arm_governor.classify_argv(["az", "deployment", "group", "show", "-n", "x"]) == arm_governor.READ
+    assert arm_governor.classify_argv(["az", "resource", "delete", "--ids", sub_id]) == arm_governor.WRITE
+    assert arm_governor.classify_argv(["az", "bicep", "build-params", "--file", "x"]) is None
+    assert arm_governor.classify_argv(["docker", "push", "x"]) is None
+    assert arm_governor.subscription_of(["az", "resource", "delete", "--ids", sub_id]) == "1234"
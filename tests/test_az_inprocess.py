@@ -0,0 +1,93 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import sys
+import time
+import types
+
+import pytest
+
+from c_aci_testing.utils import az_inprocess
+from c_aci_testing.utils.cmd_executor import execute, execute_all
+from c_aci_testing.utils.deadline import DeadlineExceeded, RunBudget
+
+
+class FakeCli:
+    instances = 0
+
+    def __init__(self):
+        FakeCli.instances += 1
+        self.calls = []
+
+    def invoke(self, args, out_file=None):
+        self.calls.append(args)
+        if args[0] == "fail":
+            print("ERROR: boom", file=sys.stderr)
+            return 1
+        if args[0] == "slow":
+            time.sleep(0.2)
+            return 0
+        if args[0] == "print":
+            # e.g. confcom prints its output instead of using out_file
+            print("printed")
+            return 0
+        out_file.write(" ".join(args) + "\n")
+        return 0
+
+
+@pytest.fixture
+def fake_azure_cli(monkeypatch):
+    core = types.ModuleType("azure.cli.core")
+    core.get_default_cli = FakeCli
+    monkeypatch.setitem(sys.modules, "azure", types.ModuleType("azure"))
+    monkeypatch.setitem(sys.modules, "azure.cli", types.ModuleType("azure.cli"))
+    monkeypatch.setitem(sys.modules, "azure.cli.core", core)
+    monkeypatch.setenv(az_inprocess.AZ_BACKEND_ENV, "inprocess")
+    monkeypatch.setattr(az_inprocess, "_cli", None)
+    monkeypatch.setattr(az_inprocess, "_available", None)
+    FakeCli.instances = 0
+    yield
+    for name in ("stdout", "stderr"):
+        stream = getattr(sys, name)
+        if isinstance(stream, az_inprocess._ThreadRoutedStream):
+            setattr(sys, name, stream._default)
+
+
+def test_inprocess_reuses_cli_context(fake_azure_cli):
+    first = execute(["az", "group", "show", "-n", "rg"], check=True)
+    results = execute_all([["az", "container", "show", "--ids", str(i)] for i in range(3)])
+
+    assert first.stdout == "group show -n rg\n"
+    assert [r.stdout for r in results] == [f"container show --ids {i}\n" for i in range(3)]
+    assert FakeCli.instances == 1
+
+
+def test_inprocess_captures_printed_output_and_errors(fake_azure_cli):
+    assert execute(["az", "print"]).stdout == "printed\n"
+
+    res = execute(["az", "fail"])
+    assert res.returncode == 1
+    assert "ERROR: boom" in res.stderr
+
+
+def test_inprocess_not_used_for_non_az_or_unsupported_calls(fake_azure_cli):
+    assert not az_inprocess.can_run_inprocess([sys.executable, "-c", ""])
+    assert not az_inprocess.can_run_inprocess(["az", "container", "logs", "--follow"])
+    assert not az_inprocess.can_run_inprocess(["az", "group", "show"], timeout=5)
+    assert az_inprocess.can_run_inprocess(["az", "group", "show"])
+
+
+def test_inprocess_used_within_run_budget(fake_azure_cli):
+    with RunBudget(60).activate():
+        execute(["az", "group", "show", "-n", "rg"], check=True)
+    assert FakeCli.instances == 1
+
+    # Not killed when the budget runs out, but noticed right after
+    with RunBudget(0.1).activate():
+        with pytest.raises(DeadlineExceeded):
+            execute(["az", "slow"])
+    assert FakeCli.instances == 1
@@ -0,0 +1,91 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from c_aci_testing.tools import bench as bench_module
+from c_aci_testing.tools.bench import bench
+from c_aci_testing.utils import run_history
+
+
+@pytest.fixture
+def fake_target_run(monkeypatch):
+    monkeypatch.setenv(run_history.HISTORY_DB_ENV, "")
+    calls = []
+    lock = threading.Lock()
+
+    @contextmanager
+    def target_run_ctx(deployment_name, budget, skip_images=False, **kwargs):
+        with lock:
+            calls.append((deployment_name, skip_images))
+            iteration = len(calls)
+        if not skip_images:
+            with budget.stage("images_build"):
+                time.sleep(0.02)
+        with budget.stage("aci_deploy"):
+            time.sleep(0.01 * iteration)
+            if iteration == 3:
+                raise RuntimeError("container group failed to start")
+        with budget.stage("test"):
+            yield
+
+    monkeypatch.setattr(bench_module, "target_run_ctx", target_run_ctx)
+    return calls
+
+
+def test_bench_reports_stage_percentiles(fake_target_run, tmp_path):
+    output = tmp_path / "bench.json"
+
+    results = bench(
+        bench_command="target",
+        deployment_name="dep",
+        target_path="/targets/simple",
+        iterations=4,
+        concurrency=2,
+        reuse_images=True,
+        bench_output=str(output),
+        label="platform 1.2.3",
+    )
+
+    names = [name for name, _ in fake_target_run]
+    assert len(set(names)) == 4 and all(name.startswith("dep-") for name in names)
+    # Only the first iteration builds, and it finishes before the others start
+    assert fake_target_run[0][1] is False and all(skip for _, skip in fake_target_run[1:])
+
+    stages = {s["stage"]: s for s in results["stages"]}
+    assert (stages["images_build"]["count"], stages["images_build"]["failures"]) == (1, 0)
+    assert (stages["aci_deploy"]["count"], stages["aci_deploy"]["failures"]) == (3, 1)
+    assert stages["aci_deploy"]["min"] <= stages["aci_deploy"]["p50"] <= stages["aci_deploy"]["max"]
+    assert stages["test"]["count"] == 3
+    assert sorted(r["outcome"] for r in results["runs"]) == ["failed", "succeeded", "succeeded", "succeeded"]
+
+    assert json.loads(output.read_text())["label"] == "platform 1.2.3"
+
+
+def test_bench_deadline_is_per_iteration(fake_target_run, monkeypatch):
+    @contextmanager
+    def slow_target_run_ctx(deployment_name, budget, **kwargs):
+        with budget.activate(), budget.stage("aci_deploy"):
+            time.sleep(0.2)
+            budget.check()
+        yield
+
+    monkeypatch.setattr(bench_module, "target_run_ctx", slow_target_run_ctx)
+    results = bench(bench_command="target", deployment_name="dep", iterations=2, deadline_secs=0.1)
+
+    assert [r["outcome"] for r in results["runs"]] == ["deadline exceeded"] * 2
+    assert results["stages"][0]["failures"] == 2
+
+
+def test_vn2_bench_iterations_run_one_at_a_time():
+    with pytest.raises(ValueError):
+        bench(bench_command="vn2", deployment_name="dep", iterations=2, concurrency=2)
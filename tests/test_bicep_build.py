@@ -0,0 +1,160 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import stat
+
+import pytest
+
+from c_aci_testing.tools.aci_param_set import aci_param_set
+from c_aci_testing.tools.target_create import target_create
+from c_aci_testing.utils import bicep_build, bicep_server
+
+
+@pytest.fixture
+def target(tmp_path, fake_cli, monkeypatch):
+    monkeypatch.setenv("AZURE_CONFIG_DIR", str(tmp_path / "azure"))
+    bicep_build.bicep_version.cache_clear()
+    path = tmp_path / "cached"
+    target_create(target_path=str(path), name="cached")
+    return path
+
+
+def compilations(fake_cli) -> int:
+    commands = (["bicep", "build-params"], ["jsonrpc", "bicep/compileParams"])
+    return len([c for c in fake_cli.calls() if c["argv"][1:3] in commands])
+
+
+def test_unchanged_inputs_are_compiled_once(fake_cli, target):
+    bicepparam = str(target / "cached.bicepparam")
+
+    template, parameters = bicep_build.build_params(bicepparam)
+    assert bicep_build.build_params(bicepparam) == (template, parameters)
+    assert compilations(fake_cli) == 1
+    assert template["resources"][0]["type"] == "Microsoft.ContainerInstance/containerGroups"
+    assert parameters["parameters"]["ccePolicies"]["value"] == {"cached": ""}
+
+    # Copies of a target share the cached template
+    copy = target.parent / "copy"
+    copy.mkdir()
+    for name in os.listdir(target):
+        (copy / name).write_bytes((target / name).read_bytes())
+    bicep_build.build_params(str(copy / "cached.bicepparam"))
+    assert compilations(fake_cli) == 1
+
+    (target / "cached.bicepparam").write_text((target / "cached.bicepparam").read_text() + "\n// changed\n")
+    bicep_build.build_params(bicepparam)
+    assert compilations(fake_cli) == 2
+
+
+def test_referenced_modules_are_part_of_the_key(fake_cli, target):
+    bicep = target / "cached.bicep"
+    bicep.write_text(bicep.read_text() + "\nmodule sidecar './modules/sidecar.bicep' = {\n  name: 'sidecar'\n}\n")
+    (target / "modules").mkdir()
+    module = target / "modules" / "sidecar.bicep"
+    module.write_text("var policy = loadTextContent('policy.rego')\n")
+    (target / "modules" / "policy.rego").write_text("package policy")
+    key = bicep_build.cache_key(str(target / "cached.bicepparam"))
+
+    (target / "modules" / "policy.rego").write_text("package policy\n\nallow := true")
+    assert bicep_build.cache_key(str(target / "cached.bicepparam")) != key
+
+
+def test_read_environment_variables_are_part_of_the_key(fake_cli, target, monkeypatch):
+    bicepparam = target / "cached.bicepparam"
+    bicepparam.write_text(bicepparam.read_text() + "\nparam note = readEnvironmentVariable('CACI_TEST_NOTE', '')\n")
+    monkeypatch.setenv("CACI_TEST_NOTE", "first")
+    key = bicep_build.cache_key(str(bicepparam))
+    masked_key, _ = bicep_build._masked_key(str(bicepparam))
+
+    monkeypatch.setenv("CACI_TEST_NOTE", "second")
+    assert bicep_build.cache_key(str(bicepparam)) != key
+    assert bicep_build._masked_key(str(bicepparam))[0] != masked_key
+
+    # Other variables don't matter
+    key = bicep_build.cache_key(str(bicepparam))
+    monkeypatch.setenv("CACI_TEST_OTHER", "changed")
+    assert bicep_build.cache_key(str(bicepparam)) == key
+
+
+def test_parameter_values_are_set_without_compiling(fake_cli, target):
+    bicepparam = target / "cached.bicepparam"
+    template, _ = bicep_build.build_params(str(bicepparam))
+
+    aci_param_set(str(target), parameters={"tag": "v2", "ccePolicies": "{\n  cached: 'cG9saWN5'\n}"})
+    assert bicep_build.build_params(str(bicepparam)) == (
+        template,
+        {
+            "contentVersion": "1.0.0.0",
+            "parameters": {
+                **{name: {"value": ""} for name in ("registry", "repository", "location", "managedIDName")},
+                "tag": {"value": "v2"},
+                "ccePolicies": {"value": {"cached": "cG9saWN5"}},
+            },
+        },
+    )
+    assert compilations(fake_cli) == 1
+
+    # Other changes, like parameter values which are expressions, are compiled
+    bicepparam.write_text(bicepparam.read_text().replace("param tag='v2'", "param tag='v${3}'"))
+    bicep_build.build_params(str(bicepparam))
+    assert compilations(fake_cli) == 2
+
+
+def test_no_cache_and_eviction(fake_cli, target, monkeypatch):
+    bicepparam = str(target / "cached.bicepparam")
+    bicep_build.build_params(bicepparam)
+
+    monkeypatch.setenv(bicep_build.NO_CACHE_ENV, "1")
+    bicep_build.build_params(bicepparam)
+    assert compilations(fake_cli) == 2
+
+    # Entries which don't fit are evicted, least recently used first
+    monkeypatch.delenv(bicep_build.NO_CACHE_ENV)
+    monkeypatch.setenv(bicep_build.MAX_SIZE_ENV, "0.000001")
+    cache_dir = bicep_build.get_cache_dir("bicep")
+    stale = os.path.join(cache_dir, "stale.json")
+    with open(stale, "w", encoding="utf-8") as f:
+        f.write("{}")
+    os.utime(stale, (0, 0))
+    (target / "cached.bicepparam").write_text((target / "cached.bicepparam").read_text() + "\n// changed\n")
+    bicep_build.build_params(bicepparam)
+    assert not os.path.exists(stale)
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_compile_server_is_reused(fake_cli, target, monkeypatch):
+    monkeypatch.setenv(bicep_server.BICEP_BACKEND_ENV, "server")
+    monkeypatch.setenv(bicep_build.NO_CACHE_ENV, "1")
+    bicepparam = str(target / "cached.bicepparam")
+
+    template, parameters = bicep_build.build_params(bicepparam)
+    assert bicep_build.build_params(bicepparam) == (template, parameters)
+    assert template["resources"][0]["name"] == "[deployment().name]"
+
+    calls = [c["argv"] for c in fake_cli.calls()]
+    assert calls.count(["bicep", "jsonrpc", "--stdio"]) == 1
+    assert calls.count(["bicep", "jsonrpc", "bicep/compileParams", bicepparam]) == 2
+    assert not any(argv[:3] == ["az", "bicep", "build-params"] for argv in calls)
+
+    (target / "cached.bicepparam").write_text("param broken=''\n")
+    with pytest.raises(bicep_server.BicepCompileError, match="has no using declaration"):
+        bicep_build.build_params(bicepparam)
+
+
+def test_compile_server_falls_back_to_az(fake_cli, target, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv(bicep_server.BICEP_BACKEND_ENV, "server")
+    broken = tmp_path / "azure" / "bin" / "bicep"
+    broken.parent.mkdir(parents=True)
+    broken.write_text("#!/bin/sh\nexit 1\n")
+    broken.chmod(broken.stat().st_mode | stat.S_IXUSR)
+
+    template, _ = bicep_build.build_params(str(target / "cached.bicepparam"))
+
+    assert template["resources"]
+    assert [c["argv"][1:3] for c in fake_cli.calls()] == [["bicep", "build-params"]]
+    assert "Warning: bicep server exited" in capsys.readouterr().err
@@ -0,0 +1,112 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from c_aci_testing.tools.aci_param_set import aci_param_set
+from c_aci_testing.utils import bicepparam
+
+BICEPPARAM = """\
+using './example.bicep'
+
+/* Image info,
+   param registry='not this one' */
+param registry='' // where images are pushed
+param repository = 'it\\'s ${concat('a', '}')}'
+param tag='''
+multi-line ''
+'''
+
+param ccePolicies={
+  example: {
+    nested: 'a }'
+  }
+  other: ''
+}
+param replicas = 3
+param ports = [
+  80
+  443
+]
+"""
+
+
+def test_unchanged_content_round_trips():
+    assert bicepparam.update(BICEPPARAM, {}) == BICEPPARAM
+    assert list(bicepparam.parse(BICEPPARAM)) == ["registry", "repository", "tag", "ccePolicies", "replicas", "ports"]
+
+
+def test_updates_replace_whole_values():
+    updated = bicepparam.update(
+        BICEPPARAM,
+        {
+            "registry": "caci.azurecr.io",
+            "repository": "'quoted'",
+            "tag": "it's",
+            "ccePolicies": "{\n  example: 'cG9saWN5'\n}",
+            "ports": "[]",
+            "managedIDName": "id",
+        },
+    )
+
+    expected = BICEPPARAM
+    for old, new in [
+        ("param registry='' //", "param registry='caci.azurecr.io' //"),
+        ("'it\\'s ${concat('a', '}')}'", "'quoted'"),
+        ("'''\nmulti-line ''\n'''", "'it\\'s'"),
+        ("{\n  example: {\n    nested: 'a }'\n  }\n  other: ''\n}", "{\n  example: 'cG9saWN5'\n}"),
+        ("[\n  80\n  443\n]", "[]"),
+    ]:
+        assert old in expected
+        expected = expected.replace(old, new)
+    assert updated == expected + "\nparam managedIDName='id'"
+    assert bicepparam.update(BICEPPARAM, {"managedIDName": "id"}, add=False) == BICEPPARAM
+
+
+def test_windows_line_endings_are_kept():
+    text = BICEPPARAM.replace("\n", "\r\n")
+
+    updated = bicepparam.update(text, {"replicas": "5", "location": "westeurope"})
+
+    assert updated == text.replace("replicas = 3", "replicas = 5") + "\r\nparam location='westeurope'"
+
+
+def test_literals():
+    assert bicepparam.literal("{\n  a: 'it\\'s'\n  'b c': [1, -2\n    true]\n  d: null\n}") == {
+        "a": "it's",
+        "b c": [1, -2, True],
+        "d": None,
+    }
+    assert bicepparam.value_of("'quoted'", True) == "quoted"
+    assert bicepparam.value_of("TRUE", None) is True
+
+
+def test_environment_variables():
+    text = "param a = readEnvironmentVariable('A')\nparam b = readEnvironmentVariable ( 'B', 'default' )\n"
+    assert bicepparam.environment_variables(text) == ["A", "B"]
+    assert bicepparam.environment_variables("// readEnvironmentVariable('C')\nparam c = 'c'\n") == []
+    assert bicepparam.environment_variables("param d = readEnvironmentVariable(name)\n") is None
+
+
+def test_syntax_errors():
+    with pytest.raises(bicepparam.BicepParamSyntaxError, match="Unterminated string"):
+        bicepparam.parse("param tag='latest\nparam registry=''\n")
+
+
+def test_aci_param_set_only_writes_changes(tmp_path):
+    (tmp_path / "example.bicep").write_text("param tag string\n")
+    path = tmp_path / "example.bicepparam"
+    path.write_text("using './example.bicep'\n\nparam tag='latest'\n")
+    os.utime(path, (0, 0))
+
+    aci_param_set(str(tmp_path), parameters={"tag": "latest"})
+    assert path.stat().st_mtime == 0
+
+    aci_param_set(str(tmp_path), parameters={"tag": "v2", "location": "westeurope"})
+    assert path.read_text() == "using './example.bicep'\n\nparam tag='v2'\n\nparam location='westeurope'"
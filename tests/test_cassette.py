@@ -0,0 +1,148 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import pytest
+
+from c_aci_testing.utils import cassette
+from c_aci_testing.utils.arm import ArmClient
+from c_aci_testing.utils.cmd_executor import execute
+
+from fake_arm import FakeArm
+
+WRITE_FILE = "import sys; open(sys.argv[1], 'w').write(sys.argv[2]); print('wrote', sys.argv[2])"
+
+
+@pytest.fixture
+def use_cassette(tmp_path, monkeypatch):
+    path = str(tmp_path / "cassette.jsonl")
+
+    def use(mode: str, latency_scale: float = 0):
+        monkeypatch.setenv(cassette.CASSETTE_ENV, path)
+        monkeypatch.setenv(cassette.MODE_ENV, mode)
+        monkeypatch.setenv(cassette.LATENCY_SCALE_ENV, str(latency_scale))
+        cassette.reset()
+
+    yield use
+    cassette.reset()
+
+
+def run_in_fresh_temp_dir(argv_for):
+    with tempfile.TemporaryDirectory(prefix="target_") as target_path:
+        out = os.path.join(target_path, "out.txt")
+        result = execute(argv_for(out))
+        with open(out) as f:
+            return result, f.read()
+
+
+def test_replay_matches_across_temp_dirs_and_restores_files(use_cassette):
+    deployment = str(uuid.uuid4())
+
+    use_cassette(cassette.RECORD)
+    recorded, recorded_file = run_in_fresh_temp_dir(lambda out: [sys.executable, "-c", WRITE_FILE, out, deployment])
+
+    # Replayed with a different temp dir and GUID, without running anything
+    use_cassette(cassette.REPLAY)
+    other = str(uuid.uuid4())
+    replayed, replayed_file = run_in_fresh_temp_dir(lambda out: [sys.executable, "-c", WRITE_FILE, out, other])
+
+    assert (replayed.returncode, replayed.stdout) == (recorded.returncode, recorded.stdout)
+    assert replayed_file == recorded_file == deployment
+
+
+def test_repeated_calls_replay_in_order(use_cassette, tmp_path):
+    count = (
+        "import pathlib, sys; p = pathlib.Path(sys.argv[1]); "
+        "n = int(p.read_text()) + 1 if p.exists() else 1; p.write_text(str(n)); print(n)"
+    )
+    argv = [sys.executable, "-c", count, str(tmp_path / "counter")]
+
+    use_cassette(cassette.RECORD)
+    assert [execute(argv).stdout.strip() for _ in range(2)] == ["1", "2"]
+
+    use_cassette(cassette.REPLAY)
+    assert [execute(argv).stdout.strip() for _ in range(3)] == ["1", "2", "2"]
+
+    with pytest.raises(cassette.CassetteMiss):
+        execute([sys.executable, "-c", "print('not recorded')"])
+
+
+def test_replay_latency_scale(use_cassette):
+    argv = [sys.executable, "-c", "import time; time.sleep(0.5)"]
+    use_cassette(cassette.RECORD)
+    execute(argv)
+
+    use_cassette(cassette.REPLAY, latency_scale=0)
+    start = time.monotonic()
+    execute(argv)
+    assert time.monotonic() - start < 0.3
+
+    use_cassette(cassette.REPLAY, latency_scale=2)
+    start = time.monotonic()
+    execute(argv)
+    assert time.monotonic() - start >= 1
+
+
+def test_arm_requests_replay_offline(use_cassette):
+    use_cassette(cassette.RECORD)
+    with FakeArm() as server:
+        client = ArmClient(server.endpoint, token_provider=lambda _: (server.token, time.time() + 3600))
+        server.add_resource("/subscriptions/sub/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm")
+        recorded = client.list_container_groups("sub", "rg"), client.resource_exists(
+            "/subscriptions/sub/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm", "2024-03-01"
+        )
+        client.close()
+
+    use_cassette(cassette.REPLAY)
+    client = ArmClient(server.endpoint, token_provider=lambda _: ("token", time.time() + 3600))
+    replayed = client.list_container_groups("sub", "rg"), client.resource_exists(
+        "/subscriptions/sub/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm", "2024-03-01"
+    )
+    assert replayed == recorded == ([], True)
+
+
+def test_tokens_and_secrets_are_not_recorded(use_cassette, tmp_path):
+    # Put together by the command, so that the token isn't on its command line
+    token = "eyJ0eXAiOiJKV1Qi.secret-token-value"
+    print_token = (
+        "import json; token = 'eyJ0eXAiOiJKV1Qi.' + 'secret-token-value';"
+        " print(json.dumps({'accessToken': token, 'expires_on': 1700000000, 'tokenType': 'Bearer'}))"
+    )
+
+    use_cassette(cassette.RECORD)
+    recorded = execute([sys.executable, "-c", print_token], env={**os.environ, "REGISTRY_PASSWORD": "hunter2"})
+    assert token in recorded.stdout
+
+    with open(tmp_path / "cassette.jsonl") as f:
+        content = f.read()
+    assert token not in content
+    assert "hunter2" not in content
+
+    use_cassette(cassette.REPLAY)
+    replayed = execute([sys.executable, "-c", print_token])
+    assert '"accessToken": "REDACTED"' in replayed.stdout
+    assert '"expires_on": 1700000000' in replayed.stdout
+
+
+def test_credential_options_are_not_recorded(use_cassette, tmp_path):
+    argv = [sys.executable, "-c", "print('created')", "--docker-server=registry", "--docker-password=SUPERSECRET"]
+
+    use_cassette(cassette.RECORD)
+    recorded = execute(argv)
+
+    with open(tmp_path / "cassette.jsonl") as f:
+        assert "SUPERSECRET" not in f.read()
+
+    # Still matched when replaying, whatever the credential
+    use_cassette(cassette.REPLAY)
+    replayed = execute(argv[:-1] + ["--docker-password=OTHERSECRET"])
+    assert replayed.stdout == recorded.stdout == "created\n"
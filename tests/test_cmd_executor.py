@@ -0,0 +1,64 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import subprocess
+import sys
+import time
+
+import pytest
+
+from c_aci_testing.utils.cmd_executor import execute, execute_all
+
+
+def py(code: str) -> list[str]:
+    return [sys.executable, "-c", code]
+
+
+def test_execute_captures_output():
+    res = execute(py("import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"))
+    assert res.returncode == 3
+    assert res.stdout.strip() == "out"
+    assert res.stderr.strip() == "err"
+
+
+def test_execute_check_raises_called_process_error():
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        execute(py("import sys; sys.exit(2)"), check=True)
+    assert e.value.returncode == 2
+
+
+def test_execute_timeout():
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        execute(py("import time; time.sleep(30)"), timeout=0.5)
+    assert time.monotonic() - start < 10
+
+
+def test_execute_stream_prefixes_lines(capsys):
+    execute(py("print('a'); print('b')"), stream=True, prefix="[cg] ")
+    assert capsys.readouterr().out.splitlines() == ["[cg] a", "[cg] b"]
+
+
+def test_execute_all_runs_in_parallel_and_preserves_order():
+    start = time.monotonic()
+    results = execute_all(
+        [py(f"import time; time.sleep(1); print({i})") for i in range(4)],
+        max_concurrency=4,
+    )
+    assert [r.stdout.strip() for r in results] == ["0", "1", "2", "3"]
+    assert time.monotonic() - start < 3.5
+
+
+def test_execute_all_cancels_remaining_on_failure():
+    start = time.monotonic()
+    with pytest.raises(subprocess.CalledProcessError):
+        execute_all(
+            [py("import sys; sys.exit(1)"), py("import time; time.sleep(30)")],
+            max_concurrency=2,
+            check=True,
+        )
+    assert time.monotonic() - start < 10
@@ -0,0 +1,71 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+import pytest
+
+from c_aci_testing.utils import container_metrics
+
+SUB = "00000000-0000-0000-0000-000000000000"
+RG = "c-aci-testing"
+GB = 1024**3
+
+
+def container(name: str, cpu: float, memory_gb: float) -> dict:
+    return {"name": name, "properties": {"resources": {"requests": {"cpu": cpu, "memoryInGB": memory_gb}}}}
+
+
+def test_sample_and_summarize(arm_backend, tmp_path):
+    group_id = arm_backend.add_container_group(SUB, RG, "cg")
+    arm_backend.metrics[("cg", "primary")] = [(200, 0.5 * GB), (900, 1.2 * GB), (400, 0.8 * GB)]
+    arm_backend.metrics[("cg", "sidecar")] = [(10, 0.1 * GB)]
+    group = arm_backend.resources[group_id.lower()]
+    group["properties"]["containers"] = [container("primary", 2, 4), container("sidecar", 1, 1)]
+
+    samples = container_metrics.sample_metrics([group_id], duration_secs=0.2, interval_secs=0.05)
+
+    # Every sample asks for the whole window, points are only kept once
+    assert len(samples) == 4
+    assert [s["cpu"] for s in samples if s["container"] == "primary"] == [0.2, 0.9, 0.4]
+    assert len([(m, p) for m, p in arm_backend.requests if "Microsoft.Insights" in p]) > 1
+
+    primary, sidecar = container_metrics.summarize([group], samples)
+    assert (primary["cpu_request"], primary["cpu_peak"], primary["suggested_cpu"]) == (2, 0.9, 1.2)
+    assert (primary["memory_request_gb"], primary["memory_peak_gb"]) == (4, pytest.approx(1.2))
+    assert primary["suggested_memory_gb"] == 1.5
+    assert (sidecar["samples"], sidecar["suggested_cpu"], sidecar["suggested_memory_gb"]) == (1, 0.1, 0.2)
+
+    table = container_metrics.format_summary([primary, sidecar])
+    assert "cg/primary" in table and "(30%)" in table
+
+    path = tmp_path / "metrics.json"
+    container_metrics.write_metrics(str(path), samples, [primary, sidecar])
+    assert json.loads(path.read_text())["summary"][0]["suggested_memory_gb"] == 1.5
+
+
+def test_sampling_until_stopped(arm_backend):
+    group_id = arm_backend.add_container_group(SUB, RG, "cg")
+    arm_backend.metrics[("cg", "primary")] = [(100, GB)]
+    stop = threading.Event()
+    threading.Timer(0.2, stop.set).start()
+
+    started = time.monotonic()
+    samples = container_metrics.sample_metrics([group_id], interval_secs=60, stop=stop)
+
+    assert time.monotonic() - started < 5
+    assert [(s["container"], s["cpu"], s["memory_gb"]) for s in samples] == [("primary", 0.1, 1.0)]
+
+
+def test_failed_queries_are_skipped(arm_backend, capsys):
+    group_id = arm_backend.add_container_group(SUB, RG, "cg")
+    arm_backend.fail_next = [400]
+
+    assert container_metrics.sample_metrics([group_id]) == []
+    assert "Failed to get metrics" in capsys.readouterr().err
@@ -0,0 +1,65 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import sys
+import time
+
+import pytest
+
+from c_aci_testing.utils import deadline
+from c_aci_testing.utils.cmd_executor import execute
+from c_aci_testing.utils.deadline import DeadlineExceeded, RunBudget
+
+
+def test_hung_command_is_killed_at_deadline():
+    budget = RunBudget(1)
+    start = time.monotonic()
+    with budget.activate(), pytest.raises(DeadlineExceeded) as e:
+        with budget.stage("images_build"):
+            execute([sys.executable, "-c", "import time; time.sleep(30)"])
+
+    assert time.monotonic() - start < 10
+    assert e.value.stage == "images_build"
+    assert budget.exceeded_in == "images_build"
+    assert "Budget exhausted by stage images_build" in budget.report()
+
+
+def test_later_stages_fail_fast_after_deadline():
+    budget = RunBudget(0.2)
+    with budget.activate():
+        with pytest.raises(DeadlineExceeded):
+            with budget.stage("aci_deploy"):
+                deadline.sleep(5)
+        with pytest.raises(DeadlineExceeded):
+            with budget.stage("test"):
+                pytest.fail("stage body ran after the deadline")
+
+    assert [(r.name, r.status) for r in budget.stages] == [
+        ("aci_deploy", "deadline exceeded"),
+        ("test", "deadline exceeded"),
+    ]
+    assert budget.exceeded_in == "aci_deploy"
+
+
+def test_cleanup_runs_after_deadline():
+    budget = RunBudget(0.1)
+    with budget.activate():
+        time.sleep(0.2)
+        with budget.cleanup_stage("aci_remove"):
+            result = execute([sys.executable, "-c", "print('removed')"])
+
+    assert result.stdout.strip() == "removed"
+    assert [(r.name, r.status) for r in budget.stages] == [("aci_remove", "ok")]
+
+
+def test_no_deadline():
+    budget = RunBudget(0)
+    with budget.activate(), budget.stage("test"):
+        assert deadline.remaining() is None
+        assert deadline.command_timeout(5) == 5
+        deadline.sleep(0)
+    assert "budget" not in budget.report()
@@ -0,0 +1,272 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+"""
+End to end runs of target run, vm runc and vn2 deploy against the offline CLIs
+of fake_cli.py, measuring how much of a run is spent orchestrating, i.e. not
+waiting in a CLI or in a polling sleep.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import List
+
+import pytest
+
+from c_aci_testing.tools.target_create import target_create
+from c_aci_testing.tools.target_run import target_run_ctx
+from c_aci_testing.tools.vm_runc import vm_runc
+from c_aci_testing.tools.vn2_deploy import vn2_deploy
+from c_aci_testing.utils import deadline, run_history
+
+pytestmark = pytest.mark.slow
+
+SUB = "00000000-0000-0000-0000-000000000000"
+RG = "c-aci-testing"
+REGISTRY = "caci.azurecr.io"
+
+# Polling loops sleep 5-20s between checks, which would dominate the runs
+SLEEP_SCALE = 0.01
+
+VN2_YAML = """\
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: {name}
+spec:
+  replicas: 2
+  selector:
+    matchLabels:
+      app: {name}
+  template:
+    metadata:
+      labels:
+        app: {name}
+      annotations:
+        microsoft.containerinstance.virtualnode.ccepolicy: cGFja2FnZSBwb2xpY3k=
+    spec:
+      containers:
+      - name: primary
+        image: {registry}/{name}/primary:latest
+"""
+
+
+@dataclass
+class RunProfile:
+    wall: float
+    cli: float
+    sleeping: float
+    calls: List[dict]
+
+    @property
+    def overhead(self) -> float:
+        return max(0.0, self.wall - self.cli - self.sleeping)
+
+    def count(self, *words: str) -> int:
+        return len([c for c in self.calls if c["argv"][: len(words)] == list(words)])
+
+    def __str__(self) -> str:
+        return (
+            f"wall {self.wall:.2f}s = cli {self.cli:.2f}s + sleeping {self.sleeping:.2f}s"
+            f" + overhead {self.overhead:.2f}s over {len(self.calls)} calls"
+        )
+
+
+def busy_time(calls: List[dict]) -> float:
+    """
+    Time at least one CLI was running, counting overlapping calls once.
+    """
+    total, end = 0.0, float("-inf")
+    for call in sorted(calls, key=lambda c: c["start"]):
+        if call["end"] > end:
+            total += call["end"] - max(call["start"], end)
+            end = call["end"]
+    return total
+
+
+@pytest.fixture
+def profile(fake_cli, monkeypatch, tmp_path):
+    """
+    Run a flow against the fake CLIs with scaled down polling sleeps and profile it.
+    """
+    monkeypatch.delenv("DEPLOYMENT_NAME", raising=False)
+    monkeypatch.setenv(run_history.HISTORY_DB_ENV, str(tmp_path / "history.db"))
+    slept = []
+    real_sleep = deadline.sleep
+
+    def scaled_sleep(secs: float):
+        started = time.monotonic()
+        real_sleep(secs * SLEEP_SCALE)
+        slept.append(time.monotonic() - started)
+
+    monkeypatch.setattr(deadline, "sleep", scaled_sleep)
+
+    def run(flow) -> RunProfile:
+        calls_before, slept_before = len(fake_cli.calls()), len(slept)
+        started = time.monotonic()
+        flow()
+        wall = time.monotonic() - started
+        calls = fake_cli.calls()[calls_before:]
+        result = RunProfile(wall, busy_time(calls), sum(slept[slept_before:]), calls)
+        print(result)
+        return result
+
+    return run
+
+
+@pytest.fixture
+def target(tmp_path):
+    path = str(tmp_path / "perf_target")
+    target_create(target_path=path, name="perf_target")
+    return path
+
+
+def target_run_kwargs(target_path: str, deployment_name: str) -> dict:
+    return dict(
+        target_path=target_path,
+        deployment_name=deployment_name,
+        subscription=SUB,
+        resource_group=RG,
+        registry=REGISTRY,
+        repository="perf",
+        tag="latest",
+        location="westeurope",
+        managed_identity="caci-id",
+    )
+
+
+def test_target_run_overhead(fake_cli, profile, target):
+    fake_cli.configure(latency={"az": 0.05, "docker": 0.05}, deployment_secs=0.3)
+    ids = []
+
+    def flow():
+        with target_run_ctx(**target_run_kwargs(target, "perf-target-run")) as aci_ids:
+            ids.extend(aci_ids)
+
+    result = profile(flow)
+
+    assert ids and ids[0].endswith("/containerGroups/perf-target-run")
+    assert result.count("az", "deployment", "group", "create") == 1
+    # Deployed from the template policies were generated from, compiled once
+    [create] = [c["argv"] for c in result.calls if c["argv"][1:4] == ["deployment", "group", "create"]]
+    assert create[create.index("--template-file") + 1].endswith(".json")
+    assert result.count("az", "bicep", "build-params") == 1
+    assert result.count("docker", "compose", "build") == 1
+    # Polling for the deployment is the only repeated call
+    assert result.count("az", "deployment", "group", "show") <= 5
+    # The deployment's state changes are recorded with when ARM says they happened
+    detections = {d.state: d for d in run_history.detection_stats(0) if d.poller == "deployment"}
+    assert detections["Succeeded"].exact == 1
+    assert len(result.calls) < 40
+    assert result.cli > 0.05 * len(result.calls) * 0.9
+    # Nothing left deployed after cleanup
+    assert fake_cli.state()["groups"] == {}
+
+
+def test_target_run_retries_throttled_deployment(fake_cli, profile, target):
+    fake_cli.configure(deployment_secs=0.3)
+    fake_cli.fail_next("az deployment group create", stderr="ERROR: (TooManyRequests) Rate limit exceeded")
+
+    def flow():
+        with target_run_ctx(**target_run_kwargs(target, "perf-retry")):
+            ...
+
+    result = profile(flow)
+
+    creates = [c for c in result.calls if c["argv"][:4] == ["az", "deployment", "group", "create"]]
+    assert [c["returncode"] for c in creates] == [1, 0]
+
+
+def test_vm_runc_overhead(fake_cli, profile, target):
+    fake_cli.configure(latency={"az": 0.05, "oras": 0.05, "az vm run-command invoke": 0.2})
+
+    result = profile(
+        lambda: vm_runc(
+            target_path=target,
+            deployment_name="perf-vm",
+            subscription=SUB,
+            resource_group=RG,
+            storage_account="caciperf",
+            win_flavor="ws2022",
+            registry=REGISTRY,
+            repository="perf",
+            tag="latest",
+            prefix="lcow",
+        )
+    )
+
+    assert result.count("oras", "manifest", "fetch") == 1
+    assert result.count("az", "vm", "run-command", "invoke") == 2
+    assert result.cli >= 0.4
+
+
+def test_vn2_deploy_overhead(fake_cli, profile, tmp_path):
+    fake_cli.configure(latency={"kubectl": 0.05}, pod_start_secs=0.3)
+    yaml_path = tmp_path / "perf.yaml"
+    yaml_path.write_text(VN2_YAML.format(name="perf-vn2", registry=REGISTRY))
+    output = tmp_path / "deploy.json"
+
+    result = profile(
+        lambda: vn2_deploy(
+            target_path=str(tmp_path),
+            yaml_path=str(yaml_path),
+            monitor_duration_secs=0,
+            deploy_output_file=str(output),
+        )
+    )
+
+    assert result.count("kubectl", "apply") == 1
+    assert 1 <= result.count("kubectl", "get", "pods") <= 10
+    assert '"nb_good_pod": 2' in output.read_text()
+
+
+def test_vn2_deploy_detects_restarts(fake_cli, profile, tmp_path):
+    fake_cli.configure(pod_start_secs=0, pod_restarts=1)
+    yaml_path = tmp_path / "perf.yaml"
+    yaml_path.write_text(VN2_YAML.format(name="perf-vn2", registry=REGISTRY))
+
+    with pytest.raises(SystemExit):
+        vn2_deploy(target_path=str(tmp_path), yaml_path=str(yaml_path), monitor_duration_secs=0, deploy_output_file="")
+
+    assert any(c["argv"][:3] == ["kubectl", "describe", "pod"] for c in fake_cli.calls())
+
+
+def test_concurrent_runs_of_one_target(fake_cli, profile, target):
+    fake_cli.configure(deployment_secs=0.3)
+    bicepparam_path = os.path.join(target, "perf_target.bicepparam")
+    with open(bicepparam_path, encoding="utf-8") as f:
+        bicepparam = f.read()
+    errors = []
+
+    def run(index: int):
+        kwargs = target_run_kwargs(target, f"perf-concurrent-{index}")
+        kwargs.update(tag=f"v{index}", location=f"region{index}", param_overlay=True, skip_images=True)
+        try:
+            with target_run_ctx(**kwargs):
+                ...
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    def flow():
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    result = profile(flow)
+
+    assert errors == []
+    with open(bicepparam_path, encoding="utf-8") as f:
+        assert f.read() == bicepparam
+    deployments = fake_cli.state()["deployments"]
+    for index in range(3):
+        [group] = deployments[f"perf-concurrent-{index}"]["resources"]
+        assert group["location"] == f"region{index}"
+        assert group["properties"]["containers"][0]["properties"]["image"].endswith(f":v{index}")
+    assert result.count("az", "deployment", "group", "create") == 3
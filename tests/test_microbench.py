@@ -0,0 +1,49 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+
+import microbench
+
+
+def test_benchmarks_run_on_small_inputs():
+    sizes = {name: 2 for name in microbench.BENCHMARKS}
+
+    results = microbench.run_benchmarks(sizes=sizes, min_time=0.001, repeat=1)
+
+    assert [r["name"] for r in results["results"]] == list(microbench.BENCHMARKS)
+    assert all(r["best"] > 0 and r["normalized"] > 0 for r in results["results"])
+
+
+def test_check_fails_on_regression(tmp_path, monkeypatch, capsys):
+    def results(host: str, calibration: float, **best: float) -> dict:
+        return {
+            "python": "3.11",
+            "host": host,
+            "calibration": calibration,
+            "results": [
+                {"name": name, "size": 10, "best": secs, "normalized": secs / calibration}
+                for name, secs in best.items()
+            ],
+        }
+
+    baseline = results("a", 1.0, evaluate_expr=1.0, make_configs=2.0)
+    # Same machine: raw timings compare
+    assert microbench.compare(baseline, results("a", 0.5, evaluate_expr=1.2, make_configs=2.0)) == []
+    assert len(microbench.compare(baseline, results("a", 1.0, evaluate_expr=1.3, make_configs=2.0))) == 1
+    # Another machine twice as fast: timings compare relative to the calibration
+    assert microbench.compare(baseline, results("b", 0.5, evaluate_expr=0.5, make_configs=1.0)) == []
+    regressions = microbench.compare(baseline, results("b", 0.5, evaluate_expr=0.5, make_configs=1.5), threshold=0.4)
+    assert len(regressions) == 1 and regressions[0].startswith("make_configs (size 10) regressed by 50%")
+
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(results("a", 1.0, evaluate_expr=1e-9)))
+    monkeypatch.setattr(microbench, "run_benchmarks", lambda *args, **kwargs: results("a", 1.0, evaluate_expr=1.0))
+    assert microbench.main(["check", "--baseline", str(path)]) == 1
+    assert "Regression: evaluate_expr" in capsys.readouterr().err
+    assert microbench.main(["check", "--baseline", str(path), "--update"]) == 0
+    assert json.loads(path.read_text())["results"][0]["best"] == 1.0
@@ -0,0 +1,70 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import threading
+
+from c_aci_testing.tools.aci_param_set import aci_param_set
+from c_aci_testing.utils import param_overlay
+
+BICEPPARAM = """\
+using './example.bicep'
+
+param tag='latest'
+param replicas=1
+param ccePolicies={
+  example: ''
+}
+"""
+
+COMPILED = {
+    "contentVersion": "1.0.0.0",
+    "parameters": {"tag": {"value": "latest"}, "replicas": {"value": 1}, "ccePolicies": {"value": {"example": ""}}},
+}
+
+
+def test_values_stay_in_memory(tmp_path):
+    (tmp_path / "example.bicep").write_text("param tag string\n")
+    path = tmp_path / "example.bicepparam"
+    path.write_text(BICEPPARAM)
+
+    with param_overlay.run_overlay(enabled=True) as overlay:
+        aci_param_set(str(tmp_path), parameters={"tag": "v2", "replicas": "3", "location": "westeurope"})
+        aci_param_set(str(tmp_path), parameters={"ccePolicies": "{\n  example: 'cG9saWN5'\n}", "other": "x"}, add=False)
+
+        assert param_overlay.apply(str(path), COMPILED)["parameters"] == {
+            "tag": {"value": "v2"},
+            "replicas": {"value": 3},
+            "ccePolicies": {"value": {"example": "cG9saWN5"}},
+            "location": {"value": "westeurope"},
+        }
+        assert overlay.fingerprint(str(path))
+
+    assert path.read_text() == BICEPPARAM
+    assert param_overlay.current() is None
+    assert param_overlay.apply(str(path), COMPILED) is COMPILED
+
+
+def test_threads_have_their_own_overlay(tmp_path):
+    (tmp_path / "example.bicep").write_text("param tag string\n")
+    path = tmp_path / "example.bicepparam"
+    path.write_text(BICEPPARAM)
+    tags = {}
+
+    def run(tag: str):
+        with param_overlay.run_overlay(enabled=True):
+            aci_param_set(str(tmp_path), parameters={"tag": tag})
+            tags[tag] = param_overlay.apply(str(path), COMPILED)["parameters"]["tag"]["value"]
+
+    threads = [threading.Thread(target=run, args=(f"v{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tags == {f"v{i}": f"v{i}" for i in range(4)}
+    assert path.read_text() == BICEPPARAM
+
@@ -0,0 +1,64 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import types
+
+import pytest
+
+from c_aci_testing.utils import deadline, poller
+from c_aci_testing.utils.poller import Detection, Poller
+
+
+@pytest.fixture
+def slept(monkeypatch):
+    """
+    Sleeps of pollers, which advance a fake clock instead of waiting.
+    """
+    now = [1000.0]
+    slept = []
+
+    def sleep(secs: float):
+        slept.append(secs)
+        now[0] += secs
+
+    monkeypatch.setattr(poller, "time", types.SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0]))
+    monkeypatch.setattr(deadline, "sleep", sleep)
+    return slept
+
+
+def test_intervals_grow_and_start_over_on_changes(slept):
+    deployment = Poller("deployment", initial=2, factor=2, max_interval=10)
+
+    for state in ["Accepted", "Accepted", "Accepted", "Running", "Running", "Running", "Running"]:
+        deployment.wait()
+        deployment.observe(state)
+    deployment.wait()
+    assert deployment.observe("Succeeded", changed_at=poller.time.time() - 1)
+
+    # Checked right after each change, then quickly again
+    assert slept == [2, 4, 8, 10, 2, 4, 8]
+    assert deployment.detections == [
+        Detection("deployment", "Accepted", 1, False, 1),
+        Detection("deployment", "Running", 5, False, 4),
+        Detection("deployment", "Succeeded", 1, True, 8),
+    ]
+
+
+def test_ceiling_and_collected_detections(slept, monkeypatch):
+    monkeypatch.setenv(poller.POLL_MAX_INTERVAL_ENV, "3")
+
+    with poller.collecting() as detections:
+        bootstrap = Poller("vm bootstrap", initial=5, max_interval=30)
+        bootstrap.wait()
+        bootstrap.observe("running")
+        bootstrap.wait()
+        bootstrap.wait(at_most=1)
+        # Clocks of the operation and this machine disagree, the lag is still bounded by the checks
+        bootstrap.observe("success", changed_at=poller.time.time() - 3600)
+
+    assert slept == [3, 3, 1]
+    assert [(d.state, d.lag, d.exact) for d in detections] == [("running", 1.5, False), ("success", 4, True)]
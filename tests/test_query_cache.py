@@ -0,0 +1,73 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import stat
+
+import pytest
+
+from c_aci_testing.utils.cmd_executor import execute, execute_all
+from c_aci_testing.utils.query_cache import is_mutating, run_cache
+
+SHOW_CG = ["az", "container", "show", "--name", "cg", "--resource-group", "rg"]
+SHOW_OTHER_CG = ["az", "container", "show", "--name", "other", "--resource-group", "rg"]
+SHOW_DEPLOYMENT = ["az", "deployment", "group", "show", "-n", "dep", "-g", "rg", "-o", "json"]
+
+
+@pytest.fixture
+def az_calls(tmp_path, monkeypatch):
+    """
+    Put an `az` on PATH which logs its arguments and echoes them back.
+    """
+    log = tmp_path / "az.log"
+    az = tmp_path / "az"
+    az.write_text('#!/bin/sh\necho "$@" >> "$AZ_LOG"\necho "$@"\n')
+    az.chmod(az.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("AZ_LOG", str(log))
+    return lambda: log.read_text().splitlines() if log.exists() else []
+
+
+def test_queries_are_cached_within_run(az_calls):
+    with run_cache() as cache:
+        first = execute(SHOW_CG)
+        again = execute_all([SHOW_CG, SHOW_CG])
+        assert [r.stdout for r in again] == [first.stdout] * 2
+        assert len(az_calls()) == 1
+        assert cache.hits == 2
+
+        execute(SHOW_CG, use_cache=False)
+        assert len(az_calls()) == 2
+
+    execute(SHOW_CG)
+    assert len(az_calls()) == 3
+
+
+def test_mutation_invalidates_same_resource(az_calls):
+    with run_cache():
+        execute_all([SHOW_CG, SHOW_OTHER_CG])
+        execute(["az", "container", "delete", "--name", "cg", "--resource-group", "rg", "--yes"], capture=False)
+        execute_all([SHOW_CG, SHOW_OTHER_CG])
+
+    assert az_calls().count(" ".join(SHOW_CG[1:])) == 2
+    assert az_calls().count(" ".join(SHOW_OTHER_CG[1:])) == 1
+
+
+def test_deployment_invalidates_resource_group(az_calls):
+    with run_cache():
+        execute_all([SHOW_CG, SHOW_DEPLOYMENT])
+        execute(["az", "deployment", "group", "create", "-n", "dep", "--resource-group", "rg"])
+        execute_all([SHOW_CG, SHOW_DEPLOYMENT])
+
+    assert len(az_calls()) == 5
+
+
+def test_is_mutating():
+    assert is_mutating(["az", "resource", "delete", "--ids", "/subscriptions/s/resourceGroups/rg/x/y"])
+    assert is_mutating(["az", "vm", "run-command", "invoke", "-n", "vm"])
+    assert not is_mutating(["az", "container", "logs", "--name", "delete"])
+    assert not is_mutating(SHOW_DEPLOYMENT)
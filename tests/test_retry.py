@@ -0,0 +1,119 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import email.utils
+import subprocess
+import sys
+import time
+
+import pytest
+
+from c_aci_testing.utils import retry
+from c_aci_testing.utils.arm import ArmClient, ArmError
+from c_aci_testing.utils.cmd_executor import execute
+from c_aci_testing.utils.retry import RetryPolicy
+
+from fake_arm import FakeArm
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.01)
+
+
+def flaky(tmp_path, failures: int, stderr: str) -> list[str]:
+    """
+    Command which fails with stderr the first `failures` times it runs.
+    """
+    counter = tmp_path / "count"
+    code = (
+        "import pathlib, sys\n"
+        f"p = pathlib.Path({str(counter)!r})\n"
+        "n = int(p.read_text()) if p.exists() else 0\n"
+        "p.write_text(str(n + 1))\n"
+        f"if n < {failures}:\n"
+        f"    print({stderr!r}, file=sys.stderr)\n"
+        "    sys.exit(1)\n"
+        "print('ok')\n"
+    )
+    return [sys.executable, "-c", code]
+
+
+@pytest.mark.parametrize(
+    "stderr, expected",
+    [
+        ("ERROR: (TooManyRequests) Too many requests, retry after 10 seconds", retry.TRANSIENT),
+        ("ERROR: Operation returned an invalid status code 'Service Unavailable' (status code 503)", retry.TRANSIENT),
+        ("ConnectionResetError: Connection reset by peer", retry.TRANSIENT),
+        ("ERROR: (ResourceGroupNotFound) Resource group 'rg' could not be found.", retry.FATAL),
+        ("ERROR: unrecognized arguments: --bogus", retry.FATAL),
+        ("ERROR: something odd happened", retry.UNKNOWN),
+        ("", retry.UNKNOWN),
+    ],
+)
+def test_classify(stderr, expected):
+    assert retry.classify(stderr) == expected
+
+
+def test_backoff_grows_with_jitter_and_honours_retry_after():
+    policy = RetryPolicy(base_delay=1, max_delay=8)
+    assert 0.5 <= policy.backoff(1) <= 1
+    assert 2 <= policy.backoff(3) <= 4
+    assert 4 <= policy.backoff(10) <= 8
+    assert policy.backoff(1, retry.parse_retry_after("Retry-After: 30")) == 30
+
+
+def test_parse_retry_after_header():
+    assert retry.parse_retry_after_header("30") == 30
+    assert retry.parse_retry_after_header(None) is None
+    assert retry.parse_retry_after_header("soon") is None
+    assert retry.parse_retry_after_header("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= retry.parse_retry_after_header(in_a_minute) <= 60
+
+
+def test_transient_failures_are_retried(tmp_path):
+    res = execute(flaky(tmp_path, 2, "HTTP status 429 TooManyRequests"), check=True, retry=FAST)
+    assert res.stdout.strip() == "ok"
+
+
+def test_fatal_failures_are_not_retried(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError):
+        execute(flaky(tmp_path, 1, "ERROR: (AuthorizationFailed) no access"), check=True, retry=FAST)
+    assert (tmp_path / "count").read_text() == "1"
+
+
+def test_unknown_failures_only_retried_on_request(tmp_path):
+    assert execute(flaky(tmp_path, 1, "huh"), retry=FAST).returncode == 1
+    assert execute(flaky(tmp_path, 2, "huh"), retry=RetryPolicy(base_delay=0.01, retry_unknown=True)).returncode == 0
+
+
+def test_arm_client_retries_throttling():
+    with FakeArm() as server:
+        client = ArmClient(server.endpoint, lambda resource: (server.token, time.time() + 3600), retry_policy=FAST)
+        server.fail_next = [429, 503]
+        assert client.list_container_groups("sub", "rg") == []
+
+        server.fail_next = [400]
+        with pytest.raises(ArmError):
+            client.list_container_groups("sub", "rg")
+        assert len(server.requests) == 4
+
+        # Dates and unparseable values fall back to the policy's backoff
+        for retry_after in ("Wed, 21 Oct 2015 07:28:00 GMT", "soon"):
+            server.retry_after = retry_after
+            server.fail_next = [503]
+            assert client.list_container_groups("sub", "rg") == []
+
+
+def test_arm_client_raises_arm_error_for_non_json_errors():
+    with FakeArm() as server:
+        client = ArmClient(server.endpoint, lambda resource: (server.token, time.time() + 3600), retry_policy=FAST)
+        server.failure_body = "<html><body>502 Bad Gateway</body></html>"
+        server.fail_next = [502] * FAST.max_attempts
+        with pytest.raises(ArmError) as e:
+            client.list_container_groups("sub", "rg")
+        assert (e.value.status, e.value.code, e.value.body) == (502, "", None)
+        assert "Bad Gateway" in e.value.message
+        client.close()
@@ -0,0 +1,122 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import time
+from contextlib import closing
+
+import pytest
+
+from c_aci_testing.tools.history import history
+from c_aci_testing.utils import deadline, run_history
+from c_aci_testing.utils.deadline import DeadlineExceeded, RunBudget, StageRecord
+from c_aci_testing.utils.poller import Poller
+from c_aci_testing.utils.run_history import RunRecord
+
+
+@pytest.fixture
+def history_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.sqlite")
+    monkeypatch.setenv(run_history.HISTORY_DB_ENV, path)
+    return path
+
+
+def runs(path):
+    with closing(run_history.connect(path)) as conn:
+        return conn.execute("SELECT kind, target, region, outcome FROM runs ORDER BY id").fetchall()
+
+
+def test_runs_are_recorded_with_outcome_and_stages(history_db):
+    budget = RunBudget()
+    with run_history.recording("target run", budget, target_path="/targets/simple/", region="westeurope"):
+        with budget.stage("aci_deploy"):
+            pass
+
+    budget = RunBudget(0.1)
+    with pytest.raises(DeadlineExceeded):
+        with run_history.recording("target run", budget, target_path="/targets/simple", region="westeurope"):
+            with budget.activate(), budget.stage("aci_deploy"):
+                deadline.sleep(1)
+
+    with pytest.raises(RuntimeError):
+        with run_history.recording("vm deploy", RunBudget(), region="eastus"):
+            raise RuntimeError("bootstrap failed")
+
+    assert runs(history_db) == [
+        ("target run", "simple", "westeurope", "succeeded"),
+        ("target run", "simple", "westeurope", "deadline exceeded"),
+        ("vm deploy", None, "eastus", "failed"),
+    ]
+    with closing(run_history.connect(history_db)) as conn:
+        assert conn.execute("SELECT name, status FROM stages ORDER BY run_id").fetchall() == [
+            ("aci_deploy", "ok"),
+            ("aci_deploy", "deadline exceeded"),
+        ]
+
+
+def test_history_disabled(monkeypatch, tmp_path):
+    monkeypatch.setenv(run_history.HISTORY_DB_ENV, "")
+    with run_history.recording("target run", RunBudget()):
+        pass
+    assert not list(tmp_path.iterdir())
+
+
+def record(path, region, durations, started_at=None, status="ok"):
+    for duration in durations:
+        run_history.record_run(
+            RunRecord(
+                kind="target run",
+                outcome="succeeded",
+                started_at=started_at or time.time(),
+                duration=duration,
+                stages=[StageRecord("aci_deploy", duration, status)],
+                target="simple",
+                region=region,
+            ),
+            path,
+        )
+
+
+def test_stage_percentiles(history_db):
+    record(history_db, "westeurope", range(1, 101))
+    record(history_db, "eastus", [500, 700])
+    record(history_db, "eastus", [10000], started_at=time.time() - 40 * 24 * 3600)
+    record(history_db, "eastus", [9000], status="failed")
+
+    since = time.time() - 30 * 24 * 3600
+    (overall,) = run_history.stage_stats(since, path=history_db)
+    assert (overall.count, overall.p50, overall.p95, overall.max) == (102, 51, 97, 700)
+
+    per_region = {s.region: s for s in run_history.stage_stats(since, by_region=True, path=history_db)}
+    assert (per_region["westeurope"].p50, per_region["westeurope"].p95) == (50, 95)
+    assert (per_region["eastus"].count, per_region["eastus"].p50, per_region["eastus"].max) == (2, 500, 700)
+
+    (filtered,) = run_history.stage_stats(since, region="eastus", path=history_db)
+    assert filtered.count == 2
+
+
+def test_history_command(history_db, capsys):
+    record(history_db, "westeurope", [30, 40])
+    history(days=7)
+    out = capsys.readouterr().out
+    assert "target run" in out and "succeeded" in out
+    assert "aci_deploy" in out and "westeurope" in out
+
+
+def test_detection_lags(history_db, capsys):
+    budget = RunBudget()
+    with run_history.recording("target run", budget, region="westeurope"):
+        deployment = Poller("deployment", initial=0)
+        deployment.observe("Running")
+        deployment.observe("Succeeded", changed_at=time.time())
+
+    (running, succeeded) = run_history.detection_stats(time.time() - 3600, path=history_db)
+    assert (running.poller, running.state, running.count, running.exact) == ("deployment", "Running", 1, 0)
+    assert (succeeded.state, succeeded.exact, succeeded.p50_polls) == ("Succeeded", 1, 2)
+    assert succeeded.max < 1
+
+    history(days=1)
+    assert "Detection lag of polled state changes" in capsys.readouterr().out
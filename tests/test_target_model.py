@@ -0,0 +1,103 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from c_aci_testing.tools.target_create import target_create
+from c_aci_testing.tools.vm_generate_scripts import make_configs
+from c_aci_testing.tools.vn2_generate_yaml import vn2_generate_yaml
+from c_aci_testing.utils import bicep_build, target_model
+from c_aci_testing.utils.target_model import TargetModel, load_target_model
+
+SUB = "00000000-0000-0000-0000-000000000000"
+RG = "c-aci-testing"
+REGISTRY = "caci.azurecr.io"
+
+
+@pytest.fixture
+def target(tmp_path, fake_cli, monkeypatch):
+    monkeypatch.setenv("AZURE_CONFIG_DIR", str(tmp_path / "azure"))
+    bicep_build.bicep_version.cache_clear()
+    path = tmp_path / "model"
+    target_create(target_path=str(path), name="model")
+    return str(path)
+
+
+def load(target: str, tag: str = "latest") -> TargetModel:
+    return load_target_model(target, SUB, RG, "model-dep", REGISTRY, "repo", tag)
+
+
+def compilations(fake_cli) -> int:
+    return len([c for c in fake_cli.calls() if c["argv"][1:3] == ["bicep", "build-params"]])
+
+
+def test_model_is_built_once_per_content(fake_cli, target, capsys):
+    model = load(target)
+
+    assert load(target) is model
+    [group] = model.container_groups
+    assert (group.id, group.name, group.os_type, group.is_wcow) == ("model", "model-dep", "Linux", False)
+    assert model.images == [f"{REGISTRY}/repo/primary:latest"]
+
+    # Another invocation uses the serialized model
+    target_model.clear_memo()
+    capsys.readouterr()
+    assert load(target).to_json() == model.to_json()
+    assert "Using cached target model" in capsys.readouterr().out
+    assert compilations(fake_cli) == 1
+
+    # Only a parameter value changed, which doesn't need compiling
+    assert load(target, tag="other").images == [f"{REGISTRY}/repo/primary:other"]
+    assert compilations(fake_cli) == 1
+
+
+def test_stages_share_a_model(fake_cli, target, tmp_path):
+    model = load(target)
+    output_dir = tmp_path / "configs"
+    output_dir.mkdir()
+
+    make_configs(
+        target_path=target,
+        subscription=SUB,
+        resource_group=RG,
+        deployment_name="model-dep",
+        win_flavor="ws2022",
+        registry=REGISTRY,
+        repository="repo",
+        tag="latest",
+        prefix="lcow",
+        output_conf_dir=str(output_dir),
+        no_resolve_manifest_hash=True,
+        model=model,
+    )
+    vn2_generate_yaml(
+        target_path=target,
+        yaml_path=str(tmp_path / "model.yaml"),
+        subscription=SUB,
+        resource_group=RG,
+        deployment_name="model-dep",
+        managed_identity="",
+        registry=REGISTRY,
+        repository="repo",
+        tag="latest",
+        replicas=1,
+        ignore_vnets=True,
+        model=model,
+    )
+
+    assert compilations(fake_cli) == 1
+    assert os.path.exists(output_dir / "pod.snp.json")
+    assert f"image: {REGISTRY}/repo/primary:latest" in (tmp_path / "model.yaml").read_text()
+
+
+def test_no_cache_always_builds(fake_cli, target, monkeypatch):
+    monkeypatch.setenv(bicep_build.NO_CACHE_ENV, "1")
+
+    assert load(target) is not load(target)
+    assert compilations(fake_cli) == 2
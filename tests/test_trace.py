@@ -0,0 +1,103 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) Microsoft Corporation. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+import c_aci_testing
+
+from c_aci_testing.utils import deadline, trace
+from c_aci_testing.utils.cmd_executor import execute, execute_all
+from c_aci_testing.utils.deadline import RunBudget
+
+SLEEP = [sys.executable, "-c", "import time; time.sleep(0.2)"]
+
+
+def load(path) -> list:
+    with open(path) as f:
+        return json.load(f)["traceEvents"]
+
+
+def spans(events: list, cat: str) -> list:
+    return [e for e in events if e["ph"] == "X" and e["cat"] == cat]
+
+
+def test_stages_contain_their_commands(tmp_path):
+    path = tmp_path / "trace.json"
+    budget = RunBudget()
+    with trace.tracing(str(path)), budget.activate():
+        with budget.stage("images_build"):
+            execute([sys.executable, "-c", "print('built')"])
+        with budget.stage("aci_deploy"):
+            deadline.sleep(0.05)
+            with trace.span("poll deployment", cat="poll") as poll:
+                poll["state"] = "Succeeded"
+
+    events = load(path)
+    stages = {e["name"]: e for e in spans(events, "stage")}
+    (command,) = spans(events, "command")
+    (poll,) = spans(events, "poll")
+    (sleep,) = spans(events, "wait")
+
+    assert command["args"]["argv"].endswith("print('built')")
+    assert command["args"]["returncode"] == 0
+    assert poll["args"]["state"] == "Succeeded"
+
+    def within(inner, outer):
+        return (
+            inner["tid"] == outer["tid"]
+            and outer["ts"] <= inner["ts"]
+            and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+        )
+
+    assert within(command, stages["images_build"])
+    assert within(sleep, stages["aci_deploy"]) and within(poll, stages["aci_deploy"])
+
+
+def test_parallel_commands_get_their_own_tracks(tmp_path):
+    path = tmp_path / "trace.json"
+    with trace.tracing(str(path)):
+        with trace.span("aci_get_is_live"):
+            execute_all([SLEEP] * 3)
+
+    events = load(path)
+    commands = spans(events, "command")
+    assert len({e["tid"] for e in commands}) == 3
+    track_names = {e["args"]["name"] for e in events if e["name"] == "thread_name"}
+    assert "MainThread parallel 2" in track_names
+
+
+def test_child_process_is_merged(tmp_path):
+    path = tmp_path / "trace.json"
+    child = (
+        "import sys; from c_aci_testing.utils import trace\n"
+        "with trace.tracing(sys.argv[1], name='child'), trace.span('child stage'): pass"
+    )
+    with trace.tracing(str(path), name="parent"), trace.span("test"):
+        env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.dirname(c_aci_testing.__file__))}
+        subprocess.run([sys.executable, "-c", child, str(path)], check=True, env=env)
+
+    processes = {e["args"]["name"] for e in load(path) if e["name"] == "process_name"}
+    assert processes == {"parent", "child"}
+
+
+def test_no_trace_without_file():
+    with trace.tracing(""), trace.span("stage") as args:
+        args["state"] = "ok"
+        assert trace.current() is None
+
+
+def test_credentials_are_not_traced(tmp_path):
+    path = tmp_path / "trace.json"
+    with trace.tracing(str(path)):
+        execute([sys.executable, "-c", "", "--docker-password=SUPERSECRET"])
+
+    (command,) = spans(load(path), "command")
+    assert "SUPERSECRET" not in command["args"]["argv"]
+    assert "--docker-password=REDACTED" in command["args"]["argv"]